@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+This script analyses the output of many simulations at once (e.g. for a
+sweep over field angles, damping or geometry). For each data directory
+it computes the power spectrum and locates the peaks closest to the given
+approximate frequencies, and it writes the peak frequencies, amplitudes
+and linewidths for all directories to a single CSV table.
+
+The data directories can be given as a list and/or as glob patterns, e.g.:
+
+    python analyse_batch.py 'runs/angle_*' --freqs 8.25,11.25 --output peaks.csv --jobs 8
+
+If the output table already exists, directories which have already been
+analysed successfully are skipped, so an interrupted batch can simply be
+restarted. Directories whose analysis fails are recorded in the table
+(with status 'failed') and retried on the next run; use `--no-resume` to
+analyse all directories again. With `--mode-maps DIR` the mode maps at
+the peaks of each directory are saved as PNG files in DIR.
+
+"""
+
+import argparse
+
+from postprocessing.batch_analysis import analyse_batch, expand_data_dirs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyse the spectra of many simulation output directories.')
+    parser.add_argument('data_dirs', type=str, nargs='+',
+                        help='Data directories (or glob patterns matching them)')
+    parser.add_argument('--output', dest='output', type=str, default='peaks.csv',
+                        help='Output table (CSV) with the results for all directories (default: peaks.csv)')
+    parser.add_argument('--freqs', dest='freqs', type=str, default='8.25,11.25',
+                        help='Comma-separated list of approximate peak frequencies in GHz (default: 8.25,11.25)')
+    parser.add_argument('--data-format', dest='data_format', type=str, default='OOMMF',
+                        help="Format of the simulation data ('OOMMF', 'Nmag' or 'HDF5'; default: OOMMF)")
+    parser.add_argument('--component', dest='component', type=str, default='y',
+                        help='Magnetization component to analyse (default: y)')
+    parser.add_argument('--method', dest='method', type=int, default=2, choices=[1, 2],
+                        help='Method used to compute the spectrum (default: 2)')
+    parser.add_argument('--memory-budget', dest='memory_budget', type=float, default=None,
+                        help='Compute the spectra out-of-core using at most this many megabytes per process')
+    parser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                        help='Number of directories analysed in parallel (default: 1)')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='Analyse all directories again, even if they are in the output table')
+    parser.add_argument('--mode-maps', dest='mode_map_dir', type=str, default=None,
+                        help='Save the mode maps at the peaks of each directory as PNG files in this directory')
+    args = parser.parse_args()
+
+    data_dirs = expand_data_dirs(args.data_dirs)
+    if not data_dirs:
+        parser.error("No data directories found matching: {}".format(' '.join(args.data_dirs)))
+
+    memory_budget = None if args.memory_budget is None else int(args.memory_budget * 1024**2)
+    approx_freqs = [float(f) for f in args.freqs.split(',')]
+
+    summary = analyse_batch(data_dirs, args.output, approx_freqs, data_format=args.data_format,
+                            component=args.component, method=args.method, memory_budget=memory_budget,
+                            jobs=args.jobs, resume=args.resume, mode_map_dir=args.mode_map_dir)
+    if summary['failed']:
+        raise SystemExit(1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+This script compares the spectra of the data generated by different
+simulation codes (e.g. OOMMF and Nmag) or of different runs. The data
+of all runs is aligned onto a common time base, the peaks closest to the
+given approximate frequencies are matched, and the deviations of their
+frequencies and amplitudes are reported for each pair of runs, e.g.:
+
+    python compare_spectra.py OOMMF=../micromagnetic_simulation_data/recomputed_data/oommf \\
+        Nmag=../micromagnetic_simulation_data/recomputed_data/nmag --data-formats OOMMF,Nmag \\
+        --figure spectra.png
+
+Each run is given as NAME=DATA_DIR (or just DATA_DIR, in which case the
+name of the directory is used). The spectra of each run are computed only
+once, however many runs are compared. With `--figure FILE` an overlay of
+the spectra of all runs is saved.
+
+"""
+
+import argparse
+import os
+
+from postprocessing import DataReader
+from postprocessing.cross_comparison import SpectralCrossComparison
+
+
+def parse_run(run):
+    """
+    Split a run given as NAME=DATA_DIR (or DATA_DIR) into its name and data directory.
+    """
+    if '=' in run:
+        name, data_dir = run.split('=', 1)
+    else:
+        name, data_dir = os.path.basename(os.path.normpath(run)), run
+    return name, data_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the spectra of different simulation codes or runs.')
+    parser.add_argument('runs', type=str, nargs='+',
+                        help='Runs to compare, given as NAME=DATA_DIR (or DATA_DIR)')
+    parser.add_argument('--data-formats', dest='data_formats', type=str, default='OOMMF',
+                        help="Comma-separated list of the formats of the data ('OOMMF', 'Nmag' or 'HDF5'), "
+                             "one for each run or one for all runs (default: OOMMF)")
+    parser.add_argument('--freqs', dest='freqs', type=str, default='8.25,11.25',
+                        help='Comma-separated list of approximate peak frequencies in GHz (default: 8.25,11.25)')
+    parser.add_argument('--components', dest='components', type=str, default='y',
+                        help='Magnetization components to compare (default: y)')
+    parser.add_argument('--methods', dest='methods', type=str, default='1,2',
+                        help='Comma-separated list of the methods used to compute the spectra (default: 1,2)')
+    parser.add_argument('--averaged-only', dest='spatially_resolved', action='store_false',
+                        help='Only use the spatially averaged magnetisation (i.e. only method 1)')
+    parser.add_argument('--figure', dest='figure', type=str, default=None,
+                        help='Save an overlay of the spectra (of the first component, via the first method) '
+                             'to this file')
+    args = parser.parse_args()
+
+    if len(args.runs) < 2:
+        parser.error("At least two runs are needed for a comparison.")
+    names, data_dirs = zip(*[parse_run(run) for run in args.runs])
+    data_formats = args.data_formats.split(',')
+    if len(data_formats) == 1:
+        data_formats = data_formats * len(data_dirs)
+    if len(data_formats) != len(data_dirs):
+        parser.error("Got {} data formats for {} runs.".format(len(data_formats), len(data_dirs)))
+
+    approx_freqs = [float(f) for f in args.freqs.split(',')]
+    methods = [int(method) for method in args.methods.split(',')]
+    components = list(args.components)
+
+    data_readers = [DataReader(data_dir, data_format=data_format, mmap_mode='r')
+                    for data_dir, data_format in zip(data_dirs, data_formats)]
+    comparison = SpectralCrossComparison(data_readers, names=names, components=components,
+                                         spatially_resolved=args.spatially_resolved)
+    print(comparison.format_alignment())
+
+    results = comparison.compare_all(approx_freqs, components=components, methods=methods)
+    for name_ref, name_gen in results:
+        print("\n{} vs. {}:".format(name_ref, name_gen))
+        for (component, method), peaks in sorted(results[(name_ref, name_gen)].items()):
+            print(comparison.format_peaks(name_ref, name_gen, peaks, component=component, method=method))
+
+    if args.figure is not None:
+        method = methods[0] if args.spatially_resolved else 1
+        fig = comparison.plot_overlay(component=components[0], method=method, approx_freqs=approx_freqs)
+        fig.savefig(args.figure)
+        print("\nSaved overlay of the spectra to: {}".format(args.figure))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+"""
+This script converts the raw simulation data in a data directory (as
+produced by the OOMMF or Nmag simulation scripts in this repository,
+i.e. the files `dynamic_txyz.txt`, `mxs.npy`, `mys.npy`, `mzs.npy`)
+into a single chunked HDF5 file.
+
+The resulting file can be read using `DataReader(..., data_format='HDF5')`.
+
+"""
+
+import argparse
+import os
+
+from postprocessing.hdf5_store import convert_to_hdf5, HDF5_FILENAME
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert simulation data to a single HDF5 file.')
+    parser.add_argument('data_dir', type=str,
+                        help='Directory containing the raw simulation data')
+    parser.add_argument('--data-format', dest='data_format', type=str, default='OOMMF',
+                        help="Format of the raw simulation data ('OOMMF' or 'Nmag'; default: OOMMF)")
+    parser.add_argument('--output', dest='output', type=str, default=None,
+                        help='Output filename (default: {} in the data directory)'.format(HDF5_FILENAME))
+    parser.add_argument('--compression', dest='compression', type=str, default=None,
+                        help="Lossless compression filter, e.g. 'gzip' or 'lzf' (default: no compression)")
+    parser.add_argument('--dtype', dest='dtype', type=str, default=None, choices=['float32', 'float64'],
+                        help='Type in which the spatially resolved magnetisation is stored '
+                             '(default: same as the raw data)')
+    args = parser.parse_args()
+
+    filename = convert_to_hdf5(args.data_dir, args.data_format, filename=args.output,
+                               compression=args.compression, dtype=args.dtype)
+    print("Data has been written to: {}".format(os.path.abspath(filename)))
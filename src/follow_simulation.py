@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+This script follows a running OOMMF simulation and reports the power
+spectrum peaks while the dynamic stage is still running. It tails the
+data table `dynamic.odt` (and optionally the `.omf` snapshots) and
+updates the spectrum incrementally after each batch of new rows, e.g.:
+
+    python follow_simulation.py /path/to/tmpdir/dynamic.odt --status-file status.json
+
+The script stops when the simulation has finished (i.e. when OOMMF has
+written '# Table End' to the data table), when no new data has arrived
+for `--idle-timeout` seconds, or when it is interrupted with Ctrl-C.
+
+"""
+
+import argparse
+import numpy as np
+
+from postprocessing.live_monitoring import ConsolePublisher, JsonStatusPublisher, LiveSpectrumMonitor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monitor the spectrum of a running simulation.')
+    parser.add_argument('table_file', type=str,
+                        help='Data table written by the simulation (dynamic.odt, or the _dat.ndt file for Nmag); '
+                             'it need not exist yet')
+    parser.add_argument('--omf-dir', dest='omf_dir', type=str, default=None,
+                        help='Also follow the .omf snapshots in this directory (spatially resolved spectrum)')
+    parser.add_argument('--component', dest='component', type=str, default='y',
+                        help='Magnetization component to analyse (default: y)')
+    parser.add_argument('--freqs', dest='freqs', type=str, default=None,
+                        help='Comma-separated list of approximate peak frequencies in GHz '
+                             '(default: report the two most prominent peaks)')
+    parser.add_argument('--max-freq', dest='max_freq', type=float, default=20.0,
+                        help='Maximum frequency of the spectrum in GHz (default: 20)')
+    parser.add_argument('--freq-step', dest='freq_step', type=float, default=0.01,
+                        help='Spacing of the frequency grid in GHz (default: 0.01)')
+    parser.add_argument('--window', dest='window_size', type=int, default=None,
+                        help='Only use the most recent WINDOW timesteps (default: all timesteps)')
+    parser.add_argument('--interval', dest='interval', type=float, default=1.0,
+                        help='Polling interval in seconds (default: 1)')
+    parser.add_argument('--idle-timeout', dest='idle_timeout', type=float, default=None,
+                        help='Stop if no new data has arrived for this many seconds')
+    parser.add_argument('--status-file', dest='status_file', type=str, default=None,
+                        help='Write the status after each update to this JSON file')
+    parser.add_argument('--include-spectrum', dest='include_spectrum', action='store_true',
+                        help='Include the full spectrum in the JSON status file')
+    parser.add_argument('--quiet', dest='quiet', action='store_true',
+                        help='Do not print the status to the console')
+    args = parser.parse_args()
+
+    publishers = []
+    if not args.quiet:
+        publishers.append(ConsolePublisher())
+    if args.status_file is not None:
+        publishers.append(JsonStatusPublisher(args.status_file))
+
+    approx_freqs = None if args.freqs is None else [float(f) for f in args.freqs.split(',')]
+    monitor = LiveSpectrumMonitor(args.table_file, omf_dir=args.omf_dir, component=args.component,
+                                  freqs=np.arange(0.0, args.max_freq, args.freq_step),
+                                  window_size=args.window_size, approx_peak_freqs=approx_freqs,
+                                  publishers=publishers, include_spectrum=args.include_spectrum)
+    try:
+        monitor.run(interval=args.interval, idle_timeout=args.idle_timeout)
+    except KeyboardInterrupt:
+        pass
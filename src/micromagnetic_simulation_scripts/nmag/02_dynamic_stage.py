@@ -1,4 +1,5 @@
 import numpy as np
+import os
 import nmag
 from nmag import SI, every, at
 
@@ -53,6 +54,18 @@ sim.set_H_ext(H_direction_normalized, SI(H, 'A/m'))
 # Set convergence parameters
 sim.set_params(stopping_dm_dt=0.0, ts_abs_tol=1e-7, ts_rel_tol=1e-7)
 
-# Save the information ever 5ps, and exit after 20ns.
+# Stop early if the stop-file given by the environment variable FMR_STOP_FILE
+# exists (it is written by '../../monitor_convergence.py' once the peak
+# frequencies have converged).
+stop_file = os.environ.get('FMR_STOP_FILE')
+
+
+def exit_if_stop_requested(sim):
+    if stop_file is not None and os.path.exists(stop_file):
+        sim.clock.exit_hysteresis = True
+
+
+# Save the information ever 5ps, and exit after 20ns (or when the stop-file exists).
 sim.relax(save=[('fields', every('time', SI(dt, "s")))],
-          do=[('exit', at('time', SI(T, "s")))])
+          do=[('exit', at('time', SI(T, "s"))),
+              (exit_if_stop_requested, every('time', SI(dt, "s")))])
@@ -11,6 +11,19 @@
 # command line argument. If it is not specified then the default value
 # '../../../micromagnetic_simulation_data/recomputed_data/nmag/' is
 # used.
+#
+# The spatially resolved magnetisation is sampled on a grid of
+# NMAG_PROBE_POINTS x NMAG_PROBE_POINTS points (default: 24) at the cell
+# centres, by reading the Nmag output file '02_dynamic_stage_dat.h5'
+# directly (see 'postprocessing/nmag_h5.py'). Set NMAG_RESAMPLING=nmagprobe
+# to use 'nmagprobe' instead, as for the reference data (see [1]). Set the
+# environment variable STORAGE_DTYPE=float32 to store it in single
+# precision (default: float64); see the README for the error bounds.
+#
+# Set the environment variable CONVERGENCE_TOL (in GHz) to stop the dynamic
+# stage early once the main peak frequencies have converged to within this
+# tolerance (see 'src/monitor_convergence.py'). The data then only contains
+# the stages computed so far.
 
 
 #
@@ -20,8 +33,19 @@
 set -o nounset
 set -o errexit
 
+NMAG_PROBE_POINTS=${NMAG_PROBE_POINTS:-24}
+NMAG_RESAMPLING=${NMAG_RESAMPLING:-native}
+STORAGE_DTYPE=${STORAGE_DTYPE:-float64}
+
 NMAG_SCRIPTS="01_relaxation_stage.py 02_dynamic_stage.py nmag_postprocessing.py meshes"
 
+#
+# The postprocessing script uses the 'postprocessing' module in the
+# 'src/' directory of this repository, so make sure it can be found.
+#
+SRC_DIR=$(cd ../.. && pwd)
+export PYTHONPATH="$SRC_DIR${PYTHONPATH:+:$PYTHONPATH}"
+
 #
 # Determine output directory (use first command line argument if
 # provided, otherwise use default).
@@ -81,7 +105,15 @@ nsim 01_relaxation_stage.py --clean
 #
 # Run the dynamic stage.
 #
-nsim 02_dynamic_stage.py --clean
+if [ -n "${CONVERGENCE_TOL:-}" ]; then
+    export FMR_STOP_FILE=STOP
+    nsim 02_dynamic_stage.py --clean &
+    NMAG_PID=$!
+    python $SRC_DIR/monitor_convergence.py 02_dynamic_stage_dat.ndt --tol $CONVERGENCE_TOL --stop-file STOP --pid $NMAG_PID
+    wait $NMAG_PID
+else
+    nsim 02_dynamic_stage.py --clean
+fi
 
 #
 # Extract the columns for time, mx, my, mz and store them in the file "dynamic_txyz.txt".
@@ -93,22 +125,30 @@ tail -n +2 dynamic_txyz.txt > temp.txt
 mv temp.txt dynamic_txyz.txt
 
 #
-# Extract the spatial magnetisation data (sampled on a 24 x 24 grid)
-#
-nmagprobe 02_dynamic_stage_dat.h5 --field=m_Py    --time=0,20e-9,4000\
-        --space=0,120,24/0,120,24/5     --out=dynamic_spatYMag.nmagProbe
-# The switch "--space=0,120,24/0,120,24/5" samples the magnetisation on
-# a 2d grid of positions with x-axis coordinates from 0 to 120 at 24 points,
-# doing the same for the y-axis coordinates. In the z direction, the magnetisation
-# is sampled at 5nm. [1]
-#
-# The syntax for nmagprobe is explained at
-# https://bitbucket.org/fangohr/nmag-src/src/95e3a9c65c79ae10ca25bd834c952f803077002f/interface/nmag/h5probe.py?#h5probe.py-871
-
-
-# And store the spatial magnetisation data in three numpy arrays 'mxs.npy',
-# 'mys.npy' and 'mzs.npy'
-python nmag_postprocessing.py dynamic_spatYMag.nmagProbe
+# Extract the spatial magnetisation data (sampled on a 24 x 24 grid by default)
+# and store it in three numpy arrays 'mxs.npy', 'mys.npy' and 'mzs.npy'.
+#
+if [ "$NMAG_RESAMPLING" = "nmagprobe" ]; then
+    NUM_STAGES=$(grep -vc '^#' dynamic_txyz.txt)
+    T_END=$(python -c "print($NUM_STAGES * 5e-12)")
+    nmagprobe 02_dynamic_stage_dat.h5 --field=m_Py    --time=0,$T_END,$NUM_STAGES\
+            --space=0,120,$NMAG_PROBE_POINTS/0,120,$NMAG_PROBE_POINTS/5     --out=dynamic_spatYMag.nmagProbe
+    # The switch "--space=0,120,24/0,120,24/5" samples the magnetisation on
+    # a 2d grid of positions with x-axis coordinates from 0 to 120 at 24 points,
+    # doing the same for the y-axis coordinates. In the z direction, the magnetisation
+    # is sampled at 5nm. [1]
+    #
+    # The syntax for nmagprobe is explained at
+    # https://bitbucket.org/fangohr/nmag-src/src/95e3a9c65c79ae10ca25bd834c952f803077002f/interface/nmag/h5probe.py?#h5probe.py-871
+
+    # The size of the sampling grid is inferred from the probe output.
+    python nmag_postprocessing.py dynamic_spatYMag.nmagProbe --dtype $STORAGE_DTYPE
+else
+    # Interpolate the magnetisation from the mesh nodes to the centres of the
+    # cells of a NMAG_PROBE_POINTS x NMAG_PROBE_POINTS grid at z = 5nm.
+    python nmag_postprocessing.py 02_dynamic_stage_dat.h5 --mesh meshes/mesh_555.nmesh.h5 \
+            --probe-points $NMAG_PROBE_POINTS --dtype $STORAGE_DTYPE
+fi
 
 #
 # Create output directory, copy the generated data there and remove
@@ -136,5 +176,6 @@ echo
 # finite difference magnetisation.
 #
 # This very minor change will only affect results computing with Nmag
-# using Method 2.
+# using Method 2. The default (NMAG_RESAMPLING=native) samples at these
+# cell centres.
 
@@ -4,52 +4,43 @@ Simple script to convert the output from Nmag NmagProbe tool, to the standard
 format we have been using for OOMMF - this is intended to improve compatibility
 '''
 
-import numpy
-import sys
-
-
-print 'Converting nmagprobe output to standard format'
-
-#Get ahold our system variables
-path = sys.argv[1]
-nx = 24
-ny = 24
-
-#Create an empty array to store the spatially resolved FT in.
-spatXMag = numpy.zeros((4000,(nx * ny * 1)))
-spatYMag = numpy.zeros((4000,(nx * ny * 1)))
-spatZMag = numpy.zeros((4000,(nx * ny * 1)))
-
-#Open up the file, then iterate through it, getting out each line
-inputFile = open(path, 'r')
-x_inputData = []
-y_inputData = []
-z_inputData = []
-times = []
-for line in inputFile.readlines():
-    if len(line) > 5:
-        splitLine = line.split(']')[0].split('[')[1].split()
-        x_inputData.append(splitLine[0])
-        y_inputData.append(splitLine[1])
-        z_inputData.append(splitLine[2])
-        times.append(line.split()[0])
-
-inputFile.close()
-
-x_inputData = numpy.array(x_inputData)
-y_inputData = numpy.array(y_inputData)
-z_inputData = numpy.array(z_inputData)
-
-#So then we map the output file structure into one that's more useful for us
-for t in range(4000):
-    spatXMag[t, : nx*ny] = x_inputData[t*nx*ny : (t+1)*nx*ny]
-    spatYMag[t, : nx*ny] = y_inputData[t*nx*ny : (t+1)*nx*ny]
-    spatZMag[t, : nx*ny] = z_inputData[t*nx*ny : (t+1)*nx*ny]
-
-#Also we need to extract the frequencies
-times = numpy.array(times[0::(nx*ny)], dtype = float)
-
-#Save the spatially resolved magnetisation to files
-numpy.save('mxs.npy', spatXMag)
-numpy.save('mys.npy', spatYMag)
-numpy.save('mzs.npy', spatZMag)
+from __future__ import print_function
+
+import argparse
+
+from postprocessing.nmag_h5 import convert_nmag_h5_output
+from postprocessing.nmagprobe_conversion import convert_nmagprobe_output
+
+
+print('Converting Nmag output to standard format')
+
+#Get ahold our command line arguments (use '--dtype float32' to store the
+#data in single precision, which halves the size of the output files)
+parser = argparse.ArgumentParser(description='Convert nmagprobe output to numpy arrays.')
+parser.add_argument('path', type=str,
+                    help="nmagprobe output file, or Nmag '_dat.h5' file (which is read directly, without nmagprobe)")
+parser.add_argument('--dtype', dest='dtype', type=str, default='float64', choices=['float32', 'float64'],
+                    help='Type in which the data is stored (default: float64)')
+parser.add_argument('--mesh', dest='mesh', type=str, default=None,
+                    help="Mesh file for a '_dat.h5' file (default: the mesh stored in the '_dat.h5' file)")
+parser.add_argument('--probe-points', dest='probe_points', type=int, default=24,
+                    help="Number of probe points along x and y for a '_dat.h5' file (default: 24)")
+parser.add_argument('--sample-at-edges', dest='cell_centres', action='store_false',
+                    help="For a '_dat.h5' file, sample at the same points as nmagprobe (including the edges "
+                         "of the sample) instead of at the cell centres")
+args = parser.parse_args()
+
+if args.path.endswith('.h5'):
+    #Resample the magnetisation at the mesh nodes on the probe grid using
+    #cached interpolation weights (see 'postprocessing/nmag_h5.py').
+    filenames, times = convert_nmag_h5_output(args.path, mesh_filename=args.mesh, output_dir='.',
+                                              grid_shape=(args.probe_points, args.probe_points),
+                                              cell_centres=args.cell_centres, dtype=args.dtype, cache_dir='.')
+else:
+    #Read the probe output in chunks and save the spatially resolved magnetisation
+    #to the files 'mxs.npy', 'mys.npy', 'mzs.npy' (the number of timesteps and the
+    #size of the sampling grid are inferred from the data; see
+    #'postprocessing/nmagprobe_conversion.py' for details).
+    filenames, times = convert_nmagprobe_output(args.path, output_dir='.', dtype=args.dtype)
+
+print('Converted {} timesteps.'.format(len(times)))
@@ -0,0 +1,45 @@
+import argparse
+import numpy as np
+
+from llg_solver import LLGSolver
+from postprocessing.ovf import write_ovf
+
+# Relaxation stage of the standard problem, computed with the finite-difference
+# solver in `llg_solver.py`. The parameters are the same as in the OOMMF script
+# '../oommf/01_relaxation_stage.mif': the 120 x 120 x 10 nm film is discretised
+# into cubic cells with 5 nm edge length, and the magnetisation is relaxed from
+# the uniform state m0 = (0, 0, 1) with large damping for 5 ns. The relaxed
+# magnetisation is written to the file 'relax.omf' (in OVF 2.0 format with
+# 8-byte binary data), from which the dynamic stage starts.
+
+# Geometry and mesh
+n = (24, 24, 2)  # number of cells along x, y, z
+cellsize = (5e-9, 5e-9, 5e-9)  # m
+
+# Material parameters
+Ms = 8e5  # saturation magnetisation (A/m)
+A = 1.3e-11  # exchange energy constant (J/m)
+gamma = 2.210173e5  # gyromagnetic ratio (m/As)
+alpha = 1.0  # Gilbert damping
+
+# External magnetic field
+H = 8e4  # A/m
+H_direction = np.array([0.81345856316858023, 0.58162287266553481, 0.0])
+
+# Total simulation time (s)
+T = 5e-9
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the relaxation stage of the standard problem.')
+    parser.add_argument('--threads', dest='num_threads', type=int, default=-1,
+                        help='Number of threads used for the FFTs (default: all CPU cores)')
+    args = parser.parse_args()
+
+    sim = LLGSolver(n, cellsize, Ms=Ms, A=A, alpha=alpha, gamma=gamma, H_ext=H * H_direction,
+                    m0=[0.0, 0.0, 1.0], num_threads=args.num_threads)
+    sim.run_until(T)
+    print("Relaxed magnetisation after {:.1f} ns ({} steps): {}".format(
+        T * 1e9, sim.num_steps, sim.get_average_magnetisation()))
+
+    write_ovf('relax.omf', np.moveaxis(sim.m, 0, -1), cellsize=cellsize, title='relax',
+              representation='binary 8')
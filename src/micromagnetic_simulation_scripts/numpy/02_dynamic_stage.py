@@ -0,0 +1,101 @@
+import argparse
+import numpy as np
+import os
+import time
+
+from llg_solver import LLGSolver
+from postprocessing.convergence_monitor import get_stop_filename, is_stop_requested
+from postprocessing.omf_ingestion import OUTPUT_FILENAMES, sample_central_plane
+from postprocessing.ovf import read_ovf
+
+# Dynamic stage of the standard problem, computed with the finite-difference
+# solver in `llg_solver.py`. The parameters are the same as in the OOMMF script
+# '../oommf/02_dynamic_stage.mif': starting from the relaxed magnetisation in
+# 'relax.omf', the direction of the external field is changed slightly and the
+# magnetisation is recorded every 5 ps for 20 ns.
+#
+# The output files have the same format as those generated by the OOMMF
+# scripts: 'dynamic_txyz.txt' contains the time and the spatially averaged
+# magnetisation, and 'mxs.npy', 'mys.npy', 'mzs.npy' contain the magnetisation
+# sampled at a height of z=5nm (i.e., the average of the top and bottom layer
+# of the sample) as arrays of shape NUM_TIMESTEPS x 24 x 24. The spatially
+# resolved data is streamed into memory-mapped files as the simulation runs.
+#
+# If a stop-file is given (via '--stop-file' or the environment variable
+# FMR_STOP_FILE) the simulation stops early as soon as this file exists
+# (see '../../monitor_convergence.py'), and the output files only contain
+# the stages computed so far.
+
+# Geometry and mesh
+n = (24, 24, 2)  # number of cells along x, y, z
+cellsize = (5e-9, 5e-9, 5e-9)  # m
+
+# Material parameters
+Ms = 8e5  # saturation magnetisation (A/m)
+A = 1.3e-11  # exchange energy constant (J/m)
+gamma = 2.210173e5  # gyromagnetic ratio (m/As)
+alpha = 0.008  # Gilbert damping
+
+# External magnetic field
+H = 8e4  # A/m
+H_direction = np.array([0.81923192051904048, 0.57346234436332832, 0.0])
+
+# Sampling parameters
+dt = 5e-12  # time step (s)
+num_stages = 4000  # i.e. the total simulation time is 20 ns
+
+ODT_HEADER = """\
+# ODT 1.0
+# Table Start
+# Title: NumPy LLG solver data table
+# Columns: \\
+# {Simulation time} mx my mz
+# Units: \\
+# s {} {} {}
+"""
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the dynamic stage of the standard problem.')
+    parser.add_argument('--threads', dest='num_threads', type=int, default=-1,
+                        help='Number of threads used for the FFTs (default: all CPU cores)')
+    parser.add_argument('--dtype', dest='dtype', type=str, default='float64', choices=['float32', 'float64'],
+                        help='Type in which the spatially resolved data is stored (default: float64)')
+    parser.add_argument('--stop-file', dest='stop_file', type=str, default=get_stop_filename(),
+                        help='Stop the simulation early when this file exists (default: $FMR_STOP_FILE)')
+    args = parser.parse_args()
+
+    _, m0 = read_ovf('relax.omf')
+    sim = LLGSolver(n, cellsize, Ms=Ms, A=A, alpha=alpha, gamma=gamma, H_ext=H * H_direction,
+                    m0=np.moveaxis(m0, -1, 0), num_threads=args.num_threads)
+
+    outputs = [np.lib.format.open_memmap(OUTPUT_FILENAMES[c], mode='w+', dtype=args.dtype,
+                                         shape=(num_stages, n[1], n[0])) for c in 'xyz']
+    start = time.time()
+    num_stages_computed = 0
+    with open('dynamic_txyz.txt', 'w') as f:
+        f.write(ODT_HEADER)
+        for i in range(1, num_stages + 1):
+            if is_stop_requested(args.stop_file):
+                print("Stop-file '{}' found, stopping after {} stages.".format(args.stop_file, i - 1))
+                break
+            sim.run_until(i * dt)
+            f.write("{!r} {!r} {!r} {!r}\n".format(sim.t, *(float(v) for v in sim.get_average_magnetisation())))
+            sampled = sample_central_plane(np.moveaxis(sim.m, 0, -1))
+            for idx, output in enumerate(outputs):
+                output[i - 1] = sampled[..., idx]
+            f.flush()
+            num_stages_computed = i
+            if i % 400 == 0:
+                print("Stage {}/{} (t = {:.2f} ns, {} steps, {:.0f} s elapsed)".format(
+                    i, num_stages, sim.t * 1e9, sim.num_steps, time.time() - start))
+        f.write("# Table End\n")
+
+    for output in outputs:
+        output.flush()
+
+    if num_stages_computed < num_stages:
+        # Truncate the spatially resolved data to the stages computed.
+        for c, output in zip('xyz', outputs):
+            tmp_filename = OUTPUT_FILENAMES[c] + '.tmp.npy'
+            np.save(tmp_filename, output[:num_stages_computed])
+            os.rename(tmp_filename, OUTPUT_FILENAMES[c])
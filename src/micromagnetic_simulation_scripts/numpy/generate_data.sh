@@ -0,0 +1,133 @@
+#!/bin/bash
+
+# This script runs the relaxation and the dynamic stage of the simulation
+# using the finite-difference LLG solver written in NumPy ('llg_solver.py'),
+# which can be used as a local stand-in for OOMMF if OOMMF is not installed.
+#
+# It generates the same data files as the OOMMF scripts, i.e. the dynamics
+# of the spatially averaged magnetisation ('dynamic_txyz.txt') and of the
+# spatially resolved magnetisation ('mxs.npy', 'mys.npy', 'mzs.npy').
+#
+# The output directory for the generated data can be provided as a
+# command line argument. If it is not specified then the default value
+# '../../../micromagnetic_simulation_data/recomputed_data/numpy/' is
+# used.
+#
+# The FFTs use all CPU cores by default; set the environment variable
+# NUM_THREADS to use a different number of threads. Set the environment
+# variable STORAGE_DTYPE=float32 to store the spatially resolved
+# magnetisation in single precision (default: float64).
+#
+# The demagnetisation kernel is cached in the directory given by the
+# environment variable FMR_DEMAG_CACHE_DIR (default: ~/.cache/fmr-stdproblem/demag).
+#
+# Set the environment variable CONVERGENCE_TOL (in GHz) to stop the dynamic
+# stage early once the main peak frequencies have converged to within this
+# tolerance (see 'src/monitor_convergence.py'). The data then only contains
+# the stages computed so far.
+
+
+#
+# Raise error when a variable is not set, and exit as soon as any
+# error occurs in the script.
+#
+set -o errexit
+
+NUM_THREADS=${NUM_THREADS:--1}
+STORAGE_DTYPE=${STORAGE_DTYPE:-float64}
+
+NUMPY_SCRIPTS="llg_solver.py 01_relaxation_stage.py 02_dynamic_stage.py"
+
+#
+# The simulation scripts use the 'postprocessing' module in the
+# 'src/' directory of this repository, so make sure it can be found.
+#
+SRC_DIR=$(cd ../.. && pwd)
+export PYTHONPATH="$SRC_DIR${PYTHONPATH:+:$PYTHONPATH}"
+
+#
+# Determine output directory (use first command line argument if
+# provided, otherwise use default).
+#
+if [ "$#" -ge 1 ]; then
+    OUTPUT_DIR=$1
+else
+    OUTPUT_DIR='../../../micromagnetic_simulation_data/recomputed_data/numpy/'
+fi
+echo "Data will be generated in output directory: '$OUTPUT_DIR'"
+
+#
+# Abort if output directory already exists to avoid overwriting existing data
+#
+if [ -d "$OUTPUT_DIR" ]; then
+    echo "Warning: Output directory already exists: '$OUTPUT_DIR'"
+    echo "         Please delete it or specify a different directory"
+    echo "         by setting the environment variable OUTPUT_DIR."
+    exit
+fi
+
+#
+# Copy the simulation scripts from source directory to a temporary
+# directory where we will run the scripts to generate the data.
+#
+TMPDIR=$(mktemp -d)
+
+for FILENAME in $NUMPY_SCRIPTS; do
+    cp ./$FILENAME $TMPDIR/$FILENAME;
+done
+
+#
+# Change into the temporary directory and run all subsequent commands there.
+#
+pushd $TMPDIR
+echo "Working in temporary directory '$TMPDIR'."
+echo "If something goes wrong you may want to delete this manually."
+
+#
+# Generate a README.txt file to inform the user how the data in this
+# directory was created.
+#
+TIMESTAMP=$(date)
+
+echo "The data in this directory was automatically generated on $TIMESTAMP
+by the script 'src/micromagnetic_simulation_scripts/numpy/generate_data.sh' in the
+repository [1]. It can safely be deleted if it is no longer needed.
+
+[1] https://github.com/fangohr/micromagnetic-standard-problem-ferromagnetic-resonance
+" > README.txt
+
+echo "Generating data using the NumPy LLG solver... This may take a while."
+
+#
+# Run the relaxation stage (which writes the relaxed magnetisation to 'relax.omf').
+#
+python 01_relaxation_stage.py --threads $NUM_THREADS
+
+#
+# Run the dynamic stage, which writes the files 'dynamic_txyz.txt',
+# 'mxs.npy', 'mys.npy' and 'mzs.npy'.
+#
+if [ -n "${CONVERGENCE_TOL:-}" ]; then
+    python 02_dynamic_stage.py --threads $NUM_THREADS --dtype $STORAGE_DTYPE --stop-file STOP &
+    SIM_PID=$!
+    python $SRC_DIR/monitor_convergence.py dynamic_txyz.txt --tol $CONVERGENCE_TOL --stop-file STOP --pid $SIM_PID
+    wait $SIM_PID
+else
+    python 02_dynamic_stage.py --threads $NUM_THREADS --dtype $STORAGE_DTYPE
+fi
+
+#
+# Create output directory, copy the generated data there and remove
+# temporay directory.
+#
+popd
+mkdir -p $OUTPUT_DIR
+cp $TMPDIR/dynamic_txyz.txt $OUTPUT_DIR
+cp $TMPDIR/mxs.npy $OUTPUT_DIR
+cp $TMPDIR/mys.npy $OUTPUT_DIR
+cp $TMPDIR/mzs.npy $OUTPUT_DIR
+rm -rf $TMPDIR
+
+echo
+echo "Successfully generated data in directory: '$OUTPUT_DIR'"
+echo
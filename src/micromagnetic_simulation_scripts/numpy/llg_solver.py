@@ -0,0 +1,369 @@
+"""
+Finite-difference micromagnetic solver written in NumPy.
+
+This is a small stand-in for OOMMF which is sufficient to compute the
+standard problem (a thin film discretised into a regular grid of cuboid
+cells). It solves the Landau-Lifshitz-Gilbert (LLG) equation
+
+    dm/dt = -gamma / (1 + alpha^2) * [m x H + alpha * m x (m x H)]
+
+where `gamma` is the gyromagnetic ratio in m/(A s) (called `gamma_G` in
+OOMMF) and the effective field H (in A/m) contains the following terms:
+
+- exchange: H_ex = 2 A / (mu0 Ms) * Laplace(m), using the six-neighbour
+  finite-difference Laplacian with free (Neumann) boundary conditions;
+
+- demagnetisation: H_d = -N * M, where N is the demagnetisation tensor of
+  the cuboid cells (Newell et al., J. Geophys. Res. 98, 9551 (1993)). The
+  convolution is computed via zero-padded FFTs. The Fourier transform of
+  the tensor only depends on the grid and is computed once and cached on
+  disk (see `get_demag_kernel`);
+
+- Zeeman: a uniform external field.
+
+The LLG equation is integrated using the adaptive Dormand-Prince
+Runge-Kutta method of order 5(4) (with renormalisation of m after
+each step).
+
+All fields are stored as arrays of shape (3, nz, ny, nx), i.e. the
+x-index varies fastest in each component, as in OOMMF's OVF files. The
+FFTs are computed by `scipy.fft` using `num_threads` threads (default:
+all CPU cores); the remaining operations are vectorised over the grid.
+
+"""
+
+import hashlib
+import numpy as np
+import os
+import scipy.fft
+
+MU0 = 4e-7 * np.pi
+
+# Environment variable determining the directory in which the demag kernels are cached.
+DEMAG_CACHE_DIR_ENV_VAR = 'FMR_DEMAG_CACHE_DIR'
+DEFAULT_DEMAG_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'fmr-stdproblem', 'demag')
+
+
+def _asinh_ratio(a, b):
+    # asinh(a / b), where terms with b == 0 are set to zero (the prefactors
+    # of these terms in `newell_f` and `newell_g` vanish in this case).
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b > 0, np.arcsinh(a / np.where(b > 0, b, 1.0)), 0.0)
+
+
+def _atan_ratio(a, b):
+    # atan(a / b), where terms with b == 0 are set to zero (see above).
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b != 0, np.arctan(a / np.where(b != 0, b, 1.0)), 0.0)
+
+
+def newell_f(x, y, z):
+    """
+    Newell's auxiliary function f, from which the diagonal elements of the
+    demagnetisation tensor are computed (see `get_demag_tensor`).
+    """
+    x2, y2, z2 = x * x, y * y, z * z
+    R = np.sqrt(x2 + y2 + z2)
+    return (0.5 * y * (z2 - x2) * _asinh_ratio(y, np.sqrt(x2 + z2))
+            + 0.5 * z * (y2 - x2) * _asinh_ratio(z, np.sqrt(x2 + y2))
+            - x * y * z * _atan_ratio(y * z, x * R)
+            + (2 * x2 - y2 - z2) * R / 6.0)
+
+
+def newell_g(x, y, z):
+    """
+    Newell's auxiliary function g, from which the off-diagonal elements of
+    the demagnetisation tensor are computed (see `get_demag_tensor`).
+    """
+    x2, y2, z2 = x * x, y * y, z * z
+    R = np.sqrt(x2 + y2 + z2)
+    return (x * y * z * _asinh_ratio(z, np.sqrt(x2 + y2))
+            + y * (3 * z2 - y2) * _asinh_ratio(x, np.sqrt(y2 + z2)) / 6.0
+            + x * (3 * z2 - x2) * _asinh_ratio(y, np.sqrt(x2 + z2)) / 6.0
+            - z * z2 * _atan_ratio(x * y, z * R) / 6.0
+            - 0.5 * z * y2 * _atan_ratio(x * z, y * R)
+            - 0.5 * z * x2 * _atan_ratio(y * z, x * R)
+            - x * y * R / 3.0)
+
+
+def _newell_sum(func, x, y, z, dx, dy, dz):
+    """
+    Evaluate `func` on the grid of points (i*dx, j*dy, k*dz) given by the
+    1D arrays of offsets `x`, `y`, `z` (of lengths n+2 each, including one
+    extra point at either end), and return the weighted 27-point sum which
+    yields the corresponding tensor element (up to the factor 1/(4 pi V)).
+    """
+    values = func(x[:, None, None], y[None, :, None], z[None, None, :])
+    nx, ny, nz = len(x) - 2, len(y) - 2, len(z) - 2
+    result = np.zeros((nx, ny, nz))
+    for ex in (-1, 0, 1):
+        for ey in (-1, 0, 1):
+            for ez in (-1, 0, 1):
+                k = abs(ex) + abs(ey) + abs(ez)
+                weight = 8.0 * (-0.5)**k
+                result += weight * values[1 + ex:1 + ex + nx, 1 + ey:1 + ey + ny, 1 + ez:1 + ez + nz]
+    return result
+
+
+def get_demag_tensor(n, cellsize):
+    """
+    Return the six independent elements (Nxx, Nyy, Nzz, Nxy, Nxz, Nyz)
+    of the demagnetisation tensor for all offsets between the cells of a
+    grid with `n = (nx, ny, nz)` cells of size `cellsize = (dx, dy, dz)`.
+
+    The result has shape (6, 2*nx-1, 2*ny-1, 2*nz-1), where the offset
+    (i, j, k) (with -nx < i < nx etc.) is stored at index (i + nx - 1,
+    j + ny - 1, k + nz - 1). Note that the axes are in the order x, y, z.
+    """
+    nx, ny, nz = n
+    dx, dy, dz = cellsize
+    x = np.arange(-nx, nx + 1) * dx
+    y = np.arange(-ny, ny + 1) * dy
+    z = np.arange(-nz, nz + 1) * dz
+
+    def transpose_back(a, axes):
+        return np.transpose(a, np.argsort(axes))
+
+    # The other elements follow from f and g by permuting the coordinates.
+    Nxx = _newell_sum(newell_f, x, y, z, dx, dy, dz)
+    Nyy = transpose_back(_newell_sum(newell_f, y, x, z, dy, dx, dz), (1, 0, 2))
+    Nzz = transpose_back(_newell_sum(newell_f, z, y, x, dz, dy, dx), (2, 1, 0))
+    Nxy = _newell_sum(newell_g, x, y, z, dx, dy, dz)
+    Nxz = transpose_back(_newell_sum(newell_g, x, z, y, dx, dz, dy), (0, 2, 1))
+    Nyz = transpose_back(_newell_sum(newell_g, y, z, x, dy, dz, dx), (1, 2, 0))
+
+    return np.array([Nxx, Nyy, Nzz, Nxy, Nxz, Nyz]) / (4 * np.pi * dx * dy * dz)
+
+
+def compute_demag_kernel(n, cellsize, num_threads=-1):
+    """
+    Return the Fourier transform of the demagnetisation tensor, zero-padded
+    to twice the size of the grid, as an array of shape (6, 2*nz, 2*ny, nx + 1)
+    (i.e. for fields stored with shape (nz, ny, nx); see `get_demag_field`).
+    """
+    nx, ny, nz = n
+    tensor = get_demag_tensor(n, cellsize)
+
+    # Arrange the offsets in "wrap-around" order on the padded grid, with
+    # axes in the order (z, y, x).
+    padded = np.zeros((6, 2 * nz, 2 * ny, 2 * nx))
+    for idx in range(6):
+        component = np.transpose(tensor[idx], (2, 1, 0))
+        shifted = np.zeros((2 * nz, 2 * ny, 2 * nx))
+        shifted[:2 * nz - 1, :2 * ny - 1, :2 * nx - 1] = component
+        padded[idx] = np.roll(shifted, shift=(-(nz - 1), -(ny - 1), -(nx - 1)), axis=(0, 1, 2))
+
+    return scipy.fft.rfftn(padded, axes=(1, 2, 3), workers=num_threads)
+
+
+def get_demag_kernel_filename(n, cellsize, cache_dir):
+    """
+    Return the name of the file in `cache_dir` in which the demag kernel
+    for the given grid is cached.
+    """
+    key = repr((tuple(int(i) for i in n), tuple(float(d) for d in cellsize))).encode('ascii')
+    return os.path.join(cache_dir, 'demag_kernel_{}x{}x{}_{}.npy'.format(
+        n[0], n[1], n[2], hashlib.sha1(key).hexdigest()[:16]))
+
+
+def get_demag_kernel(n, cellsize, cache_dir=None, num_threads=-1):
+    """
+    Return the Fourier transform of the demagnetisation tensor for the
+    given grid (see `compute_demag_kernel`), reading it from the cache
+    directory if it has been computed before, and storing it there
+    otherwise. If `cache_dir` is None, the directory given by the
+    environment variable `FMR_DEMAG_CACHE_DIR` is used, or a default
+    directory in the user's home directory. Use `cache_dir=False` to
+    disable the cache.
+    """
+    if cache_dir is False:
+        return compute_demag_kernel(n, cellsize, num_threads=num_threads)
+
+    if cache_dir is None:
+        cache_dir = os.environ.get(DEMAG_CACHE_DIR_ENV_VAR) or DEFAULT_DEMAG_CACHE_DIR
+
+    filename = get_demag_kernel_filename(n, cellsize, cache_dir)
+    try:
+        return np.load(filename)
+    except (IOError, OSError, ValueError):
+        pass
+
+    kernel = compute_demag_kernel(n, cellsize, num_threads=num_threads)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_filename = filename + '.tmp{}.npy'.format(os.getpid())
+        np.save(tmp_filename, kernel)
+        os.rename(tmp_filename, filename)
+    except (IOError, OSError):
+        pass  # caching is optional
+    return kernel
+
+
+def cross(a, b):
+    """
+    Cross product of two vector fields of shape (3, ...).
+    """
+    return np.array([a[1] * b[2] - a[2] * b[1],
+                     a[2] * b[0] - a[0] * b[2],
+                     a[0] * b[1] - a[1] * b[0]])
+
+
+def normalise(m):
+    """
+    Return the vector field `m` (of shape (3, ...)) normalised to unit length.
+    """
+    return m / np.sqrt((m * m).sum(axis=0))
+
+
+# Butcher tableau of the Dormand-Prince method
+DP_C = [0, 1. / 5, 3. / 10, 4. / 5, 8. / 9, 1., 1.]
+DP_A = [
+    [],
+    [1. / 5],
+    [3. / 40, 9. / 40],
+    [44. / 45, -56. / 15, 32. / 9],
+    [19372. / 6561, -25360. / 2187, 64448. / 6561, -212. / 729],
+    [9017. / 3168, -355. / 33, 46732. / 5247, 49. / 176, -5103. / 18656],
+    [35. / 384, 0., 500. / 1113, 125. / 192, -2187. / 6784, 11. / 84],
+    ]
+DP_B5 = [35. / 384, 0., 500. / 1113, 125. / 192, -2187. / 6784, 11. / 84, 0.]
+DP_B4 = [5179. / 57600, 0., 7571. / 16695, 393. / 640, -92097. / 339200, 187. / 2100, 1. / 40]
+DP_E = [b5 - b4 for b5, b4 in zip(DP_B5, DP_B4)]
+
+
+class LLGSolver(object):
+    """
+    Solver for the LLG equation on a regular grid of `n = (nx, ny, nz)`
+    cells of size `cellsize = (dx, dy, dz)` (in m).
+
+    *Arguments*
+
+    Ms, A:  saturation magnetisation (A/m) and exchange constant (J/m)
+
+    alpha, gamma:  Gilbert damping and gyromagnetic ratio (m/(A s))
+
+    H_ext:  uniform external field (A/m), a sequence of three values
+
+    m0:  initial magnetisation, either a sequence of three values (for
+         a uniform magnetisation) or an array of shape (3, nz, ny, nx)
+
+    tolerance:  maximum error (of any component of m) per step of the
+         adaptive time integration
+
+    num_threads:  number of threads used for the FFTs (default: all cores)
+
+    demag_cache_dir:  directory in which the demag kernel is cached (see
+         `get_demag_kernel`)
+
+    """
+
+    def __init__(self, n, cellsize, Ms, A, alpha, gamma, H_ext, m0, tolerance=1e-6,
+                 num_threads=-1, demag_cache_dir=None):
+        self.n = tuple(n)
+        self.cellsize = tuple(cellsize)
+        self.Ms = Ms
+        self.A = A
+        self.alpha = alpha
+        self.gamma = gamma
+        self.H_ext = np.asarray(H_ext, dtype=float).reshape(3, 1, 1, 1)
+        self.tolerance = tolerance
+        self.num_threads = num_threads
+
+        nx, ny, nz = self.n
+        self.shape = (nz, ny, nx)
+        m0 = np.asarray(m0, dtype=float)
+        if m0.shape == (3,):
+            m0 = m0.reshape(3, 1, 1, 1) * np.ones((3,) + self.shape)
+        if m0.shape != (3,) + self.shape:
+            raise ValueError("Initial magnetisation has shape {}, expected {}".format(m0.shape, (3,) + self.shape))
+        self.m = normalise(m0)
+        self.t = 0.0
+        self.dt = 1e-14
+        self.num_steps = 0
+
+        self.demag_kernel = get_demag_kernel(self.n, self.cellsize, cache_dir=demag_cache_dir,
+                                             num_threads=num_threads)
+
+    def get_demag_field(self, m):
+        """
+        Return the demagnetising field (in A/m) for the magnetisation `m`.
+        """
+        nz, ny, nx = self.shape
+        M_fft = scipy.fft.rfftn(self.Ms * m, s=(2 * nz, 2 * ny, 2 * nx), axes=(1, 2, 3),
+                                workers=self.num_threads)
+        Nxx, Nyy, Nzz, Nxy, Nxz, Nyz = self.demag_kernel
+        Mx, My, Mz = M_fft
+        H_fft = np.array([Nxx * Mx + Nxy * My + Nxz * Mz,
+                          Nxy * Mx + Nyy * My + Nyz * Mz,
+                          Nxz * Mx + Nyz * My + Nzz * Mz])
+        H = scipy.fft.irfftn(H_fft, s=(2 * nz, 2 * ny, 2 * nx), axes=(1, 2, 3), workers=self.num_threads)
+        return -H[:, :nz, :ny, :nx]
+
+    def get_exchange_field(self, m):
+        """
+        Return the exchange field (in A/m) for the magnetisation `m`.
+        """
+        laplacian = np.zeros_like(m)
+        for axis, d in zip((3, 2, 1), self.cellsize):
+            if m.shape[axis] < 2:
+                continue
+            diff = np.diff(m, axis=axis) / d**2
+            lower = [slice(None)] * 4
+            upper = [slice(None)] * 4
+            lower[axis] = slice(None, -1)
+            upper[axis] = slice(1, None)
+            laplacian[tuple(lower)] += diff
+            laplacian[tuple(upper)] -= diff
+        return 2 * self.A / (MU0 * self.Ms) * laplacian
+
+    def get_effective_field(self, m):
+        """
+        Return the effective field (in A/m) for the magnetisation `m`.
+        """
+        return self.get_exchange_field(m) + self.get_demag_field(m) + self.H_ext
+
+    def get_dm_dt(self, m):
+        """
+        Return the right-hand side of the LLG equation.
+        """
+        H = self.get_effective_field(m)
+        m_x_H = cross(m, H)
+        return -self.gamma / (1 + self.alpha**2) * (m_x_H + self.alpha * cross(m, m_x_H))
+
+    def get_average_magnetisation(self):
+        """
+        Return the spatially averaged magnetisation (mx, my, mz).
+        """
+        return self.m.reshape(3, -1).mean(axis=1)
+
+    def step(self, dt_max):
+        """
+        Perform a single (accepted) step of the adaptive Dormand-Prince
+        method, with a step size of at most `dt_max`.
+        """
+        while True:
+            dt = min(self.dt, dt_max)
+            k = [self.get_dm_dt(self.m)]
+            for i in range(1, 7):
+                m_stage = self.m + dt * sum(a * k_j for a, k_j in zip(DP_A[i], k) if a != 0)
+                k.append(self.get_dm_dt(m_stage))
+            # The fifth-order solution is the last stage (first-same-as-last property).
+            error = dt * abs(sum(e * k_j for e, k_j in zip(DP_E, k) if e != 0)).max()
+
+            # Adapt the step size for the next attempt (with safety factor and limits).
+            factor = 0.9 * (self.tolerance / error)**0.2 if error > 0 else 5.0
+            self.dt = dt * min(5.0, max(0.2, factor))
+            if error <= self.tolerance:
+                self.m = normalise(m_stage)
+                self.t += dt
+                self.num_steps += 1
+                return
+
+    def run_until(self, t_end):
+        """
+        Integrate the LLG equation until time `t_end` (in s).
+        """
+        while self.t < t_end * (1 - 1e-12):
+            self.step(t_end - self.t)
+        self.t = t_end
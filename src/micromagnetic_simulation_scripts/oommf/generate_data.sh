@@ -11,6 +11,23 @@
 # command line argument. If it is not specified then the default value
 # '../../../micromagnetic_simulation_data/recomputed_data/oommf/' is
 # used.
+#
+# By default the magnetisation snapshots of the dynamic stage are written
+# in text format. Set the environment variable OOMMF_OUTPUT_FORMAT=binary
+# to write them in (8-byte) binary format instead, which is considerably
+# faster to write and read and needs less disk space. Note that the
+# binary snapshots contain the full double precision values, so the
+# resulting data differs slightly from the reference data (which was
+# computed from snapshots written with 8 significant digits).
+#
+# Set the environment variable STORAGE_DTYPE=float32 to store the spatially
+# resolved magnetisation in single precision (default: float64). This halves
+# the size of the '.npy' files; see the README for the resulting error bounds.
+#
+# Set the environment variable CONVERGENCE_TOL (in GHz) to stop the dynamic
+# stage early once the main peak frequencies have converged to within this
+# tolerance (see 'src/monitor_convergence.py'). The OOMMF process is then
+# terminated and the data only contains the stages computed so far.
 
 
 #
@@ -19,7 +36,26 @@
 #
 set -o errexit
 
-OOMMF_SCRIPTS="01_relaxation_stage.mif 02_dynamic_stage.mif oommf_postprocessing.py"
+OOMMF_OUTPUT_FORMAT=${OOMMF_OUTPUT_FORMAT:-text}
+STORAGE_DTYPE=${STORAGE_DTYPE:-float64}
+
+if [ "$OOMMF_OUTPUT_FORMAT" = "binary" ]; then
+    DYNAMIC_STAGE_SCRIPT=02_dynamic_stage_binary.mif
+elif [ "$OOMMF_OUTPUT_FORMAT" = "text" ]; then
+    DYNAMIC_STAGE_SCRIPT=02_dynamic_stage.mif
+else
+    echo "Invalid value for OOMMF_OUTPUT_FORMAT: '$OOMMF_OUTPUT_FORMAT' (must be 'text' or 'binary')"
+    exit 1
+fi
+
+OOMMF_SCRIPTS="01_relaxation_stage.mif $DYNAMIC_STAGE_SCRIPT oommf_postprocessing.py"
+
+#
+# The postprocessing script uses the 'postprocessing' module in the
+# 'src/' directory of this repository, so make sure it can be found.
+#
+SRC_DIR=$(cd ../.. && pwd)
+export PYTHONPATH="$SRC_DIR${PYTHONPATH:+:$PYTHONPATH}"
 
 #
 # Check if the variable OOMMFTCL points to a valid OOMMF installation,
@@ -96,7 +132,15 @@ mv relax-*omf relax.omf
 #
 # Run the dynamic stage.
 #
-tclsh $OOMMFTCL boxsi +fg 02_dynamic_stage.mif -exitondone 1
+if [ -n "${CONVERGENCE_TOL:-}" ]; then
+    tclsh $OOMMFTCL boxsi +fg $DYNAMIC_STAGE_SCRIPT -exitondone 1 &
+    OOMMF_PID=$!
+    python $SRC_DIR/monitor_convergence.py dynamic.odt --tol $CONVERGENCE_TOL --pid $OOMMF_PID --signal TERM
+    wait $OOMMF_PID || true
+    python -c "from postprocessing.convergence_monitor import truncate_stopped_oommf_run; truncate_stopped_oommf_run('.')"
+else
+    tclsh $OOMMFTCL boxsi +fg $DYNAMIC_STAGE_SCRIPT -exitondone 1
+fi
 
 #
 # Extract the columns for time, mx, my, mz and store them in the file "dynamic_txyz.txt".
@@ -104,10 +148,12 @@ tclsh $OOMMFTCL boxsi +fg 02_dynamic_stage.mif -exitondone 1
 tclsh $OOMMFTCL odtcols < "dynamic.odt" 18 14 15 16 > "dynamic_txyz.txt"
 
 #
-# Extract the spatial magnetisation data (sampled on a 24 x 24 grid)
-# and store it in three numpy arrays 'mxs.npy', 'mys.npy' and 'mzs.npy'
+# Extract the spatial magnetisation data (sampled on the simulation grid,
+# i.e. 24 x 24 cells) and store it in three numpy arrays 'mxs.npy',
+# 'mys.npy' and 'mzs.npy' (the format of the snapshots and the grid size
+# are detected automatically).
 #
-python oommf_postprocessing.py
+python oommf_postprocessing.py --dtype $STORAGE_DTYPE
 
 #
 # Create output directory, copy the generated data there and remove
@@ -1,55 +1,32 @@
+import argparse
 import glob
-import numpy as np
 
-omf_files = sorted(glob.glob('dynamic*.omf'))
+from postprocessing.omf_ingestion import convert_omf_snapshots
+from postprocessing.ovf import get_ovf_representation
 
-nx = 24
-ny = 24
-
-# Read magnetisation snapshots from all .omf files
-# and store them in three arrays `mxs`, `mys`, `mzs`
-# of shape NUM_TIMESTEPS x NUM_CELLS.
-mxs = []
-mys = []
-mzs = []
-
-for omf_file in omf_files:
-    d = np.loadtxt(omf_file)
-    mxs.append(d[:, 0])
-    mys.append(d[:, 1])
-    mzs.append(d[:, 2])
-
-mxs = np.array(mxs)
-mys = np.array(mys)
-mzs = np.array(mzs)
-
-
-# Compute the average of the magnetisation values in the
-# top and bottom layer of the sample. Note that the way we
-# compute this relies on the fact that OOMMF orders the
-# magnetisation values such that the z-index is incremented
-# last (see [1], section "Data block").
+# Read the magnetisation snapshots from all .omf files and store the
+# magnetisation sampled at a height of z=5nm (i.e., the average of the
+# top and bottom layer of the sample) in three arrays `mxs.npy`,
+# `mys.npy`, `mzs.npy` of shape NUM_TIMESTEPS x NY x NX, where the grid
+# size NY x NX is read from the snapshots (24 x 24 for the standard problem).
 #
-# [1] http://math.nist.gov/oommf/doc/userguide12a6/userguide/OVF_1.0_format.html
-
-_, numMags = mxs.shape
-numMagsPerLayer = numMags // 2
-
-mxsTop = mxs[:, :numMagsPerLayer]
-mysTop = mys[:, :numMagsPerLayer]
-mzsTop = mzs[:, :numMagsPerLayer]
-mxsBottom = mxs[:, numMagsPerLayer:]
-mysBottom = mys[:, numMagsPerLayer:]
-mzsBottom = mzs[:, numMagsPerLayer:]
-
-# The next three lines average the magnetisation in the top and bottom
-# layer of the discretisation mesh, to represent the magnetisation
-# at a height of z=5nm. 
-
-mxs_sampled = 0.5 * (mxsTop + mxsBottom).reshape((-1, nx, ny))
-mys_sampled = 0.5 * (mysTop + mysBottom).reshape((-1, nx, ny))
-mzs_sampled = 0.5 * (mzsTop + mzsBottom).reshape((-1, nx, ny))
-
-np.save('mxs.npy', mxs_sampled)
-np.save('mys.npy', mys_sampled)
-np.save('mzs.npy', mzs_sampled)
+# The snapshots are parsed in parallel and streamed directly into
+# the output files (see `postprocessing/omf_ingestion.py`). Both text
+# and binary snapshots are supported; the format is detected automatically
+# from the file headers. The number
+# of worker processes can be given as an optional command line argument
+# (default: number of CPUs). Use `--dtype float32` to store the data in
+# single precision, which halves the size of the output files.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert OOMMF snapshots to numpy arrays.')
+    parser.add_argument('num_processes', type=int, nargs='?', default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--dtype', dest='dtype', type=str, default='float64', choices=['float32', 'float64'],
+                        help='Type in which the data is stored (default: float64)')
+    args = parser.parse_args()
+
+    omf_files = sorted(glob.glob('dynamic*.omf'))
+    print("Converting {} snapshots (data format: '{}')".format(
+        len(omf_files), get_ovf_representation(omf_files[0])))
+    convert_omf_snapshots(omf_files, output_dir='.', num_processes=args.num_processes, dtype=args.dtype)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+This script watches the spatially averaged magnetisation written by a
+running simulation and stops the simulation once the requested peak
+frequencies have converged. The peak frequencies are estimated every
+`--check-interval` timesteps, and they have converged when the last
+`--num-checks` estimates agree to within `--tol` GHz.
+
+The simulation is asked to stop by writing a stop-file, which the Nmag
+and NumPy drivers of the dynamic stage check after every stage (the
+name of the stop-file is given by the environment variable FMR_STOP_FILE),
+e.g.:
+
+    FMR_STOP_FILE=STOP python 02_dynamic_stage.py &
+    python monitor_convergence.py dynamic_txyz.txt --tol 0.01 --stop-file STOP --pid $!
+
+OOMMF cannot check a stop-file, so instead the OOMMF process is sent a
+signal (`--pid PID --signal TERM`). The `generate_data.sh` scripts do
+this automatically if the environment variable CONVERGENCE_TOL is set.
+
+"""
+
+import argparse
+import sys
+
+from postprocessing.convergence_monitor import ConvergenceMonitor, get_signal_number
+from postprocessing.live_monitoring import ConsolePublisher, JsonStatusPublisher
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stop a running simulation once the peak frequencies have converged.')
+    parser.add_argument('table_file', type=str,
+                        help='Data table written by the simulation (dynamic.odt, dynamic_txyz.txt for the NumPy '
+                             'solver, or the _dat.ndt file for Nmag); it need not exist yet')
+    parser.add_argument('--tol', dest='tol', type=float, required=True,
+                        help='Tolerance for the peak frequencies in GHz')
+    parser.add_argument('--freqs', dest='freqs', type=str, default='8.25,11.25',
+                        help='Comma-separated list of approximate peak frequencies in GHz (default: 8.25,11.25)')
+    parser.add_argument('--component', dest='component', type=str, default='y',
+                        help='Magnetization component to analyse (default: y)')
+    parser.add_argument('--check-interval', dest='check_interval', type=int, default=200,
+                        help='Estimate the peak frequencies every CHECK_INTERVAL timesteps (default: 200)')
+    parser.add_argument('--num-checks', dest='num_checks', type=int, default=3,
+                        help='Number of consecutive estimates which must agree (default: 3)')
+    parser.add_argument('--min-timesteps', dest='min_timesteps', type=int, default=0,
+                        help='Never stop the simulation before this number of timesteps (default: 0)')
+    parser.add_argument('--stop-file', dest='stop_file', type=str, default=None,
+                        help='Write this stop-file when the peak frequencies have converged')
+    parser.add_argument('--pid', dest='pid', type=int, default=None,
+                        help='Process ID of the simulation; the monitor stops when this process has ended')
+    parser.add_argument('--signal', dest='signal', type=str, default=None,
+                        help='Send this signal (e.g. TERM) to the process PID when the peak frequencies '
+                             'have converged')
+    parser.add_argument('--interval', dest='interval', type=float, default=1.0,
+                        help='Polling interval in seconds (default: 1)')
+    parser.add_argument('--idle-timeout', dest='idle_timeout', type=float, default=None,
+                        help='Stop monitoring if no new data has arrived for this many seconds')
+    parser.add_argument('--status-file', dest='status_file', type=str, default=None,
+                        help='Write the status after each check to this JSON file')
+    args = parser.parse_args()
+
+    if args.signal is not None and args.pid is None:
+        parser.error("--signal requires --pid")
+
+    publishers = [ConsolePublisher()]
+    if args.status_file is not None:
+        publishers.append(JsonStatusPublisher(args.status_file))
+
+    monitor = ConvergenceMonitor(args.table_file, [float(f) for f in args.freqs.split(',')], args.tol,
+                                 component=args.component, check_interval=args.check_interval,
+                                 num_checks=args.num_checks, min_timesteps=args.min_timesteps,
+                                 stop_filename=args.stop_file, pid=args.pid,
+                                 signum=None if args.signal is None else get_signal_number(args.signal),
+                                 publishers=publishers)
+    try:
+        status = monitor.run(interval=args.interval, idle_timeout=args.idle_timeout)
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+    if monitor.converged:
+        print("Peak frequencies converged after {} timesteps.".format(status['num_timesteps']))
+    else:
+        print("Peak frequencies did not converge to within {} GHz.".format(args.tol))
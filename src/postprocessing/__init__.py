@@ -1,2 +1,31 @@
 from .data_reader import DataReader
-from .figure_plotting import make_figure_2, make_figure_3, make_figure_4, make_figure_5
+from .fft_utils import SpectralEstimator
+from .spectral_analysis import SpectralAnalysis
+from .peak_finding import PeakFinder
+from .sampling import Sampling
+
+# The plotting functions are imported on first access, so that the data
+# reader and the spectral analysis can be used without importing
+# matplotlib (e.g. in headless batch or monitoring processes).
+_LAZY_ATTRIBUTES = {
+    'make_figure_2': 'figure_plotting',
+    'make_figure_3': 'figure_plotting',
+    'make_figure_4': 'figure_plotting',
+    'make_figure_5': 'figure_plotting',
+}
+
+__all__ = ['DataReader', 'SpectralEstimator', 'SpectralAnalysis', 'PeakFinder', 'Sampling'] + sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
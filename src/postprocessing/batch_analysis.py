@@ -0,0 +1,225 @@
+"""
+Spectral analysis of many simulation output directories at once.
+
+Each data directory is analysed independently in a pool of worker
+processes: the power spectrum of the requested magnetisation component
+is computed (via method 1 or 2) and the peaks closest to a list of
+approximate frequencies are located, together with their amplitudes
+(spectral densities) and linewidths (full width at half maximum).
+
+The results for all directories are collected in a single CSV table
+with one row per directory and requested peak. Rows are appended as
+soon as a directory has been analysed, so the table can be inspected
+while the batch is running. A directory which cannot be analysed
+(e.g. because of missing or corrupt files) does not affect the others;
+it is recorded in the table with status 'failed' and the error message.
+
+When the batch is re-run with the same output file, directories which
+have already been analysed successfully are skipped, and failed ones
+are retried.
+
+Optionally, the mode maps at the located peaks are saved as PNG files.
+Each worker process builds the mode map figure only once and re-uses it
+for all peaks and directories (see `figure_plotting.ModeMapRenderer`).
+
+"""
+
+import csv
+import glob
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from .data_reader import DataReader
+from .spectral_analysis import SpectralAnalysis
+
+TABLE_COLUMNS = ['data_dir', 'component', 'method', 'approx_freq_GHz', 'peak_freq_GHz',
+                 'amplitude', 'linewidth_GHz', 'status', 'error']
+
+# Resolution (dots per inch) of the mode maps.
+MODE_MAP_DPI = 100
+
+# Mode map renderer of the current (worker) process, see `get_mode_map_renderer`.
+_mode_map_renderer = None
+
+
+def expand_data_dirs(patterns):
+    """
+    Return the sorted list of directories matching any of the given glob
+    patterns (plain directory names are patterns matching themselves).
+    Duplicates are removed.
+    """
+    data_dirs = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                data_dirs.add(os.path.normpath(path))
+    return sorted(data_dirs)
+
+
+def get_mode_map_renderer():
+    """
+    Return the `ModeMapRenderer` of the current process (which renders
+    PNG files without recomputing the layout for each frame), creating it
+    on the first call.
+    """
+    global _mode_map_renderer
+    if _mode_map_renderer is None:
+        # Only import matplotlib if mode maps are requested.
+        from .figure_plotting import ModeMapRenderer
+        _mode_map_renderer = ModeMapRenderer(fast_png=True, dpi=MODE_MAP_DPI)
+    return _mode_map_renderer
+
+
+def get_mode_map_filename_template(data_dir, mode_map_dir):
+    """
+    Return the template for the filenames of the mode maps of `data_dir`
+    in `mode_map_dir` (see `ModeMapRenderer.render_modes`). The path of
+    the data directory is part of the filename to keep it unique.
+    """
+    name = os.path.normpath(data_dir).strip(os.sep).replace(os.sep, '_')
+    return os.path.join(mode_map_dir, name + '_mode_{freq:.2f}GHz.png')
+
+
+def analyse_data_dir(data_dir, approx_freqs, data_format='OOMMF', component='y', method=2,
+                     memory_budget=None, mode_map_dir=None):
+    """
+    Analyse the simulation data in `data_dir` and return a list of rows
+    (dictionaries with the keys in `TABLE_COLUMNS`), one for each of the
+    approximate peak frequencies (in GHz) in `approx_freqs`.
+
+    The spatially resolved data is memory-mapped, and if `memory_budget`
+    is given the spectrum is computed out-of-core (see `SpectralAnalysis`).
+
+    If `mode_map_dir` is given, the mode maps at the peak frequencies are
+    saved as PNG files in this directory.
+    """
+    with DataReader(data_dir, data_format=data_format, mmap_mode='r') as data_reader:
+        spectral_analysis = SpectralAnalysis(data_reader, memory_budget=memory_budget)
+        peak_finder = spectral_analysis.get_peak_finder(component, method=method, interpolation='parabolic')
+        peak_freqs, amplitudes, linewidths = peak_finder.get_peak_properties(approx_freqs)
+
+        if mode_map_dir is not None:
+            get_mode_map_renderer().render_modes(spectral_analysis, peak_freqs,
+                                                 get_mode_map_filename_template(data_dir, mode_map_dir))
+
+    rows = []
+    for approx_freq, peak_freq, amplitude, linewidth in zip(approx_freqs, peak_freqs, amplitudes, linewidths):
+        rows.append({'data_dir': data_dir, 'component': component, 'method': method,
+                     'approx_freq_GHz': approx_freq, 'peak_freq_GHz': repr(float(peak_freq)),
+                     'amplitude': repr(float(amplitude)), 'linewidth_GHz': repr(float(linewidth)),
+                     'status': 'ok', 'error': ''})
+    return rows
+
+
+def _analyse_data_dir_safely(task):
+    """
+    Wrapper around `analyse_data_dir` which is run in the worker processes.
+    Any error is caught and reported as a single row with status 'failed',
+    so that it does not affect the analysis of the other directories.
+    """
+    data_dir, kwargs = task
+    start = time.time()
+    try:
+        rows = analyse_data_dir(data_dir, **kwargs)
+    except Exception as exc:
+        error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        rows = [{'data_dir': data_dir, 'component': kwargs.get('component', 'y'),
+                 'method': kwargs.get('method', 2), 'status': 'failed', 'error': error}]
+    return data_dir, rows, time.time() - start
+
+
+def read_results_table(filename):
+    """
+    Return the list of rows (dictionaries) in the CSV table `filename`,
+    or an empty list if the file does not exist.
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return list(csv.DictReader(f))
+
+
+def write_results_table(filename, rows):
+    """
+    Write the given rows to the CSV table `filename` (replacing the file).
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.rename(tmp_filename, filename)
+
+
+def analyse_batch(data_dirs, output_file, approx_freqs, data_format='OOMMF', component='y', method=2,
+                  memory_budget=None, jobs=1, resume=True, progress_stream=sys.stdout, mode_map_dir=None):
+    """
+    Analyse all directories in `data_dirs` (see `analyse_data_dir` for the
+    meaning of the other arguments) using `jobs` worker processes, and
+    write the results to the CSV table `output_file`.
+
+    If `resume` is True (the default) and `output_file` already exists,
+    directories with successful results in it are skipped (their rows are
+    kept), whereas previously failed directories are analysed again.
+    Progress is reported to `progress_stream` (use None to disable this).
+    If `mode_map_dir` is given, the mode maps at the peaks are saved in
+    this directory (which is created if necessary).
+
+    Returns a dictionary with the numbers of directories which were
+    analysed successfully ('ok'), which failed ('failed') and which
+    were skipped because they had been analysed before ('skipped').
+    """
+    data_dirs = [os.path.normpath(d) for d in data_dirs]
+
+    # Keep successful results of previous runs and drop failed ones.
+    rows = [row for row in read_results_table(output_file) if row['status'] == 'ok'] if resume else []
+    done = set(row['data_dir'] for row in rows)
+    pending = [d for d in data_dirs if d not in done]
+    summary = {'ok': 0, 'failed': 0, 'skipped': len(data_dirs) - len(pending)}
+
+    write_results_table(output_file, rows)
+
+    def report(message):
+        if progress_stream is not None:
+            progress_stream.write(message + '\n')
+            progress_stream.flush()
+
+    if summary['skipped']:
+        report("Skipping {} directories which have already been analysed.".format(summary['skipped']))
+
+    if mode_map_dir is not None and not os.path.isdir(mode_map_dir):
+        os.makedirs(mode_map_dir)
+
+    kwargs = dict(approx_freqs=list(approx_freqs), data_format=data_format, component=component,
+                  method=method, memory_budget=memory_budget, mode_map_dir=mode_map_dir)
+    tasks = [(data_dir, kwargs) for data_dir in pending]
+
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(processes=min(jobs, len(tasks)))
+        results = pool.imap_unordered(_analyse_data_dir_safely, tasks)
+    else:
+        pool = None
+        results = (_analyse_data_dir_safely(task) for task in tasks)
+
+    try:
+        with open(output_file, 'a') as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+            for i, (data_dir, new_rows, duration) in enumerate(results, start=1):
+                writer.writerows(new_rows)
+                f.flush()
+                status = new_rows[0]['status']
+                summary[status] += 1
+                message = "[{}/{}] {}: {} ({:.1f} s)".format(i, len(tasks), data_dir, status, duration)
+                if status == 'failed':
+                    message += " - " + new_rows[0]['error']
+                report(message)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    report("Analysed {ok} directories successfully, {failed} failed, {skipped} skipped.".format(**summary))
+    return summary
@@ -0,0 +1,284 @@
+"""
+Convergence-based early termination of the dynamic stage.
+
+The monitor follows the table of the spatially averaged magnetisation
+written by a running simulation (see `live_monitoring`) and estimates
+the frequencies of the requested peaks every `check_interval` timesteps.
+The uncertainty of each peak frequency is estimated as the largest
+deviation of the last `num_checks` estimates from the most recent one.
+Once the uncertainty of all requested peaks is below the tolerance, the
+monitor asks the simulation to stop, by writing a stop-file (which the
+Nmag and NumPy drivers check after every stage) and/or by sending a
+signal to the simulation process (which is used for OOMMF).
+
+"""
+
+import glob
+import json
+import os
+import signal
+import time
+
+import numpy as np
+
+from .live_monitoring import DEFAULT_FREQS, RecursiveDFT, get_peaks, get_table_follower
+from .ovf import read_ovf
+
+# Environment variable which contains the name of the stop-file checked
+# by the simulation drivers.
+STOP_FILE_ENV_VAR = 'FMR_STOP_FILE'
+
+
+def get_stop_filename(default=None):
+    """
+    Return the name of the stop-file given by the environment variable
+    `FMR_STOP_FILE`, or `default` if it is not set.
+    """
+    return os.environ.get(STOP_FILE_ENV_VAR, default)
+
+
+def is_stop_requested(stop_filename):
+    """
+    Return True if the stop-file `stop_filename` exists (False if
+    `stop_filename` is None).
+    """
+    return stop_filename is not None and os.path.exists(stop_filename)
+
+
+def is_process_running(pid):
+    """
+    Return True if the process with the given process ID is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class ConvergenceMonitor(object):
+    """
+    Follow the data table `table_filename` of a running simulation (see
+    `live_monitoring.get_table_follower`) and request the simulation to
+    stop once the frequencies of the peaks closest to `approx_freqs` (in
+    GHz) have converged to within `tol` GHz.
+
+    *Arguments*
+
+    component:  magnetisation component whose spectrum is analysed
+
+    freqs:  frequency grid in GHz on which the spectrum is computed
+
+    check_interval:  the peak frequencies are estimated every
+        `check_interval` timesteps
+
+    num_checks:  number of consecutive estimates which must agree to
+        within `tol` (see `get_uncertainties`)
+
+    min_timesteps:  the simulation is never stopped before this number
+        of timesteps
+
+    stop_filename:  if given, a stop-file with this name (containing the
+        final status in JSON format) is written when the peaks have
+        converged
+
+    pid, signum:  if `pid` is given, the signal `signum` is sent to this
+        process when the peaks have converged (if `signum` is not None),
+        and the monitor stops when the process has ended
+
+    publishers:  objects with a method `publish(status)` which is called
+        with the status dictionary after each check (see `check`)
+
+    """
+
+    def __init__(self, table_filename, approx_freqs, tol, component='y', freqs=None, check_interval=200,
+                 num_checks=3, min_timesteps=0, stop_filename=None, pid=None, signum=None, publishers=None):
+        self.table_follower = get_table_follower(table_filename)
+        self.approx_freqs = list(approx_freqs)
+        self.tol = tol
+        self.component = component
+        self.freqs = DEFAULT_FREQS if freqs is None else np.asarray(freqs, dtype=float)
+        self.check_interval = check_interval
+        self.num_checks = num_checks
+        self.min_timesteps = min_timesteps
+        self.stop_filename = stop_filename
+        self.pid = pid
+        self.signum = signum
+        self.publishers = [] if publishers is None else publishers
+
+        self.dft = RecursiveDFT(self.freqs)
+        self.history = []
+        self.converged = False
+        self.status = None
+        self._pending_rows = np.empty((0, 4))
+
+    @property
+    def finished(self):
+        return self.table_follower.finished
+
+    @property
+    def component_index(self):
+        return 1 + 'xyz'.index(self.component)
+
+    def update(self):
+        """
+        Read the new rows of the table and check the convergence of the
+        peaks after every `check_interval` timesteps (and at the end of
+        the table). Returns the list of the new status dictionaries.
+        """
+        rows = np.concatenate([self._pending_rows, self.table_follower.read_new_rows()])
+        idx = self.component_index
+
+        statuses = []
+        while not self.converged:
+            num_missing = self.check_interval - self.dft.num_samples % self.check_interval
+            if len(rows) < num_missing:
+                break
+            self.dft.update(rows[:num_missing, 0], rows[:num_missing, idx])
+            rows = rows[num_missing:]
+            statuses.append(self.check())
+
+        if self.finished and len(rows) > 0 and not self.converged:
+            self.dft.update(rows[:, 0], rows[:, idx])
+            rows = rows[:0]
+            statuses.append(self.check())
+
+        self._pending_rows = rows
+        return statuses
+
+    def get_uncertainties(self):
+        """
+        Return the uncertainties of the peak frequencies (in GHz), i.e. the
+        largest deviation of the last `num_checks` estimates from the most
+        recent one, or None if there are fewer than `num_checks` estimates
+        (or a peak has not been detected in any of them).
+        """
+        recent = self.history[-self.num_checks:]
+        if len(recent) < self.num_checks or any(peak_freqs is None for peak_freqs in recent):
+            return None
+        recent = np.array(recent)
+        return abs(recent - recent[-1]).max(axis=0)
+
+    def check(self):
+        """
+        Estimate the peak frequencies from the data read so far, update the
+        uncertainties and request the simulation to stop if they are below
+        the tolerance. Returns the status dictionary, which contains the
+        number of timesteps and the last simulation time read, the peaks
+        (with the keys 'approx_freq', 'freq', 'amplitude' and 'uncertainty'),
+        and whether the peaks have converged.
+        """
+        peaks = get_peaks(self.freqs, self.dft.get_power_spectrum(), self.approx_freqs)
+        self.history.append([peak['freq'] for peak in peaks] if peaks else None)
+        uncertainties = self.get_uncertainties()
+
+        if not peaks:
+            peaks = [{'freq': None, 'amplitude': None} for _ in self.approx_freqs]
+        for idx, approx_freq in enumerate(self.approx_freqs):
+            peaks[idx]['approx_freq'] = approx_freq
+            peaks[idx]['uncertainty'] = None if uncertainties is None else float(uncertainties[idx])
+
+        converged = (uncertainties is not None and bool(np.all(uncertainties < self.tol)) and
+                     self.dft.num_samples >= self.min_timesteps)
+        self.status = {'component': self.component,
+                       'num_timesteps': self.dft.num_samples,
+                       'time': float(self.dft.t_last),
+                       'frequency_resolution': self.dft.get_frequency_resolution(),
+                       'peaks': peaks,
+                       'tolerance': self.tol,
+                       'converged': converged,
+                       'finished': self.finished,
+                       'updated': time.time()}
+
+        for publisher in self.publishers:
+            publisher.publish(self.status)
+        if converged:
+            self.converged = True
+            self.request_stop()
+        return self.status
+
+    def request_stop(self):
+        """
+        Ask the simulation to stop, by writing the stop-file and/or
+        sending the signal to the simulation process.
+        """
+        if self.stop_filename is not None:
+            tmp_filename = self.stop_filename + '.tmp'
+            with open(tmp_filename, 'w') as f:
+                json.dump(self.status, f, indent=2)
+            os.rename(tmp_filename, self.stop_filename)
+        if self.pid is not None and self.signum is not None:
+            try:
+                os.kill(self.pid, self.signum)
+            except OSError:
+                pass
+
+    def run(self, interval=1.0, idle_timeout=None):
+        """
+        Poll for new data every `interval` seconds until the peaks have
+        converged, the simulation has finished (or the process `pid` has
+        ended), or no new data has arrived for `idle_timeout` seconds.
+        Returns the last status (None if no check has been done).
+        """
+        last_change = time.time()
+        while True:
+            process_ended = self.pid is not None and not is_process_running(self.pid)
+            num_timesteps = self.dft.num_samples + len(self._pending_rows)
+            self.update()
+            if self.dft.num_samples + len(self._pending_rows) > num_timesteps:
+                last_change = time.time()
+            if self.converged or self.finished:
+                break
+            if process_ended or (idle_timeout is not None and time.time() - last_change > idle_timeout):
+                # Take the remaining rows into account.
+                if len(self._pending_rows) > 0:
+                    self.dft.update(self._pending_rows[:, 0], self._pending_rows[:, self.component_index])
+                    self._pending_rows = self._pending_rows[:0]
+                    self.check()
+                break
+            time.sleep(interval)
+        return self.status
+
+
+def get_signal_number(name):
+    """
+    Return the number of the signal `name` (e.g. 'TERM' or 'SIGTERM').
+    """
+    name = name.upper()
+    if not name.startswith('SIG'):
+        name = 'SIG' + name
+    try:
+        return int(getattr(signal, name))
+    except AttributeError:
+        raise ValueError("Unknown signal: '{}'".format(name))
+
+
+def truncate_stopped_oommf_run(directory, odt_filename='dynamic.odt', omf_pattern='dynamic*.omf'):
+    """
+    Make the output of an OOMMF simulation which has been stopped early
+    (by a signal) consistent: remove an incomplete last row of the data
+    table, and remove snapshots of stages which are not in the table (or
+    which are incomplete), and vice versa. Returns the number of stages.
+    """
+    odt_filename = os.path.join(directory, odt_filename)
+    with open(odt_filename) as f:
+        lines = f.readlines()
+    if lines and not lines[-1].endswith('\n'):
+        lines = lines[:-1]
+    header = [line for line in lines if line.startswith('#') and not line.lower().startswith('# table end')]
+    rows = [line for line in lines if line.strip() and not line.startswith('#')]
+
+    omf_files = sorted(glob.glob(os.path.join(directory, omf_pattern)))
+    num_complete_omf_files = len(omf_files)
+    if num_complete_omf_files > 0:
+        try:
+            read_ovf(omf_files[-1])
+        except (IOError, OSError, ValueError, IndexError):
+            num_complete_omf_files -= 1
+
+    num_stages = min(len(rows), num_complete_omf_files)
+    for filename in omf_files[num_stages:]:
+        os.remove(filename)
+    with open(odt_filename, 'w') as f:
+        f.writelines(header + rows[:num_stages] + ['# Table End\n'])
+    return num_stages
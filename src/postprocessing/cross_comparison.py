@@ -0,0 +1,299 @@
+"""
+Cross-comparison of the spectra of different simulation runs (e.g. of
+the OOMMF and Nmag data for the standard problem).
+
+The runs generally differ in their time bases: they may contain a
+different number of timesteps, start at a different time or have been
+sampled with a different timestep. All runs are therefore brought onto a
+common time base first. Runs sampled with the same timestep are trimmed
+to the common time interval (without copying any data), and all other
+runs are linearly interpolated onto the timesteps of the run with the
+largest timestep.
+
+Since all runs then share the same FFT frequencies, the spectra of each
+run (via methods 1 and 2, for all components) are computed in a single
+batched FFT over the spatially averaged magnetisation and all grid cells,
+and are cached together with the peaks detected in them. Any number of
+pairwise comparisons therefore computes each spectrum only once.
+
+"""
+
+import itertools
+import os
+
+import numpy as np
+import scipy.fft
+
+from .data_comparison import compare_peaks
+from .fft_utils import get_fft_frequencies
+from .peak_finding import PeakFinder
+
+# Relative tolerance (with respect to the timestep) used to decide whether
+# two runs have been sampled with the same timestep at the same times.
+DEFAULT_TIMESTEP_RTOL = 1e-3
+
+
+def get_timestep(timesteps):
+    """
+    Return the (median) timestep of the given array of timesteps.
+    """
+    return float(np.median(np.diff(timesteps)))
+
+
+def get_common_timesteps(timesteps_list, rtol=DEFAULT_TIMESTEP_RTOL):
+    """
+    Return the timesteps onto which the runs with the given timesteps are
+    aligned: those timesteps of the run with the largest timestep (the
+    first one if there are several) which lie in the time interval
+    covered by all runs.
+    """
+    dts = [get_timestep(timesteps) for timesteps in timesteps_list]
+    t_start = max(timesteps[0] for timesteps in timesteps_list)
+    t_end = min(timesteps[-1] for timesteps in timesteps_list)
+    if t_end <= t_start:
+        raise ValueError("The time intervals of the runs do not overlap.")
+
+    timesteps = timesteps_list[int(np.argmax(dts))]
+    atol = rtol * max(dts)
+    return timesteps[(timesteps >= t_start - atol) & (timesteps <= t_end + atol)]
+
+
+class TimeResampler(object):
+    """
+    Map time series sampled at `timesteps` onto `common_timesteps` (which
+    must lie within the time interval covered by `timesteps`).
+
+    If the common timesteps coincide (to within `rtol` times the timestep)
+    with a contiguous range of `timesteps`, the time series are simply
+    trimmed, which returns views of the arrays. Otherwise they are
+    linearly interpolated along the time axis.
+    """
+
+    def __init__(self, timesteps, common_timesteps, rtol=DEFAULT_TIMESTEP_RTOL):
+        timesteps = np.asarray(timesteps)
+        common_timesteps = np.asarray(common_timesteps)
+        num_timesteps = len(common_timesteps)
+        atol = rtol * get_timestep(common_timesteps)
+
+        start = int(np.argmin(abs(timesteps - common_timesteps[0])))
+        candidate = timesteps[start:start + num_timesteps]
+        if len(candidate) == num_timesteps and np.allclose(candidate, common_timesteps, rtol=0, atol=atol):
+            self.time_slice = slice(start, start + num_timesteps)
+            self.indices = self.weights = None
+        else:
+            if common_timesteps[0] < timesteps[0] - atol or common_timesteps[-1] > timesteps[-1] + atol:
+                raise ValueError("Common timesteps are outside the time interval of the data.")
+            self.time_slice = None
+            indices = np.searchsorted(timesteps, common_timesteps, side='right') - 1
+            self.indices = np.clip(indices, 0, len(timesteps) - 2)
+            t_lower = timesteps[self.indices]
+            t_upper = timesteps[self.indices + 1]
+            self.weights = np.clip((common_timesteps - t_lower) / (t_upper - t_lower), 0.0, 1.0)
+
+    @property
+    def is_trimmed(self):
+        return self.time_slice is not None
+
+    def __call__(self, m):
+        """
+        Return the time series `m` (with time along the first dimension)
+        at the common timesteps.
+        """
+        if self.is_trimmed:
+            return m[self.time_slice]
+        weights = self.weights.reshape((-1,) + (1,) * (m.ndim - 1))
+        return m[self.indices] * (1.0 - weights) + m[self.indices + 1] * weights
+
+
+class SpectralCrossComparison(object):
+    """
+    Compare the spectra of the simulation runs whose data is provided by
+    the given data readers (see `DataReader`), identified by `names`
+    (e.g. ['OOMMF', 'Nmag']).
+
+    The runs are aligned onto a common time base (see the module
+    docstring), and the spectra of each run are computed on first use
+    and cached. Set `spatially_resolved=False` if only the spatially
+    averaged magnetisation is available (in which case only method 1
+    can be used).
+
+    Example:
+
+        >>> comparison = SpectralCrossComparison([oommf_reader, nmag_reader], names=['OOMMF', 'Nmag'])
+        >>> peaks = comparison.compare('OOMMF', 'Nmag', approx_freqs=[8.25, 11.25])
+        >>> print(comparison.format_peaks('OOMMF', 'Nmag', peaks))
+
+    """
+
+    def __init__(self, data_readers, names=None, components='xyz', spatially_resolved=True,
+                 rtol=DEFAULT_TIMESTEP_RTOL):
+        if names is None:
+            names = [os.path.basename(os.path.normpath(data_reader.data_dir)) for data_reader in data_readers]
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the runs must be unique. Got: {}".format(names))
+        if len(names) != len(data_readers):
+            raise ValueError("Got {} data readers but {} names.".format(len(data_readers), len(names)))
+
+        self.names = list(names)
+        self.data_readers = dict(zip(names, data_readers))
+        self.components = list(components)
+        self.spatially_resolved = spatially_resolved
+
+        timesteps_list = [data_reader.get_timesteps(unit='s') for data_reader in data_readers]
+        self.timesteps = get_common_timesteps(timesteps_list, rtol=rtol)
+        self.resamplers = {name: TimeResampler(timesteps, self.timesteps, rtol=rtol)
+                           for name, timesteps in zip(names, timesteps_list)}
+        self.freqs = get_fft_frequencies(self.timesteps, unit='GHz')
+
+        self._spectra = {}
+        self._peak_finders = {}
+
+    def get_num_timesteps(self):
+        return len(self.timesteps)
+
+    def _get_time_series(self, name):
+        """
+        Return the list of the aligned time series of the given run which
+        are transformed together: the spatially averaged magnetisation for
+        each component (shape (N, 1)), followed by the spatially resolved
+        magnetisation for each component (shape (N, nx * ny)).
+        """
+        data_reader = self.data_readers[name]
+        resample = self.resamplers[name]
+        num_timesteps = self.get_num_timesteps()
+
+        columns = [resample(np.asarray(data_reader.get_average_magnetisation(c))).reshape(num_timesteps, 1)
+                   for c in self.components]
+        if self.spatially_resolved:
+            for c in self.components:
+                m_full = resample(data_reader.get_spatially_resolved_magnetisation(c))
+                columns.append(np.reshape(m_full, (num_timesteps, -1)))
+        return columns
+
+    def compute_spectra(self, names=None):
+        """
+        Compute the spectra (via methods 1 and 2, for all components) of
+        the given runs (default: all runs) whose spectra have not been
+        computed yet, using a single batched FFT.
+        """
+        names = [name for name in (self.names if names is None else names) if name not in self._spectra]
+        if not names:
+            return
+
+        columns = {name: self._get_time_series(name) for name in names}
+        data = np.concatenate([column for name in names for column in columns[name]], axis=1)
+        spectra_full = np.abs(scipy.fft.rfft(data, axis=0))**2
+        del data
+
+        # Split the spectra of all columns into the individual spectra. As in
+        # `fft_utils`, the last frequency bin is discarded.
+        offset = 0
+        for name in names:
+            spectra = {}
+            widths = [column.shape[1] for column in columns[name]]
+            for idx, width in enumerate(widths):
+                spectrum = spectra_full[:-1, offset:offset + width].mean(axis=1)
+                component = self.components[idx % len(self.components)]
+                method = 1 if idx < len(self.components) else 2
+                spectra[(component, method)] = spectrum
+                offset += width
+            self._spectra[name] = spectra
+
+    def get_spectrum(self, name, component='y', method=1):
+        """
+        Return the power spectrum of the given run and component computed
+        via `method` (1 or 2, see `fft_utils`) on the common time base.
+        """
+        if method not in (1, 2):
+            raise ValueError("Argument 'method' must be 1 or 2. Got: '{}'".format(method))
+        if method == 2 and not self.spatially_resolved:
+            raise ValueError("Method 2 needs the spatially resolved magnetisation "
+                             "(the comparison was created with spatially_resolved=False).")
+        if component not in self.components:
+            raise ValueError("Component '{}' has not been analysed (components: {})".format(
+                component, ', '.join(self.components)))
+        self.compute_spectra([name])
+        return self._spectra[name][(component, method)]
+
+    def get_peak_finder(self, name, component='y', method=1, interpolation='lorentzian'):
+        """
+        Return a `PeakFinder` for the spectrum of the given run. The peaks
+        are detected only once for each combination of arguments.
+        """
+        key = (name, component, method, interpolation)
+        try:
+            peak_finder = self._peak_finders[key]
+        except KeyError:
+            spectrum = self.get_spectrum(name, component, method=method)
+            peak_finder = PeakFinder(self.freqs, spectrum, interpolation=interpolation)
+            self._peak_finders[key] = peak_finder
+        return peak_finder
+
+    def compare(self, name_ref, name_gen, approx_freqs, component='y', method=1, interpolation='lorentzian'):
+        """
+        Match the peaks closest to `approx_freqs` (in GHz) in the spectra of
+        the runs `name_ref` and `name_gen` and return their deviations, as
+        a list of dictionaries (see `data_comparison.compare_spectral_peaks`).
+        """
+        return compare_peaks(self.get_peak_finder(name_ref, component, method, interpolation),
+                             self.get_peak_finder(name_gen, component, method, interpolation),
+                             approx_freqs)
+
+    def compare_all(self, approx_freqs, components=('y',), methods=(1, 2), interpolation='lorentzian'):
+        """
+        Compare all pairs of runs. Returns a dictionary mapping each pair
+        of names `(name_ref, name_gen)` to a dictionary which maps each
+        pair `(component, method)` to the result of `compare`.
+        """
+        if not self.spatially_resolved:
+            methods = [method for method in methods if method != 2]
+        self.compute_spectra()
+        results = {}
+        for name_ref, name_gen in itertools.combinations(self.names, 2):
+            results[(name_ref, name_gen)] = {
+                (component, method): self.compare(name_ref, name_gen, approx_freqs, component=component,
+                                                  method=method, interpolation=interpolation)
+                for component in components for method in methods}
+        return results
+
+    def format_alignment(self):
+        """
+        Return a human-readable description of how the runs were aligned.
+        """
+        lines = ["Common time base: {} timesteps from {:.4g} s to {:.4g} s (dt = {:.4g} s)".format(
+            self.get_num_timesteps(), self.timesteps[0], self.timesteps[-1], get_timestep(self.timesteps))]
+        for name in self.names:
+            num_timesteps = self.data_readers[name].get_num_timesteps()
+            action = 'trimmed' if self.resamplers[name].is_trimmed else 'interpolated'
+            lines.append("  {}: {} timesteps, {}".format(name, num_timesteps, action))
+        return '\n'.join(lines)
+
+    def format_peaks(self, name_ref, name_gen, peaks, component='y', method=1):
+        """
+        Return a human-readable report of the peak deviations `peaks`
+        returned by `compare`.
+        """
+        lines = []
+        for peak in peaks:
+            lines.append("Peak of m_{} (method {}) near {} GHz: {} {:.4f} GHz, {} {:.4f} GHz "
+                         "(deviation {:+.2e} GHz), relative amplitude deviation {:+.2e}".format(
+                             component, method, peak['approx_freq'], name_ref, peak['freq_ref'], name_gen,
+                             peak['freq_gen'], peak['freq_deviation'], peak['relative_amplitude_deviation']))
+        return '\n'.join(lines)
+
+    def plot_overlay(self, component='y', method=1, names=None, approx_freqs=None, interpolation='lorentzian'):
+        """
+        Return a matplotlib figure showing the spectra of the given runs
+        (default: all runs) on top of each other. If `approx_freqs` is given,
+        the peaks closest to these frequencies are marked.
+        """
+        from .figure_plotting import plot_spectra_overlay
+
+        names = self.names if names is None else names
+        spectra = [self.get_spectrum(name, component, method=method) for name in names]
+        peak_freqs = None
+        if approx_freqs is not None:
+            peak_freqs = [self.get_peak_finder(name, component, method, interpolation).find_peak_frequency(
+                approx_freqs) for name in names]
+        return plot_spectra_overlay(self.freqs, spectra, names, peak_freqs=peak_freqs,
+                                    title='Spectra of m_{} (method {})'.format(component, method))
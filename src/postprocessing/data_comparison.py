@@ -0,0 +1,378 @@
+"""
+Streaming comparison of recomputed simulation data with reference data.
+
+The spatially resolved magnetisation is compared in chunks of timesteps,
+which are read from (memory-mapped) data readers one at a time, so the
+memory needed does not depend on the number of timesteps and no
+temporary array of the full size is ever created. The components are
+compared in parallel threads (numpy releases the GIL for the arithmetic
+on each chunk).
+
+For each quantity the comparison reports the maximum and RMS absolute
+difference, and the first timestep at which the difference exceeds the
+tolerance. With `early_exit=True` the comparison stops as soon as the
+tolerance is exceeded anywhere (in any component), so that failures are
+detected quickly even for very large datasets. In addition, the
+frequencies and amplitudes of the main spectral peaks can be compared.
+
+"""
+
+import threading
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from .data_reader import DataReader
+from .fft_utils import get_fft_frequencies, get_spectrum_via_method_1
+from .peak_finding import PeakFinder
+from .spectral_analysis import SpectralAnalysis
+
+# Approximate amount of memory (in bytes) used for each chunk of timesteps.
+DEFAULT_CHUNK_MEMORY = 32 * 1024**2
+
+
+class ComparisonResult(object):
+    """
+    Statistics of the absolute difference between a reference and a
+    recomputed time series (e.g. of one magnetisation component).
+
+    *Attributes*
+
+    name:  name of the compared quantity (e.g. 'm_y (spatially resolved)')
+
+    tol:  tolerance for the absolute difference
+
+    max_diff, rms_diff:  maximum and RMS absolute difference over all
+         values compared
+
+    first_violation:  index of the first timestep at which the difference
+         exceeds the tolerance (None if there is no such timestep);
+         `first_violation_time` and `first_violation_diff` contain the
+         corresponding time (if known) and maximum difference
+
+    num_timesteps_compared:  number of timesteps which have been compared
+         (smaller than the total number if the comparison stopped early)
+
+    stopped_early:  True if the comparison was stopped before all
+         timesteps had been compared (see `compare_time_series`)
+
+    """
+
+    def __init__(self, name, tol, num_timesteps):
+        self.name = name
+        self.tol = tol
+        self.num_timesteps = num_timesteps
+        self.max_diff = 0.0
+        self.sum_squared_diff = 0.0
+        self.num_values_compared = 0
+        self.num_timesteps_compared = 0
+        self.first_violation = None
+        self.first_violation_time = None
+        self.first_violation_diff = None
+        self.stopped_early = False
+
+    @property
+    def rms_diff(self):
+        if self.num_values_compared == 0:
+            return 0.0
+        return np.sqrt(self.sum_squared_diff / self.num_values_compared)
+
+    @property
+    def passed(self):
+        return self.first_violation is None
+
+    def format(self):
+        """
+        Return a one-line summary of the result.
+        """
+        line = "{}: max diff {:.3e}, RMS diff {:.3e} (tolerance {:.1e})".format(
+            self.name, self.max_diff, self.rms_diff, self.tol)
+        if self.first_violation is not None:
+            line += ", first exceeded at timestep {}".format(self.first_violation)
+            if self.first_violation_time is not None:
+                line += " (t = {:.6g} s)".format(self.first_violation_time)
+            line += " with diff {:.3e}".format(self.first_violation_diff)
+        if self.stopped_early:
+            line += " [stopped after {} of {} timesteps]".format(self.num_timesteps_compared, self.num_timesteps)
+        return line
+
+    def __repr__(self):
+        return "<ComparisonResult {}>".format(self.format())
+
+
+def get_num_timesteps_per_chunk(shape, memory_budget=DEFAULT_CHUNK_MEMORY):
+    """
+    Return the number of timesteps per chunk for data of the given shape
+    (time along the first axis) so that the chunks of both datasets and
+    the temporary difference (all in double precision) fit into
+    `memory_budget` bytes.
+    """
+    values_per_timestep = int(np.prod(shape[1:], dtype=np.int64))
+    return max(1, memory_budget // (3 * 8 * max(values_per_timestep, 1)))
+
+
+def compare_time_series(m_ref, m_gen, tol, name='', timesteps=None, chunk_size=None,
+                        memory_budget=DEFAULT_CHUNK_MEMORY, early_exit=False, stop_event=None):
+    """
+    Compare the arrays `m_ref` and `m_gen` (of the same shape, with time
+    along the first axis) chunk by chunk and return a `ComparisonResult`.
+
+    The arrays can be memory-mapped (or any objects supporting slicing
+    along the first axis, e.g. h5py datasets); only one chunk of
+    `chunk_size` timesteps (default: determined from `memory_budget`) is
+    read at a time. If `timesteps` is given, the time of the first
+    violation of the tolerance `tol` is reported as well.
+
+    If `early_exit` is True, the comparison stops at the end of the first
+    chunk in which the tolerance is exceeded, and `stop_event` (a
+    `threading.Event`, if given) is set. Conversely, the comparison stops
+    if `stop_event` is set by someone else (e.g. by the comparison of
+    another component running in parallel).
+    """
+    if m_ref.shape != m_gen.shape:
+        raise ValueError("Cannot compare {}: reference data has shape {} but recomputed data has shape {}".format(
+            name or 'data', m_ref.shape, m_gen.shape))
+
+    num_timesteps = m_ref.shape[0]
+    if chunk_size is None:
+        chunk_size = get_num_timesteps_per_chunk(m_ref.shape, memory_budget)
+
+    result = ComparisonResult(name, tol, num_timesteps)
+    for start in range(0, num_timesteps, chunk_size):
+        if stop_event is not None and stop_event.is_set():
+            result.stopped_early = True
+            break
+
+        stop = min(start + chunk_size, num_timesteps)
+        diff = np.subtract(m_gen[start:stop], m_ref[start:stop], dtype=np.float64)
+        np.abs(diff, out=diff)
+        diff = diff.reshape(stop - start, -1)
+
+        max_diff_per_timestep = diff.max(axis=1)
+        result.max_diff = max(result.max_diff, float(max_diff_per_timestep.max()))
+        result.sum_squared_diff += float(np.einsum('ij,ij->', diff, diff))
+        result.num_values_compared += diff.size
+        result.num_timesteps_compared = stop
+
+        if result.first_violation is None:
+            violations = np.flatnonzero(max_diff_per_timestep > tol)
+            if len(violations) > 0:
+                result.first_violation = start + int(violations[0])
+                result.first_violation_diff = float(max_diff_per_timestep[violations[0]])
+                if timesteps is not None:
+                    result.first_violation_time = float(timesteps[result.first_violation])
+                if early_exit:
+                    if stop_event is not None:
+                        stop_event.set()
+                    result.stopped_early = stop < num_timesteps
+                    break
+
+    return result
+
+
+def compare_spectral_peaks(freqs, spectrum_ref, spectrum_gen, approx_freqs, interpolation='lorentzian'):
+    """
+    Compare the peaks closest to each of the frequencies in `approx_freqs`
+    in the spectra `spectrum_ref` and `spectrum_gen` (sampled at `freqs`).
+
+    Returns a list of dictionaries (one for each approximate frequency) with
+    the keys 'approx_freq', 'freq_ref', 'freq_gen', 'freq_deviation' (in the
+    unit of `freqs`), 'amplitude_ref', 'amplitude_gen' (the spectral densities
+    at the peaks) and 'relative_amplitude_deviation'.
+    """
+    return compare_peaks(PeakFinder(freqs, spectrum_ref, interpolation=interpolation),
+                         PeakFinder(freqs, spectrum_gen, interpolation=interpolation), approx_freqs)
+
+
+def compare_peaks(peak_finder_ref, peak_finder_gen, approx_freqs):
+    """
+    Same as `compare_spectral_peaks`, but for spectra whose peaks have
+    already been detected by the given `PeakFinder` instances.
+    """
+    freqs_ref, amplitudes_ref, _ = peak_finder_ref.get_peak_properties(approx_freqs)
+    freqs_gen, amplitudes_gen, _ = peak_finder_gen.get_peak_properties(approx_freqs)
+
+    peaks = []
+    for values in zip(approx_freqs, freqs_ref, freqs_gen, amplitudes_ref, amplitudes_gen):
+        approx_freq, freq_ref, freq_gen, amplitude_ref, amplitude_gen = (float(v) for v in values)
+        peaks.append({'approx_freq': approx_freq,
+                      'freq_ref': freq_ref,
+                      'freq_gen': freq_gen,
+                      'freq_deviation': freq_gen - freq_ref,
+                      'amplitude_ref': amplitude_ref,
+                      'amplitude_gen': amplitude_gen,
+                      'relative_amplitude_deviation': (amplitude_gen - amplitude_ref) / amplitude_ref})
+    return peaks
+
+
+def compare_spatially_resolved_magnetisation(ref_data_reader, gen_data_reader, tol, components='xyz',
+                                             chunk_size=None, memory_budget=DEFAULT_CHUNK_MEMORY,
+                                             early_exit=False, jobs=None):
+    """
+    Compare the spatially resolved magnetisation provided by the two data
+    readers (which should memory-map the data, see `compare_data_dirs`)
+    chunk by chunk, using one thread per component (or `jobs` threads).
+    Returns a dictionary mapping each component to a `ComparisonResult`.
+
+    With `early_exit=True` the comparison of all components stops as soon
+    as the tolerance `tol` is exceeded in any of them.
+    """
+    timesteps = ref_data_reader.get_timesteps()
+    stop_event = threading.Event()
+
+    def compare_component(component):
+        m_ref = ref_data_reader.get_spatially_resolved_magnetisation(component)
+        m_gen = gen_data_reader.get_spatially_resolved_magnetisation(component)
+        return compare_time_series(m_ref, m_gen, tol, name='m_{} (spatially resolved)'.format(component),
+                                   timesteps=timesteps, chunk_size=chunk_size, memory_budget=memory_budget,
+                                   early_exit=early_exit, stop_event=stop_event)
+
+    components = list(components)
+    jobs = len(components) if jobs is None else jobs
+    if jobs > 1 and len(components) > 1:
+        pool = ThreadPool(processes=min(jobs, len(components)))
+        try:
+            results = pool.map(compare_component, components)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [compare_component(component) for component in components]
+
+    return dict(zip(components, results))
+
+
+class ComparisonReport(object):
+    """
+    Result of the comparison of a recomputed dataset with reference data
+    (see `compare_data`).
+
+    *Attributes*
+
+    timesteps_max_diff:  maximum difference between the timesteps (in s)
+
+    average:  dictionary mapping each component to the `ComparisonResult`
+        for the spatially averaged magnetisation
+
+    spatially_resolved:  same for the spatially resolved magnetisation
+        (empty if it was not compared)
+
+    peaks:  dictionary mapping each component to the list of peak
+        deviations returned by `compare_spectral_peaks` (empty if no
+        peaks were compared)
+
+    peak_tol:  tolerance for the deviation of the peak frequencies (or None)
+
+    """
+
+    def __init__(self, timesteps_max_diff, average, spatially_resolved, peaks, peak_tol=None):
+        self.timesteps_max_diff = timesteps_max_diff
+        self.average = average
+        self.spatially_resolved = spatially_resolved
+        self.peaks = peaks
+        self.peak_tol = peak_tol
+
+    def get_results(self):
+        """
+        Return the list of all `ComparisonResult` instances in this report.
+        """
+        return list(self.average.values()) + list(self.spatially_resolved.values())
+
+    @property
+    def peaks_passed(self):
+        if self.peak_tol is None:
+            return True
+        return all(abs(peak['freq_deviation']) < self.peak_tol
+                   for peaks in self.peaks.values() for peak in peaks)
+
+    @property
+    def passed(self):
+        return all(result.passed for result in self.get_results()) and self.peaks_passed
+
+    def format(self):
+        """
+        Return a human-readable multi-line report.
+        """
+        lines = ["Maximum difference of timesteps: {:.3e} s".format(self.timesteps_max_diff)]
+        lines.extend(result.format() for result in self.get_results())
+        for component, peaks in sorted(self.peaks.items()):
+            for peak in peaks:
+                lines.append("Peak of m_{} near {} GHz: reference {:.4f} GHz, recomputed {:.4f} GHz "
+                             "(deviation {:+.2e} GHz), relative amplitude deviation {:+.2e}".format(
+                                 component, peak['approx_freq'], peak['freq_ref'], peak['freq_gen'],
+                                 peak['freq_deviation'], peak['relative_amplitude_deviation']))
+        lines.append("PASSED" if self.passed else "FAILED")
+        return '\n'.join(lines)
+
+
+def compare_data(ref_data_reader, gen_data_reader, tol, components='xyz', spatially_resolved=True,
+                 approx_peak_freqs=None, peak_method=1, peak_tol=None, chunk_size=None,
+                 memory_budget=DEFAULT_CHUNK_MEMORY, early_exit=False, jobs=None):
+    """
+    Compare the data provided by `gen_data_reader` with the reference data
+    provided by `ref_data_reader` and return a `ComparisonReport`.
+
+    The spatially averaged magnetisation and (if `spatially_resolved` is
+    True) the spatially resolved magnetisation are compared with the
+    absolute tolerance `tol` (see `compare_time_series` and
+    `compare_spatially_resolved_magnetisation` for the other arguments).
+
+    If `approx_peak_freqs` (in GHz) is given, the peaks of the spectra
+    (computed via method `peak_method`) closest to these frequencies are
+    compared as well, and the report only passes if their frequencies
+    deviate by less than `peak_tol` GHz (if given). With `early_exit=True`
+    nothing else is compared once the tolerance has been exceeded.
+    """
+    timesteps_ref = ref_data_reader.get_timesteps()
+    timesteps_gen = gen_data_reader.get_timesteps()
+    if len(timesteps_ref) != len(timesteps_gen):
+        raise ValueError("Reference data has {} timesteps but recomputed data has {}".format(
+            len(timesteps_ref), len(timesteps_gen)))
+    timesteps_max_diff = float(abs(timesteps_ref - timesteps_gen).max())
+
+    average = {}
+    stop_event = threading.Event()
+    for component in components:
+        average[component] = compare_time_series(
+            ref_data_reader.get_average_magnetisation(component),
+            gen_data_reader.get_average_magnetisation(component),
+            tol, name='m_{} (average)'.format(component), timesteps=timesteps_ref,
+            early_exit=early_exit, stop_event=stop_event)
+    failed = not all(result.passed for result in average.values())
+
+    resolved = {}
+    if spatially_resolved and not (early_exit and failed):
+        resolved = compare_spatially_resolved_magnetisation(
+            ref_data_reader, gen_data_reader, tol, components=components, chunk_size=chunk_size,
+            memory_budget=memory_budget, early_exit=early_exit, jobs=jobs)
+        failed = failed or not all(result.passed for result in resolved.values())
+
+    peaks = {}
+    if approx_peak_freqs is not None and not (early_exit and failed):
+        freqs = get_fft_frequencies(timesteps_ref, unit='GHz')
+        for component in components:
+            if peak_method == 1:
+                spectrum_ref = get_spectrum_via_method_1(ref_data_reader.get_average_magnetisation(component))
+                spectrum_gen = get_spectrum_via_method_1(gen_data_reader.get_average_magnetisation(component))
+            else:
+                # Compute the spectra out-of-core to keep the memory usage bounded.
+                spectrum_ref = SpectralAnalysis(ref_data_reader, memory_budget=memory_budget).get_spectrum(
+                    component, method=2)
+                spectrum_gen = SpectralAnalysis(gen_data_reader, memory_budget=memory_budget).get_spectrum(
+                    component, method=2)
+            peaks[component] = compare_spectral_peaks(freqs, spectrum_ref, spectrum_gen, approx_peak_freqs)
+
+    return ComparisonReport(timesteps_max_diff, average, resolved, peaks, peak_tol=peak_tol)
+
+
+def compare_data_dirs(ref_data_dir, gen_data_dir, tol, data_format='OOMMF', **kwargs):
+    """
+    Compare the data in `gen_data_dir` with the reference data in
+    `ref_data_dir` (both in the given data format) and return a
+    `ComparisonReport`. The spatially resolved data is memory-mapped, so
+    that only the chunks being compared are read into memory. See
+    `compare_data` for the other arguments.
+    """
+    with DataReader(ref_data_dir, data_format=data_format, mmap_mode='r') as ref_data_reader, \
+            DataReader(gen_data_dir, data_format=data_format, mmap_mode='r') as gen_data_reader:
+        return compare_data(ref_data_reader, gen_data_reader, tol, **kwargs)
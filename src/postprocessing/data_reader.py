@@ -1,7 +1,37 @@
 import numpy as np
 import os
+from collections import OrderedDict
+
+from . import nmag_h5, util
+from .hdf5_store import HDF5_FILENAME, import_h5py
+from .table_cache import load_table
+
+
+def reshape_to_grid(m, num_timesteps, grid_shape=None):
+    """
+    Return the spatially resolved magnetisation `m` as an array of shape
+    (N, n1, n2), where N = `num_timesteps` and n1 x n2 is the size of the
+    sampling grid. Arrays which already have this shape are returned
+    unchanged. Arrays stored with a flattened spatial dimension (of shape
+    (N, n1 * n2) or (N * n1 * n2,)) are reshaped (without copying) to the
+    given `grid_shape`, or to a square grid if `grid_shape` is None.
+    """
+    if m.ndim == 3:
+        if grid_shape is not None and m.shape[1:] != tuple(grid_shape):
+            raise ValueError(
+                "Spatially resolved data has grid shape {}, expected {}".format(m.shape[1:], tuple(grid_shape)))
+        return m
+
+    num_cells = m.size // num_timesteps
+    if grid_shape is None:
+        n = int(round(np.sqrt(num_cells)))
+        if n * n != num_cells:
+            raise ValueError(
+                "Cannot infer grid shape for spatially resolved data with {} cells per "
+                "timestep; please specify `grid_shape`.".format(num_cells))
+        grid_shape = (n, n)
+    return m.reshape((num_timesteps,) + tuple(grid_shape))
 
-from . import util
 
 #
 # If you'd like to support more data formats in addition to the
@@ -26,14 +56,133 @@ class BaseDataReader(object):
     OOMMF, Nmag) which store their simulation output in different
     formats.
 
+    If `mmap_mode` is given (e.g. `mmap_mode='r'`) then the arrays
+    containing the spatially resolved magnetisation are memory-mapped
+    instead of being read into memory, and the resulting arrays are
+    kept in a bounded per-component cache so that repeated access does
+    not cause any extra I/O. At most `cache_size` components are kept
+    in the cache (default: 3 in memory-mapped mode, 0 otherwise); the
+    least recently used one is evicted first. Use `evict()` or `close()`
+    (or use the data reader as a context manager) to release cached
+    arrays and memory mappings explicitly.
+
+    The size of the sampling grid is taken from the stored data (see
+    `get_grid_shape()`). For data stored with a flattened spatial
+    dimension the grid is assumed to be square unless `grid_shape`
+    is given.
+
+    If `dtype` is given (e.g. `dtype=np.float32`), the spatially resolved
+    magnetisation is converted to this type when it is read. Converting
+    float64 data to float32 halves the memory needed for the data and its
+    Fourier transforms, at the cost of a relative rounding error of at
+    most 2**-24 (about 6e-8) per value (see the README for the resulting
+    error bounds of the spectra and mode maps). Note that a conversion
+    requires a copy, so it is most useful for data which has been stored
+    as float32 in the first place (in which case no conversion happens).
+    The averaged magnetisation and the timesteps are always float64.
+
+    The spatially resolved magnetisation can be restricted to a region of
+    interest, decimated or sampled at a different height by passing a
+    `Sampling` (see the module `sampling`) as the argument `sampling`.
+    Wherever possible the result is a view of the (cached) data.
+
     """
 
     EXPECTED_DATA_FILES = None  # needs to be overwritten by derived classes
 
-    def __init__(self, data_dir):
+    # Height (in nm) at which the stored spatially resolved magnetisation
+    # has been sampled, or None if it is not known.
+    SAMPLING_HEIGHT = None
+
+    def __init__(self, data_dir, mmap_mode=None, cache_size=None, dtype=None, grid_shape=None):
         self.data_dir = data_dir
+        self.mmap_mode = mmap_mode
+        self.cache_size = cache_size
+        self.dtype = dtype
+        self.grid_shape = grid_shape
         self._check_expected_data_files_exist()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release all cached arrays (and the associated memory mappings,
+        if any). The data reader can still be used afterwards, in which
+        case the data is re-read on demand.
+
+        Note that a memory mapping is only released once all references
+        to the arrays returned by this data reader have been dropped.
+        """
+        self.evict()
+
+    def evict(self, component=None):
+        """
+        Remove the spatially resolved magnetisation data for the given
+        component from the cache. If `component` is None (the default),
+        the cache is cleared completely.
+        """
+        cache = self._get_cache()
+        if component is None:
+            cache.clear()
+        else:
+            cache.pop(component, None)
+
+    def get_cached_components(self):
+        """
+        Return a list of the magnetisation components whose spatially
+        resolved data is currently held in the cache (least recently
+        used first).
+        """
+        return list(self._get_cache().keys())
+
+    def _get_cache(self):
+        # Created lazily so that derived classes which don't call the
+        # base class constructor (e.g. readers for generated data)
+        # still work.
+        try:
+            return self._cache
+        except AttributeError:
+            self._cache = OrderedDict()
+            return self._cache
+
+    def _get_max_cache_size(self):
+        cache_size = getattr(self, 'cache_size', None)
+        if cache_size is None:
+            cache_size = 3 if getattr(self, 'mmap_mode', None) else 0
+        return cache_size
+
+    def _load_array(self, filename):
+        """
+        Load the numpy array stored in `filename`, memory-mapping it if
+        this data reader was created with `mmap_mode` set.
+        """
+        return np.load(filename, mmap_mode=getattr(self, 'mmap_mode', None))
+
+    def _load_spatially_resolved_array(self, filename, mmap_mode=None):
+        """
+        Load the spatially resolved magnetisation stored in the `.npy` file
+        `filename` as an array of shape (N, n1, n2) (see `reshape_to_grid`).
+        If `mmap_mode` is None, the `mmap_mode` of the data reader is used.
+        """
+        if mmap_mode is None:
+            m = self._load_array(filename)
+        else:
+            m = np.load(filename, mmap_mode=mmap_mode)
+        return reshape_to_grid(m, self.get_num_timesteps(), getattr(self, 'grid_shape', None))
+
+    def _convert_dtype(self, m):
+        """
+        Convert the array `m` to the `dtype` of this data reader (if any).
+        """
+        dtype = getattr(self, 'dtype', None)
+        if dtype is None:
+            return m
+        return m.astype(dtype, copy=False)
+
     def _check_expected_data_files_exist(self):
         """
         Check that all files in `self.EXPECTED_DATA_FILES` exist.
@@ -81,16 +230,103 @@ class BaseDataReader(object):
         """
         return self._get_average_magnetisation(component)
 
-    def get_spatially_resolved_magnetisation(self, component):
+    def get_grid_shape(self, sampling=None):
+        """
+        Return the shape `(n1, n2)` of the grid on which the spatially
+        resolved magnetisation is sampled (24 x 24 for the data in this
+        repository). If `sampling` is given, return the shape of the grid
+        of the mode maps for this sampling (see `Sampling.get_grid_shape`).
+        """
+        grid_shape = tuple(self._get_grid_shape())
+        if sampling is not None:
+            return sampling.get_grid_shape(grid_shape)
+        return grid_shape
+
+    def get_sampling_height(self):
+        """
+        Return the height (in nm) at which the stored spatially resolved
+        magnetisation has been sampled, or None if it is not known.
+        """
+        return self.SAMPLING_HEIGHT
+
+    def _get_grid_shape(self):
+        # Generic implementation; derived classes may override this to
+        # determine the grid shape without reading any data.
+        window = self.get_spatially_resolved_magnetisation_window('x', time_slice=slice(0, 1))
+        return window.shape[1:]
+
+    def get_spatially_resolved_magnetisation(self, component, sampling=None):
         """
         Return a 3D numpy array containing the values of the spatially
         resolved magnetization for the given magnetisation component
         at all timesteps. The magnetisation is sampled on a regular
-        grid of size 24 x 24 in the center of the nano-film so that
-        the shape of the returned array is (N, 24, 24), where N is the
-        number of timesteps present in the simulation.
+        grid in the center of the nano-film so that the shape of the
+        returned array is (N, n1, n2), where N is the number of timesteps
+        present in the simulation and n1 x n2 is the size of the sampling
+        grid (see `get_grid_shape()`; this is 24 x 24 for the data in this
+        repository).
+
+        If the data reader caches spatially resolved data (see the
+        class docstring) then repeated calls for the same component
+        return the same array without re-reading it.
+
+        If `sampling` is given, only the part of the grid selected by it is
+        returned (see `get_sampled_magnetisation`).
+        """
+        if sampling is not None:
+            return self.get_sampled_magnetisation(component, sampling)
+
+        max_cache_size = self._get_max_cache_size()
+        if max_cache_size <= 0:
+            return self._convert_dtype(self._get_spatially_resolved_magnetisation(component))
+
+        cache = self._get_cache()
+        try:
+            m = cache.pop(component)
+        except KeyError:
+            m = self._convert_dtype(self._get_spatially_resolved_magnetisation(component))
+            while len(cache) >= max_cache_size:
+                cache.popitem(last=False)
+        cache[component] = m  # (re-)insert as most recently used item
+        return m
+
+    def get_spatially_resolved_magnetisation_window(self, component, time_slice=slice(None),
+                                                    spatial_slices=(slice(None), slice(None))):
         """
-        return self._get_spatially_resolved_magnetisation(component)
+        Return the spatially resolved magnetisation for the given component
+        restricted to the timesteps selected by `time_slice` and the region
+        selected by `spatial_slices` (a pair of slices along the two spatial
+        dimensions).
+
+        Data formats which support partial reads (e.g. 'HDF5') only read
+        the requested part of the data. For memory-mapped data the result
+        is a view into the mapped file.
+        """
+        index = (time_slice,) + tuple(spatial_slices)
+        return self.get_spatially_resolved_magnetisation(component)[index]
+
+    def get_sampled_magnetisation(self, component, sampling):
+        """
+        Return the spatially resolved magnetisation for the given component,
+        sampled as specified by `sampling` (see the module `sampling`).
+
+        Rectangular regions are read via `get_spatially_resolved_magnetisation_window`,
+        so the result is a view of the cached or memory-mapped data, and
+        data formats which support partial reads only read the selected
+        cells. If the sampling requests a height other than the one at which
+        the data is stored (see `get_sampling_height`), the magnetisation is
+        resampled at that height; this raises ValueError for data formats
+        which only store a single plane.
+        """
+        height = sampling.height
+        stored_height = self.get_sampling_height()
+        if height is not None and (stored_height is None or not np.isclose(height, stored_height)):
+            m_full = self._convert_dtype(self._get_spatially_resolved_magnetisation_at_height(component, height))
+            return sampling.apply(m_full)
+
+        sampling.check_grid_shape(self.get_grid_shape())
+        m = self.get_spatially_resolved_magnetisation_window(component, spatial_slices=sampling.slices)
+        return sampling.crop(m)
 
     def _get_timesteps(self):
         raise NotImplementedError(
@@ -107,15 +343,33 @@ class BaseDataReader(object):
             "Data reader of type '{}' does not implement reading of "
             "spatially resolved magnetisation data.".format(self.__class__.__name__))
 
+    def _get_spatially_resolved_magnetisation_at_height(self, component, height):
+        raise ValueError(
+            "Data reader of type '{}' cannot sample the magnetisation at a height of {} nm "
+            "(the data is stored at a height of {} nm).".format(
+                self.__class__.__name__, height, self.get_sampling_height()))
+
 
 class OOMMFDataReader(BaseDataReader):
+    """
+    Data reader for simulation data generated by OOMMF.
+
+    The parsed contents of 'dynamic_txyz.txt' are cached in a binary
+    sidecar file, so that subsequent instantiations only need to memory-map
+    it. Set `table_cache=False` to disable this, or use `table_cache_dir`
+    to place the cache files in a separate directory (see `table_cache`).
+    """
     EXPECTED_DATA_FILES = ['dynamic_txyz.txt', 'mxs.npy', 'mys.npy', 'mzs.npy']
+    SAMPLING_HEIGHT = 5.0
 
-    def __init__(self, data_dir):
-        super(OOMMFDataReader, self).__init__(data_dir)
+    def __init__(self, data_dir, mmap_mode=None, cache_size=None, dtype=None, grid_shape=None,
+                 table_cache=True, table_cache_dir=None):
+        super(OOMMFDataReader, self).__init__(data_dir, mmap_mode=mmap_mode, cache_size=cache_size,
+                                  dtype=dtype, grid_shape=grid_shape)
 
+        # The parsed table is cached in a binary sidecar file (see `table_cache`).
         data_avg_filename = os.path.join(self.data_dir, 'dynamic_txyz.txt')
-        self.data_avg = np.loadtxt(data_avg_filename)
+        self.data_avg = load_table(data_avg_filename, cache_dir=table_cache_dir, use_cache=table_cache)
 
     def _get_timesteps(self):
         # Timestamps are contained in the first column of the averaged data
@@ -125,20 +379,32 @@ class OOMMFDataReader(BaseDataReader):
         idx = util.get_index_of_m_avg_component(component)
         return self.data_avg[:, idx]
 
+    def _get_grid_shape(self):
+        # Only the header of the .npy file needs to be read for this.
+        filename = os.path.join(self.data_dir, 'mxs.npy')
+        return self._load_spatially_resolved_array(filename, mmap_mode='r').shape[1:]
+
     def _get_spatially_resolved_magnetisation(self, component):
         filename = os.path.join(self.data_dir, 'm{}s.npy'.format(component))
-        m = np.load(filename)
-        return m.reshape(-1, 24, 24)
+        return self._load_spatially_resolved_array(filename)
 
 
 class NmagDataReader(BaseDataReader):
+    """
+    Data reader for simulation data generated by Nmag. See `OOMMFDataReader`
+    for the meaning of the arguments `table_cache` and `table_cache_dir`.
+    """
     EXPECTED_DATA_FILES = ['dynamic_txyz.txt', 'mxs.npy', 'mys.npy', 'mzs.npy']
+    SAMPLING_HEIGHT = 5.0
 
-    def __init__(self, data_dir):
-        super(NmagDataReader, self).__init__(data_dir)
+    def __init__(self, data_dir, mmap_mode=None, cache_size=None, dtype=None, grid_shape=None,
+                 table_cache=True, table_cache_dir=None):
+        super(NmagDataReader, self).__init__(data_dir, mmap_mode=mmap_mode, cache_size=cache_size,
+                                  dtype=dtype, grid_shape=grid_shape)
 
+        # The parsed table is cached in a binary sidecar file (see `table_cache`).
         data_avg_filename = os.path.join(self.data_dir, 'dynamic_txyz.txt')
-        self.data_avg = np.loadtxt(data_avg_filename)
+        self.data_avg = load_table(data_avg_filename, cache_dir=table_cache_dir, use_cache=table_cache)
 
     def _get_timesteps(self):
         # Timestamps are contained in the first column of the averaged data
@@ -148,20 +414,233 @@ class NmagDataReader(BaseDataReader):
         idx = util.get_index_of_m_avg_component(component)
         return self.data_avg[:, idx]
 
+    def _get_grid_shape(self):
+        # Only the header of the .npy file needs to be read for this.
+        filename = os.path.join(self.data_dir, 'mxs.npy')
+        return self._load_spatially_resolved_array(filename, mmap_mode='r').shape[1:]
+
     def _get_spatially_resolved_magnetisation(self, component):
         filename = os.path.join(self.data_dir, 'm{}s.npy'.format(component))
-        m = np.load(filename)
-        return m.reshape(-1, 24, 24)
+        return self._load_spatially_resolved_array(filename)
+
+
+class HDF5DataReader(BaseDataReader):
+    """
+    Data reader for simulation data stored in a single HDF5 file
+    'dynamic.h5' (see the module `hdf5_store` for the file layout
+    and for converting existing OOMMF/Nmag data to this format).
+
+    The spatially resolved data is read directly from the (chunked)
+    file, so that time windows and spatial regions requested via
+    `get_spatially_resolved_magnetisation_window()` are read without
+    reading the entire dataset. The argument `mmap_mode` is ignored, and
+    so is `grid_shape` (the grid shape is stored in the file).
+    """
+    EXPECTED_DATA_FILES = [HDF5_FILENAME]
+
+    def __init__(self, data_dir, mmap_mode=None, cache_size=None, dtype=None, grid_shape=None):
+        super(HDF5DataReader, self).__init__(data_dir, mmap_mode=mmap_mode, cache_size=cache_size, dtype=dtype)
+
+        self.filename = os.path.join(self.data_dir, HDF5_FILENAME)
+        self._h5file = None
+
+        h5file = self._get_h5file()
+        self.timesteps = h5file['timesteps'][:]
+        self.m_avg = h5file['m_avg'][:]
+
+    def _get_h5file(self):
+        if self._h5file is None:
+            self._h5file = import_h5py().File(self.filename, 'r')
+        return self._h5file
+
+    def close(self):
+        """
+        Release all cached arrays and close the HDF5 file (it is
+        re-opened automatically if more data is read afterwards).
+        """
+        super(HDF5DataReader, self).close()
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def _get_timesteps(self):
+        return self.timesteps
+
+    def _get_average_magnetisation(self, component):
+        return self.m_avg[:, util.get_index_of_component(component)]
+
+    def _get_grid_shape(self):
+        return self._get_h5file()['m'].shape[2:]
+
+    def _get_spatially_resolved_magnetisation(self, component):
+        return self._get_h5file()['m'][:, util.get_index_of_component(component)]
+
+    def get_spatially_resolved_magnetisation_window(self, component, time_slice=slice(None),
+                                                    spatial_slices=(slice(None), slice(None))):
+        if component in self._get_cache():
+            return super(HDF5DataReader, self).get_spatially_resolved_magnetisation_window(
+                component, time_slice, spatial_slices)
+
+        index = (time_slice, util.get_index_of_component(component)) + tuple(spatial_slices)
+        return self._convert_dtype(self._get_h5file()['m'][index])
+
+
+class NmagHDF5DataReader(BaseDataReader):
+    """
+    Data reader which reads the raw output of an Nmag simulation directly,
+    i.e. the `_dat.h5` file `dat_filename` (default: '02_dynamic_stage_dat.h5')
+    and the mesh, without the need to run `nmagprobe` (see `nmag_h5`).
+
+    The mesh is read from `mesh_filename` (default: 'meshes/mesh_555.nmesh.h5'
+    or 'mesh_555.nmesh.h5' in the data directory if one of them exists, and
+    otherwise the mesh stored in the `_dat.h5` file). The magnetisation is
+    sampled on a regular grid of `grid_shape` points in the plane at height
+    `probe_height` (in the length unit of the mesh) which covers the mesh.
+    By default the grid points are the cell centres of the grid (as in
+    OOMMF); set `cell_centres=False` to sample at the same points as the
+    `nmagprobe` command in `nmag/generate_data.sh`.
+
+    The interpolation weights are cached in a file in the data directory,
+    or in `interpolation_cache_dir` if given (set `interpolation_cache=False`
+    to disable the cache). The
+    spatially averaged magnetisation is computed from the nodal values,
+    weighted by the volume associated with each node. The argument
+    `mmap_mode` is ignored.
+
+    Since the full 3D magnetisation is available, the film can also be
+    sampled at other heights (see `Sampling`), for which the interpolation
+    weights are computed (and cached) in the same way.
+    """
+
+    def __init__(self, data_dir, mmap_mode=None, cache_size=None, dtype=None, grid_shape=nmag_h5.DEFAULT_GRID_SHAPE,
+                 dat_filename=nmag_h5.NMAG_DAT_FILENAME, mesh_filename=None,
+                 probe_height=nmag_h5.DEFAULT_PROBE_HEIGHT, cell_centres=True, interpolation_cache=True,
+                 interpolation_cache_dir=None):
+        self.EXPECTED_DATA_FILES = [dat_filename]
+        super(NmagHDF5DataReader, self).__init__(data_dir, mmap_mode=mmap_mode, cache_size=cache_size,
+                                                 dtype=dtype, grid_shape=tuple(grid_shape))
+        self.dat_filename = os.path.join(self.data_dir, dat_filename)
+        self.mesh_filename = self._find_mesh_filename() if mesh_filename is None else mesh_filename
+        self.probe_height = probe_height
+        self.cell_centres = cell_centres
+        self.interpolation_cache_dir = None
+        if interpolation_cache:
+            self.interpolation_cache_dir = self.data_dir if interpolation_cache_dir is None else interpolation_cache_dir
+
+        self.points, self.simplices = nmag_h5.read_nmag_mesh(self.mesh_filename)
+        self.timesteps = nmag_h5.read_nmag_timesteps(self.dat_filename)
+        self._m_avg = None
+        self._m_full = None
+        self._m_full_at_height = {}
+
+    def _find_mesh_filename(self):
+        for filename in [os.path.join('meshes', nmag_h5.NMAG_MESH_FILENAME), nmag_h5.NMAG_MESH_FILENAME]:
+            filename = os.path.join(self.data_dir, filename)
+            if os.path.exists(filename):
+                return filename
+        return self.dat_filename
+
+    def get_sampling_height(self):
+        return self.probe_height
+
+    def get_probe_points(self, height=None):
+        """
+        Return the probe points (an array of shape (n1 * n2, 3)) at which
+        the spatially resolved magnetisation is sampled, in the plane at
+        the given `height` (default: `probe_height`).
+        """
+        if height is None:
+            height = self.probe_height
+        lower = self.points.min(axis=0)
+        upper = self.points.max(axis=0)
+        return nmag_h5.get_probe_points((lower[0], upper[0]), (lower[1], upper[1]), height,
+                                        grid_shape=self.grid_shape, cell_centres=self.cell_centres)
+
+    def get_interpolation_matrix(self, height=None):
+        """
+        Return the sparse matrix which maps the nodal values of the field to
+        its values at the probe points (see `nmag_h5.get_interpolation_matrix`).
+        """
+        return nmag_h5.get_interpolation_matrix(self.points, self.simplices, self.get_probe_points(height),
+                                                cache_dir=self.interpolation_cache_dir)
+
+    def close(self):
+        """
+        Release all cached arrays, including the resampled magnetisation.
+        """
+        super(NmagHDF5DataReader, self).close()
+        self._m_avg = None
+        self._m_full = None
+        self._m_full_at_height.clear()
+
+    def _read_nodal_values(self):
+        nodal_values = nmag_h5.read_nmag_field(self.dat_filename)
+        if nodal_values.shape[1] != len(self.points):
+            raise ValueError(
+                "The field in '{}' has {} sites, but the mesh '{}' has {} points.".format(
+                    self.dat_filename, nodal_values.shape[1], self.mesh_filename, len(self.points)))
+        return nodal_values
+
+    def _resample(self, nodal_values, height=None):
+        # All components at all timesteps are resampled at once.
+        m_full = nmag_h5.resample_field(nodal_values, self.get_interpolation_matrix(height))
+        return m_full.reshape((3, len(self.timesteps)) + self.grid_shape)
+
+    def _read_field(self):
+        """
+        Read the nodal values of the magnetisation and compute both the
+        spatially averaged and the resampled magnetisation from them (the
+        nodal values themselves are not kept, since they are much larger).
+        """
+        nodal_values = self._read_nodal_values()
+        node_volumes = nmag_h5.get_node_volumes(self.points, self.simplices)
+        self._m_avg = np.tensordot(nodal_values, node_volumes / node_volumes.sum(), axes=(1, 0))
+        self._m_full = self._resample(nodal_values)
+
+    def _get_timesteps(self):
+        return self.timesteps
+
+    def _get_average_magnetisation(self, component):
+        if self._m_avg is None:
+            self._read_field()
+        return self._m_avg[:, util.get_index_of_component(component)]
+
+    def _get_grid_shape(self):
+        return self.grid_shape
+
+    def _get_spatially_resolved_magnetisation(self, component):
+        if self._m_full is None:
+            self._read_field()
+        return self._m_full[util.get_index_of_component(component)]
+
+    def _get_spatially_resolved_magnetisation_at_height(self, component, height):
+        # The magnetisation is resampled at each height only once (for
+        # all components).
+        try:
+            m_full = self._m_full_at_height[height]
+        except KeyError:
+            m_full = self._resample(self._read_nodal_values(), height)
+            self._m_full_at_height[height] = m_full
+        return m_full[util.get_index_of_component(component)]
 
 
 data_reader_classes = {
     'OOMMF': OOMMFDataReader,
     'Nmag': NmagDataReader,
+    'HDF5': HDF5DataReader,
+    'NmagHDF5': NmagHDF5DataReader,
     }
 
 
-def DataReader(data_path, data_format):
+def DataReader(data_path, data_format, **kwargs):
     """
+    Return a data reader for the simulation data in `data_path`, which
+    must have been generated by the micromagnetic software specified
+    by `data_format` (one of the keys in `data_reader_classes`).
+
+    Any additional keyword arguments (e.g. `mmap_mode='r'` or
+    `dtype=np.float32`) are passed on to the constructor of the data
+    reader class.
     """
     try:
         cls = data_reader_classes[data_format]
@@ -171,4 +650,4 @@ def DataReader(data_path, data_format):
             ("Unsupported data format: '{}'. Supported values: {} "
              "".format(data_format, supported_data_formats)))
 
-    return cls(data_path)
+    return cls(data_path, **kwargs)
@@ -1,7 +1,9 @@
 import numpy as np
-import scipy.signal
+import scipy.fft
 
 from . import util
+from .peak_finding import PeakFinder
+from .sampling import apply_sampling
 
 
 def get_fft_frequencies(timesteps, unit='Hz'):
@@ -22,7 +24,139 @@ def get_fft_frequencies(timesteps, unit='Hz'):
     return freqs[:-1] * util.get_conversion_factor('Hz', unit)
 
 
-def get_spectrum_via_method_1(m_avg):
+class SpectralEstimator(object):
+    """
+    Configurable estimator for power spectral densities.
+
+    By default this computes the raw periodogram of the whole time
+    series, exactly as `get_spectrum_via_method_1/2` do. It supports:
+
+    - window functions (`window`, any window name or tuple accepted by
+      `scipy.signal.get_window`, e.g. 'hann' or ('tukey', 0.25));
+
+    - Welch's method, i.e. averaging the periodograms of overlapping
+      segments of length `nperseg` which overlap by `noverlap` samples
+      (default: `nperseg // 2`);
+
+    - zero-padding each (segment of the) time series to length `nfft`
+      to obtain a finer frequency grid (use `get_nfft_for_resolution`
+      to compute `nfft` for a target frequency resolution).
+
+    The power spectra are normalised by the mean square of the window,
+    so that the results for different windows are comparable (for the
+    default rectangular window this factor is 1).
+
+    For compatibility with the existing reference data the last
+    frequency bin is dropped by default (`drop_last_bin=True`).
+
+    All computations are vectorised over the spatial dimensions. For
+    method 2, the grid points are processed in blocks of `chunk_size`
+    cells so that the full array of Fourier coefficients is never held
+    in memory at once.
+
+    """
+
+    def __init__(self, window='boxcar', nperseg=None, noverlap=None, nfft=None,
+                 drop_last_bin=True, chunk_size=4096):
+        self.window = window
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.nfft = nfft
+        self.drop_last_bin = drop_last_bin
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def get_nfft_for_resolution(dt, resolution):
+        """
+        Return the FFT length needed to achieve the given frequency
+        resolution (in Hz) for data sampled at timestep `dt` (in s).
+        """
+        return int(np.ceil(1.0 / (dt * resolution)))
+
+    def _get_segment_params(self, num_timesteps):
+        nperseg = num_timesteps if self.nperseg is None else min(self.nperseg, num_timesteps)
+        if self.noverlap is not None:
+            noverlap = self.noverlap
+        elif nperseg < num_timesteps:
+            noverlap = nperseg // 2
+        else:
+            noverlap = 0
+        if noverlap >= nperseg:
+            raise ValueError("noverlap ({}) must be less than nperseg ({})".format(noverlap, nperseg))
+        nfft = nperseg if self.nfft is None else max(self.nfft, nperseg)
+        return nperseg, noverlap, nfft
+
+    def get_frequencies(self, timesteps, unit='Hz'):
+        """
+        Return the frequencies corresponding to the spectra computed by this
+        estimator for data sampled at the given `timesteps` (in seconds).
+        """
+        _, _, nfft = self._get_segment_params(len(timesteps))
+        dt = timesteps[1] - timesteps[0]
+        freqs = np.fft.rfftfreq(nfft, dt)
+        if self.drop_last_bin:
+            freqs = freqs[:-1]
+        return freqs * util.get_conversion_factor('Hz', unit)
+
+    def get_power_spectra(self, m_vals):
+        """
+        Return the power spectra of all time series in `m_vals` (with time
+        along the first dimension). The result has the same shape as `m_vals`
+        except along the first dimension, which is the frequency axis.
+        """
+        num_timesteps = m_vals.shape[0]
+        nperseg, noverlap, nfft = self._get_segment_params(num_timesteps)
+
+        import scipy.signal  # imported on first use (it is slow to import)
+        window = scipy.signal.get_window(self.window, nperseg)
+        window_is_flat = np.all(window == 1.0)
+        scale = np.mean(window**2)
+        # Apply the window in the precision of the data (e.g. float32).
+        window = window.astype(get_real_dtype(m_vals), copy=False).reshape((-1,) + (1,) * (m_vals.ndim - 1))
+
+        step = nperseg - noverlap
+        starts = range(0, num_timesteps - nperseg + 1, step)
+
+        spectra = 0
+        for start in starts:
+            segment = m_vals[start:start + nperseg]
+            if not window_is_flat:
+                segment = segment * window
+            spectra = spectra + np.abs(scipy.fft.rfft(segment, n=nfft, axis=0))**2
+        spectra = spectra / (scale * len(starts))
+
+        if self.drop_last_bin:
+            spectra = spectra[:-1]
+        return spectra
+
+    def get_spectrum_via_method_1(self, m_avg):
+        """
+        Compute the power spectrum of the spatially averaged magnetisation
+        (see `get_spectrum_via_method_1`) using this estimator.
+        """
+        return self.get_power_spectra(m_avg)
+
+    def get_spectrum_via_method_2(self, m_vals):
+        """
+        Compute the power spectrum of the spatially resolved magnetisation
+        (see `get_spectrum_via_method_2`) using this estimator, processing
+        blocks of `chunk_size` grid points at a time.
+        """
+        assert m_vals.ndim >= 2
+
+        N = m_vals.shape[0]
+        m_flat = m_vals.reshape(N, -1)
+        num_cells = m_flat.shape[1]
+
+        spectrum_sum = 0
+        for start in range(0, num_cells, self.chunk_size):
+            spectra = self.get_power_spectra(m_flat[:, start:start + self.chunk_size])
+            spectrum_sum = spectrum_sum + spectra.sum(axis=1)
+
+        return spectrum_sum / num_cells
+
+
+def get_spectrum_via_method_1(m_avg, estimator=None):
     """Compute power spectrum from spatially averaged magnetisation dynamics.
 
     The returned array contains the power spectral densities `S_y(f)` as
@@ -35,6 +169,12 @@ def get_spectrum_via_method_1(m_avg):
         Time series representing dynamics of a single component of
         the spatially averaged magnetisation (for example `m_y`).
 
+    estimator :  SpectralEstimator (optional)
+
+        If given, the spectrum is computed using this estimator (e.g. with
+        a window function or Welch's method). By default the raw periodogram
+        of the whole time series is returned.
+
     Returns
     -------
     numpy.array
@@ -42,6 +182,9 @@ def get_spectrum_via_method_1(m_avg):
         Power spectral densities of the Fourier-transformed magnetisation data.
 
     """
+    if estimator is not None:
+        return estimator.get_spectrum_via_method_1(m_avg)
+
     fft_m_avg = np.fft.rfft(m_avg, axis=0)
     spectrum_m_avg = np.abs(fft_m_avg)**2
 
@@ -50,7 +193,7 @@ def get_spectrum_via_method_1(m_avg):
     return spectrum_m_avg[:-1]
 
 
-def get_spectrum_via_method_2(m_vals):
+def get_spectrum_via_method_2(m_vals, estimator=None, memory_budget=None, sampling=None):
     """
     Compute power spectrum from spatially resolved magnetisation dynamics.
 
@@ -63,15 +206,33 @@ def get_spectrum_via_method_2(m_vals):
 
         Time series representing dynamics of a single component of
         the spatially resolved magnetisation, sampled on a regular
-        grid. It is assumed that time is along the first dimension.
-        That is, `data[k, i, j]` contains the magnetisation at
-        timestep `t_k` for the grid point `r_{i,j}`.
+        grid (of any size). It is assumed that time is along the first
+        dimension. That is, `data[k, i, j]` contains the magnetisation
+        at timestep `t_k` for the grid point `r_{i,j}`. If the data is
+        stored as float32, the spectrum is computed in single precision.
 
     dt :  float
 
         Size of the timestep at which the magnetisation was sampled
         during the simulation (e.g. `dt=5e-12` for every 5 ps).
 
+    estimator :  SpectralEstimator (optional)
+
+        If given, the spectrum is computed using this estimator (see
+        `get_spectrum_via_method_1`).
+
+    memory_budget :  int (optional)
+
+        If given, the spectrum is computed out-of-core, processing blocks
+        of grid cells such that at most (approximately) this many bytes
+        are used (see `get_spectrum_and_fft_coefficients_blockwise`).
+
+    sampling :  Sampling (optional)
+
+        If given, the spectrum is computed only from the part of the grid
+        selected by this sampling (see the module `sampling`), so that the
+        cost of the FFT scales with the number of cells analysed.
+
     Returns
     -------
     Pair of `numpy.array`s
@@ -80,20 +241,21 @@ def get_spectrum_via_method_2(m_vals):
         data. Note that the frequencies are returned in GHz (not Hz).
 
     """
-    assert m_vals.ndim == 3
+    assert m_vals.ndim >= 2
+    m_vals = apply_sampling(m_vals, sampling)
 
-    N, nx, ny = m_vals.shape
-    m_vals = m_vals.reshape(N, -1)
+    if estimator is not None:
+        return estimator.get_spectrum_via_method_2(m_vals)
 
-    fft_data_full = np.fft.rfft(m_vals, axis=0)
-    spectrum_full = np.abs(fft_data_full)**2
-    spectrum_avg = np.mean(spectrum_full, axis=1)
+    if memory_budget is not None:
+        spectrum, _ = get_spectrum_and_fft_coefficients_blockwise(m_vals, memory_budget=memory_budget)
+        return spectrum
 
-    # FIXME: We ignore the last element for now so that we can compare with the existing data.
-    return spectrum_avg[:-1]
+    fft_data_full = get_fft_coefficients(m_vals)
+    return get_spectrum_from_fft_coefficients(fft_data_full)
 
 
-def find_peak_frequency(freqs, spectrum, approx_freq):
+def find_peak_frequency(freqs, spectrum, approx_freq, interpolation=None, min_prominence=0.5):
     """
     Find the peak in the spectrum that is closest to the given
     approximate frequency. Returns the exact frequency of the peak
@@ -109,43 +271,261 @@ def find_peak_frequency(freqs, spectrum, approx_freq):
 
         The spectrum in which to search for a peak.
 
-    approx_freq: float
+    approx_freq: float or array
+
+        Approximate frequency for the peak to be determined. If an
+        array of frequencies is given, an array of peak frequencies
+        is returned (the peaks are only detected once).
+
+    interpolation: None, 'parabolic' or 'lorentzian'
+
+        Method used to refine the peak position to sub-bin precision
+        (see `peak_finding.PeakFinder`). The default (None) returns
+        the frequency of the FFT bin at the peak.
+
+    min_prominence: float
+
+        Minimum prominence (in decades) of the peaks to be considered.
+
+    """
+    peak_finder = PeakFinder(freqs, spectrum, min_prominence=min_prominence, interpolation=interpolation)
+    return peak_finder.find_peak_frequency(approx_freq)
+
+
+def get_real_dtype(m_vals):
+    """
+    Return the floating point type in which computations on `m_vals`
+    are carried out: float32 for single precision data, and float64
+    otherwise.
+    """
+    return np.result_type(m_vals.dtype, np.float32)
+
+
+def get_fft_coefficients(m_vals):
+    """
+    Return the complex Fourier coefficients of the spatially resolved
+    magnetisation `m_vals` (with time along the first dimension). The
+    result has shape (N // 2 + 1, nx, ny) if `m_vals` has shape
+    (N, nx, ny).
+
+    The precision of the data is preserved, i.e. for float32 data the
+    result is complex64 (which needs half the memory of complex128).
+    """
+    return scipy.fft.rfft(m_vals, axis=0)
+
+
+def get_spectrum_from_fft_coefficients(fft_coeffs):
+    """
+    Compute the power spectrum via method 2 (see `get_spectrum_via_method_2`)
+    from precomputed Fourier coefficients as returned by `get_fft_coefficients`.
+    """
+    n = fft_coeffs.shape[0]
+    spectrum_full = np.abs(fft_coeffs.reshape(n, -1))**2
+    spectrum_avg = np.mean(spectrum_full, axis=1)
+
+    # FIXME: We ignore the last element for now so that we can compare with the existing data.
+    return spectrum_avg[:-1]
+
+
+# Default memory budget (in bytes) for the out-of-core computation
+# of spectra and mode coefficients (see `get_spectrum_and_fft_coefficients_blockwise`).
+DEFAULT_MEMORY_BUDGET = 256 * 1024**2
+
+
+def get_num_cells_per_block(num_timesteps, memory_budget, dtype=np.float64):
+    """
+    Return the number of grid cells whose time series can be transformed
+    at once within the given `memory_budget` (in bytes). Per cell we need
+    one (contiguous) copy of the time series plus the complex Fourier
+    coefficients, the power spectrum and workspace of the FFT, which is
+    accounted for as four times the size of the time series.
+    """
+    bytes_per_cell = 4 * num_timesteps * np.dtype(dtype).itemsize
+    return max(1, int(memory_budget // bytes_per_cell))
+
+
+def get_spectrum_and_fft_coefficients_blockwise(m_vals, indices=(), memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Compute the power spectrum via method 2 (see `get_spectrum_via_method_2`)
+    together with the Fourier coefficients at the given `indices` of the FFT
+    frequencies, without ever holding the full FFT of `m_vals` in memory.
+
+    The grid cells are processed in blocks whose size is chosen such that
+    the memory needed for each block stays within `memory_budget` (in bytes,
+    see `get_num_cells_per_block`). If `m_vals` is a memory-mapped array
+    (e.g. obtained from a data reader with `mmap_mode='r'`), only one block
+    of the data is read into memory at a time, so that data sets larger than
+    the available memory can be processed. The results agree with those of
+    the in-memory functions up to round-off.
+
+    Returns a pair `(spectrum, coeffs)`, where `coeffs` has shape (F, nx, ny)
+    if `m_vals` has shape (N, nx, ny) and F = len(indices).
+    """
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    N = m_vals.shape[0]
+    m_flat = m_vals.reshape(N, -1)
+    num_cells = m_flat.shape[1]
+    dtype = get_real_dtype(m_vals)
+
+    block_size = get_num_cells_per_block(N, memory_budget, dtype)
+    spectrum_sum = np.zeros(N // 2 + 1, dtype=dtype)
+    coeffs = np.empty((len(indices), num_cells), dtype=np.result_type(dtype, np.complex64))
+
+    for start in range(0, num_cells, block_size):
+        stop = min(start + block_size, num_cells)
+        # Copy the block so that each time series is contiguous in memory.
+        block = np.ascontiguousarray(m_flat[:, start:stop].T, dtype=dtype)
+        fft_block = scipy.fft.rfft(block, axis=1, overwrite_x=True)
+        del block
+        spectrum_sum += (fft_block.real**2 + fft_block.imag**2).sum(axis=0)
+        coeffs[:, start:stop] = fft_block[:, indices].T
+
+    spectrum_avg = spectrum_sum / num_cells
+
+    # FIXME: We ignore the last element for now so that we can compare with the existing data.
+    return spectrum_avg[:-1], coeffs.reshape((len(indices),) + m_vals.shape[1:])
 
-        Approximate frequency for the peak to be determined.
 
+def get_fft_coefficients_at_indices(m_vals, indices, chunk_size=1024):
     """
-    # Find indices of peaks in the signal
-    widths = np.linspace(0.1, 1.0, 10)
-    peak_indices = scipy.signal.find_peaks_cwt(spectrum, widths)
+    Return the Fourier coefficients of `m_vals` (with time along the
+    first dimension) at the given indices of the FFT frequencies only.
 
-    # Find and return the peak frequency that is closest to `approx_freq`.
-    idx = abs(freqs[peak_indices] - approx_freq).argmin()
-    peak_freq = freqs[peak_indices[idx]]
+    The result is the same (up to round-off) as
 
-    return peak_freq
+        get_fft_coefficients(m_vals)[indices]
 
+    but it is computed via a direct DFT, i.e. as a matrix product of
+    the data with precomputed twiddle factors. Only O(F * num_cells)
+    memory is needed (where F is the number of indices) instead of
+    O(N * num_cells) for the full FFT. The data is processed in blocks
+    of `chunk_size` timesteps so that it can be streamed from a
+    memory-mapped array.
 
-def get_mode_amplitudes_at_freq(timesteps, m_vals, peak_freq):
+    This is faster than the full FFT if the number of requested
+    frequencies is small (see `get_fft_coefficients_at_freqs`).
     """
+    indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+    N = m_vals.shape[0]
+    m_flat = m_vals.reshape(N, -1)
+    dtype = get_real_dtype(m_vals)
+
+    coeffs_real = np.zeros((len(indices), m_flat.shape[1]), dtype=dtype)
+    coeffs_imag = np.zeros((len(indices), m_flat.shape[1]), dtype=dtype)
+
+    for start in range(0, N, chunk_size):
+        stop = min(start + chunk_size, N)
+        # Reduce `k * n` modulo N before converting to an angle so that
+        # the twiddle factors are accurate even for long time series.
+        angles = (2 * np.pi / N) * (np.outer(indices, np.arange(start, stop)) % N)
+        chunk = m_flat[start:stop]
+        coeffs_real += np.cos(angles).astype(dtype, copy=False).dot(chunk)
+        coeffs_imag -= np.sin(angles).astype(dtype, copy=False).dot(chunk)
+
+    coeffs = coeffs_real + 1j * coeffs_imag
+    return coeffs.reshape((len(indices),) + m_vals.shape[1:])
+
+
+def get_max_num_bins_for_direct_dft(num_timesteps):
+    """
+    Return the maximum number of frequencies for which computing the
+    Fourier coefficients via a direct DFT is expected to be faster than
+    a full FFT of a time series with `num_timesteps` samples.
+
+    The direct DFT costs O(F * N) per grid point whereas the FFT costs
+    O(N * log(N)), so the crossover is at F ~ c * log2(N), where the
+    constant has been determined empirically.
+    """
+    return int(4 * np.log2(max(num_timesteps, 2)))
+
+
+def get_indices_of_frequencies(freqs, target_freqs):
+    """
+    Return an array containing, for each frequency in `target_freqs`,
+    the index of the closest element in `freqs`.
+    """
+    target_freqs = np.atleast_1d(target_freqs)
+    return abs(freqs[np.newaxis, :] - target_freqs[:, np.newaxis]).argmin(axis=1)
+
+
+def get_fft_coefficients_at_freqs(timesteps, m_vals, target_freqs, method='auto'):
+    """
+    Return the Fourier coefficients of `m_vals` at the FFT frequencies
+    which are closest to the frequencies in `target_freqs` (in GHz).
+    The returned array has shape (F, nx, ny) where F = len(target_freqs).
+
+    The argument `method` can be 'dft' (compute only the required
+    frequency bins via a direct DFT), 'fft' (compute a full FFT and
+    extract the required bins) or 'auto' (the default), which uses
+    'dft' if the number of target frequencies is small enough (see
+    `get_max_num_bins_for_direct_dft`) and 'fft' otherwise.
     """
     freqs = get_fft_frequencies(timesteps, unit='GHz')
-    spectrum = get_spectrum_via_method_2(m_vals)
+    indices = get_indices_of_frequencies(freqs, target_freqs)
 
-    fft_coeffs = np.fft.rfft(m_vals, axis=0)
+    if method == 'auto':
+        method = 'dft' if len(indices) <= get_max_num_bins_for_direct_dft(len(timesteps)) else 'fft'
 
-    idx_peak_freq = abs(freqs - peak_freq).argmin()
+    if method == 'dft':
+        return get_fft_coefficients_at_indices(m_vals, indices)
+    elif method == 'fft':
+        return get_fft_coefficients(m_vals)[indices]
+    else:
+        raise ValueError(
+            "Argument 'method' must be one of 'auto', 'dft', 'fft'. Got: '{}'".format(method))
 
-    return np.absolute(fft_coeffs[idx_peak_freq, :, :])
 
+def get_index_of_frequency(freqs, freq):
+    """
+    Return the index of the element in `freqs` which is closest to `freq`.
+    """
+    return abs(freqs - freq).argmin()
 
-def get_mode_phases_at_freq(timesteps, m_vals, peak_freq):
+
+def get_mode_amplitudes_at_freq(timesteps, m_vals, peak_freq, sampling=None):
+    """
+    Return a 2D array containing the amplitudes of the Fourier
+    coefficients of `m_vals` at the FFT frequency closest to
+    `peak_freq` (in GHz). If `sampling` is given, the amplitudes
+    are computed on the part of the grid selected by it only (see
+    `Sampling.to_grid` for the shape of the result).
+    """
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    m_vals = apply_sampling(m_vals, sampling)
+    fft_coeffs = get_fft_coefficients(m_vals)
+    idx_peak_freq = get_index_of_frequency(freqs, peak_freq)
+
+    amplitudes = np.absolute(fft_coeffs[idx_peak_freq:idx_peak_freq + 1])
+    return amplitudes[0] if sampling is None else sampling.to_grid(amplitudes)[0]
+
+
+def get_mode_phases_at_freq(timesteps, m_vals, peak_freq, sampling=None):
     """
+    Return a 2D array containing the phases of the Fourier
+    coefficients of `m_vals` at the FFT frequency closest to
+    `peak_freq` (in GHz). See `get_mode_amplitudes_at_freq` for
+    the meaning of `sampling`.
     """
     freqs = get_fft_frequencies(timesteps, unit='GHz')
-    spectrum = get_spectrum_via_method_2(m_vals)
+    m_vals = apply_sampling(m_vals, sampling)
+    fft_coeffs = get_fft_coefficients(m_vals)
+    idx_peak_freq = get_index_of_frequency(freqs, peak_freq)
 
-    fft_coeffs = np.fft.rfft(m_vals, axis=0)
+    phases = np.angle(fft_coeffs[idx_peak_freq:idx_peak_freq + 1])
+    return phases[0] if sampling is None else sampling.to_grid(phases)[0]
 
-    idx_peak_freq = abs(freqs - peak_freq).argmin()
 
-    return np.angle(fft_coeffs[idx_peak_freq, :, :])
+def get_mode_amplitudes_and_phases_at_freqs(timesteps, m_vals, target_freqs, method='auto', sampling=None):
+    """
+    Return a pair of arrays of shape (F, nx, ny) containing the amplitudes
+    and phases of the Fourier coefficients of `m_vals` at the frequencies
+    closest to each of the F frequencies in `target_freqs` (in GHz).
+
+    See `get_fft_coefficients_at_freqs` for the meaning of `method` and
+    `get_mode_amplitudes_at_freq` for the meaning of `sampling`.
+    """
+    fft_coeffs = get_fft_coefficients_at_freqs(timesteps, apply_sampling(m_vals, sampling), target_freqs,
+                                               method=method)
+    if sampling is not None:
+        fft_coeffs = sampling.to_grid(fft_coeffs)
+    return np.absolute(fft_coeffs), np.angle(fft_coeffs)
@@ -5,13 +5,11 @@ import matplotlib as mpl
 import numpy as np
 from matplotlib import cm
 
-from .fft_utils import \
-    get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2, \
-    find_peak_frequency, get_mode_amplitudes_at_freq, get_mode_phases_at_freq
+from .fft_utils import get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2
+from .spectral_analysis import SpectralAnalysis
 
 
 def rescale_cmap(cmap_name, low=0.0, high=1.0, plot=False):
-    import matplotlib._cm as _cm
     '''
     Example 1:
     # equivalent scaling to cplot_like(blah, l_bias=0.33, int_exponent=0.0)
@@ -20,42 +18,55 @@ def rescale_cmap(cmap_name, low=0.0, high=1.0, plot=False):
     my_hsv = rescale_cmap(cm.hsv, low = 0.3)
     '''
     if type(cmap_name) is str:
-        cmap = eval('_cm._%s_data' % cmap_name)
+        cmap = mpl.colormaps[cmap_name]
     else:
-        cmap = eval('_cm._%s_data' % cmap_name.name)
+        cmap = cmap_name
     LUTSIZE = plt.rcParams['image.lut']
-    r = np.array(cmap['red'])
-    g = np.array(cmap['green'])
-    b = np.array(cmap['blue'])
-    range = high - low
-    r[:, 1:] = r[:, 1:] * range + low
-    g[:, 1:] = g[:, 1:] * range + low
-    b[:, 1:] = b[:, 1:] * range + low
-    _my_data = {'red': tuple(map(tuple, r)),
-                'green': tuple(map(tuple, g)),
-                'blue': tuple(map(tuple, b))
-                }
-    my_cmap = mpl.colors.LinearSegmentedColormap('my_hsv', _my_data, LUTSIZE)
+    # Sample the colormap at the points of its lookup table and rescale
+    # the RGB values to the range [low, high].
+    xs = np.linspace(0, 1, LUTSIZE)
+    colors = cmap(xs)
+    colors[:, :3] = colors[:, :3] * (high - low) + low
+    my_cmap = mpl.colors.LinearSegmentedColormap.from_list('my_hsv', colors, LUTSIZE)
 
     if plot:
         print('plotting')
         plt.figure()
-        plt.plot(r[:, 0], r[:, 1], 'r', g[:, 0], g[:, 1], 'g', b[:, 0],
-                 b[:, 1], 'b', lw=3)
+        plt.plot(xs, colors[:, 0], 'r', xs, colors[:, 1], 'g', xs, colors[:, 2],
+                 'b', lw=3)
         plt.axis(ymin=-0.2, ymax=1.2)
         plt.show()
 
     return my_cmap
 
-my_hsv = rescale_cmap(cm.hsv, low=0.3, high=0.8, plot=False)
-
 
 CMAP_AMPLITUDE = cm.coolwarm
-CMAP_PHASE = my_hsv
+
+_phase_cmap = None
+
+
+def get_phase_cmap():
+    """
+    Return the colormap used for the phases of the mode maps (a rescaled
+    HSV colormap). It is constructed on first use.
+    """
+    global _phase_cmap
+    if _phase_cmap is None:
+        _phase_cmap = rescale_cmap(cm.hsv, low=0.3, high=0.8, plot=False)
+    return _phase_cmap
+
+
+def __getattr__(name):
+    # The phase colormap used to be constructed at import time and
+    # exported as `my_hsv` and `CMAP_PHASE`.
+    if name in ('my_hsv', 'CMAP_PHASE'):
+        return get_phase_cmap()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
 
 def make_figure_2(data_reader, component='y',
                   xlim_upper=[0, 2.5], ylim_upper=None,
-                  xlim_lower=[0.1, 20], ylim_lower=[1e-5, 1.]):
+                  xlim_lower=[0.1, 20], ylim_lower=[1e-5, 1.], estimator=None):
     """
     Reproduce Figure 2 in the paper.
 
@@ -71,6 +82,10 @@ def make_figure_2(data_reader, component='y',
     is useful when comparing figures generated from different data (for
     example OOMMF, Nmag).
 
+    The power spectrum is computed using the given `estimator` (an
+    instance of `SpectralEstimator`, e.g. to apply a window function
+    or Welch's method). By default the raw periodogram is used.
+
     """
 
     # Read timesteps and spatially averaged magnetisation
@@ -79,8 +94,11 @@ def make_figure_2(data_reader, component='y',
 
     # Compute power spectrum from averaged magnetisation
     ts_seconds = data_reader.get_timesteps(unit='s')
-    freqs = get_fft_frequencies(ts_seconds, unit='GHz')
-    spectrum = get_spectrum_via_method_1(mys)
+    if estimator is None:
+        freqs = get_fft_frequencies(ts_seconds, unit='GHz')
+    else:
+        freqs = estimator.get_frequencies(ts_seconds, unit='GHz')
+    spectrum = get_spectrum_via_method_1(mys, estimator=estimator)
 
     # Create two subplots into which we can draw magnetisation dynamics
     # and power spectrum, respectively.
@@ -105,7 +123,7 @@ def make_figure_2(data_reader, component='y',
     return fig
 
 
-def make_figure_3(data_reader, component='y'):
+def make_figure_3(data_reader, component='y', spectral_analysis=None, estimator=None):
     """
     Create Fig. 3 in the paper.
 
@@ -113,18 +131,30 @@ def make_figure_3(data_reader, component='y'):
     spectral densities of the magnetisation dynamics computed
     via method 1 and 2 (as described in section C1 and C2).
 
-    """
-    timesteps = data_reader.get_timesteps()
-    dt = data_reader.get_dt()
+    If a `SpectralAnalysis` instance for `data_reader` is passed as
+    the argument `spectral_analysis`, its cached spectra are re-used.
+
+    If `estimator` (an instance of `SpectralEstimator`) is given, both
+    spectra are computed using this estimator instead of the raw
+    periodogram (in this case `spectral_analysis` is not used).
 
-    # Read average and spatially resolved magnetisation (y-component).
-    m_avg = data_reader.get_average_magnetisation(component)
-    m_full = data_reader.get_spatially_resolved_magnetisation(component)
+    """
+    if estimator is not None:
+        timesteps = data_reader.get_timesteps(unit='s')
+        m_avg = data_reader.get_average_magnetisation(component)
+        m_full = data_reader.get_spatially_resolved_magnetisation(component)
+
+        freqs = estimator.get_frequencies(timesteps, unit='GHz')
+        spectrum_1 = get_spectrum_via_method_1(m_avg, estimator=estimator)
+        spectrum_2 = get_spectrum_via_method_2(m_full, estimator=estimator)
+    else:
+        if spectral_analysis is None:
+            spectral_analysis = SpectralAnalysis(data_reader)
 
-    # Compute frequencies and power spectrum via the two different methods.
-    freqs = get_fft_frequencies(timesteps, unit='GHz')
-    spectrum_1 = get_spectrum_via_method_1(m_avg)
-    spectrum_2 = get_spectrum_via_method_2(m_full)
+        # Compute frequencies and power spectrum via the two different methods.
+        freqs = spectral_analysis.get_frequencies(unit='GHz')
+        spectrum_1 = spectral_analysis.get_spectrum_via_method_1(component)
+        spectrum_2 = spectral_analysis.get_spectrum_via_method_2(component)
 
     # Plot both power spectra into the same figure
     fig = plt.figure(figsize=(7, 5.5))
@@ -141,103 +171,241 @@ def make_figure_3(data_reader, component='y'):
     return fig
 
 
+def plot_spectra_overlay(freqs, spectra, labels, peak_freqs=None, title=None, xlim=[0.2, 20], ylim=[1e-5, 1e0]):
+    """
+    Return a matplotlib figure showing the power spectra `spectra` (all
+    sampled at the frequencies `freqs`, in GHz) on top of each other, e.g.
+    to compare the spectra obtained with different simulation codes.
+
+    If `peak_freqs` is given, it must contain a list of peak frequencies
+    for each spectrum, which are marked by dotted vertical lines.
+    """
+    fig = plt.figure(figsize=(7, 5.5))
+    ax = fig.add_subplot(1, 1, 1)
+    for idx, (spectrum, label) in enumerate(zip(spectra, labels)):
+        line, = ax.plot(freqs, spectrum, lw=2 if idx == 0 else 1, label=label)
+        if peak_freqs is not None:
+            for peak_freq in np.atleast_1d(peak_freqs[idx]):
+                ax.axvline(peak_freq, color=line.get_color(), ls=':', lw=1)
+    ax.set_xlabel('Frequency (GHz)')
+    ax.set_ylabel('Spectral density')
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    ax.set_yscale('log')
+    if title is not None:
+        ax.set_title(title)
+    ax.legend(frameon=False)
+
+    return fig
+
+
 def plot_mode_component(ax, data, label, vmin, vmax, cmap):
-    ax.imshow(data, cmap=cmap, vmin=vmin, vmax=vmax, origin='lower')
+    image = ax.imshow(data, cmap=cmap, vmin=vmin, vmax=vmax, origin='lower')
     ax.set_title(label)
     ax.set_xticks([])
     ax.set_yticks([])
+    return image
 
 
 def plot_colorbar(ax, label, cmap, vmin, vmax, num_ticks, ticklabels=None):
     norm = mpl.colors.Normalize(vmin=vmin, vmax=vmax)
     ticks = np.linspace(vmin, vmax, num_ticks)
     cbar = mpl.colorbar.ColorbarBase(
-               ax, cmap, norm=norm, orientation='vertical', ticks=ticks)
+               ax, cmap=cmap, norm=norm, orientation='vertical', ticks=ticks)
     cbar.set_label(label)
     if ticklabels:
         cbar.ax.set_yticklabels(ticklabels)
+    return cbar
 
 
-def plot_mode_at_frequency(data_reader, freq):
+def plot_mode_at_frequency(data_reader, freq, spectral_analysis=None, sampling=None):
     """
-    Plot mode at the given frequency (in Hz).
+    Plot mode at the given frequency (in GHz).
+
+    If a `SpectralAnalysis` instance for `data_reader` is passed as
+    the argument `spectral_analysis`, its cached Fourier coefficients
+    are re-used. Otherwise the mode is computed on the part of the grid
+    selected by `sampling` (if given, see the module `sampling`).
     """
-    m_x = data_reader.get_spatially_resolved_magnetisation('x')
-    m_y = data_reader.get_spatially_resolved_magnetisation('y')
-    m_z = data_reader.get_spatially_resolved_magnetisation('z')
+    if spectral_analysis is None:
+        spectral_analysis = SpectralAnalysis(data_reader, sampling=sampling)
 
-    timesteps = data_reader.get_timesteps(unit='s')
+    amp_x = spectral_analysis.get_mode_amplitudes_at_freq('x', freq)
+    amp_y = spectral_analysis.get_mode_amplitudes_at_freq('y', freq)
+    amp_z = spectral_analysis.get_mode_amplitudes_at_freq('z', freq)
 
-    amp_x = get_mode_amplitudes_at_freq(timesteps, m_x, freq)
-    amp_y = get_mode_amplitudes_at_freq(timesteps, m_y, freq)
-    amp_z = get_mode_amplitudes_at_freq(timesteps, m_z, freq)
+    phase_x = spectral_analysis.get_mode_phases_at_freq('x', freq)
+    phase_y = spectral_analysis.get_mode_phases_at_freq('y', freq)
+    phase_z = spectral_analysis.get_mode_phases_at_freq('z', freq)
 
-    phase_x = get_mode_phases_at_freq(timesteps, m_x, freq)
-    phase_y = get_mode_phases_at_freq(timesteps, m_y, freq)
-    phase_z = get_mode_phases_at_freq(timesteps, m_z, freq)
+    return ModeMapRenderer().update(freq, [amp_x, amp_y, amp_z], [phase_x, phase_y, phase_z])
 
-    # Ensure that all three amplitude plots are on the same scale:
-    minVal = np.min([amp_x, amp_y, amp_z])
-    maxVal = np.max([amp_x, amp_y, amp_z])
 
-    fig = plt.figure(figsize=(8, 6))
-    gs = gridspec.GridSpec(2, 4, width_ratios=[4, 4, 4, 0.5],
-                                 height_ratios=[4, 4])
-    axes = [fig.add_subplot(g) for g in gs]
+class ModeMapRenderer(object):
+    """
+    Render the mode maps (as plotted by `plot_mode_at_frequency`) at many
+    frequencies, e.g. for every peak in a spectrum or for every run in a
+    sweep.
 
-    plot_mode_component(axes[0], amp_x, label='x', cmap=CMAP_AMPLITUDE, vmin=minVal, vmax=maxVal)
-    plot_mode_component(axes[1], amp_y, label='y', cmap=CMAP_AMPLITUDE, vmin=minVal, vmax=maxVal)
-    plot_mode_component(axes[2], amp_z, label='z', cmap=CMAP_AMPLITUDE, vmin=minVal, vmax=maxVal)
-    plot_colorbar(axes[3], label='Amplitude', cmap=CMAP_AMPLITUDE, vmin=0, vmax=maxVal, num_ticks=5)
+    The figure with its 2 x 4 panels and the colour bars is built only
+    once. For each frequency only the image data, the colour limits (and
+    the ticks of the amplitude colour bar) and the title are updated
+    before the figure is saved.
 
-    plot_mode_component(axes[4], phase_x, label='x', cmap=CMAP_PHASE, vmin=-np.pi, vmax=+np.pi)
-    plot_mode_component(axes[5], phase_y, label='y', cmap=CMAP_PHASE, vmin=-np.pi, vmax=+np.pi)
-    plot_mode_component(axes[6], phase_z, label='z', cmap=CMAP_PHASE, vmin=-np.pi, vmax=+np.pi)
-    plot_colorbar(axes[7], label='Phase', cmap=CMAP_PHASE, vmin=-np.pi, vmax=np.pi, num_ticks=3,
-                  ticklabels=['-3.14', '0', '-3.14'])
+    If `fast_png` is True, the layout is only computed for the first
+    frame and all frames are saved as PNG files with the fixed resolution
+    `dpi`. Otherwise `tight_layout` is called for every frame, exactly as
+    in `plot_mode_at_frequency`, and the format is determined by the
+    extension of the filename.
 
-    fig.subplots_adjust(left=0.1, bottom=0.1, right=0.95, wspace=0.1)
-    fig.suptitle('{:.2f} GHz'.format(freq), fontsize=20)
-    fig.tight_layout()
+    Example:
 
-    return fig
+        >>> renderer = ModeMapRenderer(fast_png=True)
+        >>> renderer.render_modes(spectral_analysis, [8.25, 11.25], 'mode_{freq:.2f}GHz.png')
+        >>> renderer.close()
 
+    """
 
-def make_figure_4(data_reader):
+    def __init__(self, fast_png=False, dpi=100):
+        self.fast_png = fast_png
+        self.dpi = dpi
+
+        self.fig = plt.figure(figsize=(8, 6))
+        gs = gridspec.GridSpec(2, 4, width_ratios=[4, 4, 4, 0.5],
+                                     height_ratios=[4, 4])
+        axes = [self.fig.add_subplot(g) for g in gs]
+
+        placeholder = np.zeros((1, 1))
+        self.amplitude_images = [
+            plot_mode_component(ax, placeholder, label=label, cmap=CMAP_AMPLITUDE, vmin=0, vmax=1)
+            for ax, label in zip(axes[0:3], 'xyz')]
+        self.phase_images = [
+            plot_mode_component(ax, placeholder, label=label, cmap=get_phase_cmap(), vmin=-np.pi, vmax=+np.pi)
+            for ax, label in zip(axes[4:7], 'xyz')]
+        self.amplitude_colorbar = plot_colorbar(axes[3], label='Amplitude', cmap=CMAP_AMPLITUDE, vmin=0, vmax=1,
+                                                num_ticks=5)
+        plot_colorbar(axes[7], label='Phase', cmap=get_phase_cmap(), vmin=-np.pi, vmax=np.pi, num_ticks=3,
+                      ticklabels=['-3.14', '0', '-3.14'])
+
+        self.fig.subplots_adjust(left=0.1, bottom=0.1, right=0.95, wspace=0.1)
+        self.title = self.fig.suptitle('', fontsize=20)
+        self._grid_shape = None
+
+        # `tight_layout` starts from the current subplot parameters, so they
+        # are reset before each layout to give every frame the same layout
+        # as the first one.
+        params = self.fig.subplotpars
+        self._subplot_params = dict(left=params.left, right=params.right, bottom=params.bottom,
+                                    top=params.top, wspace=params.wspace, hspace=params.hspace)
+
+    def update(self, freq, amplitudes, phases):
+        """
+        Show the mode at the frequency `freq` (in GHz), given the amplitudes
+        and phases of the x, y, z components (each a sequence of three 2D
+        arrays, as returned by `SpectralAnalysis.get_mode_maps_at_freqs`
+        for a single frequency). Returns the figure.
+        """
+        # Ensure that all three amplitude plots are on the same scale (cells
+        # outside a non-rectangular region of interest are NaN):
+        minVal = min(np.nanmin(amp) for amp in amplitudes)
+        maxVal = max(np.nanmax(amp) for amp in amplitudes)
+
+        grid_shape = np.shape(amplitudes[0])
+        needs_layout = grid_shape != self._grid_shape or not self.fast_png
+        if grid_shape != self._grid_shape:
+            extent = (-0.5, grid_shape[1] - 0.5, -0.5, grid_shape[0] - 0.5)
+            for image in self.amplitude_images + self.phase_images:
+                image.set_extent(extent)
+            self._grid_shape = grid_shape
+
+        for image, amp in zip(self.amplitude_images, amplitudes):
+            image.set_data(amp)
+            image.set_clim(minVal, maxVal)
+        for image, phase in zip(self.phase_images, phases):
+            image.set_data(phase)
+
+        self.amplitude_colorbar.mappable.set_clim(0, maxVal)
+        self.amplitude_colorbar.set_ticks(np.linspace(0, maxVal, 5))
+        self.title.set_text('{:.2f} GHz'.format(freq))
+
+        if needs_layout:
+            self.fig.subplots_adjust(**self._subplot_params)
+            self.fig.tight_layout()
+        return self.fig
+
+    def save(self, filename):
+        """
+        Save the current frame to the file `filename`.
+        """
+        if self.fast_png:
+            self.fig.savefig(filename, format='png', dpi=self.dpi)
+        else:
+            self.fig.savefig(filename)
+
+    def render_modes(self, spectral_analysis, freqs, filename_template, method='auto'):
+        """
+        Save the mode maps at each of the frequencies `freqs` (in GHz),
+        computed by `spectral_analysis` in a single pass over the data
+        (see `SpectralAnalysis.get_mode_maps_at_freqs`). The filenames are
+        obtained from `filename_template` by substituting `{freq}` and
+        `{index}`, e.g. 'mode_{freq:.2f}GHz.png'. Returns the filenames.
+        """
+        amplitudes, phases = spectral_analysis.get_mode_maps_at_freqs(freqs, method=method)
+        filenames = []
+        for idx, freq in enumerate(freqs):
+            self.update(freq, amplitudes[idx], phases[idx])
+            filename = filename_template.format(freq=freq, index=idx)
+            self.save(filename)
+            filenames.append(filename)
+        return filenames
+
+    def close(self):
+        plt.close(self.fig)
+
+
+def make_figure_4(data_reader, spectral_analysis=None, sampling=None):
     """
     Create Fig. 4 in the paper.
 
     Returns a matplotlib figure with 2 x 3 panels displaying, respectively, the
     amplitude and phase of the x/y/z component of the eigenmode at 8.25 GHz.
 
+    If a `SpectralAnalysis` instance for `data_reader` is passed as the
+    argument `spectral_analysis`, its cached spectra are re-used. Otherwise
+    the peak and the mode are computed on the part of the grid selected by
+    `sampling` (if given).
+
     """
     approx_freq = 8.25
 
+    if spectral_analysis is None:
+        spectral_analysis = SpectralAnalysis(data_reader, sampling=sampling)
+
     # We use the spectrum of the y-component to find the peak
-    timesteps = data_reader.get_timesteps(unit='s')
-    freqs = get_fft_frequencies(timesteps, unit='GHz')
-    m_y = data_reader.get_spatially_resolved_magnetisation('y')
-    spectrum_y = get_spectrum_via_method_2(m_y)
-    peak_freq = find_peak_frequency(freqs, spectrum_y, approx_freq=approx_freq)
+    peak_freq = spectral_analysis.find_peak_frequency(approx_freq, component='y', method=2)
 
-    return plot_mode_at_frequency(data_reader, peak_freq)
+    return plot_mode_at_frequency(data_reader, peak_freq, spectral_analysis=spectral_analysis)
 
 
-def make_figure_5(data_reader):
+def make_figure_5(data_reader, spectral_analysis=None, sampling=None):
     """
     Create Fig. 5 in the paper.
 
     Returns a matplotlib figure with 2 x 3 panels displaying, respectively, the
     amplitude and phase of the x/y/z component of the eigenmode at 11.25 GHz.
 
+    If a `SpectralAnalysis` instance for `data_reader` is passed as the
+    argument `spectral_analysis`, its cached spectra are re-used. Otherwise
+    the peak and the mode are computed on the part of the grid selected by
+    `sampling` (if given).
+
     """
     approx_freq = 11.25
 
+    if spectral_analysis is None:
+        spectral_analysis = SpectralAnalysis(data_reader, sampling=sampling)
+
     # We use the spectrum of the y-component to find the peak
-    timesteps = data_reader.get_timesteps(unit='s')
-    freqs = get_fft_frequencies(timesteps, unit='GHz')
-    m_y = data_reader.get_spatially_resolved_magnetisation('y')
-    spectrum_y = get_spectrum_via_method_2(m_y)
-    peak_freq = find_peak_frequency(freqs, spectrum_y, approx_freq=approx_freq)
+    peak_freq = spectral_analysis.find_peak_frequency(approx_freq, component='y', method=2)
 
-    return plot_mode_at_frequency(data_reader, peak_freq)
+    return plot_mode_at_frequency(data_reader, peak_freq, spectral_analysis=spectral_analysis)
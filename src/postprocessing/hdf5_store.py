@@ -0,0 +1,127 @@
+"""
+Storage of all simulation data of a single run in one HDF5 file.
+
+The file contains the following datasets:
+
+   timesteps   shape (N,)               timesteps (in seconds)
+   m_avg       shape (N, 3)             spatially averaged magnetisation
+   m           shape (N, 3, nx, ny)     spatially resolved magnetisation
+
+The dataset `m` is chunked along time and space (and each chunk only
+contains a single magnetisation component), so that time windows or
+spatial regions can be read without reading the entire dataset. The
+data can optionally be compressed using a lossless compression filter.
+
+This module requires `h5py`, which is an optional dependency. It is
+only imported when HDF5 files are actually read or written.
+
+"""
+
+import numpy as np
+import os
+
+HDF5_FILENAME = 'dynamic.h5'
+
+
+def import_h5py():
+    """
+    Import and return the `h5py` module, raising an informative
+    error if it is not installed.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("Reading and writing HDF5 files requires the 'h5py' package.")
+    return h5py
+
+
+def get_default_chunk_shape(shape, max_chunk_timesteps=256, max_chunk_size=32):
+    """
+    Return the default chunk shape for a dataset of spatially resolved
+    magnetisation of the given shape (N, 3, nx, ny).
+    """
+    N, _, nx, ny = shape
+    return (min(N, max_chunk_timesteps), 1, min(nx, max_chunk_size), min(ny, max_chunk_size))
+
+
+def write_hdf5_dataset(filename, timesteps, m_avg, m_full, chunks=None, compression=None,
+                       compression_opts=None, time_block_size=1024, dtype=None):
+    """
+    Write simulation data to the HDF5 file `filename`.
+
+    Parameters
+    ----------
+    timesteps :  1D numpy array of length N
+
+        Timesteps (in seconds) at which the magnetisation was saved.
+
+    m_avg :  numpy array of shape (N, 3)
+
+        Spatially averaged magnetisation.
+
+    m_full :  sequence of three arrays of shape (N, nx, ny)
+
+        Spatially resolved magnetisation for the x/y/z component. These
+        can be memory-mapped arrays, in which case they are copied in
+        blocks of `time_block_size` timesteps so that they never need
+        to be loaded into memory completely.
+
+    chunks :  tuple (optional)
+
+        Chunk shape of the dataset `m` (default: see `get_default_chunk_shape`).
+
+    compression, compression_opts :  (optional)
+
+        Lossless compression filter (e.g. 'gzip' or 'lzf') and its options.
+        By default the data is not compressed.
+
+    dtype :  numpy dtype (optional)
+
+        Type in which the dataset `m` is stored (default: the type of
+        `m_full`). Use `np.float32` to halve the size of the file.
+
+    """
+    h5py = import_h5py()
+
+    N, nx, ny = m_full[0].shape
+    shape = (N, 3, nx, ny)
+    if chunks is None:
+        chunks = get_default_chunk_shape(shape)
+    if dtype is None:
+        dtype = m_full[0].dtype
+
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset('timesteps', data=np.asarray(timesteps))
+        f.create_dataset('m_avg', data=np.asarray(m_avg))
+        dset = f.create_dataset('m', shape=shape, dtype=dtype, chunks=chunks,
+                                compression=compression, compression_opts=compression_opts,
+                                shuffle=compression is not None)
+        for idx, m in enumerate(m_full):
+            for start in range(0, N, time_block_size):
+                stop = min(start + time_block_size, N)
+                dset[start:stop, idx] = m[start:stop]
+
+
+def convert_to_hdf5(data_dir, data_format, filename=None, **kwargs):
+    """
+    Convert the simulation data in `data_dir` (in the given `data_format`,
+    e.g. 'OOMMF' or 'Nmag') into a single HDF5 file. If `filename` is not
+    given, the file 'dynamic.h5' is created in `data_dir`.
+
+    Any keyword arguments are passed on to `write_hdf5_dataset`.
+
+    Returns the name of the file written.
+
+    """
+    from .data_reader import DataReader
+
+    if filename is None:
+        filename = os.path.join(data_dir, HDF5_FILENAME)
+
+    with DataReader(data_dir, data_format=data_format, mmap_mode='r', cache_size=0) as data_reader:
+        timesteps = data_reader.get_timesteps(unit='s')
+        m_avg = np.array([data_reader.get_average_magnetisation(c) for c in 'xyz']).T
+        m_full = [data_reader.get_spatially_resolved_magnetisation(c) for c in 'xyz']
+        write_hdf5_dataset(filename, timesteps, m_avg, m_full, **kwargs)
+
+    return filename
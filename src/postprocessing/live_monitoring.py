@@ -0,0 +1,533 @@
+"""
+Live monitoring of the spectrum while a simulation is running.
+
+The table `dynamic.odt` written by OOMMF during the dynamic stage is
+followed as it grows (like `tail -f`), and the power spectrum of the
+spatially averaged magnetisation (method 1) is updated incrementally
+after each batch of new rows. Optionally, the spatially resolved
+spectrum (method 2) is updated from new `.omf` snapshots as well.
+
+Instead of recomputing the FFT of the whole time series on every
+update, the DFT coefficients on a fixed frequency grid are accumulated
+recursively: each new sample x(t) adds x(t) * exp(-2*pi*i*f*t) to the
+coefficient at frequency f, so an update costs O(number of new samples
+x number of frequencies), independently of the length of the history.
+With a finite window the samples leaving the window are subtracted
+again (a sliding DFT), so that the spectrum tracks the most recent
+part of the time series.
+
+After each update the peak frequencies are estimated and a status
+dictionary is passed to the publishers (printed to the console or
+written to a JSON status file).
+
+"""
+
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from .omf_ingestion import read_sampled_snapshot
+from .peak_finding import PeakFinder
+
+# Default frequency grid (in GHz) on which the spectrum is computed.
+DEFAULT_FREQS = np.arange(0.0, 20.0, 0.01)
+
+# Column indices of time, mx, my, mz in the table written by the dynamic
+# stage (as used with `odtcols` in `oommf/generate_data.sh`). They are
+# only used if the table has no '# Columns:' header line.
+DEFAULT_ODT_COLUMNS = (18, 14, 15, 16)
+
+# Names of the columns for time, mx, my, mz. In tables written by OOMMF
+# they are prefixed with the name of the driver (e.g. 'Oxs_TimeDriver::mx').
+ODT_COLUMN_NAMES = ('Simulation time', 'mx', 'my', 'mz')
+
+
+def parse_odt_column_names(line):
+    """
+    Return the list of column names in the '# Columns:' header line of
+    an OOMMF data table. Names containing spaces are enclosed in braces.
+    """
+    line = line.split(':', 1)[1]
+    return [name.strip('{}') for name in re.findall(r'\{[^}]*\}|\S+', line)]
+
+
+def get_odt_column_indices(column_names):
+    """
+    Return the indices of the columns for the simulation time and the
+    average magnetisation components mx, my, mz in `column_names`.
+    """
+    indices = []
+    for column_name in ODT_COLUMN_NAMES:
+        matches = [idx for idx, name in enumerate(column_names)
+                   if name == column_name or name.endswith('::' + column_name)]
+        if len(matches) == 0:
+            raise ValueError("No column '{}' found in data table.".format(column_name))
+        indices.append(matches[0])
+    return tuple(indices)
+
+
+class TableFollower(object):
+    """
+    Incremental reader for a data table which is still being written by
+    a simulation (base class for `OdtFollower` and `NdtFollower`).
+
+    Each call to `read_new_rows()` returns the rows appended to the file
+    since the previous call, as an array of shape (N, 4) containing the
+    columns time, mx, my, mz. Incomplete lines at the end of the file
+    are left for the next call. The file does not need to exist yet.
+
+    Subclasses implement `_parse_header_line()`, which determines the
+    indices of these columns from the header (stored in `self.columns`)
+    and sets `self.finished` when the end of the table is reached. If
+    the header does not determine the columns, `default_columns` is used.
+
+    """
+
+    default_columns = None
+
+    def __init__(self, filename, columns=None):
+        self.filename = filename
+        self.columns = columns
+        self.finished = False
+        self._offset = 0
+
+    def _parse_header_line(self, line):
+        raise NotImplementedError()
+
+    def read_new_rows(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(self._offset)
+                content = f.read()
+        except (IOError, OSError):
+            return np.empty((0, 4))
+
+        # Only consume complete lines.
+        end = content.rfind(b'\n') + 1
+        self._offset += end
+
+        rows = []
+        for line in content[:end].decode('utf-8', 'replace').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                self._parse_header_line(line)
+                continue
+            columns = self.columns or self.default_columns
+            if columns is None:
+                raise ValueError("Cannot determine the columns of the data table '{}'.".format(self.filename))
+            values = line.split()
+            rows.append([float(values[idx]) for idx in columns])
+
+        return np.array(rows, dtype=float).reshape(-1, 4)
+
+
+class OdtFollower(TableFollower):
+    """
+    Incremental reader for an OOMMF data table (`.odt` file), see
+    `TableFollower`. This also reads the table written by the NumPy LLG
+    solver (`dynamic_txyz.txt`), which uses the same format.
+
+    The attribute `finished` is set to True once the line '# Table End'
+    has been read, which OOMMF writes when the simulation has finished.
+
+    """
+
+    default_columns = DEFAULT_ODT_COLUMNS
+
+    def __init__(self, filename, columns=None):
+        super(OdtFollower, self).__init__(filename, columns)
+        self._columns_line = None
+
+    def _parse_header_line(self, line):
+        if self._columns_line is not None:
+            # Continuation of the '# Columns:' line.
+            self._columns_line += ' ' + line.lstrip('#').strip()
+        elif line.lower().startswith('# columns:'):
+            self._columns_line = line
+        elif line.lower().startswith('# table end'):
+            self.finished = True
+
+        if self._columns_line is not None:
+            if self._columns_line.endswith('\\'):
+                self._columns_line = self._columns_line[:-1].rstrip()
+            else:
+                self.columns = get_odt_column_indices(parse_odt_column_names(self._columns_line))
+                self._columns_line = None
+
+
+class NdtFollower(TableFollower):
+    """
+    Incremental reader for an Nmag data table (`_dat.ndt` file), see
+    `TableFollower`. The first header line contains the column names; the
+    average magnetisation of the material `material_name` is contained in
+    the columns 'm_<material_name>_0', 'm_<material_name>_1', etc.
+
+    Nmag does not mark the end of the table, so `finished` is never set.
+
+    """
+
+    def __init__(self, filename, columns=None, material_name='Py'):
+        super(NdtFollower, self).__init__(filename, columns)
+        self.material_name = material_name
+
+    def _parse_header_line(self, line):
+        if self.columns is not None:
+            return
+        column_names = line.lstrip('#').split()
+        wanted = ['time'] + ['m_{}_{}'.format(self.material_name, idx) for idx in range(3)]
+        missing = [name for name in wanted if name not in column_names]
+        if missing:
+            raise ValueError("No column(s) {} found in data table '{}'.".format(', '.join(missing), self.filename))
+        self.columns = tuple(column_names.index(name) for name in wanted)
+
+
+def get_table_follower(filename):
+    """
+    Return a `TableFollower` for the data table `filename`: an
+    `NdtFollower` for Nmag tables (ending in '.ndt'), otherwise an
+    `OdtFollower`.
+    """
+    if filename.endswith('.ndt'):
+        return NdtFollower(filename)
+    return OdtFollower(filename)
+
+
+class OmfFollower(object):
+    """
+    Incremental reader for the magnetisation snapshots (`.omf` files
+    matching `pattern` in `directory`) written during the dynamic stage.
+
+    Each call to `read_new_snapshots(max_num_snapshots)` returns the
+    magnetisation sampled at half the height of the sample (see
+    `omf_ingestion.sample_central_plane`) for the new snapshots, as an
+    array of shape (N, ny, nx, 3). Files which cannot be read (e.g.
+    because they are still being written) are retried on the next call.
+
+    """
+
+    def __init__(self, directory, pattern='dynamic*.omf'):
+        self.directory = directory
+        self.pattern = pattern
+        self.num_snapshots_read = 0
+
+    def read_new_snapshots(self, max_num_snapshots=None):
+        filenames = sorted(glob.glob(os.path.join(self.directory, self.pattern)))[self.num_snapshots_read:]
+        if max_num_snapshots is not None:
+            filenames = filenames[:max_num_snapshots]
+
+        snapshots = []
+        for filename in filenames:
+            try:
+                snapshots.append(read_sampled_snapshot(filename))
+            except (IOError, OSError, ValueError, IndexError):
+                break
+        self.num_snapshots_read += len(snapshots)
+        return np.array(snapshots)
+
+
+class RecursiveDFT(object):
+    """
+    Discrete Fourier transform at the fixed frequencies `freqs` (in GHz)
+    of a time series which grows sample by sample.
+
+    The samples can be scalars or arrays of any shape (e.g. the values in
+    all cells of a grid). The coefficients are accumulated recursively in
+    `update()`. If `window_size` is given, only the most recent
+    `window_size` samples contribute (sliding DFT); to avoid the
+    accumulation of rounding errors, the coefficients are recomputed from
+    the samples in the window each time `window_size` samples have left it.
+
+    The phases are measured relative to the time of the first sample, so
+    for uniformly sampled data and frequencies on the grid of `np.fft.rfft`
+    the coefficients coincide with those computed by `np.fft.rfft`.
+
+    """
+
+    def __init__(self, freqs, window_size=None):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.window_size = window_size
+        self.coefficients = None
+        self.sample_shape = None
+        self.num_samples = 0
+        self.t0 = None
+        self.t_last = None
+        self._window_times = None
+        self._window_values = None
+        self._num_removed_since_resync = 0
+
+    def _get_phase_factors(self, times):
+        # Shape (num_freqs, num_times).
+        return np.exp(-2j * np.pi * np.outer(self.freqs * 1e9, times - self.t0))
+
+    def _transform(self, times, values):
+        values = values.reshape(len(times), -1)
+        return np.dot(self._get_phase_factors(times), values).reshape((len(self.freqs),) + self.sample_shape)
+
+    def update(self, times, values):
+        """
+        Add the samples `values` (an array whose first axis corresponds to
+        the sample times `times`, in seconds) to the transform.
+        """
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if len(times) == 0:
+            return
+
+        if self.coefficients is None:
+            self.t0 = times[0]
+            self.sample_shape = values.shape[1:]
+            self.coefficients = np.zeros((len(self.freqs),) + self.sample_shape, dtype=complex)
+
+        self.coefficients += self._transform(times, values)
+        self.num_samples += len(times)
+        self.t_last = times[-1]
+
+        if self.window_size is not None:
+            self._slide_window(times, values)
+
+    def _slide_window(self, times, values):
+        if self._window_times is None:
+            self._window_times, self._window_values = times, values
+        else:
+            self._window_times = np.concatenate([self._window_times, times])
+            self._window_values = np.concatenate([self._window_values, values])
+
+        num_removed = len(self._window_times) - self.window_size
+        if num_removed <= 0:
+            return
+
+        removed_times, self._window_times = self._window_times[:num_removed], self._window_times[num_removed:]
+        removed_values, self._window_values = self._window_values[:num_removed], self._window_values[num_removed:]
+        self.num_samples -= num_removed
+        self._num_removed_since_resync += num_removed
+
+        if self._num_removed_since_resync >= self.window_size:
+            self.coefficients = self._transform(self._window_times, self._window_values)
+            self._num_removed_since_resync = 0
+        else:
+            self.coefficients -= self._transform(removed_times, removed_values)
+
+    def get_power_spectrum(self):
+        """
+        Return the power spectrum |X(f)|^2, averaged over all axes of the
+        samples (i.e. over the cells for spatially resolved data).
+        """
+        if self.coefficients is None:
+            return np.zeros(len(self.freqs))
+        power = np.abs(self.coefficients)**2
+        return power.reshape(len(self.freqs), -1).mean(axis=1)
+
+    def get_frequency_resolution(self):
+        """
+        Return the frequency resolution (in GHz) of the spectrum, i.e. the
+        reciprocal of the duration of the samples currently contributing.
+        """
+        if self.num_samples < 2:
+            return None
+        t_first = self.t0 if self._window_times is None else self._window_times[0]
+        dt = (self.t_last - t_first) / (self.num_samples - 1)
+        return 1e-9 / (self.num_samples * dt)
+
+
+def get_peaks(freqs, spectrum, approx_freqs=None, num_peaks=2, min_prominence=0.5):
+    """
+    Return a list of dictionaries with the keys 'freq' and 'amplitude' for
+    the peaks of `spectrum` closest to `approx_freqs` or, if `approx_freqs`
+    is None, for the `num_peaks` most prominent peaks (in ascending order
+    of frequency). Returns an empty list if no peaks can be detected yet.
+    """
+    if not np.any(spectrum > 0):
+        return []
+
+    peak_finder = PeakFinder(freqs, spectrum, min_prominence=min_prominence)
+    if len(peak_finder.peak_indices) == 0:
+        return []
+
+    if approx_freqs is not None:
+        idx = peak_finder.get_peak_indices(approx_freqs)
+    else:
+        idx = np.sort(np.argsort(peak_finder.prominences)[::-1][:num_peaks])
+
+    peak_freqs = peak_finder.peak_freqs[idx]
+    amplitudes = peak_finder.get_peak_amplitudes()[idx]
+    return [{'freq': float(f), 'amplitude': float(a)} for f, a in zip(peak_freqs, amplitudes)]
+
+
+class ConsolePublisher(object):
+    """
+    Print a one-line summary of each status update to `stream`. Peak
+    uncertainties and the convergence state are included if the status
+    contains them (see `convergence_monitor.ConvergenceMonitor`).
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def format_peak(self, peak):
+        if peak['freq'] is None:
+            return 'n/a'
+        if peak.get('uncertainty') is None:
+            return '{:.3f} GHz'.format(peak['freq'])
+        return '{:.3f} +/- {:.3f} GHz'.format(peak['freq'], peak['uncertainty'])
+
+    def publish(self, status):
+        peaks = ', '.join(self.format_peak(peak) for peak in status['peaks'])
+        line = "t = {:.4g} ns ({} timesteps, resolution {}): peaks of m_{} at {}".format(
+            status['time'] * 1e9, status['num_timesteps'],
+            'n/a' if status['frequency_resolution'] is None else
+            '{:.3g} GHz'.format(status['frequency_resolution']),
+            status['component'], peaks or 'n/a')
+        if status.get('converged'):
+            line += ' [converged]'
+        if status['finished']:
+            line += ' [finished]'
+        stream = self.stream or sys.stdout
+        stream.write(line + '\n')
+        stream.flush()
+
+
+class JsonStatusPublisher(object):
+    """
+    Write each status update to the JSON file `filename`. The file is
+    replaced atomically, so readers never see a partially written file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def publish(self, status):
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump(status, f, indent=2)
+        os.rename(tmp_filename, self.filename)
+
+
+class LiveSpectrumMonitor(object):
+    """
+    Follow the data table `table_filename` (`dynamic.odt` for OOMMF, or
+    `<simulation name>_dat.ndt` for Nmag) and, if `omf_dir` is given, the
+    `.omf` snapshots in this directory, of a running simulation and update
+    the spectrum and the peak estimates incrementally.
+
+    *Arguments*
+
+    component:  magnetisation component whose spectrum is monitored
+
+    freqs:  frequency grid in GHz (default: 0 to 20 GHz in steps of 0.01 GHz)
+
+    window_size:  if given, the spectrum is computed from the most recent
+        `window_size` timesteps only
+
+    approx_peak_freqs:  if given, the peaks closest to these frequencies are
+        reported; otherwise the `num_peaks` most prominent peaks
+
+    publishers:  objects with a method `publish(status)` which is called
+        with the status dictionary after each update (see `get_status`)
+
+    include_spectrum:  if True, the status contains the full spectrum
+
+    """
+
+    def __init__(self, table_filename, omf_dir=None, component='y', freqs=None, window_size=None,
+                 approx_peak_freqs=None, num_peaks=2, publishers=None, include_spectrum=False):
+        self.table_follower = get_table_follower(table_filename)
+        self.omf_follower = None if omf_dir is None else OmfFollower(omf_dir)
+        self.component = component
+        self.freqs = DEFAULT_FREQS if freqs is None else np.asarray(freqs, dtype=float)
+        self.approx_peak_freqs = approx_peak_freqs
+        self.num_peaks = num_peaks
+        self.publishers = [] if publishers is None else publishers
+        self.include_spectrum = include_spectrum
+
+        self.dft_method_1 = RecursiveDFT(self.freqs, window_size=window_size)
+        self.dft_method_2 = None if omf_dir is None else RecursiveDFT(self.freqs, window_size=window_size)
+        self.timesteps = []
+        self.num_updates = 0
+
+    @property
+    def finished(self):
+        return self.table_follower.finished
+
+    def update(self):
+        """
+        Read the new data and update the spectra. Returns the new status
+        (which is also passed to the publishers) or None if there was no
+        new data.
+        """
+        was_finished = self.finished
+        rows = self.table_follower.read_new_rows()
+        if len(rows) > 0:
+            self.timesteps.extend(rows[:, 0])
+            self.dft_method_1.update(rows[:, 0], rows[:, 1 + 'xyz'.index(self.component)])
+
+        num_new_snapshots = 0
+        if self.omf_follower is not None:
+            # Snapshot k belongs to the k-th row of the table, so only read
+            # snapshots whose time is already known.
+            first = self.omf_follower.num_snapshots_read
+            snapshots = self.omf_follower.read_new_snapshots(len(self.timesteps) - first)
+            num_new_snapshots = len(snapshots)
+            if num_new_snapshots > 0:
+                times = np.array(self.timesteps[first:first + num_new_snapshots])
+                self.dft_method_2.update(times, snapshots[..., 'xyz'.index(self.component)])
+
+        if len(rows) == 0 and num_new_snapshots == 0 and self.finished == was_finished:
+            return None
+
+        self.num_updates += 1
+        status = self.get_status()
+        for publisher in self.publishers:
+            publisher.publish(status)
+        return status
+
+    def get_status(self):
+        """
+        Return a dictionary with the current state: the number of timesteps
+        and the last simulation time read, the frequency resolution (GHz),
+        the peaks of the spectrum (see `get_peaks`), the peaks of the
+        spatially resolved spectrum (if `.omf` snapshots are followed) and
+        whether the simulation has finished.
+        """
+        spectrum = self.dft_method_1.get_power_spectrum()
+        status = {'component': self.component,
+                  'num_timesteps': len(self.timesteps),
+                  'time': float(self.timesteps[-1]) if self.timesteps else 0.0,
+                  'frequency_resolution': self.dft_method_1.get_frequency_resolution(),
+                  'peaks': get_peaks(self.freqs, spectrum, self.approx_peak_freqs, self.num_peaks),
+                  'finished': self.finished,
+                  'updated': time.time()}
+        if self.dft_method_2 is not None:
+            status['num_snapshots'] = self.omf_follower.num_snapshots_read
+            status['peaks_method_2'] = get_peaks(self.freqs, self.dft_method_2.get_power_spectrum(),
+                                                 self.approx_peak_freqs, self.num_peaks)
+        if self.include_spectrum:
+            status['freqs'] = self.freqs.tolist()
+            status['spectrum'] = spectrum.tolist()
+        return status
+
+    def run(self, interval=1.0, idle_timeout=None):
+        """
+        Poll for new data every `interval` seconds until the simulation has
+        finished (or no new data has arrived for `idle_timeout` seconds).
+        Returns the last status.
+        """
+        status = None
+        last_change = time.time()
+        while True:
+            new_status = self.update()
+            if new_status is not None:
+                status = new_status
+                last_change = time.time()
+            if self.finished:
+                break
+            if idle_timeout is not None and time.time() - last_change > idle_timeout:
+                break
+            time.sleep(interval)
+        return status
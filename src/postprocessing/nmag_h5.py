@@ -0,0 +1,273 @@
+"""
+Direct reading of the spatially resolved magnetisation from Nmag's HDF5
+output, without running `nmagprobe`.
+
+Nmag stores the magnetisation at the nodes of a tetrahedral mesh. The
+mesh is read from an Nmag mesh file (e.g. `meshes/mesh_555.nmesh.h5`,
+which contains the datasets `/mesh/points` and `/mesh/simplices`), and
+the field data from the `_dat.h5` file written by the simulation (e.g.
+`02_dynamic_stage_dat.h5`), whose table `/data/fields/m/m_Py` contains
+one row per saved timestep with the columns `time` (in seconds) and
+`data` (the field values at the mesh nodes, in the order of the mesh
+points).
+
+The field is resampled on a regular grid of probe points by linear
+(barycentric) interpolation within the tetrahedra. The interpolation
+weights are computed once, stored in a sparse matrix (with one row per
+probe point and four non-zero entries per row), and cached on disk, so
+that resampling all timesteps is a single sparse-dense matrix product.
+
+By default the probe points are the centres of the cells of a regular
+grid covering the mesh (e.g. at x, y = 2.5, 7.5, ..., 117.5 nm for a
+24 x 24 grid), which corresponds to the cell centres used by OOMMF.
+(The `nmagprobe` command in `nmag/generate_data.sh` samples at x, y =
+0, ..., 120 nm instead, see the comment at the end of that script.)
+
+This module requires `h5py`, which is an optional dependency. It is
+only imported when the HDF5 files are actually read.
+
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from .hdf5_store import import_h5py
+
+NMAG_DAT_FILENAME = '02_dynamic_stage_dat.h5'
+NMAG_MESH_FILENAME = 'mesh_555.nmesh.h5'
+NMAG_FIELD_TABLE = '/data/fields/m/m_Py'
+
+# Default probe grid: 24 x 24 points in the plane z = 5 nm (in the length
+# unit of the mesh, which is nm for the meshes of the standard problem).
+DEFAULT_GRID_SHAPE = (24, 24)
+DEFAULT_PROBE_HEIGHT = 5.0
+
+# Tolerance for the barycentric coordinates of points on the faces of
+# a tetrahedron (which may be slightly negative due to rounding).
+BARYCENTRIC_TOL = 1e-8
+
+
+def read_nmag_mesh(filename):
+    """
+    Read the tetrahedral mesh from the Nmag mesh file (or `_dat.h5` file)
+    `filename`. Returns a pair `(points, simplices)` of arrays of shape
+    (num_points, 3) and (num_simplices, 4).
+    """
+    with import_h5py().File(filename, 'r') as f:
+        points = f['mesh/points'][:].astype(float)
+        simplices = f['mesh/simplices'][:].astype(np.intp)
+    return points, simplices
+
+
+def get_probe_points(xlim, ylim, z, grid_shape=DEFAULT_GRID_SHAPE, cell_centres=True):
+    """
+    Return an array of shape (nx * ny, 3) with the probe points of a regular
+    grid of nx x ny = `grid_shape` points in the plane at height `z`, where
+    the x coordinate varies slowest (as in the output of `nmagprobe`).
+
+    If `cell_centres` is True (the default), the probe points are the
+    centres of the nx x ny cells into which the rectangle `xlim` x `ylim`
+    is divided. Otherwise they include the edges of the rectangle (i.e.
+    the points are `np.linspace(xlim[0], xlim[1], nx)` etc.).
+    """
+    coords = []
+    for (lower, upper), n in zip([xlim, ylim], grid_shape):
+        if cell_centres:
+            step = (upper - lower) / float(n)
+            coords.append(lower + step * (np.arange(n) + 0.5))
+        else:
+            coords.append(np.linspace(lower, upper, n))
+    xs, ys = np.meshgrid(coords[0], coords[1], indexing='ij')
+    return np.column_stack([xs.ravel(), ys.ravel(), np.full(xs.size, float(z))])
+
+
+def get_barycentric_coordinates(points, simplices, probe_points):
+    """
+    Return the barycentric coordinates (shape (..., 4)) of the probe points
+    (shape (..., 3)) with respect to the tetrahedra `simplices` (shape
+    (..., 4), containing indices into `points`).
+    """
+    vertices = points[simplices]
+    # Solve T * (b0, b1, b2) = p - v3, where the columns of T are v_i - v3.
+    T = np.swapaxes(vertices[..., :3, :] - vertices[..., 3:, :], -1, -2)
+    rhs = (probe_points - vertices[..., 3, :])[..., np.newaxis]
+    b = np.linalg.solve(T, rhs)[..., 0]
+    return np.concatenate([b, 1.0 - b.sum(axis=-1, keepdims=True)], axis=-1)
+
+
+def locate_points(points, simplices, probe_points, num_candidates=16, tol=BARYCENTRIC_TOL):
+    """
+    Find a tetrahedron containing each probe point. Returns a pair
+    `(simplex_indices, barycentric_coordinates)` of arrays of shape (P,)
+    and (P, 4) for the P probe points.
+
+    For each point the `num_candidates` tetrahedra with the closest
+    centroids are checked first (using a k-d tree); all tetrahedra are
+    checked for the (rare) points which are not found among them. A
+    ValueError is raised if a point lies outside the mesh.
+    """
+    from scipy.spatial import cKDTree
+
+    probe_points = np.asarray(probe_points, dtype=float)
+    num_candidates = min(num_candidates, len(simplices))
+    _, candidates = cKDTree(points[simplices].mean(axis=1)).query(probe_points, k=num_candidates)
+    candidates = candidates.reshape(len(probe_points), num_candidates)
+
+    bary = get_barycentric_coordinates(points, simplices[candidates], probe_points[:, np.newaxis, :])
+    inside = bary.min(axis=-1) >= -tol
+    idx_best = np.argmax(inside, axis=1)
+    rows = np.arange(len(probe_points))
+    simplex_indices = candidates[rows, idx_best]
+    coords = bary[rows, idx_best]
+
+    for i in np.nonzero(~inside.any(axis=1))[0]:
+        bary_all = get_barycentric_coordinates(points, simplices, probe_points[i])
+        inside_all = np.nonzero(bary_all.min(axis=-1) >= -tol)[0]
+        if len(inside_all) == 0:
+            raise ValueError("Probe point {} lies outside the mesh.".format(tuple(probe_points[i])))
+        simplex_indices[i] = inside_all[0]
+        coords[i] = bary_all[inside_all[0]]
+
+    return simplex_indices, coords
+
+
+def compute_interpolation_matrix(points, simplices, probe_points):
+    """
+    Return a sparse matrix (in CSR format) of shape (P, num_points) which
+    maps the values of a field at the mesh nodes to its (linearly
+    interpolated) values at the P probe points.
+    """
+    import scipy.sparse  # imported on first use (it is slow to import)
+
+    simplex_indices, coords = locate_points(points, simplices, probe_points)
+    num_probes = len(probe_points)
+    rows = np.repeat(np.arange(num_probes), 4)
+    cols = simplices[simplex_indices].ravel()
+    return scipy.sparse.csr_matrix((coords.ravel(), (rows, cols)), shape=(num_probes, len(points)))
+
+
+def get_node_volumes(points, simplices):
+    """
+    Return the volume associated with each mesh node (a quarter of the
+    volume of each adjacent tetrahedron). The spatial average of a field
+    which is linear within each tetrahedron is the average of its nodal
+    values weighted by these volumes.
+    """
+    vertices = points[simplices]
+    volumes = abs(np.linalg.det(vertices[:, :3] - vertices[:, 3:])) / 6.0
+    return np.bincount(simplices.ravel(), weights=np.repeat(volumes / 4.0, 4), minlength=len(points))
+
+
+def get_interpolation_cache_filename(cache_dir, points, simplices, probe_points):
+    """
+    Return the name of the file in `cache_dir` in which the interpolation
+    matrix for the given mesh and probe points is cached. The name contains
+    a hash of the mesh and the probe points, so a changed mesh or probe
+    grid never uses a stale matrix.
+    """
+    sha256 = hashlib.sha256()
+    for array in (points, simplices, probe_points):
+        array = np.ascontiguousarray(array)
+        sha256.update(str((array.dtype.str, array.shape)).encode('utf-8'))
+        sha256.update(array.tobytes())
+    return os.path.join(cache_dir, '.nmag_interpolation_{}.npz'.format(sha256.hexdigest()[:32]))
+
+
+def get_interpolation_matrix(points, simplices, probe_points, cache_dir=None):
+    """
+    Return the interpolation matrix (see `compute_interpolation_matrix`).
+    If `cache_dir` is given, the matrix is read from a cache file in this
+    directory if it exists, and otherwise computed and written to it.
+    """
+    import scipy.sparse
+
+    if cache_dir is None:
+        return compute_interpolation_matrix(points, simplices, probe_points)
+
+    filename = get_interpolation_cache_filename(cache_dir, points, simplices, probe_points)
+    try:
+        return scipy.sparse.load_npz(filename).tocsr()
+    except (IOError, OSError, ValueError):
+        pass
+
+    matrix = compute_interpolation_matrix(points, simplices, probe_points)
+    try:
+        # Write to a temporary file first so that concurrent readers never
+        # see an incomplete file.
+        tmp_filename = filename[:-len('.npz')] + '.{}.tmp.npz'.format(os.getpid())
+        scipy.sparse.save_npz(tmp_filename, matrix)
+        os.rename(tmp_filename, filename)
+    except (IOError, OSError):
+        # The cache is optional (e.g. the directory may be read-only).
+        pass
+    return matrix
+
+
+def read_nmag_timesteps(filename, table=NMAG_FIELD_TABLE, skip_initial=True):
+    """
+    Return the timesteps (in seconds) of the rows of the field table
+    `table` in the Nmag `_dat.h5` file `filename`. If `skip_initial` is
+    True (the default), the first row (the initial state at t = 0) is
+    skipped, as in `dynamic_txyz.txt`.
+    """
+    with import_h5py().File(filename, 'r') as f:
+        timesteps = np.asarray(f[table]['time'], dtype=float)
+    return timesteps[1:] if skip_initial else timesteps
+
+
+def read_nmag_field(filename, table=NMAG_FIELD_TABLE, skip_initial=True):
+    """
+    Return the values of the field in the table `table` of the Nmag
+    `_dat.h5` file `filename` at the mesh nodes, as an array of shape
+    (N, num_points, 3) (see `read_nmag_timesteps` for `skip_initial`).
+    """
+    with import_h5py().File(filename, 'r') as f:
+        values = f[table]['data']
+    return values[1:] if skip_initial else values
+
+
+def resample_field(values, interpolation_matrix):
+    """
+    Resample the field values at the mesh nodes (shape (N, num_points, 3))
+    at the probe points using the given interpolation matrix (shape (P,
+    num_points)). All timesteps and components are resampled in a single
+    sparse-dense product. Returns an array of shape (3, N, P).
+    """
+    import scipy.sparse
+
+    num_timesteps, num_points, dim = values.shape
+    # Apply the weights to all components at once, so that the values can
+    # be used in their stored order (as a transposed view, without a copy).
+    matrix = scipy.sparse.kron(interpolation_matrix, scipy.sparse.identity(dim), format='csr')
+    resampled = matrix.dot(values.reshape(num_timesteps, num_points * dim).T)
+    return np.ascontiguousarray(resampled.reshape(-1, dim, num_timesteps).transpose(1, 2, 0))
+
+
+def convert_nmag_h5_output(dat_filename, mesh_filename=None, output_dir='.', grid_shape=DEFAULT_GRID_SHAPE,
+                           probe_height=DEFAULT_PROBE_HEIGHT, cell_centres=True, dtype=np.float64,
+                           cache_dir=None):
+    """
+    Resample the magnetisation in the Nmag `_dat.h5` file `dat_filename`
+    on a regular grid (see `get_probe_points`) which covers the mesh in
+    `mesh_filename` (default: the mesh stored in `dat_filename`), and save
+    it to the files `mxs.npy`, `mys.npy` and `mzs.npy` in `output_dir`, in
+    the same format as `nmagprobe_conversion.convert_nmagprobe_output`.
+
+    Returns a pair `(filenames, timesteps)` containing the list of the
+    filenames written and a 1D array with the timesteps.
+    """
+    points, simplices = read_nmag_mesh(dat_filename if mesh_filename is None else mesh_filename)
+    lower, upper = points.min(axis=0), points.max(axis=0)
+    probe_points = get_probe_points((lower[0], upper[0]), (lower[1], upper[1]), probe_height,
+                                    grid_shape=grid_shape, cell_centres=cell_centres)
+    matrix = get_interpolation_matrix(points, simplices, probe_points, cache_dir=cache_dir)
+
+    timesteps = read_nmag_timesteps(dat_filename)
+    m_full = resample_field(read_nmag_field(dat_filename), matrix)
+
+    filenames = [os.path.join(output_dir, 'm{}s.npy'.format(c)) for c in 'xyz']
+    for filename, m in zip(filenames, m_full):
+        np.save(filename, m.reshape((len(timesteps),) + tuple(grid_shape)).astype(dtype, copy=False))
+    return filenames, timesteps
@@ -0,0 +1,211 @@
+"""
+Conversion of the output of Nmag's `nmagprobe` tool into the arrays
+`mxs.npy`, `mys.npy`, `mzs.npy` which contain the spatially resolved
+magnetisation (in the same format as for OOMMF).
+
+Each line of the probe output contains the time, optionally followed
+by the coordinates of the probe point, and then the value of the field
+at this point in square brackets, e.g.:
+
+    5e-12 2.5 2.5 5 [0.787 0.592 -2.48e-05]
+
+Lines for the same time are contiguous, and the probe points appear in
+the same order for each time.
+
+The file is read in chunks of fixed size, and each chunk is parsed with
+vectorised numpy operations and written straight into memory-mapped
+`.npy` files. Thus arbitrarily large probe files can be converted in
+bounded memory. The number of timesteps and the size of the sampling
+grid are inferred from the data.
+
+"""
+
+import numpy as np
+import os
+import re
+
+OUTPUT_FILENAMES = {'x': 'mxs.npy', 'y': 'mys.npy', 'z': 'mzs.npy'}
+
+COMMENT_REGEX = re.compile(br'#[^\n]*')
+
+
+def iter_text_chunks(filename, chunk_size):
+    """
+    Read the file `filename` in chunks of (approximately) `chunk_size`
+    bytes and yield them, making sure that each chunk ends at a line break.
+
+    """
+    with open(filename, 'rb') as f:
+        remainder = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            last_newline = chunk.rfind(b'\n')
+            if last_newline == -1:
+                remainder = chunk
+                continue
+            remainder = chunk[last_newline + 1:]
+            yield chunk[:last_newline + 1]
+        if remainder.strip():
+            yield remainder
+
+
+def get_line_layout(line):
+    """
+    Return a pair `(num_columns, idx_m)` for a line of nmagprobe output,
+    where `num_columns` is the total number of values in the line and
+    `idx_m` is the index of the first field component.
+
+    """
+    before, rest = line.split(b'[', 1)
+    inside, after = rest.split(b']', 1)
+    num_before = len(before.split())
+    return num_before + len(inside.split()) + len(after.split()), num_before
+
+
+def parse_lines(text, num_columns):
+    """
+    Parse a chunk of nmagprobe output (comments and blank lines are
+    ignored) and return an array of shape (num_lines, num_columns).
+
+    """
+    text = COMMENT_REGEX.sub(b'', text)
+    values = np.array(text.replace(b'[', b' ').replace(b']', b' ').split(), dtype=float)
+    if len(values) % num_columns != 0:
+        raise ValueError("Invalid nmagprobe output: lines have different numbers of values.")
+    return values.reshape(-1, num_columns)
+
+
+def iter_parsed_chunks(filename, chunk_size):
+    """
+    Yield pairs `(rows, idx_m)` where `rows` is a 2D array containing the
+    values of the lines in each chunk of the file (see `parse_lines`) and
+    `idx_m` is the column index of the first field component.
+
+    """
+    layout = None
+    for chunk in iter_text_chunks(filename, chunk_size):
+        if layout is None:
+            match = re.search(br'^[^#\n]*\[[^\n]*$', chunk, flags=re.MULTILINE)
+            if match is None:
+                continue
+            layout = get_line_layout(match.group(0))
+        yield parse_lines(chunk, layout[0]), layout[1]
+
+
+def count_lines(filename, chunk_size):
+    """
+    Return the number of data lines in the nmagprobe output file
+    `filename`. This is cheap because it only counts the opening
+    brackets (each data line contains exactly one).
+
+    """
+    num_lines = 0
+    for chunk in iter_text_chunks(filename, chunk_size):
+        num_lines += COMMENT_REGEX.sub(b'', chunk).count(b'[')
+    return num_lines
+
+
+def infer_grid_shape(positions):
+    """
+    Infer the shape of the sampling grid from the coordinates of the
+    probe points (a 2D array with one row per point, in the order in
+    which they appear in the probe output). The result is a tuple
+    `(n_slow, n_fast)`, where `n_slow` is the number of distinct values
+    of the coordinate which varies slowest.
+
+    If no coordinates are available (i.e. `positions` has zero columns),
+    the grid is assumed to be square.
+
+    """
+    num_points, num_coords = positions.shape
+
+    if num_coords == 0:
+        n = int(round(np.sqrt(num_points)))
+        if n * n != num_points:
+            raise ValueError(
+                "Cannot infer grid shape for {} probe points without coordinates.".format(num_points))
+        return (n, n)
+
+    # The slowest varying coordinate is the one which changes least often
+    # between consecutive probe points (and which changes at all).
+    num_changes = (np.diff(positions, axis=0) != 0).sum(axis=0)
+    candidates = [i for i in range(num_coords) if num_changes[i] > 0]
+    if not candidates:
+        return (1, num_points)
+    idx_slowest = min(candidates, key=lambda i: num_changes[i])
+    n_slow = len(np.unique(positions[:, idx_slowest]))
+
+    if num_points % n_slow != 0:
+        raise ValueError("Probe points do not form a regular grid.")
+    return (n_slow, num_points // n_slow)
+
+
+def convert_nmagprobe_output(filename, output_dir='.', grid_shape=None, chunk_size=16 * 1024**2,
+                             dtype=np.float64):
+    """
+    Convert the nmagprobe output file `filename` into the files `mxs.npy`,
+    `mys.npy` and `mzs.npy` in `output_dir`. Each of these contains an
+    array of shape (N, n1, n2), where N is the number of timesteps and
+    n1 x n2 is the shape of the sampling grid (the probe points are
+    stored in the order in which they appear in the file).
+
+    The number of timesteps and the grid shape are inferred from the
+    data, but the latter can also be given explicitly via `grid_shape`.
+    The file is read in chunks of `chunk_size` bytes, so memory usage
+    is bounded independently of the size of the file.
+
+    Returns a pair `(filenames, timesteps)` containing the list of the
+    filenames written and a 1D array with the timesteps in the file.
+
+    """
+    # Determine the number of probe points per timestep from the lines
+    # for the first timestep, which normally all lie in the first chunk.
+    first_rows = []
+    for rows, idx_m in iter_parsed_chunks(filename, chunk_size):
+        first_rows.append(rows)
+        if np.any(rows[:, 0] != first_rows[0][0, 0]):
+            break
+    if not first_rows:
+        raise ValueError("No data found in nmagprobe output file '{}'".format(filename))
+    first_rows = np.concatenate(first_rows)
+    num_points = int(np.argmax(first_rows[:, 0] != first_rows[0, 0])) or len(first_rows)
+
+    if grid_shape is None:
+        grid_shape = infer_grid_shape(first_rows[:num_points, 1:idx_m])
+    grid_shape = tuple(grid_shape)
+    if grid_shape[0] * grid_shape[1] != num_points:
+        raise ValueError(
+            "Grid shape {} does not match the number of probe points ({})".format(grid_shape, num_points))
+
+    num_lines = count_lines(filename, chunk_size)
+    if num_lines % num_points != 0:
+        raise ValueError(
+            "Number of lines ({}) is not a multiple of the number of probe "
+            "points ({})".format(num_lines, num_points))
+    num_timesteps = num_lines // num_points
+
+    filenames = [os.path.join(output_dir, OUTPUT_FILENAMES[c]) for c in 'xyz']
+    shape = (num_timesteps,) + grid_shape
+    outputs = [np.lib.format.open_memmap(f, mode='w+', dtype=dtype, shape=shape) for f in filenames]
+    outputs_flat = [output.reshape(-1) for output in outputs]
+    timesteps = np.empty(num_timesteps)
+
+    line = 0
+    for rows, idx_m in iter_parsed_chunks(filename, chunk_size):
+        n = len(rows)
+        for i, output_flat in enumerate(outputs_flat):
+            output_flat[line:line + n] = rows[:, idx_m + i]
+        # Store the time of each timestep (i.e. of its first probe point)
+        first_point = (-line) % num_points
+        timesteps[(line + first_point) // num_points:(line + n + num_points - 1) // num_points] = \
+            rows[first_point::num_points, 0]
+        line += n
+
+    for output in outputs:
+        output.flush()
+    del outputs, outputs_flat
+
+    return filenames, timesteps
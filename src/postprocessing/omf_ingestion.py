@@ -0,0 +1,108 @@
+"""
+Conversion of the magnetisation snapshots (`.omf` files) written by
+OOMMF during the dynamic stage into the arrays `mxs.npy`, `mys.npy`,
+`mzs.npy` which contain the spatially resolved magnetisation sampled
+at half the height of the film.
+
+The snapshots are parsed in a pool of worker processes. Each worker
+reduces its snapshot to the sampled plane before sending it back, and
+the results are written straight into preallocated memory-mapped
+`.npy` files. Thus peak memory usage does not depend on the number of
+snapshots.
+
+"""
+
+import multiprocessing
+import numpy as np
+import os
+
+from .ovf import read_ovf
+
+OUTPUT_FILENAMES = {'x': 'mxs.npy', 'y': 'mys.npy', 'z': 'mzs.npy'}
+
+
+def sample_central_plane(data):
+    """
+    Return the magnetisation at half the height of the sample, given the
+    full vector field `data` of shape (znodes, ynodes, xnodes, 3) as
+    returned by `ovf.read_ovf`. The result has shape (ynodes, xnodes, 3).
+
+    For an even number of layers this is the average of the two central
+    layers. For the standard problem, which is discretised into two layers
+    of 5 nm each, this is the average of the top and bottom layer and
+    represents the magnetisation at a height of z=5nm.
+
+    """
+    znodes = data.shape[0]
+    if znodes % 2 == 1:
+        return data[znodes // 2]
+    else:
+        return 0.5 * (data[znodes // 2 - 1] + data[znodes // 2])
+
+
+def read_sampled_snapshot(filename):
+    """
+    Read the OVF file `filename` and return the magnetisation sampled
+    at half the height of the sample (see `sample_central_plane`).
+
+    """
+    _, data = read_ovf(filename)
+    return sample_central_plane(data)
+
+
+def convert_omf_snapshots(omf_files, output_dir='.', num_processes=None, chunksize=4, dtype=np.float64):
+    """
+    Convert the OVF files in `omf_files` (which must be given in
+    chronological order) into the files `mxs.npy`, `mys.npy` and `mzs.npy`
+    in `output_dir`. Each of these contains an array of shape (N, ny, nx),
+    where N is the number of snapshots and ny x nx is the size of the grid.
+
+    The snapshots are parsed in parallel using `num_processes` worker
+    processes (default: the number of CPUs). If `num_processes` is 1 then
+    all snapshots are parsed in the current process. The data is stored
+    with the given `dtype` (default: float64).
+
+    Returns the list of filenames written.
+
+    """
+    if len(omf_files) == 0:
+        raise ValueError("No .omf files given.")
+
+    # Read the first snapshot to determine the grid size.
+    first_snapshot = read_sampled_snapshot(omf_files[0])
+    shape = (len(omf_files),) + first_snapshot.shape[:2]
+
+    filenames = [os.path.join(output_dir, OUTPUT_FILENAMES[c]) for c in 'xyz']
+    outputs = [np.lib.format.open_memmap(f, mode='w+', dtype=dtype, shape=shape) for f in filenames]
+
+    def store_snapshot(idx, snapshot):
+        if snapshot.shape[:2] != shape[1:]:
+            raise ValueError(
+                "Snapshot '{}' has grid size {}, expected {}".format(
+                    omf_files[idx], snapshot.shape[:2], shape[1:]))
+        for i, output in enumerate(outputs):
+            output[idx] = snapshot[:, :, i]
+
+    store_snapshot(0, first_snapshot)
+
+    if num_processes is None:
+        num_processes = multiprocessing.cpu_count()
+
+    if num_processes == 1:
+        for idx, filename in enumerate(omf_files[1:], start=1):
+            store_snapshot(idx, read_sampled_snapshot(filename))
+    else:
+        pool = multiprocessing.Pool(processes=num_processes)
+        try:
+            snapshots = pool.imap(read_sampled_snapshot, omf_files[1:], chunksize=chunksize)
+            for idx, snapshot in enumerate(snapshots, start=1):
+                store_snapshot(idx, snapshot)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    for output in outputs:
+        output.flush()
+    del outputs
+
+    return filenames
@@ -0,0 +1,250 @@
+"""
+Reading and writing of files in OOMMF's OVF format (used for the
+`.omf` magnetisation snapshots produced by OOMMF).
+
+The format is described in the OOMMF user guide, see e.g.
+
+   http://math.nist.gov/oommf/doc/userguide12a6/userguide/OVF_1.0_format.html
+   http://math.nist.gov/oommf/doc/userguide12a6/userguide/OVF_2.0_format.html
+
+Note that the data values are stored such that the x-index varies
+fastest, then the y-index, and the z-index varies slowest.
+
+Both the text and the binary (4- and 8-byte) data representations
+are supported. Binary data blocks are decoded without copying via
+`np.frombuffer`. In OVF 2.0 files binary values are stored in
+little-endian byte order, in OVF 1.0 files in big-endian byte order.
+Each binary data block starts with a "validation tag" (a known
+value) which is checked when reading the file.
+
+"""
+
+import numpy as np
+
+# Validation tags at the start of binary data blocks (see OVF specification)
+BINARY_VALIDATION_TAGS = {4: 1234567.0, 8: 123456789012345.0}
+
+
+def parse_ovf_header(header_lines):
+    """
+    Return a dictionary containing the key/value pairs in the given
+    OVF header lines (e.g. '# xnodes: 24'). Keys are converted to lower
+    case. Values are converted to int or float where possible.
+
+    """
+    header = {}
+    for line in header_lines:
+        line = line.lstrip('#').strip()
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key in ('begin', 'end'):
+            continue
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        header[key] = value
+    return header
+
+
+def split_ovf_file(content):
+    """
+    Split the raw content (a bytes object) of an OVF file with a single
+    segment into the header lines, the data representation (e.g. 'text',
+    'binary 4' or 'binary 8') and the offset at which the data block starts.
+
+    """
+    begin_data = content.lower().find(b'# begin: data')
+    if begin_data == -1:
+        raise ValueError("Invalid OVF file: no data block found.")
+
+    # The data block starts right after the line containing "# Begin: Data ..."
+    end_of_begin_line = content.index(b'\n', begin_data)
+    representation = content[begin_data + len(b'# begin: data'):end_of_begin_line].decode('ascii')
+    representation = ' '.join(representation.lower().split())
+
+    header_lines = content[:begin_data].decode('ascii', 'replace').splitlines()
+
+    return header_lines, representation, end_of_begin_line + 1
+
+
+def get_ovf_version(header_lines):
+    """
+    Return the version of the OVF format (either '1.0' or '2.0') as
+    determined from the first line of the file.
+
+    """
+    first_line = header_lines[0].lower() if header_lines else ''
+    if 'ovf 2.0' in first_line:
+        return '2.0'
+    elif 'v1.0' in first_line or 'ovf 1.0' in first_line:
+        return '1.0'
+    else:
+        raise ValueError("Invalid OVF file: unknown format '{}'".format(first_line.strip()))
+
+
+def decode_text_data(content, offset):
+    """
+    Decode the values in the text data block of an OVF file starting
+    at `offset` in `content`. Returns a 1D numpy array.
+
+    """
+    end_data = content.lower().find(b'# end: data', offset)
+    if end_data == -1:
+        raise ValueError("Invalid OVF file: data block is not terminated.")
+
+    # Parsing the whitespace separated values directly is considerably
+    # faster than using `np.loadtxt` (in older numpy versions).
+    return np.array(content[offset:end_data].split(), dtype=float)
+
+
+def decode_binary_data(content, offset, num_values, num_bytes, byteorder):
+    """
+    Decode `num_values` binary floating point values of size `num_bytes`
+    (4 or 8) in the data block of an OVF file starting at `offset` in
+    `content`, after checking the validation tag. The argument `byteorder`
+    must be '<' (little-endian) or '>' (big-endian).
+
+    The returned 1D array is a read-only view into `content` (no copy).
+
+    """
+    try:
+        expected_tag = BINARY_VALIDATION_TAGS[num_bytes]
+    except KeyError:
+        raise ValueError("Unsupported size of binary values: {}".format(num_bytes))
+
+    dtype = np.dtype('{}f{}'.format(byteorder, num_bytes))
+    if len(content) < offset + (num_values + 1) * num_bytes:
+        raise ValueError("Invalid OVF file: binary data block is truncated.")
+
+    tag = np.frombuffer(content, dtype=dtype, count=1, offset=offset)[0]
+    if tag != expected_tag:
+        raise ValueError(
+            "Invalid OVF file: wrong validation tag in binary data block "
+            "(expected {!r}, got {!r}).".format(expected_tag, tag))
+
+    return np.frombuffer(content, dtype=dtype, count=num_values, offset=offset + num_bytes)
+
+
+def get_ovf_grid_shape(header):
+    """
+    Return the tuple (znodes, ynodes, xnodes) describing the grid on
+    which the data in an OVF file with the given header is sampled.
+    This is the shape (minus the trailing vector dimension) of the
+    array returned by `read_ovf`.
+
+    """
+    return (header['znodes'], header['ynodes'], header['xnodes'])
+
+
+def read_ovf(filename):
+    """
+    Read the OVF file `filename`.
+
+    Returns a pair `(header, data)` where `header` is a dictionary
+    containing the header information (see `parse_ovf_header`) and
+    `data` is a numpy array of shape (znodes, ynodes, xnodes, valuedim).
+
+    """
+    with open(filename, 'rb') as f:
+        content = f.read()
+
+    header_lines, representation, offset = split_ovf_file(content)
+    header = parse_ovf_header(header_lines)
+    valuedim = header.get('valuedim', 3)  # OVF 1.0 files only support 3D vector fields
+    shape = get_ovf_grid_shape(header) + (valuedim,)
+
+    if representation == 'text':
+        data = decode_text_data(content, offset)
+    elif representation in ('binary 4', 'binary 8'):
+        byteorder = '<' if get_ovf_version(header_lines) == '2.0' else '>'
+        num_bytes = int(representation.split()[1])
+        data = decode_binary_data(content, offset, int(np.prod(shape)), num_bytes, byteorder)
+    else:
+        raise ValueError("Unsupported OVF data representation: '{}'".format(representation))
+
+    return header, data.reshape(shape)
+
+
+def get_ovf_representation(filename):
+    """
+    Return the data representation ('text', 'binary 4' or 'binary 8')
+    used in the OVF file `filename`, reading only its header.
+
+    """
+    with open(filename, 'rb') as f:
+        content = b''
+        while b'# begin: data' not in content.lower():
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            content += chunk
+        # Make sure we have the full "Begin: Data" line
+        content += f.readline()
+
+    _, representation, _ = split_ovf_file(content)
+    return representation
+
+
+def write_ovf(filename, data, cellsize=(5e-9, 5e-9, 5e-9), title='m', representation='text', fmt='%#.8g'):
+    """
+    Write the vector field `data` (a numpy array of shape
+    (znodes, ynodes, xnodes, 3)) to the file `filename` in OVF 2.0
+    format. The argument `representation` can be 'text' (in which case
+    the values are formatted using `fmt`), 'binary 4' or 'binary 8'.
+
+    This is mainly useful to create synthetic test data.
+
+    """
+    znodes, ynodes, xnodes, valuedim = data.shape
+    dx, dy, dz = cellsize
+
+    header = [
+        "# OOMMF OVF 2.0",
+        "#",
+        "# Segment count: 1",
+        "#",
+        "# Begin: Segment",
+        "# Begin: Header",
+        "#",
+        "# Title: {}".format(title),
+        "# meshtype: rectangular",
+        "# meshunit: m",
+        "# xmin: 0", "# ymin: 0", "# zmin: 0",
+        "# xmax: {!r}".format(xnodes * dx),
+        "# ymax: {!r}".format(ynodes * dy),
+        "# zmax: {!r}".format(znodes * dz),
+        "# valuedim: {}".format(valuedim),
+        "# valuelabels: m_x m_y m_z",
+        "# valueunits: 1 1 1",
+        "# xbase: {!r}".format(dx / 2.), "# ybase: {!r}".format(dy / 2.), "# zbase: {!r}".format(dz / 2.),
+        "# xnodes: {}".format(xnodes), "# ynodes: {}".format(ynodes), "# znodes: {}".format(znodes),
+        "# xstepsize: {!r}".format(dx), "# ystepsize: {!r}".format(dy), "# zstepsize: {!r}".format(dz),
+        "# End: Header",
+        "#",
+        ]
+
+    if representation == 'text':
+        label = 'Text'
+    elif representation in ('binary 4', 'binary 8'):
+        num_bytes = int(representation.split()[1])
+        label = 'Binary {}'.format(num_bytes)
+    else:
+        raise ValueError("Unsupported OVF data representation: '{}'".format(representation))
+
+    with open(filename, 'wb') as f:
+        f.write(("\n".join(header) + "\n").encode('ascii'))
+        f.write("# Begin: Data {}\n".format(label).encode('ascii'))
+        if representation == 'text':
+            np.savetxt(f, data.reshape(-1, valuedim), fmt=fmt)
+        else:
+            values = np.concatenate([[BINARY_VALIDATION_TAGS[num_bytes]], data.ravel()])
+            f.write(values.astype('<f{}'.format(num_bytes)).tobytes())
+            f.write(b"\n")
+        f.write("# End: Data {}\n".format(label).encode('ascii'))
+        f.write(b"# End: Segment\n")
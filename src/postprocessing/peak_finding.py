@@ -0,0 +1,161 @@
+"""
+Detection of peaks in power spectra.
+
+All peaks of a spectrum are detected once (as local maxima with a given
+minimum prominence) and their positions are refined to sub-bin precision.
+Looking up the peak closest to one or many approximate frequencies is
+then a cheap binary search, so that a single detection pass can answer
+any number of queries (e.g. for batches of spectra or mode maps).
+
+This replaces the previous approach using `scipy.signal.find_peaks_cwt`,
+which recomputed a continuous wavelet transform for every query and
+located peaks up to one bin away from the actual maxima.
+
+"""
+
+import numpy as np
+
+
+def refine_peak_positions(values, peak_indices):
+    """
+    Return the sub-bin offsets (between -1 and 1) of the vertices of the
+    parabolas through the values at each peak index and its two neighbours.
+    """
+    a = values[peak_indices - 1]
+    b = values[peak_indices]
+    c = values[peak_indices + 1]
+    denominator = a - 2 * b + c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offsets = np.where(denominator != 0, 0.5 * (a - c) / denominator, 0.0)
+    return np.clip(offsets, -1.0, 1.0)
+
+
+class PeakFinder(object):
+    """
+    Detect all peaks in a spectrum once and answer queries for the peak
+    closest to any number of approximate frequencies.
+
+    Peaks are local maxima of the spectrum whose prominence is at least
+    `min_prominence`. If `log_scale` is True (the default), prominences
+    are measured on the logarithm (base 10) of the spectrum, i.e. in
+    decades, which is appropriate for spectra covering many orders of
+    magnitude.
+
+    The peak positions are refined to sub-bin precision using the given
+    `interpolation` method:
+
+    - 'parabolic': fit a parabola through the logarithm of the spectrum
+      at the peak and its two neighbours (exact for Gaussian peaks);
+
+    - 'lorentzian': fit a parabola through the reciprocal of the spectrum
+      (exact for Lorentzian peaks, as expected for damped oscillations);
+
+    - None: return the frequencies of the FFT bins.
+
+    Example:
+
+        >>> peak_finder = PeakFinder(freqs, spectrum)
+        >>> peak_finder.find_peak_frequency([8.25, 11.25])
+
+    """
+
+    def __init__(self, freqs, spectrum, min_prominence=0.5, log_scale=True, interpolation='parabolic'):
+        if interpolation not in ('parabolic', 'lorentzian', None):
+            raise ValueError(
+                "Argument 'interpolation' must be one of 'parabolic', 'lorentzian', None. "
+                "Got: '{}'".format(interpolation))
+
+        self.freqs = np.asarray(freqs)
+        self.spectrum = np.asarray(spectrum)
+        self.min_prominence = min_prominence
+        self.log_scale = log_scale
+        self.interpolation = interpolation
+
+        self.peak_indices, self.prominences = self._detect_peaks()
+        self.peak_freqs = self._refine_peak_frequencies()
+        self._linewidths = None
+
+    def _get_positive_spectrum(self):
+        # Replace zeros (e.g. in synthetic data) by a tiny value so that
+        # logarithms and reciprocals are well defined.
+        floor = max(self.spectrum.max(), np.finfo(float).tiny) * 1e-30
+        return np.maximum(self.spectrum, floor)
+
+    def _detect_peaks(self):
+        values = np.log10(self._get_positive_spectrum()) if self.log_scale else self.spectrum
+        import scipy.signal  # imported on first use (it is slow to import)
+        peak_indices, properties = scipy.signal.find_peaks(values, prominence=self.min_prominence)
+        return peak_indices, properties['prominences']
+
+    def _refine_peak_frequencies(self):
+        bin_freqs = self.freqs[self.peak_indices]
+        if self.interpolation is None or len(self.peak_indices) == 0:
+            return bin_freqs
+
+        if self.interpolation == 'parabolic':
+            values = np.log(self._get_positive_spectrum())
+        else:
+            values = 1.0 / self._get_positive_spectrum()
+
+        offsets = refine_peak_positions(values, self.peak_indices)
+        df = self.freqs[self.peak_indices + 1] - bin_freqs
+        return bin_freqs + offsets * df
+
+    def get_peak_frequencies(self):
+        """
+        Return the (refined) frequencies of all detected peaks in ascending order.
+        """
+        return self.peak_freqs
+
+    def get_peak_indices(self, approx_freqs):
+        """
+        Return the indices (into the array of detected peaks) of the peaks
+        closest to each of the given approximate frequencies. The distance
+        is measured from the frequency of the FFT bin of each peak.
+        """
+        if len(self.peak_indices) == 0:
+            raise ValueError("No peaks found in spectrum.")
+
+        bin_freqs = self.freqs[self.peak_indices]
+        approx_freqs = np.asarray(approx_freqs, dtype=float)
+
+        # Binary search for the neighbouring peaks and pick the closer one.
+        idx = np.clip(np.searchsorted(bin_freqs, approx_freqs), 1, max(len(bin_freqs) - 1, 1))
+        idx_lower = idx - 1
+        idx_upper = np.minimum(idx, len(bin_freqs) - 1)
+        use_upper = abs(bin_freqs[idx_upper] - approx_freqs) < abs(bin_freqs[idx_lower] - approx_freqs)
+        return np.where(use_upper, idx_upper, idx_lower)
+
+    def find_peak_frequency(self, approx_freqs):
+        """
+        Return the frequency of the peak closest to `approx_freqs`, which
+        can be a single frequency or an array of frequencies (in which case
+        an array of the same shape is returned).
+        """
+        return self.peak_freqs[self.get_peak_indices(approx_freqs)]
+
+    def get_peak_amplitudes(self):
+        """
+        Return the values of the spectrum at all detected peaks.
+        """
+        return self.spectrum[self.peak_indices]
+
+    def get_linewidths(self):
+        """
+        Return the linewidths of all detected peaks, i.e. their full width
+        at half maximum (in the units of `freqs`). The half maximum points
+        are located by linear interpolation between the FFT bins.
+        """
+        if self._linewidths is None:
+            import scipy.signal
+            widths, _, _, _ = scipy.signal.peak_widths(self.spectrum, self.peak_indices, rel_height=0.5)
+            self._linewidths = widths * (self.freqs[1] - self.freqs[0])
+        return self._linewidths
+
+    def get_peak_properties(self, approx_freqs):
+        """
+        Return a tuple `(peak_freqs, amplitudes, linewidths)` for the peaks
+        closest to `approx_freqs` (see `find_peak_frequency`).
+        """
+        idx = self.get_peak_indices(approx_freqs)
+        return self.peak_freqs[idx], self.get_peak_amplitudes()[idx], self.get_linewidths()[idx]
@@ -0,0 +1,363 @@
+"""
+Stage-level timing and memory instrumentation.
+
+When profiling is enabled (see `enable_profiling` or the context manager
+`profile`), the functions and methods listed in `DEFAULT_TARGETS` (the
+data reader methods, each function in `fft_utils`, the peak finder and
+spectral analysis methods and the figure builders) are replaced by thin
+wrappers which record, for every call:
+
+- the wall-clock duration (inclusive and exclusive of nested stages),
+- the resident set size (RSS) of the process before and after the call,
+- optionally (`trace_memory=True`) the peak memory allocated during the
+  call, measured with `tracemalloc` (this slows down the computation).
+
+The wrappers are installed by replacing the attributes of the modules and
+classes in which the functions are defined and into which they have been
+imported, and are removed again by `disable_profiling`. Thus profiling
+is zero-cost when disabled: no code path is changed at all.
+
+Further stages (e.g. saving figures) can be recorded either by passing
+additional targets to `enable_profiling` or via `Profiler.stage`.
+
+The recorded events can be summarised per stage (`Profiler.format_summary`)
+and written to a JSON file (`Profiler.write_json`) or to a file in the Chrome
+trace event format (`Profiler.write_chrome_trace`), which can be viewed in
+chrome://tracing or https://ui.perfetto.dev.
+
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# List of (module name, object name, category) of the functions and classes
+# which are instrumented by default. For classes, all public methods defined
+# in the class itself are instrumented.
+DEFAULT_TARGETS = [
+    ('postprocessing.data_reader', 'DataReader', 'data_reader'),
+    ('postprocessing.data_reader', 'BaseDataReader', 'data_reader'),
+    ('postprocessing.fft_utils', '*', 'fft_utils'),
+    ('postprocessing.fft_utils', 'SpectralEstimator', 'fft_utils'),
+    ('postprocessing.peak_finding', 'PeakFinder', 'peak_finding'),
+    ('postprocessing.spectral_analysis', 'SpectralAnalysis', 'spectral_analysis'),
+    ('postprocessing.figure_plotting', 'make_figure_2', 'figures'),
+    ('postprocessing.figure_plotting', 'make_figure_3', 'figures'),
+    ('postprocessing.figure_plotting', 'make_figure_4', 'figures'),
+    ('postprocessing.figure_plotting', 'make_figure_5', 'figures'),
+    ]
+
+_active_profiler = None
+_installed_patches = []
+
+
+def get_rss():
+    """
+    Return the resident set size of the current process in bytes (or
+    None if it cannot be determined on this platform).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+class Profiler(object):
+    """
+    Recorder for the timing and memory usage of (nested) stages.
+
+    Use `stage(name, category)` as a context manager to record a stage.
+    The events are stored in the list `events`; each event is a dictionary
+    with the keys 'name', 'category', 'start', 'duration', 'self_duration',
+    'rss_before', 'rss_after', 'peak_memory' (None unless `trace_memory`
+    is True), 'depth', 'pid' and 'tid'. Times are in seconds and memory
+    sizes in bytes.
+    """
+
+    def __init__(self, trace_memory=False, sample_rss=True):
+        self.trace_memory = trace_memory
+        self.sample_rss = sample_rss
+        self.events = []
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        """
+        Stop tracing memory allocations (if this profiler started it).
+        """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _get_stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, category=''):
+        """
+        Context manager which records the enclosed code as a stage with the given name.
+        """
+        stack = self._get_stack()
+        frame = {'children_duration': 0.0, 'peak': 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_memory'] = current
+        rss_before = get_rss() if self.sample_rss else None
+        stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+
+            peak_memory = None
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                peak_memory = peak - frame['start_memory']
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            if stack:
+                stack[-1]['children_duration'] += duration
+
+            self.events.append({
+                'name': name,
+                'category': category,
+                'start': start,
+                'duration': duration,
+                'self_duration': duration - frame['children_duration'],
+                'rss_before': rss_before,
+                'rss_after': get_rss() if self.sample_rss else None,
+                'peak_memory': peak_memory,
+                'depth': len(stack),
+                'pid': os.getpid(),
+                'tid': threading.current_thread().ident,
+                })
+
+    def wrap(self, func, name, category=''):
+        """
+        Return a wrapper of `func` which records each call as a stage.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name, category):
+                return func(*args, **kwargs)
+        wrapper._profiling_original = func
+        return wrapper
+
+    def add_events(self, events):
+        """
+        Add events recorded elsewhere (e.g. by a profiler in a worker process).
+        """
+        self.events.extend(events)
+
+    def get_summary(self):
+        """
+        Return an ordered dictionary mapping the name of each stage to a
+        dictionary with the number of calls ('calls'), the total inclusive
+        and exclusive time ('total', 'self'), the maximum RSS after any call
+        ('max_rss'), the maximum increase of the RSS during a call
+        ('max_rss_increase') and the maximum peak memory of any call
+        ('peak_memory'). The stages are sorted by decreasing exclusive time.
+        """
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(event['name'], {
+                'category': event['category'], 'calls': 0, 'total': 0.0, 'self': 0.0,
+                'max_rss': None, 'max_rss_increase': None, 'peak_memory': None})
+            entry['calls'] += 1
+            entry['total'] += event['duration']
+            entry['self'] += event['self_duration']
+            if event['rss_after'] is not None:
+                entry['max_rss'] = max(entry['max_rss'] or 0, event['rss_after'])
+                entry['max_rss_increase'] = max(entry['max_rss_increase'] or 0,
+                                                event['rss_after'] - event['rss_before'])
+            if event['peak_memory'] is not None:
+                entry['peak_memory'] = max(entry['peak_memory'] or 0, event['peak_memory'])
+        return OrderedDict(sorted(summary.items(), key=lambda item: -item[1]['self']))
+
+    def get_category_summary(self):
+        """
+        Return an ordered dictionary mapping each category to the total
+        exclusive time spent in its stages (sorted by decreasing time).
+        """
+        totals = {}
+        for event in self.events:
+            totals[event['category']] = totals.get(event['category'], 0.0) + event['self_duration']
+        return OrderedDict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def format_summary(self):
+        """
+        Return a human-readable table with the per-stage and per-category breakdown.
+        """
+        def format_bytes(num_bytes):
+            return '-' if num_bytes is None else '{:.1f}'.format(num_bytes / 1024.**2)
+
+        lines = ["{:<60} {:>6} {:>10} {:>10} {:>10} {:>10}".format(
+            'Stage', 'Calls', 'Total [s]', 'Self [s]', 'RSS [MB]', 'Peak [MB]')]
+        for name, entry in self.get_summary().items():
+            lines.append("{:<60} {:>6} {:>10.4f} {:>10.4f} {:>10} {:>10}".format(
+                name, entry['calls'], entry['total'], entry['self'],
+                format_bytes(entry['max_rss']), format_bytes(entry['peak_memory'])))
+
+        lines.append("")
+        lines.append("{:<60} {:>10}".format('Category', 'Self [s]'))
+        for category, total in self.get_category_summary().items():
+            lines.append("{:<60} {:>10.4f}".format(category or '(none)', total))
+        return '\n'.join(lines)
+
+    def write_json(self, filename):
+        """
+        Write the summary and all recorded events to the JSON file `filename`.
+        """
+        data = {'summary': self.get_summary(), 'categories': self.get_category_summary(), 'events': self.events}
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    def write_chrome_trace(self, filename):
+        """
+        Write the recorded events to `filename` in the Chrome trace event
+        format (one 'complete' event per stage, with timestamps in
+        microseconds), e.g. for viewing in chrome://tracing.
+        """
+        t0 = min([event['start'] for event in self.events] or [0.0])
+        trace_events = []
+        for event in sorted(self.events, key=lambda e: e['start']):
+            args = {key: event[key] for key in ('rss_before', 'rss_after', 'peak_memory')
+                    if event[key] is not None}
+            trace_events.append({
+                'name': event['name'], 'cat': event['category'], 'ph': 'X',
+                'ts': (event['start'] - t0) * 1e6, 'dur': event['duration'] * 1e6,
+                'pid': event['pid'], 'tid': event['tid'], 'args': args})
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _get_targets(targets):
+    """
+    Resolve the list of (module name, object name, category) tuples into a
+    list of (owner, attribute name, function, stage name, category), where
+    `owner` is the module or class whose attribute is to be replaced.
+    """
+    resolved = []
+    for target in targets:
+        module_name, name, category = target[:3]
+        stage_name = target[3] if len(target) > 3 else None
+        module = sys.modules.get(module_name)
+        if module is None:
+            __import__(module_name)
+            module = sys.modules[module_name]
+        short_module_name = module_name.rsplit('.', 1)[-1]
+
+        if name == '*':
+            names = [n for n, obj in vars(module).items()
+                     if not n.startswith('_') and callable(obj) and not isinstance(obj, type)
+                     and getattr(obj, '__module__', None) == module.__name__]
+        else:
+            names = [name]
+
+        for n in sorted(names):
+            obj = getattr(module, n)
+            if isinstance(obj, type):
+                for attr, method in sorted(vars(obj).items()):
+                    if attr.startswith('_') and attr != '__init__':
+                        continue
+                    if not (callable(method) or isinstance(method, (staticmethod, classmethod))):
+                        continue
+                    resolved.append((obj, attr, method, '{}.{}'.format(obj.__name__, attr), category))
+            else:
+                resolved.append((module, n, obj, stage_name or '{}.{}'.format(short_module_name, n), category))
+    return resolved
+
+
+def enable_profiling(trace_memory=False, sample_rss=True, targets=None, extra_targets=()):
+    """
+    Start profiling and return the active `Profiler`.
+
+    The functions given by `targets` (default: `DEFAULT_TARGETS`) and
+    `extra_targets` are instrumented. Each target is a tuple (module name,
+    object name, category) or (module name, function name, category, stage
+    name); the object name '*' denotes all public functions defined in the
+    module. Besides the module which defines each function,
+    all loaded modules which have imported it under the same name (e.g.
+    `from postprocessing import make_figure_2`) are patched, too.
+    """
+    global _active_profiler
+    if _active_profiler is not None:
+        disable_profiling()
+
+    profiler = Profiler(trace_memory=trace_memory, sample_rss=sample_rss)
+    targets = list(DEFAULT_TARGETS if targets is None else targets) + list(extra_targets)
+
+    for owner, attr, func, name, category in _get_targets(targets):
+        if isinstance(func, (staticmethod, classmethod)):
+            wrapper = type(func)(profiler.wrap(func.__func__, name, category))
+        else:
+            wrapper = profiler.wrap(func, name, category)
+        _installed_patches.append((owner, attr, func))
+        setattr(owner, attr, wrapper)
+        if isinstance(owner, type):
+            continue
+        # Also patch modules which have imported the function by name.
+        for module in list(sys.modules.values()):
+            if module is None or module is owner:
+                continue
+            module_dict = getattr(module, '__dict__', {})
+            if module_dict.get(attr) is func:
+                _installed_patches.append((module, attr, func))
+                setattr(module, attr, wrapper)
+
+    _active_profiler = profiler
+    return profiler
+
+
+def disable_profiling():
+    """
+    Stop profiling: remove all wrappers installed by `enable_profiling`
+    and return the profiler which was active (or None).
+    """
+    global _active_profiler
+    while _installed_patches:
+        owner, attr, func = _installed_patches.pop()
+        setattr(owner, attr, func)
+
+    profiler, _active_profiler = _active_profiler, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+
+def get_active_profiler():
+    """
+    Return the active profiler, or None if profiling is disabled.
+    """
+    return _active_profiler
+
+
+@contextmanager
+def profile(**kwargs):
+    """
+    Context manager which enables profiling (see `enable_profiling` for
+    the arguments) for the enclosed code and yields the profiler.
+    """
+    profiler = enable_profiling(**kwargs)
+    try:
+        yield profiler
+    finally:
+        disable_profiling()
@@ -0,0 +1,201 @@
+"""
+Sampling of the spatially resolved magnetisation on a part of the
+sampling grid, so that localised modes (e.g. edge or centre modes) can
+be analysed without re-running the postprocessing of the raw simulation
+output, and so that the cost of the FFTs scales with the size of the
+region analysed rather than with the size of the whole film.
+
+A `Sampling` selects a region of interest (ROI) of the grid, given
+either as a pair of slices or as a boolean mask, decimates it with a
+given stride, and optionally selects the height at which the film is
+sampled. It is passed as the argument `sampling` to the data readers
+(see `BaseDataReader.get_spatially_resolved_magnetisation`), to
+`SpectralAnalysis`, to `fft_utils.get_spectrum_via_method_2` and to the
+functions which compute or plot mode maps.
+
+Rectangular regions are selected by basic slicing, i.e. the sampled
+data is a view of the original data (and, for data formats which support
+partial reads, only the selected part of the data is read). Only the
+cells of a non-rectangular mask have to be copied; in this case the
+sampled data has shape (N, K), where K is the number of selected cells,
+and mode maps are returned on the bounding box of the mask, with NaN
+outside the mask (see `Sampling.to_grid`).
+
+Example:
+
+    >>> sampling = Sampling(roi=(slice(0, 6), slice(None)), stride=2)
+    >>> m_edge = data_reader.get_spatially_resolved_magnetisation('y', sampling=sampling)
+
+"""
+
+import numpy as np
+
+
+def get_bounding_slices(mask):
+    """
+    Return a pair of slices which select the bounding box of the
+    True entries of the 2D boolean array `mask`.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim != 2:
+        raise ValueError("The region of interest must be a 2D mask, got an array of shape {}".format(mask.shape))
+    if not mask.any():
+        raise ValueError("The region of interest is empty.")
+    slices = []
+    for axis in [1, 0]:
+        indices = np.flatnonzero(mask.any(axis=axis))
+        slices.append(slice(indices[0], indices[-1] + 1))
+    return tuple(slices)
+
+
+class Sampling(object):
+    """
+    Selection of a part of the sampling grid of the spatially resolved
+    magnetisation (see the module docstring).
+
+    *Arguments*
+
+    roi:  None, a pair of slices or a 2D boolean array
+
+        The region of interest. If None (the default) the whole grid is
+        used. A pair of slices selects a rectangular region along the two
+        spatial dimensions; a boolean mask (of the same shape as the grid)
+        selects the cells where it is True.
+
+    stride:  int or pair of ints
+
+        Decimation stride along the two spatial dimensions (default: 1,
+        i.e. every cell of the region is used).
+
+    height:  float or None
+
+        Height (in nm) at which the film is sampled. If None (the default)
+        the height at which the data is stored is used. Only data readers
+        which have access to the full 3D magnetisation (e.g. 'NmagHDF5')
+        can sample the film at other heights.
+
+    """
+
+    def __init__(self, roi=None, stride=1, height=None):
+        stride = (stride, stride) if np.isscalar(stride) else tuple(stride)
+        if len(stride) != 2 or any(int(s) != s or s < 1 for s in stride):
+            raise ValueError("The stride must be a positive integer or a pair of them. Got: {}".format(stride))
+        self.stride = tuple(int(s) for s in stride)
+        self.height = height
+
+        self.mask = None
+        if roi is None:
+            roi = (slice(None), slice(None))
+        elif not all(isinstance(s, slice) for s in roi):
+            self.mask = np.asarray(roi, dtype=bool)
+            roi = get_bounding_slices(self.mask)
+        if len(roi) != 2 or any(s.step not in (None, 1) for s in roi):
+            raise ValueError(
+                "The region of interest must be given as a pair of slices without step "
+                "(use `stride` for decimation) or as a 2D boolean mask.")
+        self.slices = tuple(slice(s.start, s.stop, step) for s, step in zip(roi, self.stride))
+
+        # The mask of the cells within the (decimated) bounding box, or None
+        # if all of them are selected (in which case the data is sampled
+        # by slicing alone, i.e. without a copy).
+        self._cropped_mask = None
+        if self.mask is not None:
+            cropped_mask = self.mask[self.slices]
+            if not cropped_mask.any():
+                raise ValueError("The region of interest contains no cells of the decimated grid.")
+            if not cropped_mask.all():
+                self._cropped_mask = cropped_mask
+
+    def __repr__(self):
+        roi = 'mask' if self.mask is not None else self.slices
+        return "Sampling(roi={}, stride={}, height={})".format(roi, self.stride, self.height)
+
+    def is_rectangular(self):
+        """
+        Return True if the sampled cells form a rectangular grid, i.e. if
+        the sampled data is a view of the original data.
+        """
+        return self._cropped_mask is None
+
+    def check_grid_shape(self, grid_shape):
+        """
+        Raise ValueError if the mask of this sampling doesn't match the
+        shape `grid_shape` of the sampling grid.
+        """
+        if self.mask is not None and self.mask.shape != tuple(grid_shape):
+            raise ValueError("The region of interest has shape {}, but the grid has shape {}".format(
+                self.mask.shape, tuple(grid_shape)))
+
+    def get_grid_shape(self, grid_shape):
+        """
+        Return the shape of the grid on which the mode maps of data with
+        the grid shape `grid_shape` are returned by this sampling (i.e. the
+        shape of the decimated bounding box of the region of interest).
+        """
+        self.check_grid_shape(grid_shape)
+        return tuple(len(range(*s.indices(n))) for s, n in zip(self.slices, grid_shape))
+
+    def get_num_cells(self, grid_shape):
+        """
+        Return the number of cells sampled from a grid of shape `grid_shape`.
+        """
+        if self._cropped_mask is not None:
+            self.check_grid_shape(grid_shape)
+            return int(self._cropped_mask.sum())
+        return int(np.prod(self.get_grid_shape(grid_shape)))
+
+    def apply(self, m_vals):
+        """
+        Return the sampled part of the spatially resolved magnetisation
+        `m_vals` (an array of shape (N, n1, n2)). This is a view of `m_vals`
+        of shape (N, n1', n2') if the region of interest is rectangular and
+        an array of shape (N, K) otherwise (see the module docstring).
+
+        Note that the height of the sampling is not taken into account here,
+        since it can only be changed by a data reader.
+        """
+        self.check_grid_shape(m_vals.shape[1:])
+        return self.crop(m_vals[(slice(None),) + self.slices])
+
+    def crop(self, m_vals):
+        """
+        Select the cells of the mask from data which has already been
+        restricted to the decimated bounding box of the region of interest
+        (e.g. by a partial read). For rectangular regions `m_vals` is
+        returned unchanged.
+        """
+        if self._cropped_mask is None:
+            return m_vals
+        return m_vals[:, self._cropped_mask]
+
+    def to_grid(self, values, fill_value=np.nan):
+        """
+        Return the values `values` (e.g. Fourier coefficients or mode maps)
+        of the sampled cells, given as an array of shape (F, K), as an array
+        of shape (F, n1', n2') on the decimated bounding box of the region
+        of interest, where cells outside the region are set to `fill_value`.
+        For rectangular regions `values` is returned unchanged.
+        """
+        if self._cropped_mask is None:
+            return values
+        values = np.asarray(values)
+        grid = np.full(values.shape[:1] + self._cropped_mask.shape, fill_value, dtype=values.dtype)
+        grid[:, self._cropped_mask] = values
+        return grid
+
+
+def apply_sampling(m_vals, sampling):
+    """
+    Return the part of the spatially resolved magnetisation `m_vals` (of
+    shape (N, n1, n2)) selected by `sampling`, or `m_vals` itself if
+    `sampling` is None. Raises ValueError if the sampling requests a
+    height, since arrays which have already been read from a data reader
+    cannot be sampled at a different height.
+    """
+    if sampling is None:
+        return m_vals
+    if sampling.height is not None:
+        raise ValueError(
+            "Cannot change the sampling height of data which has already been read; "
+            "pass the sampling to the data reader instead.")
+    return sampling.apply(m_vals)
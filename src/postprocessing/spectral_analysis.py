@@ -0,0 +1,246 @@
+import numpy as np
+
+from . import util
+from .fft_utils import \
+    get_fft_frequencies, get_spectrum_via_method_1, get_fft_coefficients, \
+    get_spectrum_from_fft_coefficients, get_index_of_frequency, \
+    get_fft_coefficients_at_indices, get_indices_of_frequencies, get_max_num_bins_for_direct_dft, \
+    get_spectrum_and_fft_coefficients_blockwise
+from .peak_finding import PeakFinder
+
+
+class SpectralAnalysis(object):
+    """
+    This class provides the spectral analysis of the data available
+    through a data reader (see `DataReader`).
+
+    All derived quantities (the FFT frequencies, the complex Fourier
+    coefficients of the spatially resolved magnetisation and the power
+    spectra computed via methods 1 and 2, and the peaks detected in
+    them) are computed lazily on first use and cached per magnetisation
+    component. This means that the
+    full FFT of each component is computed at most once, and extracting
+    mode amplitudes/phases or looking up peak frequencies only requires
+    cheap indexing operations.
+
+    If `memory_budget` (in bytes) is given, the full FFT is never held in
+    memory. Instead, the spectra via method 2 and the Fourier coefficients
+    at the requested frequencies are computed out-of-core, streaming blocks
+    of grid cells through the FFT (see `fft_utils.get_spectrum_and_fft_coefficients_blockwise`),
+    and only these results are cached. This should be combined with a data
+    reader which memory-maps the data (`mmap_mode='r'`) to process data
+    sets which are larger than the available memory.
+
+    If `sampling` is given, all spatially resolved quantities (the spectra
+    via method 2 and the mode maps) are computed only from the part of
+    the grid selected by it (see the module `sampling`). The mode maps
+    then have the shape returned by `data_reader.get_grid_shape(sampling)`.
+
+    Example:
+
+        >>> analysis = SpectralAnalysis(data_reader)
+        >>> peak_freq = analysis.find_peak_frequency(approx_freq=8.25, component='y')
+        >>> amp_x = analysis.get_mode_amplitudes_at_freq('x', peak_freq)
+
+    """
+
+    def __init__(self, data_reader, memory_budget=None, sampling=None):
+        self.data_reader = data_reader
+        self.memory_budget = memory_budget
+        self.sampling = sampling
+        self._freqs = None
+        self._fft_coeffs = {}
+        self._fft_coeffs_at_indices = {}
+        self._spectra_method_1 = {}
+        self._spectra_method_2 = {}
+        self._peak_finders = {}
+
+    def clear_cache(self):
+        """
+        Discard all cached Fourier coefficients and spectra.
+        """
+        self._freqs = None
+        self._fft_coeffs.clear()
+        self._fft_coeffs_at_indices.clear()
+        self._spectra_method_1.clear()
+        self._spectra_method_2.clear()
+        self._peak_finders.clear()
+
+    def get_frequencies(self, unit='GHz'):
+        """
+        Return the FFT sample frequencies corresponding to the spectra
+        returned by this class. The argument `unit` can be either 'Hz'
+        or 'GHz' (the default).
+        """
+        if self._freqs is None:
+            timesteps = self.data_reader.get_timesteps(unit='s')
+            self._freqs = get_fft_frequencies(timesteps, unit='Hz')
+        return self._freqs * util.get_conversion_factor('Hz', unit)
+
+    def _get_spatially_resolved_magnetisation(self, component):
+        return self.data_reader.get_spatially_resolved_magnetisation(component, sampling=self.sampling)
+
+    def _to_grid(self, coeffs):
+        # Mode maps of non-rectangular regions are returned on the bounding
+        # box of the region (see `Sampling.to_grid`).
+        return coeffs if self.sampling is None else self.sampling.to_grid(coeffs)
+
+    def get_fft_coefficients(self, component):
+        """
+        Return the complex Fourier coefficients of the spatially resolved
+        magnetisation for the given component. The returned array has
+        shape (N // 2 + 1, nx, ny) (or (N // 2 + 1, K) if the cells are
+        selected by a non-rectangular sampling) and must not be modified.
+        """
+        try:
+            fft_coeffs = self._fft_coeffs[component]
+        except KeyError:
+            m_full = self._get_spatially_resolved_magnetisation(component)
+            fft_coeffs = get_fft_coefficients(m_full)
+            self._fft_coeffs[component] = fft_coeffs
+        return fft_coeffs
+
+    def _get_fft_coefficients_at_indices(self, component, indices):
+        """
+        Return the Fourier coefficients of the given component at the given
+        indices of the FFT frequencies. These are extracted from the full
+        FFT, unless a memory budget is set, in which case the coefficients
+        which have not been computed yet are computed out-of-core (together
+        with the spectrum via method 2) and cached.
+        """
+        if self.memory_budget is None or component in self._fft_coeffs:
+            return self.get_fft_coefficients(component)[indices]
+
+        cached_coeffs = self._fft_coeffs_at_indices.setdefault(component, {})
+        missing_indices = sorted(set(int(idx) for idx in np.atleast_1d(indices)) - set(cached_coeffs))
+        if missing_indices or component not in self._spectra_method_2:
+            m_full = self._get_spatially_resolved_magnetisation(component)
+            spectrum, coeffs = get_spectrum_and_fft_coefficients_blockwise(
+                m_full, missing_indices, memory_budget=self.memory_budget)
+            self._spectra_method_2.setdefault(component, spectrum)
+            cached_coeffs.update(zip(missing_indices, coeffs))
+
+        return np.array([cached_coeffs[int(idx)] for idx in np.atleast_1d(indices)])
+
+    def get_spectrum_via_method_1(self, component):
+        """
+        Return the power spectrum of the spatially averaged magnetisation
+        for the given component (see `fft_utils.get_spectrum_via_method_1`).
+        """
+        try:
+            spectrum = self._spectra_method_1[component]
+        except KeyError:
+            m_avg = self.data_reader.get_average_magnetisation(component)
+            spectrum = get_spectrum_via_method_1(m_avg)
+            self._spectra_method_1[component] = spectrum
+        return spectrum
+
+    def get_spectrum_via_method_2(self, component):
+        """
+        Return the power spectrum of the spatially resolved magnetisation
+        for the given component (see `fft_utils.get_spectrum_via_method_2`).
+        """
+        try:
+            spectrum = self._spectra_method_2[component]
+        except KeyError:
+            if self.memory_budget is None:
+                spectrum = get_spectrum_from_fft_coefficients(self.get_fft_coefficients(component))
+                self._spectra_method_2[component] = spectrum
+            else:
+                self._get_fft_coefficients_at_indices(component, [])
+                spectrum = self._spectra_method_2[component]
+        return spectrum
+
+    def get_spectrum(self, component, method=2):
+        """
+        Return the power spectrum computed via method 1 or 2 (see above).
+        """
+        if method == 1:
+            return self.get_spectrum_via_method_1(component)
+        elif method == 2:
+            return self.get_spectrum_via_method_2(component)
+        else:
+            raise ValueError("Argument 'method' must be 1 or 2. Got: '{}'".format(method))
+
+    def get_peak_finder(self, component='y', method=2, interpolation=None):
+        """
+        Return a `PeakFinder` for the spectrum of the given component,
+        computed via `method`. The peaks are detected only once for each
+        combination of arguments.
+        """
+        key = (component, method, interpolation)
+        try:
+            peak_finder = self._peak_finders[key]
+        except KeyError:
+            freqs = self.get_frequencies(unit='GHz')
+            spectrum = self.get_spectrum(component, method=method)
+            peak_finder = PeakFinder(freqs, spectrum, interpolation=interpolation)
+            self._peak_finders[key] = peak_finder
+        return peak_finder
+
+    def find_peak_frequency(self, approx_freq, component='y', method=2, interpolation=None):
+        """
+        Return the frequency (in GHz) of the peak closest to `approx_freq`
+        in the spectrum of the given component, computed via `method`.
+        If `approx_freq` is an array, an array of peak frequencies is
+        returned. See `PeakFinder` for the meaning of `interpolation`.
+        """
+        peak_finder = self.get_peak_finder(component, method=method, interpolation=interpolation)
+        return peak_finder.find_peak_frequency(approx_freq)
+
+    def get_mode_amplitudes_at_freq(self, component, freq):
+        """
+        Return a 2D array with the amplitudes of the Fourier coefficients
+        of the given component at the FFT frequency closest to `freq` (in GHz).
+        """
+        idx = get_index_of_frequency(self.get_frequencies(unit='GHz'), freq)
+        return np.absolute(self._to_grid(self._get_fft_coefficients_at_indices(component, [idx]))[0])
+
+    def get_mode_phases_at_freq(self, component, freq):
+        """
+        Return a 2D array with the phases of the Fourier coefficients of
+        the given component at the FFT frequency closest to `freq` (in GHz).
+        """
+        idx = get_index_of_frequency(self.get_frequencies(unit='GHz'), freq)
+        return np.angle(self._to_grid(self._get_fft_coefficients_at_indices(component, [idx]))[0])
+
+    def get_fft_coefficients_at_freqs(self, component, freqs, method='auto'):
+        """
+        Return an array of shape (F, nx, ny) containing the Fourier
+        coefficients of the given component at the FFT frequencies
+        closest to each of the F frequencies in `freqs` (in GHz).
+
+        If the full FFT of the component has already been computed, the
+        coefficients are simply extracted from it. Otherwise `method`
+        determines how they are computed: 'dft' computes only the required
+        frequency bins (without caching them), 'fft' computes (and caches)
+        the full FFT (or, if a memory budget is set, the required bins
+        out-of-core), and 'auto' (the default) chooses 'dft' if the number
+        of frequencies is small and 'fft' otherwise.
+        """
+        indices = get_indices_of_frequencies(self.get_frequencies(unit='GHz'), freqs)
+
+        if method == 'auto':
+            num_timesteps = self.data_reader.get_num_timesteps()
+            method = 'dft' if len(indices) <= get_max_num_bins_for_direct_dft(num_timesteps) else 'fft'
+
+        if component in self._fft_coeffs or method == 'fft':
+            return self._to_grid(self._get_fft_coefficients_at_indices(component, indices))
+        elif method == 'dft':
+            m_full = self._get_spatially_resolved_magnetisation(component)
+            return self._to_grid(get_fft_coefficients_at_indices(m_full, indices))
+        else:
+            raise ValueError(
+                "Argument 'method' must be one of 'auto', 'dft', 'fft'. Got: '{}'".format(method))
+
+    def get_mode_maps_at_freqs(self, freqs, components=('x', 'y', 'z'), method='auto'):
+        """
+        Return a pair of arrays `(amplitudes, phases)` of shape (F, C, nx, ny)
+        containing the mode maps at each of the F frequencies in `freqs`
+        (in GHz) for each of the C magnetisation components in `components`.
+
+        See `get_fft_coefficients_at_freqs` for the meaning of `method`.
+        """
+        fft_coeffs = np.stack(
+            [self.get_fft_coefficients_at_freqs(c, freqs, method=method) for c in components], axis=1)
+        return np.absolute(fft_coeffs), np.angle(fft_coeffs)
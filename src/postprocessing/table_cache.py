@@ -0,0 +1,147 @@
+"""
+Transparent cache for numerical tables stored in text files (such as
+`dynamic_txyz.txt`), which are slow to parse with `np.loadtxt`.
+
+When a table is read for the first time, the parsed data is stored in
+a binary sidecar file (`.npy`) next to the text file, or in a separate
+cache directory (which is useful for read-only data directories). The
+cache directory can be given explicitly or via the environment variable
+`FMR_TABLE_CACHE_DIR`. Subsequent reads simply memory-map the sidecar.
+
+A sidecar is only used if the size, the modification time and the
+content hash of the text file match the values recorded when it was
+written. (The content hash is only recomputed if the modification time
+has changed, so that a cache hit does not require reading the file.)
+
+"""
+
+import hashlib
+import json
+import numpy as np
+import os
+
+CACHE_DIR_ENV_VAR = 'FMR_TABLE_CACHE_DIR'
+
+
+def get_file_hash(filename, block_size=1024**2):
+    """
+    Return the SHA-256 hash of the contents of the file `filename`.
+    """
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def get_file_stats(filename):
+    """
+    Return a dictionary with the size and modification time of `filename`.
+    """
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': getattr(stat, 'st_mtime_ns', int(stat.st_mtime * 1e9))}
+
+
+def get_sidecar_filenames(filename, cache_dir=None):
+    """
+    Return the names of the sidecar files `(data_file, metadata_file)` for
+    the text file `filename`. If `cache_dir` is None, the sidecar files are
+    placed next to the text file (as hidden files). Otherwise they are placed
+    in `cache_dir`, with a prefix derived from the absolute path of the text
+    file to avoid name clashes.
+    """
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    if cache_dir is None:
+        prefix = os.path.join(dirname, '.' + basename)
+    else:
+        path_hash = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:16]
+        prefix = os.path.join(cache_dir, '{}-{}'.format(path_hash, basename))
+    return prefix + '.cache.npy', prefix + '.cache.json'
+
+
+def read_cached_table(filename, data_file, metadata_file):
+    """
+    Return the memory-mapped cached table for `filename` if the sidecar
+    files exist and are valid, otherwise None.
+    """
+    try:
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    stats = get_file_stats(filename)
+    if metadata.get('size') != stats['size']:
+        return None
+
+    if metadata.get('mtime_ns') != stats['mtime_ns']:
+        # The file has been touched; check whether its contents changed.
+        if metadata.get('sha256') != get_file_hash(filename):
+            return None
+        metadata.update(stats)
+        write_metadata(metadata_file, metadata)
+
+    try:
+        return np.load(data_file, mmap_mode='r')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_metadata(metadata_file, metadata):
+    tmp_file = metadata_file + '.tmp{}'.format(os.getpid())
+    with open(tmp_file, 'w') as f:
+        json.dump(metadata, f)
+    os.rename(tmp_file, metadata_file)
+
+
+def write_cached_table(filename, data, data_file, metadata_file):
+    """
+    Write the parsed table `data` for the text file `filename` to the
+    given sidecar files. Returns True on success and False if the files
+    could not be written (e.g. because the directory is read-only).
+    """
+    metadata = get_file_stats(filename)
+    metadata['sha256'] = get_file_hash(filename)
+
+    tmp_file = data_file + '.tmp{}.npy'.format(os.getpid())
+    try:
+        cache_dir = os.path.dirname(data_file)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        np.save(tmp_file, data)
+        os.rename(tmp_file, data_file)
+        write_metadata(metadata_file, metadata)
+    except (IOError, OSError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return False
+    return True
+
+
+def load_table(filename, cache_dir=None, use_cache=True):
+    """
+    Return the numerical table in the text file `filename` as a 2D numpy
+    array (like `np.loadtxt`), using a binary sidecar cache as described
+    in the module docstring. On a cache hit the returned array is a
+    read-only memory-mapped array.
+
+    If `cache_dir` is None, the value of the environment variable
+    `FMR_TABLE_CACHE_DIR` is used; if this is not set either, the cache
+    files are placed next to `filename`. If the cache files cannot be
+    written, the parsed data is returned without caching it. Set
+    `use_cache=False` to disable the cache completely.
+    """
+    if not use_cache:
+        return np.loadtxt(filename)
+
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV_VAR) or None
+
+    data_file, metadata_file = get_sidecar_filenames(filename, cache_dir)
+
+    data = read_cached_table(filename, data_file, metadata_file)
+    if data is None:
+        data = np.loadtxt(filename)
+        write_cached_table(filename, data, data_file, metadata_file)
+
+    return data
@@ -43,3 +43,13 @@ def get_index_of_m_avg_component(component):
             "Argument 'component' must be one of 'x', 'y', 'z'. "
             "Got: '{}'".format(component))
     return idx
+
+
+def get_index_of_component(component):
+    """
+    Return the index (0, 1 or 2) of the x/y/z component of a vector
+    field, e.g. for indexing arrays which store the three magnetisation
+    components along one dimension.
+
+    """
+    return get_index_of_m_avg_component(component) - 1
@@ -12,14 +12,31 @@ The resulting plots are saved to the directory `../figures/generated_from_refere
 The input and output directories can be changed using the command line switches `--data-dir` and
 `--output-dir`, respectively.
 
+With `--jobs N` the figures are rendered in parallel using N worker processes. Each worker
+memory-maps the input data, so the magnetisation arrays are shared between the workers via the
+page cache rather than being copied to each of them. The output is identical to the serial mode.
+
+With `--memory-budget MB` the Fourier transforms of the spatially resolved magnetisation are computed
+out-of-core, using at most (approximately) the given number of megabytes at a time. This allows
+data sets which are larger than the available memory to be processed.
+
+With `--profile` the time and memory spent in each stage (reading the data, each FFT function, peak
+finding, each figure builder and `savefig`) is recorded and a per-stage breakdown is printed at the
+end. Use `--profile-output FILE` to save the breakdown and all recorded calls as JSON, `--profile-trace
+FILE` to save them in the Chrome trace event format (for viewing in chrome://tracing or
+https://ui.perfetto.dev) and `--profile-memory` to measure the peak memory of each stage with
+`tracemalloc` (which slows down the computation). Without `--profile` no instrumentation is installed.
+
 """
 
 import argparse
+import multiprocessing
 import os
 import textwrap
 import sys
 
-from postprocessing import DataReader, make_figure_2, make_figure_3, make_figure_4, make_figure_5
+from postprocessing import DataReader, SpectralAnalysis, make_figure_2, make_figure_3, make_figure_4, make_figure_5
+from postprocessing import profiling
 
 here = os.path.abspath(os.path.dirname(__file__))
 
@@ -48,11 +65,112 @@ def check_input_data_exists(data_dir):
         sys.exit()
 
 
-def reproduce_figures(data_dir, output_dir, output_format, component='y'):
+FIGURE_NUMBERS = [2, 3, 4, 5]
+
+# Metadata which makes the output of `savefig` deterministic (by omitting
+# the creation date), so that repeated runs produce identical files.
+DETERMINISTIC_METADATA = {
+    'pdf': {'CreationDate': None},
+    'svg': {'Date': None},
+    'ps': {'CreationDate': None},
+    'eps': {'CreationDate': None},
+    }
+
+
+def make_figure(data_reader, figure_number, component='y', spectral_analysis=None):
+    """
+    Create the figure with the given number (2-5) from the data provided by `data_reader`.
+    """
+    if figure_number == 2:
+        return make_figure_2(data_reader, component=component)
+    elif figure_number == 3:
+        return make_figure_3(data_reader, component=component, spectral_analysis=spectral_analysis)
+    elif figure_number == 4:
+        return make_figure_4(data_reader, spectral_analysis=spectral_analysis)
+    elif figure_number == 5:
+        return make_figure_5(data_reader, spectral_analysis=spectral_analysis)
+    else:
+        raise ValueError("Invalid figure number: {}".format(figure_number))
+
+
+def save_figure(fig, output_dir, figure_number, fmt):
+    """
+    Save the figure `fig` to the file 'figure_<N>.<fmt>' in `output_dir`.
+    """
+    import matplotlib.pyplot as plt
+
+    filename = os.path.join(output_dir, 'figure_{}.{}'.format(figure_number, fmt))
+    with plt.rc_context({'svg.hashsalt': 'figure_{}'.format(figure_number)}):
+        fig.savefig(filename, metadata=DETERMINISTIC_METADATA.get(fmt))
+
+
+def get_profiling_targets():
+    """
+    Return the stages of this script which are recorded (in addition to
+    `profiling.DEFAULT_TARGETS`) when profiling is enabled.
+    """
+    return [(__name__, 'save_figure', 'savefig', 'savefig')]
+
+
+# State of the worker processes used in parallel mode (see `_init_worker`).
+_worker_state = {}
+
+
+def _init_worker(data_dir, output_dir, component, memory_budget=None, profile_options=None):
+    """
+    Initialise a worker process for rendering figures in parallel. Each
+    worker creates its own (memory-mapped) data reader, so the input data
+    is shared between the processes instead of being sent to each of them.
+
+    If `profile_options` is given, the worker profiles its stages (see
+    `profiling.enable_profiling` for the options) and returns the recorded
+    events together with the result of each task.
+    """
+    if profile_options is not None:
+        profiling.enable_profiling(extra_targets=get_profiling_targets(), **profile_options)
+    data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode='r')
+    _worker_state.update(data_reader=data_reader,
+                         spectral_analysis=SpectralAnalysis(data_reader, memory_budget=memory_budget),
+                         output_dir=output_dir,
+                         component=component,
+                         figures={})
+
+
+def _render_figure(task):
+    """
+    Create (or re-use) the figure with the given number and save it in the given format.
+    """
+    figure_number, fmt = task
+    figures = _worker_state['figures']
+    if figure_number not in figures:
+        figures[figure_number] = make_figure(_worker_state['data_reader'], figure_number,
+                                             component=_worker_state['component'],
+                                             spectral_analysis=_worker_state['spectral_analysis'])
+    save_figure(figures[figure_number], _worker_state['output_dir'], figure_number, fmt)
+
+    profiler = profiling.get_active_profiler()
+    if profiler is None:
+        return task, []
+    events, profiler.events = profiler.events, []
+    return task, events
+
+
+def reproduce_figures(data_dir, output_dir, output_format, component='y', jobs=1, memory_budget=None,
+                      profiler=None):
     """
     This function reproduces Figures 2-5. It reads the raw simulation
     data from `data_dir` and stores the resulting plots in `output_dir`.
 
+    If `jobs` is larger than 1, the figures (and the different output
+    formats) are rendered in parallel by the given number of processes.
+
+    If `memory_budget` (in bytes) is given, the spectral analysis is
+    performed out-of-core within this budget (see `SpectralAnalysis`).
+
+    If `profiler` is given, the stages computed in worker processes are
+    profiled with the same options and their events are added to it (in
+    serial mode the stages are recorded by the active profiler directly).
+
     """
     output_format = output_format.split(',')
     check_input_data_exists(data_dir)
@@ -68,24 +186,42 @@ def reproduce_figures(data_dir, output_dir, output_format, component='y'):
     print("Input data directory:\n   {}\n".format(os.path.abspath(data_dir)))
     print("Output directory:\n   {}\n".format(os.path.abspath(output_dir)))
 
-    # Create DataReader which provides a convenient way of
-    # reading raw simulation data and computing derived data.
-    data_reader = DataReader(data_dir, data_format='OOMMF')
-
     print("Generating plots..."),; sys.stdout.flush()
 
-    # Generate plots
-    fig2 = make_figure_2(data_reader, component=component)
-    fig3 = make_figure_3(data_reader, component=component)
-    fig4 = make_figure_4(data_reader)
-    fig5 = make_figure_5(data_reader)
+    if jobs > 1:
+        tasks = [(figure_number, fmt) for figure_number in FIGURE_NUMBERS for fmt in output_format]
+        profile_options = None
+        if profiler is not None:
+            profile_options = dict(trace_memory=profiler.trace_memory, sample_rss=profiler.sample_rss)
+        pool = multiprocessing.Pool(processes=jobs, initializer=_init_worker,
+                                    initargs=(data_dir, output_dir, component, memory_budget, profile_options))
+        try:
+            for _, events in pool.imap_unordered(_render_figure, tasks):
+                if profiler is not None:
+                    profiler.add_events(events)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        # Create DataReader which provides a convenient way of
+        # reading raw simulation data and computing derived data.
+        # The spatially resolved data is memory-mapped and cached
+        # so that it is only read once for all figures.
+        data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode='r')
 
-    # Save plots to output directory
-    for fmt in output_format:
-        fig2.savefig(os.path.join(output_dir, 'figure_2.' + fmt))
-        fig3.savefig(os.path.join(output_dir, 'figure_3.' + fmt))
-        fig4.savefig(os.path.join(output_dir, 'figure_4.' + fmt))
-        fig5.savefig(os.path.join(output_dir, 'figure_5.' + fmt))
+        # The spectral analysis caches the Fourier transforms of the
+        # magnetisation so that they are shared between Figures 3-5.
+        spectral_analysis = SpectralAnalysis(data_reader, memory_budget=memory_budget)
+
+        # Generate plots
+        figures = [make_figure(data_reader, figure_number, component=component,
+                               spectral_analysis=spectral_analysis)
+                   for figure_number in FIGURE_NUMBERS]
+
+        # Save plots to output directory
+        for fmt in output_format:
+            for figure_number, fig in zip(FIGURE_NUMBERS, figures):
+                save_figure(fig, output_dir, figure_number, fmt)
 
     print("Done.")
     print("Plots have been successfully generated in output directory.")
@@ -105,6 +241,37 @@ if __name__ == '__main__':
                               'can be supplied as a comma-separated list. (Default: png,pdf)'))
     parser.add_argument('--component', dest='component', type=str, default='y',
                         help='Magnetization component to use for the plots in Figures 2, 3')
+    parser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                        help='Number of processes used to render the figures in parallel (default: 1)')
+    parser.add_argument('--memory-budget', dest='memory_budget', type=float, default=None,
+                        help=('Compute the Fourier transforms out-of-core using at most (approximately) '
+                              'this many megabytes of memory (default: compute them in memory)'))
+    parser.add_argument('--profile', dest='profile', action='store_true',
+                        help='Record the time and memory spent in each stage and print a breakdown')
+    parser.add_argument('--profile-memory', dest='profile_memory', action='store_true',
+                        help='Also measure the peak memory of each stage with tracemalloc (slow; implies --profile)')
+    parser.add_argument('--profile-output', dest='profile_output', type=str, default=None,
+                        help='Write the profiling results to this JSON file (implies --profile)')
+    parser.add_argument('--profile-trace', dest='profile_trace', type=str, default=None,
+                        help='Write the profiling results to this file in Chrome trace format (implies --profile)')
     args = parser.parse_args()
 
-    reproduce_figures(args.data_dir, args.output_dir, args.output_format, args.component)
+    profiler = None
+    if args.profile or args.profile_memory or args.profile_output or args.profile_trace:
+        profiler = profiling.enable_profiling(trace_memory=args.profile_memory,
+                                              extra_targets=get_profiling_targets())
+
+    memory_budget = None if args.memory_budget is None else int(args.memory_budget * 1024**2)
+    reproduce_figures(args.data_dir, args.output_dir, args.output_format, args.component, args.jobs,
+                      memory_budget=memory_budget, profiler=profiler)
+
+    if profiler is not None:
+        profiling.disable_profiling()
+        print("\nProfile (times in seconds, memory in MB):\n")
+        print(profiler.format_summary())
+        if args.profile_output:
+            profiler.write_json(args.profile_output)
+            print("\nProfiling results have been written to: {}".format(args.profile_output))
+        if args.profile_trace:
+            profiler.write_chrome_trace(args.profile_trace)
+            print("Chrome trace has been written to: {}".format(args.profile_trace))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Compare two JSON files with benchmark results (as written by
+`run_benchmarks.py`), e.g. for two different commits:
+
+    python compare_benchmarks.py before.json after.json
+
+For each benchmark and size present in both files this prints the
+(minimum) times and their ratio. Benchmarks which became slower or
+faster by more than `--threshold` (default: 10%) are marked. With
+`--fail-on-regression` the script exits with a non-zero status if
+any benchmark became slower by more than the threshold.
+
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(filename):
+    """
+    Return a pair `(metadata, results)`, where `results` is a dictionary
+    mapping pairs `(name, size)` to the result entries in the file.
+    """
+    with open(filename) as f:
+        data = json.load(f)
+    return data['metadata'], {(r['name'], r['size']): r for r in data['results']}
+
+
+def compare_results(baseline, new, threshold=0.1):
+    """
+    Return a list of tuples `(name, size, time_baseline, time_new, ratio, status)`
+    for all benchmarks in both `baseline` and `new` (as returned by `load_results`),
+    where `status` is 'slower', 'faster' or '' (if the change is below `threshold`).
+    """
+    rows = []
+    for key in sorted(set(baseline) & set(new), key=lambda k: (k[1], k[0])):
+        time_baseline = baseline[key]['min']
+        time_new = new[key]['min']
+        ratio = time_new / time_baseline if time_baseline > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'slower'
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = ''
+        rows.append(key + (time_baseline, time_new, ratio, status))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two sets of benchmark results.')
+    parser.add_argument('baseline', type=str, help='JSON file with the baseline results')
+    parser.add_argument('new', type=str, help='JSON file with the new results')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.1,
+                        help='Relative change above which benchmarks are marked (default: 0.1)')
+    parser.add_argument('--fail-on-regression', dest='fail_on_regression', action='store_true',
+                        help='Exit with a non-zero status if any benchmark became slower')
+    args = parser.parse_args()
+
+    metadata_baseline, results_baseline = load_results(args.baseline)
+    metadata_new, results_new = load_results(args.new)
+
+    print("Baseline: {} (commit {})".format(args.baseline, metadata_baseline.get('commit')))
+    print("New:      {} (commit {})".format(args.new, metadata_new.get('commit')))
+    print()
+    print("{:<12} {:<60} {:>12} {:>12} {:>8}".format('size', 'benchmark', 'baseline [s]', 'new [s]', 'ratio'))
+
+    rows = compare_results(results_baseline, results_new, threshold=args.threshold)
+    for name, size, time_baseline, time_new, ratio, status in rows:
+        print("{:<12} {:<60} {:12.5f} {:12.5f} {:8.2f} {}".format(size, name, time_baseline, time_new, ratio, status))
+
+    only_in_one = set(results_baseline) ^ set(results_new)
+    if only_in_one:
+        print("\n{} benchmarks are only present in one of the files.".format(len(only_in_one)))
+
+    if args.fail_on_regression and any(row[-1] == 'slower' for row in rows):
+        sys.exit(1)
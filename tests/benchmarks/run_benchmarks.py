@@ -0,0 +1,564 @@
+#!/usr/bin/env python
+
+"""
+Benchmarks for the postprocessing package and the postprocessing scripts.
+
+The benchmarks are run on synthetic data (see `synthetic_data.py`) at the
+size of the reference data (4000 timesteps on a 24 x 24 grid) and at
+scaled sizes (more timesteps, larger grids). They cover:
+
+- `data_reader`: constructing a DataReader and loading the data,
+- `fft_utils`:   each function in `postprocessing.fft_utils` (including
+                 `find_peak_frequency`),
+- `figures`:     `make_figure_2` to `make_figure_5`,
+- `scripts`:     the OOMMF and Nmag postprocessing scripts, i.e. the conversion
+                 of `.omf` snapshots and of nmagprobe output into `.npy` files,
+- `imports`:     importing the postprocessing package (with and without the
+                 plotting functions) in a fresh interpreter.
+
+Each benchmark is run `--repeat` times (calls which take less than 10 ms are
+looped to obtain a measurable time) and the timings are written, together
+with information about the machine and the git commit, to a JSON file.
+Use `compare_benchmarks.py` to compare the results for two commits, e.g.:
+
+    python run_benchmarks.py --output before.json --work-dir /tmp/fmr-bench
+    git checkout <other-commit>
+    python run_benchmarks.py --output after.json --work-dir /tmp/fmr-bench
+    python compare_benchmarks.py before.json after.json
+
+The synthetic data is generated in `--work-dir` (by default a temporary
+directory which is deleted afterwards). If the given directory already
+contains data of the requested sizes it is reused.
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy
+
+import synthetic_data
+from postprocessing import DataReader, fft_utils
+from postprocessing import make_figure_2, make_figure_3, make_figure_4, make_figure_5
+
+here = os.path.abspath(os.path.dirname(__file__))
+SRC_DIR = os.path.abspath(os.path.join(here, '../../src'))
+SCRIPTS_DIR = os.path.join(SRC_DIR, 'micromagnetic_simulation_scripts')
+
+REFERENCE_SIZE = '4000x24x24'
+DEFAULT_SIZES = [REFERENCE_SIZE, '16000x24x24', '4000x48x48']
+GROUPS = ['data_reader', 'fft_utils', 'figures', 'scripts', 'imports']
+
+# Calls which take less than this (in seconds) are looped within each repeat.
+MIN_TIME_PER_REPEAT = 0.01
+
+PEAK_FREQS = [8.25, 11.25]  # GHz
+
+
+class BenchmarkData(object):
+    """
+    Synthetic input data of a given size. The data files are generated
+    on first access and reused if they already exist in `work_dir`.
+    """
+
+    def __init__(self, size, work_dir):
+        self.size = size
+        self.num_timesteps, self.grid_shape = synthetic_data.parse_size(size)
+        self.base_dir = os.path.join(work_dir, size)
+        self._arrays = {}
+
+    def _get_dir(self, name, write_func):
+        directory = os.path.join(self.base_dir, name)
+        complete_marker = os.path.join(directory, '.complete')
+        if not os.path.exists(complete_marker):
+            print("  Generating synthetic data: {} ({})".format(name, self.size))
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+            os.makedirs(directory)
+            write_func(directory)
+            open(complete_marker, 'w').close()
+        return directory
+
+    @property
+    def data_dir(self):
+        return self._get_dir('data', lambda d: synthetic_data.write_data_dir(d, self.num_timesteps, self.grid_shape))
+
+    @property
+    def omf_dir(self):
+        return self._get_dir('omf', lambda d: synthetic_data.write_omf_snapshots(
+            d, self.num_timesteps, self.grid_shape))
+
+    @property
+    def nmagprobe_dir(self):
+        return self._get_dir('nmagprobe', lambda d: synthetic_data.write_nmagprobe_output(
+            os.path.join(d, 'dynamic_spatYMag.nmagProbe'), self.num_timesteps, self.grid_shape))
+
+    def get_array(self, name):
+        """
+        Return (and cache) the timesteps ('timesteps'), the average y-component
+        ('m_avg') or the spatially resolved y-component ('m_vals') of the data.
+        """
+        if name not in self._arrays:
+            data_reader = DataReader(self.data_dir, data_format='OOMMF')
+            self._arrays.update(timesteps=data_reader.get_timesteps(),
+                                m_avg=data_reader.get_average_magnetisation('y'),
+                                m_vals=np.array(data_reader.get_spatially_resolved_magnetisation('y')))
+        return self._arrays[name]
+
+    def get_spectrum(self, method):
+        key = 'spectrum_{}'.format(method)
+        if key not in self._arrays:
+            if method == 1:
+                self._arrays[key] = fft_utils.get_spectrum_via_method_1(self.get_array('m_avg'))
+            else:
+                self._arrays[key] = fft_utils.get_spectrum_via_method_2(self.get_array('m_vals'))
+        return self._arrays[key]
+
+
+# List of tuples (group, name, setup function). Each setup function takes
+# an instance of BenchmarkData and returns the function to be timed.
+BENCHMARKS = []
+
+
+def benchmark(group, name):
+    def decorator(setup_func):
+        BENCHMARKS.append((group, name, setup_func))
+        return setup_func
+    return decorator
+
+
+#
+# DataReader
+#
+
+@benchmark('data_reader', 'DataReader.__init__')
+def setup_data_reader_init(data):
+    data_dir = data.data_dir
+    return lambda: DataReader(data_dir, data_format='OOMMF')
+
+
+@benchmark('data_reader', 'DataReader.get_average_magnetisation')
+def setup_data_reader_average(data):
+    data_dir = data.data_dir
+
+    def func():
+        data_reader = DataReader(data_dir, data_format='OOMMF')
+        data_reader.get_timesteps()
+        for component in 'xyz':
+            data_reader.get_average_magnetisation(component)
+    return func
+
+
+@benchmark('data_reader', 'DataReader.get_spatially_resolved_magnetisation')
+def setup_data_reader_spatially_resolved(data):
+    data_dir = data.data_dir
+
+    def func():
+        data_reader = DataReader(data_dir, data_format='OOMMF')
+        for component in 'xyz':
+            data_reader.get_spatially_resolved_magnetisation(component)
+    return func
+
+
+@benchmark('data_reader', 'DataReader.get_spatially_resolved_magnetisation[mmap]')
+def setup_data_reader_spatially_resolved_mmap(data):
+    data_dir = data.data_dir
+
+    def func():
+        data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode='r')
+        for component in 'xyz':
+            data_reader.get_spatially_resolved_magnetisation(component)
+    return func
+
+
+#
+# fft_utils
+#
+
+@benchmark('fft_utils', 'get_fft_frequencies')
+def setup_get_fft_frequencies(data):
+    timesteps = data.get_array('timesteps')
+    return lambda: fft_utils.get_fft_frequencies(timesteps, unit='GHz')
+
+
+@benchmark('fft_utils', 'get_spectrum_via_method_1')
+def setup_get_spectrum_via_method_1(data):
+    m_avg = data.get_array('m_avg')
+    return lambda: fft_utils.get_spectrum_via_method_1(m_avg)
+
+
+@benchmark('fft_utils', 'get_spectrum_via_method_2')
+def setup_get_spectrum_via_method_2(data):
+    m_vals = data.get_array('m_vals')
+    return lambda: fft_utils.get_spectrum_via_method_2(m_vals)
+
+
+@benchmark('fft_utils', 'get_spectrum_via_method_2[welch]')
+def setup_get_spectrum_via_method_2_welch(data):
+    m_vals = data.get_array('m_vals')
+    estimator = fft_utils.SpectralEstimator(window='hann', nperseg=data.num_timesteps // 4)
+    return lambda: fft_utils.get_spectrum_via_method_2(m_vals, estimator=estimator)
+
+
+@benchmark('fft_utils', 'get_spectrum_via_method_2[memory_budget]')
+def setup_get_spectrum_via_method_2_blockwise(data):
+    m_vals = data.get_array('m_vals')
+    return lambda: fft_utils.get_spectrum_via_method_2(m_vals, memory_budget=64 * 1024**2)
+
+
+@benchmark('fft_utils', 'get_fft_coefficients')
+def setup_get_fft_coefficients(data):
+    m_vals = data.get_array('m_vals')
+    return lambda: fft_utils.get_fft_coefficients(m_vals)
+
+
+@benchmark('fft_utils', 'get_spectrum_from_fft_coefficients')
+def setup_get_spectrum_from_fft_coefficients(data):
+    fft_coeffs = fft_utils.get_fft_coefficients(data.get_array('m_vals'))
+    return lambda: fft_utils.get_spectrum_from_fft_coefficients(fft_coeffs)
+
+
+def get_peak_indices(data):
+    freqs = fft_utils.get_fft_frequencies(data.get_array('timesteps'), unit='GHz')
+    return fft_utils.get_indices_of_frequencies(freqs, PEAK_FREQS)
+
+
+@benchmark('fft_utils', 'get_spectrum_and_fft_coefficients_blockwise')
+def setup_get_spectrum_and_fft_coefficients_blockwise(data):
+    m_vals = data.get_array('m_vals')
+    indices = get_peak_indices(data)
+    return lambda: fft_utils.get_spectrum_and_fft_coefficients_blockwise(m_vals, indices)
+
+
+@benchmark('fft_utils', 'get_fft_coefficients_at_indices')
+def setup_get_fft_coefficients_at_indices(data):
+    m_vals = data.get_array('m_vals')
+    indices = get_peak_indices(data)
+    return lambda: fft_utils.get_fft_coefficients_at_indices(m_vals, indices)
+
+
+@benchmark('fft_utils', 'get_fft_coefficients_at_freqs')
+def setup_get_fft_coefficients_at_freqs(data):
+    timesteps, m_vals = data.get_array('timesteps'), data.get_array('m_vals')
+    return lambda: fft_utils.get_fft_coefficients_at_freqs(timesteps, m_vals, PEAK_FREQS)
+
+
+@benchmark('fft_utils', 'get_indices_of_frequencies')
+def setup_get_indices_of_frequencies(data):
+    freqs = fft_utils.get_fft_frequencies(data.get_array('timesteps'), unit='GHz')
+    return lambda: fft_utils.get_indices_of_frequencies(freqs, PEAK_FREQS)
+
+
+@benchmark('fft_utils', 'get_mode_amplitudes_at_freq')
+def setup_get_mode_amplitudes_at_freq(data):
+    timesteps, m_vals = data.get_array('timesteps'), data.get_array('m_vals')
+    return lambda: fft_utils.get_mode_amplitudes_at_freq(timesteps, m_vals, PEAK_FREQS[0])
+
+
+@benchmark('fft_utils', 'get_mode_phases_at_freq')
+def setup_get_mode_phases_at_freq(data):
+    timesteps, m_vals = data.get_array('timesteps'), data.get_array('m_vals')
+    return lambda: fft_utils.get_mode_phases_at_freq(timesteps, m_vals, PEAK_FREQS[0])
+
+
+@benchmark('fft_utils', 'get_mode_amplitudes_and_phases_at_freqs')
+def setup_get_mode_amplitudes_and_phases_at_freqs(data):
+    timesteps, m_vals = data.get_array('timesteps'), data.get_array('m_vals')
+    return lambda: fft_utils.get_mode_amplitudes_and_phases_at_freqs(timesteps, m_vals, PEAK_FREQS)
+
+
+@benchmark('fft_utils', 'find_peak_frequency')
+def setup_find_peak_frequency(data):
+    freqs = fft_utils.get_fft_frequencies(data.get_array('timesteps'), unit='GHz')
+    spectrum = data.get_spectrum(method=2)
+    return lambda: fft_utils.find_peak_frequency(freqs, spectrum, PEAK_FREQS)
+
+
+@benchmark('fft_utils', 'find_peak_frequency[lorentzian]')
+def setup_find_peak_frequency_lorentzian(data):
+    freqs = fft_utils.get_fft_frequencies(data.get_array('timesteps'), unit='GHz')
+    spectrum = data.get_spectrum(method=2)
+    return lambda: fft_utils.find_peak_frequency(freqs, spectrum, PEAK_FREQS, interpolation='lorentzian')
+
+
+#
+# Figures (each figure is created from scratch, including the spectral analysis)
+#
+
+def setup_figure(data, make_figure, **kwargs):
+    import matplotlib.pyplot as plt
+
+    data_dir = data.data_dir
+
+    def func():
+        data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode='r')
+        fig = make_figure(data_reader, **kwargs)
+        plt.close(fig)
+    return func
+
+
+@benchmark('figures', 'make_figure_2')
+def setup_make_figure_2(data):
+    return setup_figure(data, make_figure_2)
+
+
+@benchmark('figures', 'make_figure_3')
+def setup_make_figure_3(data):
+    return setup_figure(data, make_figure_3)
+
+
+@benchmark('figures', 'make_figure_4')
+def setup_make_figure_4(data):
+    return setup_figure(data, make_figure_4)
+
+
+@benchmark('figures', 'make_figure_5')
+def setup_make_figure_5(data):
+    return setup_figure(data, make_figure_5)
+
+
+# Rendering of the mode maps at many frequencies (e.g. at every peak of a
+# spectrum). The mode maps are computed beforehand, so only the rendering
+# and saving of the PNG files is measured.
+MODE_MAP_FREQS = np.linspace(2.0, 18.0, 10)
+
+
+def setup_mode_maps(data, renderer_kwargs=None):
+    import matplotlib.pyplot as plt
+    from postprocessing.figure_plotting import ModeMapRenderer, plot_mode_at_frequency
+    from postprocessing.spectral_analysis import SpectralAnalysis
+
+    spectral_analysis = SpectralAnalysis(DataReader(data.data_dir, data_format='OOMMF', mmap_mode='r'))
+    amplitudes, phases = spectral_analysis.get_mode_maps_at_freqs(MODE_MAP_FREQS)
+    # Pre-compute the single-frequency mode maps used by `plot_mode_at_frequency`.
+    for freq in MODE_MAP_FREQS:
+        spectral_analysis.get_mode_amplitudes_at_freq('y', freq)
+    output_dir = tempfile.mkdtemp(prefix='fmr-mode-maps-')
+
+    if renderer_kwargs is None:
+        def func():
+            for idx, freq in enumerate(MODE_MAP_FREQS):
+                fig = plot_mode_at_frequency(None, freq, spectral_analysis=spectral_analysis)
+                fig.savefig(os.path.join(output_dir, 'mode_{}.png'.format(idx)))
+                plt.close(fig)
+    else:
+        def func():
+            renderer = ModeMapRenderer(**renderer_kwargs)
+            for idx, freq in enumerate(MODE_MAP_FREQS):
+                renderer.update(freq, amplitudes[idx], phases[idx])
+                renderer.save(os.path.join(output_dir, 'mode_{}.png'.format(idx)))
+            renderer.close()
+    return func
+
+
+@benchmark('figures', 'mode_maps[plot_mode_at_frequency]')
+def setup_mode_maps_plot_mode_at_frequency(data):
+    return setup_mode_maps(data)
+
+
+@benchmark('figures', 'mode_maps[ModeMapRenderer]')
+def setup_mode_maps_renderer(data):
+    return setup_mode_maps(data, {})
+
+
+@benchmark('figures', 'mode_maps[ModeMapRenderer,fast_png]')
+def setup_mode_maps_renderer_fast_png(data):
+    return setup_mode_maps(data, {'fast_png': True})
+
+
+#
+# Postprocessing scripts (run as separate processes, as in generate_data.sh)
+#
+
+def setup_script(script, args, cwd):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    command = [sys.executable, script] + args
+
+    def func():
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(command, cwd=cwd, env=env, stdout=devnull)
+    return func
+
+
+@benchmark('scripts', 'oommf_postprocessing.py')
+def setup_oommf_postprocessing(data):
+    return setup_script(os.path.join(SCRIPTS_DIR, 'oommf', 'oommf_postprocessing.py'), [], data.omf_dir)
+
+
+@benchmark('scripts', 'nmag_postprocessing.py')
+def setup_nmag_postprocessing(data):
+    return setup_script(os.path.join(SCRIPTS_DIR, 'nmag', 'nmag_postprocessing.py'),
+                        ['dynamic_spatYMag.nmagProbe'], data.nmagprobe_dir)
+
+
+#
+# Import time (each import is done in a fresh interpreter, so the timings
+# include the startup time of the interpreter, see 'python (startup)')
+#
+
+def setup_import(statement):
+    return setup_script('-c', [statement], SRC_DIR)
+
+
+@benchmark('imports', 'python (startup)')
+def setup_import_nothing(data):
+    return setup_import('pass')
+
+
+@benchmark('imports', 'DataReader, fft_utils')
+def setup_import_data_reader(data):
+    return setup_import('from postprocessing import DataReader, fft_utils')
+
+
+@benchmark('imports', 'make_figure_2')
+def setup_import_figures(data):
+    return setup_import('from postprocessing import make_figure_2')
+
+
+#
+# Running the benchmarks
+#
+
+def time_function(func, repeat):
+    """
+    Call `func` `repeat` times and return the list of durations (in seconds)
+    per call. If a single call takes less than `MIN_TIME_PER_REPEAT`, each
+    repeat loops over enough calls to take at least that long.
+    """
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+    number = 1 if duration >= MIN_TIME_PER_REPEAT else int(MIN_TIME_PER_REPEAT / max(duration, 1e-7)) + 1
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def get_git_info():
+    def git(*args):
+        try:
+            with open(os.devnull, 'w') as devnull:
+                return subprocess.check_output(('git',) + args, cwd=here, stderr=devnull).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    commit = git('rev-parse', 'HEAD')
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {'commit': commit, 'dirty': bool(status) if status is not None else None}
+
+
+def get_metadata(repeat):
+    import matplotlib
+
+    metadata = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'matplotlib': matplotlib.__version__,
+        'repeat': repeat,
+        }
+    metadata.update(get_git_info())
+    return metadata
+
+
+def select_benchmarks(groups=None, name_filter=None):
+    return [(group, name, setup) for group, name, setup in BENCHMARKS
+            if (groups is None or group in groups) and (name_filter is None or name_filter in name)]
+
+
+def run_benchmarks(sizes, work_dir, groups=None, name_filter=None, repeat=3):
+    """
+    Run the selected benchmarks for all sizes (given as strings 'NxNYxNX')
+    and return the results as a dictionary (see the module docstring).
+    """
+    benchmarks = select_benchmarks(groups, name_filter)
+    results = []
+    for size in sizes:
+        print("Size {}:".format(size))
+        data = BenchmarkData(size, work_dir)
+        for group, name, setup in benchmarks:
+            func = setup(data)
+            times, number = time_function(func, repeat)
+            result = {
+                'group': group,
+                'name': name,
+                'size': size,
+                'num_timesteps': data.num_timesteps,
+                'grid_shape': list(data.grid_shape),
+                'number': number,
+                'times': times,
+                'min': min(times),
+                'median': float(np.median(times)),
+                'mean': float(np.mean(times)),
+                }
+            results.append(result)
+            print("  {:<12} {:<60} {:12.6f} s".format(group, name, result['min']))
+    return {'metadata': get_metadata(repeat), 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the benchmarks for the postprocessing package.')
+    parser.add_argument('--sizes', dest='sizes', type=str, default=','.join(DEFAULT_SIZES),
+                        help=('Comma-separated list of data sizes NUM_TIMESTEPSxNYxNX '
+                              '(default: {})'.format(','.join(DEFAULT_SIZES))))
+    parser.add_argument('--groups', dest='groups', type=str, default=','.join(GROUPS),
+                        help='Comma-separated list of benchmark groups (default: {})'.format(','.join(GROUPS)))
+    parser.add_argument('--filter', dest='name_filter', type=str, default=None,
+                        help='Only run benchmarks whose name contains this string')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3,
+                        help='Number of times each benchmark is repeated (default: 3)')
+    parser.add_argument('--output', dest='output', type=str, default='benchmark_results.json',
+                        help='Output file for the results in JSON format (default: benchmark_results.json)')
+    parser.add_argument('--work-dir', dest='work_dir', type=str, default=None,
+                        help=('Directory for the synthetic input data, which is reused if it exists '
+                              '(default: a temporary directory which is deleted afterwards)'))
+    parser.add_argument('--list', dest='list', action='store_true',
+                        help='List the available benchmarks and exit')
+    args = parser.parse_args()
+
+    groups = args.groups.split(',')
+    for group in groups:
+        if group not in GROUPS:
+            parser.error("Unknown benchmark group: '{}' (available: {})".format(group, ', '.join(GROUPS)))
+
+    if args.list:
+        for group, name, _ in select_benchmarks(groups, args.name_filter):
+            print("{:<12} {}".format(group, name))
+        sys.exit()
+
+    sizes = args.sizes.split(',')
+    for size in sizes:
+        try:
+            synthetic_data.parse_size(size)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='fmr-benchmarks-')
+    try:
+        results = run_benchmarks(sizes, work_dir, groups=groups, name_filter=args.name_filter, repeat=args.repeat)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print("Results have been written to: {}".format(os.path.abspath(args.output)))
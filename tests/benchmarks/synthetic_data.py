@@ -0,0 +1,146 @@
+"""
+Generation of synthetic simulation output for the benchmarks.
+
+The data imitates the ringdown of the standard problem: a superposition
+of damped oscillations at the two main resonance frequencies (8.25 and
+11.25 GHz) plus a weaker one at 5 GHz, each with its own spatial mode
+profile. The data can be generated for any number of timesteps and any
+grid size, and it is written block by block so that memory usage does
+not depend on the size of the data.
+
+"""
+
+import numpy as np
+import os
+
+from postprocessing.ovf import write_ovf
+
+DT = 5e-12  # s
+
+# (frequency in GHz, amplitude, spatial mode profile)
+MODES = [
+    (8.25, 1e-2, 'uniform'),
+    (11.25, 3e-3, 'edge'),
+    (5.0, 5e-4, 'antisymmetric'),
+    ]
+DAMPING_TIME = 5e-9  # s
+
+
+def parse_size(size):
+    """
+    Parse a size specification of the form 'NxNYxNX' (e.g. '4000x24x24')
+    and return a pair `(num_timesteps, (ny, nx))`.
+    """
+    try:
+        num_timesteps, ny, nx = (int(s) for s in size.lower().split('x'))
+    except ValueError:
+        raise ValueError("Invalid size '{}' (expected e.g. '4000x24x24')".format(size))
+    return num_timesteps, (ny, nx)
+
+
+def get_timesteps(num_timesteps):
+    return DT * np.arange(1, num_timesteps + 1)
+
+
+def get_mode_profile(kind, grid_shape):
+    """
+    Return the spatial profile (an array of shape `grid_shape`) of the given kind of mode.
+    """
+    ny, nx = grid_shape
+    y = (np.arange(ny) + 0.5) / ny - 0.5
+    x = (np.arange(nx) + 0.5) / nx - 0.5
+    if kind == 'uniform':
+        return np.ones(grid_shape)
+    elif kind == 'edge':
+        return np.outer(np.ones(ny), np.cos(2 * np.pi * x))
+    elif kind == 'antisymmetric':
+        return np.outer(np.sin(np.pi * y), np.ones(nx))
+    else:
+        raise ValueError("Unknown mode profile: '{}'".format(kind))
+
+
+def iter_magnetisation_blocks(num_timesteps, grid_shape, block_size=500):
+    """
+    Yield triples `(start, stop, m)` where `m` is an array of shape
+    (stop - start, ny, nx, 3) containing the magnetisation for the
+    timesteps with indices `start` to `stop - 1`.
+    """
+    ts = get_timesteps(num_timesteps)
+    m0 = np.array([0.787, 0.592, 0.0]) / np.linalg.norm([0.787, 0.592, 0.0])
+    profiles = [get_mode_profile(kind, grid_shape) for _, _, kind in MODES]
+
+    for start in range(0, num_timesteps, block_size):
+        stop = min(start + block_size, num_timesteps)
+        t = ts[start:stop, np.newaxis, np.newaxis]
+        m = np.empty((stop - start,) + tuple(grid_shape) + (3,))
+        m[:] = m0
+        for (freq, amplitude, _), profile in zip(MODES, profiles):
+            envelope = amplitude * np.exp(-t / DAMPING_TIME) * profile
+            phase = 2 * np.pi * freq * 1e9 * t
+            m[..., 0] += envelope * -0.6 * np.cos(phase)
+            m[..., 1] += envelope * 0.8 * np.cos(phase)
+            m[..., 2] += envelope * np.sin(phase)
+        yield start, stop, m
+
+
+def write_data_dir(data_dir, num_timesteps, grid_shape):
+    """
+    Write synthetic data in the OOMMF output layout ('dynamic_txyz.txt',
+    'mxs.npy', 'mys.npy', 'mzs.npy') to `data_dir` and return `data_dir`.
+    """
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    shape = (num_timesteps,) + tuple(grid_shape)
+    outputs = [np.lib.format.open_memmap(os.path.join(data_dir, 'm{}s.npy'.format(c)), mode='w+',
+                                         dtype=np.float64, shape=shape) for c in 'xyz']
+    m_avg = np.empty((num_timesteps, 3))
+    for start, stop, m in iter_magnetisation_blocks(num_timesteps, grid_shape):
+        for idx, output in enumerate(outputs):
+            output[start:stop] = m[..., idx]
+        m_avg[start:stop] = m.mean(axis=(1, 2))
+    for output in outputs:
+        output.flush()
+
+    table = np.column_stack([get_timesteps(num_timesteps), m_avg])
+    np.savetxt(os.path.join(data_dir, 'dynamic_txyz.txt'), table, fmt='%.17g',
+               header="Synthetic benchmark data\nt mx my mz")
+    return data_dir
+
+
+def write_omf_snapshots(directory, num_timesteps, grid_shape, representation='text'):
+    """
+    Write synthetic magnetisation snapshots (with two layers along z, as
+    for the standard problem) in OVF format to `directory`, using the same
+    filenames as OOMMF. Returns the list of filenames.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    filenames = []
+    for start, stop, m in iter_magnetisation_blocks(num_timesteps, grid_shape):
+        for i in range(start, stop):
+            filename = os.path.join(directory, 'dynamic-Oxs_TimeDriver-Spin-{:07d}.omf'.format(i))
+            write_ovf(filename, np.array([m[i - start], m[i - start]]), representation=representation)
+            filenames.append(filename)
+    return filenames
+
+
+def write_nmagprobe_output(filename, num_timesteps, grid_shape):
+    """
+    Write synthetic nmagprobe output (with the coordinates of the probe
+    points) for the given number of timesteps and grid to `filename`.
+    """
+    ny, nx = grid_shape
+    y, x = np.meshgrid(5.0 * np.arange(ny) + 2.5, 5.0 * np.arange(nx) + 2.5, indexing='ij')
+    positions = np.column_stack([x.ravel(), y.ravel(), np.full(nx * ny, 5.0)])
+    ts = get_timesteps(num_timesteps)
+
+    with open(filename, 'wb') as f:
+        f.write(b"# Output of nmagprobe (synthetic benchmark data)\n")
+        for start, stop, m in iter_magnetisation_blocks(num_timesteps, grid_shape):
+            num_rows = (stop - start) * nx * ny
+            rows = np.column_stack([np.repeat(ts[start:stop], nx * ny),
+                                    np.tile(positions, (stop - start, 1)),
+                                    m.reshape(num_rows, 3)])
+            np.savetxt(f, rows, fmt='%.17g %g %g %g [%.17g %.17g %.17g]')
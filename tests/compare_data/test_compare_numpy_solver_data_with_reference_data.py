@@ -0,0 +1,71 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing import fft_utils
+from postprocessing.data_comparison import compare_spectral_peaks, compare_time_series
+
+# The NumPy LLG solver uses a different time integrator and demag
+# implementation than OOMMF, so its data is not identical to the reference
+# data. Instead we check that the main resonance peaks agree to within
+# two frequency bins (the frequency resolution is 1/20ns = 0.05 GHz), and
+# that the average magnetisation agrees to within a small tolerance.
+PEAK_FREQUENCY_TOL = 0.1  # GHz
+AVERAGE_MAGNETISATION_TOL = 1e-6
+APPROX_PEAK_FREQS = [8.25, 11.25]  # GHz
+
+# Get absolute path to the current directory (to avoid problems if
+# this script is invoked from somewhere else).
+this_directory = os.path.abspath(os.path.dirname(__file__))
+
+REFERENCE_DATA_DIR_OOMMF = os.path.join(this_directory, '../../micromagnetic_simulation_data/reference_data/oommf/')
+GENERATED_DATA_DIR_NUMPY = os.path.join(this_directory, '../../micromagnetic_simulation_data/recomputed_data/numpy/')
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(GENERATED_DATA_DIR_NUMPY),
+                                reason="No data generated by the NumPy LLG solver (run 'make recompute-numpy-data')")
+
+
+def load_table(data_dir):
+    return np.loadtxt(os.path.join(data_dir, 'dynamic_txyz.txt'))
+
+
+def test__compare_average_magnetisation():
+    """
+    Check that maximum difference in average magnetisation between
+    reference data and the data computed by the NumPy LLG solver is
+    below threshold.
+
+    """
+    print("\nComparing average magnetisation between reference data and NumPy solver data.")
+
+    data_ref = load_table(REFERENCE_DATA_DIR_OOMMF)
+    data_gen = load_table(GENERATED_DATA_DIR_NUMPY)
+    assert data_ref.shape == data_gen.shape
+    assert np.allclose(data_ref[:, 0], data_gen[:, 0], rtol=1e-12, atol=0)
+
+    for idx, component in enumerate(['x', 'y', 'z'], start=1):
+        result = compare_time_series(data_ref[:, idx], data_gen[:, idx], AVERAGE_MAGNETISATION_TOL,
+                                     name='m_{} (average)'.format(component), timesteps=data_ref[:, 0])
+        print(result.format())
+        assert result.passed
+
+
+def test__compare_peak_frequencies():
+    """
+    Check that the main resonance peaks of the data computed by the NumPy
+    LLG solver agree with those of the OOMMF reference data (computed via
+    method 1 from the average y-component of the magnetisation).
+
+    """
+    data_ref = load_table(REFERENCE_DATA_DIR_OOMMF)
+    data_gen = load_table(GENERATED_DATA_DIR_NUMPY)
+    freqs = fft_utils.get_fft_frequencies(data_ref[:, 0], unit='GHz')
+    peaks = compare_spectral_peaks(freqs,
+                                   fft_utils.get_spectrum_via_method_1(data_ref[:, 2]),
+                                   fft_utils.get_spectrum_via_method_1(data_gen[:, 2]),
+                                   APPROX_PEAK_FREQS)
+
+    for peak in peaks:
+        print("\nPeak near {} GHz: reference {:.4f} GHz, NumPy solver {:.4f} GHz".format(
+            peak['approx_freq'], peak['freq_ref'], peak['freq_gen']))
+        assert abs(peak['freq_deviation']) < PEAK_FREQUENCY_TOL
@@ -1,8 +1,12 @@
 import os
 
 from postprocessing import DataReader
+from postprocessing.data_comparison import compare_data, compare_spatially_resolved_magnetisation
 
-TOL = 0
+TOL = 1e-14
+
+# Maximum allowed deviation of the peak frequencies (in GHz).
+PEAK_FREQUENCY_TOL = 1e-6
 
 # Get absolute path to the current directory (to avoid problems if
 # this script is invoked from somewhere else).
@@ -11,29 +15,27 @@ this_directory = os.path.abspath(os.path.dirname(__file__))
 REFERENCE_DATA_DIR_OOMMF = os.path.join(this_directory, '../../micromagnetic_simulation_data/reference_data/oommf/')
 GENERATED_DATA_DIR_OOMMF = os.path.join(this_directory, '../../micromagnetic_simulation_data/recomputed_data/oommf/')
 
-ref_data_reader = DataReader(REFERENCE_DATA_DIR_OOMMF, data_format='OOMMF')
-gen_data_reader = DataReader(GENERATED_DATA_DIR_OOMMF, data_format='OOMMF')
+# The spatially resolved data is memory-mapped and compared in chunks,
+# so it is never loaded into memory as a whole.
+ref_data_reader = DataReader(REFERENCE_DATA_DIR_OOMMF, data_format='OOMMF', mmap_mode='r')
+gen_data_reader = DataReader(GENERATED_DATA_DIR_OOMMF, data_format='OOMMF', mmap_mode='r')
 
 
 def test__compare_average_magnetisation():
     """
     Check that maximum difference in average magnetisation between
-    reference data and recomputed data is below threshold.
+    reference data and recomputed data is below threshold, and that
+    the main peaks of the spectra agree.
 
     """
 
     print("\nComparing average magnetisation between reference data and recomputed data.")
 
-    TOL = 1e-14
-
-    for component in ['x', 'y', 'z']:
-        m_avg_ref = ref_data_reader.get_average_magnetisation(component)
-        m_avg_gen = gen_data_reader.get_average_magnetisation(component)
-
-        max_diff = abs(m_avg_ref - m_avg_gen).max()
+    report = compare_data(ref_data_reader, gen_data_reader, TOL, spatially_resolved=False,
+                          approx_peak_freqs=[8.25, 11.25], peak_method=1, peak_tol=PEAK_FREQUENCY_TOL)
 
-        print("Maximum difference in {} component: {}".format(component, max_diff))
-        assert max_diff < TOL
+    print(report.format())
+    assert report.passed
 
 
 def test__compare_spatially_resolved_magnetisation():
@@ -45,13 +47,10 @@ def test__compare_spatially_resolved_magnetisation():
 
     print("\nComparing spatially resolved magnetisation between reference data and recomputed data.")
 
-    TOL = 1e-14
+    # Stop at the first timestep which exceeds the tolerance.
+    results = compare_spatially_resolved_magnetisation(ref_data_reader, gen_data_reader, TOL, early_exit=True)
 
     for component in ['x', 'y', 'z']:
-        m_ref = ref_data_reader.get_spatially_resolved_magnetisation(component)
-        m_gen = gen_data_reader.get_spatially_resolved_magnetisation(component)
-
-        max_diff = abs(m_ref - m_gen).max()
-
-        print("Maximum difference in {} component: {}".format(component, max_diff))
-        assert max_diff < TOL
+        print(results[component].format())
+    for component in ['x', 'y', 'z']:
+        assert results[component].passed
@@ -1,4 +1,6 @@
 import numpy as np
+import os
+import time
 from numpy import pi
 
 from postprocessing.data_reader import BaseDataReader
@@ -75,10 +77,12 @@ class FakeDataReader(BaseDataReader):
 
     """
 
-    def __init__(self, damping=0.0):
+    def __init__(self, damping=0.0, grid_shape=(24, 24), dtype=None):
         self.timesteps = np.linspace(5e-12, 20e-9, 4000)
         self.ringdown_generator = FakeRingdownGenerator(self.timesteps)
         self.damping = damping
+        self.grid_shape = grid_shape
+        self.dtype = dtype
 
     def _get_timesteps(self):
         return self.timesteps
@@ -94,16 +98,16 @@ class FakeDataReader(BaseDataReader):
         """
         # Compute the average magnetisation from the spatially resolved
         # data by averaging over the two spatial dimensions.
-        m_full = self.get_spatially_resolved_magnetisation(component)
+        m_full = self._get_spatially_resolved_magnetisation(component)
         m_avg = np.mean(m_full, axis=(1, 2))
         return m_avg
 
     def _get_spatially_resolved_magnetisation(self, component):
         """
-        Return 3d numpy array of shape N x 24 x 24 representing a ringdown
+        Return 3d numpy array of shape N x n1 x n2 representing a ringdown
         which is the superposition of various oscillations at different
-        frequencies. Here `N` is the number of timesteps and 24 x 24 is the
-        size of the sampling grid.
+        frequencies. Here `N` is the number of timesteps and n1 x n2 is the
+        size of the sampling grid (default: 24 x 24).
 
         We don't bother inventing different data for the different magnetisation
         components but simply return the same data for `m_x`, `m_y`, `m_z`.
@@ -114,13 +118,153 @@ class FakeDataReader(BaseDataReader):
         m3 = -m1
 
         N = len(self.timesteps)
-        m = np.zeros((N, 24, 24))
+        n1, n2 = self.grid_shape
+        k = n2 // 3
+        m = np.zeros((N, n1, n2))
 
         # Set different oscillation patterns in different parts of the sample
         # (but keep the outside ones symmetric so that they eliminate each other
         # in the average data).
-        m[:, :, :8]   = m1[:, np.newaxis, np.newaxis].repeat(24, axis=1).repeat(8, axis=2)
-        m[:, :, 8:16] = m2[:, np.newaxis, np.newaxis].repeat(24, axis=1).repeat(8, axis=2)
-        m[:, :, 16:]  = m3[:, np.newaxis, np.newaxis].repeat(24, axis=1).repeat(8, axis=2)
-        
+        m[:, :, :k]     = m1[:, np.newaxis, np.newaxis]
+        m[:, :, k:n2-k] = m2[:, np.newaxis, np.newaxis]
+        m[:, :, n2-k:]  = m3[:, np.newaxis, np.newaxis]
+
         return m
+
+
+def write_fake_data_dir(data_dir, data_reader=None):
+    """
+    Write the data provided by `data_reader` (default: a `FakeDataReader`
+    with zero damping) to the directory `data_dir`, using the same file
+    layout as the OOMMF/Nmag output ('dynamic_txyz.txt', 'mxs.npy',
+    'mys.npy', 'mzs.npy'). Returns `data_dir`.
+
+    """
+    if data_reader is None:
+        data_reader = FakeDataReader()
+
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    columns = [data_reader.get_timesteps()] + \
+        [data_reader.get_average_magnetisation(c) for c in 'xyz']
+    np.savetxt(os.path.join(data_dir, 'dynamic_txyz.txt'), np.array(columns).T)
+
+    for component in 'xyz':
+        m = data_reader.get_spatially_resolved_magnetisation(component)
+        np.save(os.path.join(data_dir, 'm{}s.npy'.format(component)), m)
+
+    return data_dir
+
+
+ODT_COLUMN_NAMES = ['Oxs_RungeKuttaEvolve:evolver:Total energy', 'Oxs_TimeDriver::Iteration',
+                    'Oxs_TimeDriver::Stage', 'Oxs_TimeDriver::mx', 'Oxs_TimeDriver::my',
+                    'Oxs_TimeDriver::mz', 'Oxs_TimeDriver::Simulation time']
+
+
+def write_synthetic_odt(filename, data_reader=None, rows_per_write=100, delay=0.0, stop_filename=None):
+    """
+    Write the average magnetisation provided by `data_reader` (default: a
+    `FakeDataReader` with zero damping) to the file `filename` in the
+    format of an OOMMF data table, imitating a running simulation: the
+    rows are appended in batches of `rows_per_write`, with a pause of
+    `delay` seconds between batches (the last batch ends in the middle
+    of a line), and the table is closed with '# Table End'. If the file
+    `stop_filename` exists before a batch is written, the table is
+    closed early (like the simulation drivers do).
+
+    """
+    if data_reader is None:
+        data_reader = FakeDataReader()
+
+    timesteps = data_reader.get_timesteps()
+    m_avg = [data_reader.get_average_magnetisation(c) for c in 'xyz']
+    lines = ["  {:.17g} {} {} {:.17g} {:.17g} {:.17g} {:.17g}\n".format(
+        0.0, idx + 1, idx, m_avg[0][idx], m_avg[1][idx], m_avg[2][idx], t) for idx, t in enumerate(timesteps)]
+
+    with open(filename, 'w') as f:
+        f.write("# ODT 1.0\n# Table Start\n# Title: Synthetic ringdown\n")
+        f.write("# Columns: " + ' '.join('{' + name + '}' if ' ' in name else name
+                                         for name in ODT_COLUMN_NAMES) + "\n")
+        f.write("# Units: J {} {} {} {} {} s\n")
+        f.flush()
+        for start in range(0, len(lines), rows_per_write):
+            if stop_filename is not None and os.path.exists(stop_filename):
+                if start > 0:
+                    # Complete the partially written line.
+                    f.write(lines[start])
+                break
+            content = ''.join(lines[start:start + rows_per_write])
+            if start + rows_per_write < len(lines):
+                # Imitate a partially written line.
+                next_line = lines[start + rows_per_write]
+                content += next_line[:len(next_line) // 2]
+                lines[start + rows_per_write] = next_line[len(next_line) // 2:]
+            f.write(content)
+            f.flush()
+            time.sleep(delay)
+        f.write("# Table End\n")
+
+
+def make_box_mesh(size=(120.0, 120.0, 10.0), num_cells=(6, 5, 2)):
+    """
+    Return a tetrahedral mesh `(points, simplices)` of the box [0, Lx] x
+    [0, Ly] x [0, Lz], in which each of the nx x ny x nz cubes is divided
+    into six tetrahedra (the points are stored in Nmag's mesh file format).
+
+    """
+    axes = [np.linspace(0, length, n + 1) for length, n in zip(size, num_cells)]
+    xs, ys, zs = np.meshgrid(*axes, indexing='ij')
+    points = np.column_stack([xs.ravel(), ys.ravel(), zs.ravel()])
+
+    def index(i, j, k):
+        return (i * (num_cells[1] + 1) + j) * (num_cells[2] + 1) + k
+
+    # Each cube is split along its main diagonal into six tetrahedra, one
+    # for each path from corner (0, 0, 0) to (1, 1, 1) along the edges.
+    paths = [(0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+    simplices = []
+    for i in range(num_cells[0]):
+        for j in range(num_cells[1]):
+            for k in range(num_cells[2]):
+                for path in paths:
+                    corner = [i, j, k]
+                    tet = [index(*corner)]
+                    for axis in path:
+                        corner[axis] += 1
+                        tet.append(index(*corner))
+                    simplices.append(tet)
+    return points, np.array(simplices, dtype=np.int32)
+
+
+def write_synthetic_nmag_h5(data_dir, field_func, timesteps, mesh=None, mesh_filename='meshes/mesh_555.nmesh.h5',
+                            dat_filename='02_dynamic_stage_dat.h5'):
+    """
+    Write an Nmag mesh file and a `_dat.h5` file to `data_dir` which contain
+    a (synthetic) magnetisation at the nodes of the given mesh (default: see
+    `make_box_mesh`). The magnetisation at the time t and the node positions
+    `points` is `field_func(t, points)` (an array of shape (num_points, 3)).
+    As in the output of Nmag, the first row of the field table contains the
+    initial state at t = 0, followed by the given timesteps. Returns the mesh.
+
+    """
+    import h5py
+
+    points, simplices = make_box_mesh() if mesh is None else mesh
+    mesh_filename = os.path.join(data_dir, mesh_filename)
+    if not os.path.exists(os.path.dirname(mesh_filename)):
+        os.makedirs(os.path.dirname(mesh_filename))
+    with h5py.File(mesh_filename, 'w') as f:
+        f['mesh/points'] = points
+        f['mesh/simplices'] = simplices
+        f['mesh/simplicesregions'] = np.ones(len(simplices), dtype=np.int32)
+
+    times = np.concatenate([[0.0], timesteps])
+    row_dtype = np.dtype([('data', float, (len(points), 3)), ('id', np.int64), ('stage', np.int64),
+                          ('step', np.int64), ('time', float)])
+    rows = np.zeros(len(times), dtype=row_dtype)
+    for idx, t in enumerate(times):
+        rows[idx] = (field_func(t, points), idx, 1, idx * 10, t)
+    with h5py.File(os.path.join(data_dir, dat_filename), 'w') as f:
+        f['data/fields/m/m_Py'] = rows
+    return points, simplices
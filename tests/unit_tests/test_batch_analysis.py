@@ -0,0 +1,83 @@
+import io
+import numpy as np
+import os
+import pytest
+
+from postprocessing.batch_analysis import analyse_batch, expand_data_dirs, read_results_table
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+
+@pytest.fixture
+def data_dirs(tmpdir):
+    """
+    Three directories with fake data and one directory with corrupt data.
+    """
+    data_dirs = [write_fake_data_dir(os.path.join(str(tmpdir), 'run_{}'.format(i)), FakeDataReader(damping=0.08))
+                 for i in range(3)]
+    broken_dir = write_fake_data_dir(os.path.join(str(tmpdir), 'run_broken'), FakeDataReader())
+    with open(os.path.join(broken_dir, 'mys.npy'), 'wb') as f:
+        f.write(b'not a numpy file')
+    return data_dirs + [broken_dir]
+
+
+def test__expand_data_dirs_accepts_glob_patterns_and_plain_directories(data_dirs, tmpdir):
+    patterns = [os.path.join(str(tmpdir), 'run_[0-9]'), data_dirs[0], os.path.join(str(tmpdir), 'nonexistent')]
+    assert expand_data_dirs(patterns) == sorted(data_dirs[:3])
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test__batch_analysis_writes_consolidated_table_and_isolates_failures(data_dirs, tmpdir, jobs):
+    """
+    Each successfully analysed directory contributes one row per requested peak; failing directories
+    are recorded with status 'failed' without affecting the others.
+    """
+    output_file = os.path.join(str(tmpdir), 'peaks.csv')
+    progress = io.StringIO()
+
+    summary = analyse_batch(data_dirs, output_file, [2.35, 12.0], jobs=jobs, progress_stream=progress)
+
+    assert summary == {'ok': 3, 'failed': 1, 'skipped': 0}
+    rows = read_results_table(output_file)
+    ok_rows = [row for row in rows if row['status'] == 'ok']
+    failed_rows = [row for row in rows if row['status'] == 'failed']
+
+    assert sorted(set(row['data_dir'] for row in ok_rows)) == sorted(data_dirs[:3])
+    assert len(ok_rows) == 6
+    assert np.allclose([float(row['peak_freq_GHz']) for row in ok_rows], [2.35, 12.0] * 3, atol=0.05)
+    assert all(float(row['amplitude']) > 0 and float(row['linewidth_GHz']) > 0 for row in ok_rows)
+
+    assert [row['data_dir'] for row in failed_rows] == [data_dirs[3]]
+    assert failed_rows[0]['error'] != ''
+    assert '[4/4]' in progress.getvalue()
+
+
+def test__batch_analysis_skips_completed_directories_and_retries_failed_ones(data_dirs, tmpdir):
+    output_file = os.path.join(str(tmpdir), 'peaks.csv')
+    analyse_batch(data_dirs, output_file, [12.0], progress_stream=None)
+
+    # Repair the broken directory; only this one is analysed again.
+    write_fake_data_dir(data_dirs[3], FakeDataReader(damping=0.08))
+    summary = analyse_batch(data_dirs, output_file, [12.0], progress_stream=None)
+
+    assert summary == {'ok': 1, 'failed': 0, 'skipped': 3}
+    rows = read_results_table(output_file)
+    assert sorted(row['data_dir'] for row in rows) == sorted(data_dirs)
+    assert all(row['status'] == 'ok' for row in rows)
+
+    summary = analyse_batch(data_dirs, output_file, [12.0], resume=False, progress_stream=None)
+    assert summary == {'ok': 4, 'failed': 0, 'skipped': 0}
+    assert len(read_results_table(output_file)) == 4
+
+
+def test__batch_analysis_saves_mode_maps(data_dirs, tmpdir):
+    output_file = os.path.join(str(tmpdir), 'peaks.csv')
+    mode_map_dir = os.path.join(str(tmpdir), 'mode_maps')
+
+    summary = analyse_batch(data_dirs[:2], output_file, [2.35, 12.0], progress_stream=None,
+                            mode_map_dir=mode_map_dir)
+
+    assert summary['ok'] == 2
+    filenames = sorted(os.listdir(mode_map_dir))
+    assert len(filenames) == 4
+    assert all(name.endswith('GHz.png') for name in filenames)
+    assert sum('run_0_mode_' in name for name in filenames) == 2
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+# The benchmark scripts are not part of the postprocessing package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../benchmarks'))
+
+import compare_benchmarks  # noqa: E402
+import run_benchmarks  # noqa: E402
+import synthetic_data  # noqa: E402
+from postprocessing import DataReader, SpectralAnalysis  # noqa: E402
+
+
+def test__synthetic_data_has_the_expected_layout_and_peaks(tmpdir):
+    data_dir = synthetic_data.write_data_dir(os.path.join(str(tmpdir), 'data'), 2000, (6, 4))
+    data_reader = DataReader(data_dir, data_format='OOMMF')
+    assert data_reader.get_spatially_resolved_magnetisation('y').shape == (2000, 6, 4)
+    assert data_reader.get_timesteps().shape == (2000,)
+
+    spectral_analysis = SpectralAnalysis(data_reader)
+    for approx_freq in [8.25, 11.25]:
+        assert abs(spectral_analysis.find_peak_frequency(approx_freq) - approx_freq) < 0.1
+
+
+def test__benchmark_results_can_be_written_as_json_and_compared(tmpdir):
+    results = run_benchmarks.run_benchmarks(['100x4x3'], str(tmpdir), groups=['data_reader', 'fft_utils'],
+                                            repeat=2)
+    names = [r['name'] for r in results['results']]
+    assert 'DataReader.__init__' in names
+    assert 'get_spectrum_via_method_2' in names
+    assert 'find_peak_frequency' in names
+    for result in results['results']:
+        assert result['size'] == '100x4x3'
+        assert result['grid_shape'] == [4, 3]
+        assert len(result['times']) == 2
+        assert 0 < result['min'] <= result['median']
+
+    filename = os.path.join(str(tmpdir), 'results.json')
+    with open(filename, 'w') as f:
+        json.dump(results, f)
+    _, baseline = compare_benchmarks.load_results(filename)
+
+    # Make one benchmark artificially slower.
+    new = {key: dict(result) for key, result in baseline.items()}
+    new[('find_peak_frequency', '100x4x3')]['min'] *= 2
+    rows = compare_benchmarks.compare_results(baseline, new)
+    assert len(rows) == len(names)
+    assert [row[0] for row in rows if row[-1] == 'slower'] == ['find_peak_frequency']
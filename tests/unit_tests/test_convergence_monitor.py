@@ -0,0 +1,93 @@
+import json
+import multiprocessing
+import numpy as np
+import os
+import signal
+
+from postprocessing.convergence_monitor import ConvergenceMonitor, get_signal_number, truncate_stopped_oommf_run
+from postprocessing.live_monitoring import OdtFollower
+from postprocessing.ovf import write_ovf
+from .mock_utils import FakeDataReader, write_synthetic_odt
+
+
+def run_monitor_with_writer(tmpdir, stop_filename=None, **kwargs):
+    odt_filename = os.path.join(str(tmpdir), 'dynamic.odt')
+    # Stand-in for the simulation, which writes a ringdown in batches.
+    writer = multiprocessing.Process(target=write_synthetic_odt,
+                                     args=(odt_filename, FakeDataReader(), 100, 0.02, stop_filename))
+    writer.start()
+    try:
+        monitor = ConvergenceMonitor(odt_filename, [1.0, 12.0], 0.01, stop_filename=stop_filename,
+                                     pid=writer.pid, **kwargs)
+        status = monitor.run(interval=0.005, idle_timeout=30)
+    finally:
+        writer.join()
+    return monitor, status, writer, odt_filename
+
+
+def test__monitor_writes_stop_file_when_peaks_have_converged(tmpdir):
+    stop_filename = os.path.join(str(tmpdir), 'STOP')
+    monitor, status, writer, odt_filename = run_monitor_with_writer(tmpdir, stop_filename)
+
+    assert monitor.converged and status['converged']
+    assert status['num_timesteps'] % 200 == 0 and status['num_timesteps'] < 4000
+    for peak in status['peaks']:
+        assert abs(peak['freq'] - peak['approx_freq']) < 0.05
+        assert peak['uncertainty'] < 0.01
+    with open(stop_filename) as f:
+        assert json.load(f) == status
+
+    # The writer has stopped early.
+    assert writer.exitcode == 0
+    follower = OdtFollower(odt_filename)
+    assert len(follower.read_new_rows()) < 4000
+    assert follower.finished
+
+
+def test__monitor_signals_the_simulation_process(tmpdir):
+    monitor, status, writer, _ = run_monitor_with_writer(tmpdir, signum=get_signal_number('TERM'))
+    assert monitor.converged
+    assert writer.exitcode == -signal.SIGTERM
+
+
+def test__monitor_does_not_stop_before_min_timesteps_or_without_convergence(tmpdir):
+    monitor, status, writer, _ = run_monitor_with_writer(tmpdir, min_timesteps=3000, signum=signal.SIGTERM)
+    assert monitor.converged
+    assert status['num_timesteps'] == 3000
+
+    monitor, status, writer, _ = run_monitor_with_writer(tmpdir, check_interval=500, num_checks=20,
+                                                         signum=signal.SIGTERM)
+    assert writer.exitcode == 0
+    assert not monitor.converged
+    assert [peak['uncertainty'] for peak in status['peaks']] == [None, None]
+
+
+def test__uncertainties_are_the_maximum_deviation_of_recent_estimates(tmpdir):
+    monitor = ConvergenceMonitor(os.path.join(str(tmpdir), 'dynamic.odt'), [1.0, 12.0], 0.01, num_checks=3)
+    monitor.history = [[0.5, 11.0], None, [1.02, 12.1], [0.99, 12.0], [1.0, 12.0]]
+    assert np.allclose(monitor.get_uncertainties(), [0.02, 0.1])
+    monitor.history = monitor.history[:-1]
+    assert monitor.get_uncertainties() is None
+
+
+def test__truncate_stopped_oommf_run(tmpdir):
+    directory = str(tmpdir)
+    odt_filename = os.path.join(directory, 'dynamic.odt')
+    with open(odt_filename, 'w') as f:
+        f.write("# ODT 1.0\n# Columns: {Oxs_TimeDriver::Simulation time} Oxs_TimeDriver::mx "
+                "Oxs_TimeDriver::my Oxs_TimeDriver::mz\n")
+        for idx in range(5):
+            f.write("{} 0.1 0.2 0.3\n".format((idx + 1) * 5e-12))
+        f.write("3e-11 0.1")
+    m = np.ones((1, 2, 2, 3))
+    for idx in range(5):
+        write_ovf(os.path.join(directory, 'dynamic-{:07d}.omf'.format(idx)), m)
+    # The last snapshot was not written completely.
+    with open(os.path.join(directory, 'dynamic-{:07d}.omf'.format(4)), 'r+') as f:
+        f.truncate(100)
+
+    assert truncate_stopped_oommf_run(directory) == 4
+    assert sorted(os.listdir(directory)) == ['dynamic-{:07d}.omf'.format(idx) for idx in range(4)] + ['dynamic.odt']
+    follower = OdtFollower(odt_filename)
+    assert np.allclose(follower.read_new_rows()[:, 0], [5e-12, 10e-12, 15e-12, 20e-12])
+    assert follower.finished
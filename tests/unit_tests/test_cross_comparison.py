@@ -0,0 +1,123 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from postprocessing import fft_utils
+from postprocessing.cross_comparison import SpectralCrossComparison, TimeResampler, get_common_timesteps
+from postprocessing.data_reader import BaseDataReader
+
+FREQS = [8.0, 11.0]  # GHz
+
+
+class RingdownDataReader(BaseDataReader):
+    """
+    Data reader for a damped superposition of oscillations at the
+    frequencies FREQS, sampled at the given timesteps on a small grid.
+    """
+
+    def __init__(self, timesteps, freq_shift=0.0, grid_shape=(4, 6)):
+        self.data_dir = 'ringdown'
+        self.timesteps = np.asarray(timesteps)
+        self.grid_shape = grid_shape
+        t = self.timesteps * 1e9
+        modes = [np.cos(2 * np.pi * (f + freq_shift) * t) * np.exp(-0.1 * t) for f in FREQS]
+        profile_1 = np.linspace(0.5, 1.0, grid_shape[0] * grid_shape[1]).reshape(grid_shape)
+        profile_2 = np.cos(np.linspace(0, np.pi, grid_shape[1]))[np.newaxis, :] * np.ones(grid_shape)
+        self.m = 0.01 * (modes[0][:, np.newaxis, np.newaxis] * profile_1 +
+                         modes[1][:, np.newaxis, np.newaxis] * profile_2)
+        self.num_reads = 0
+
+    def _get_timesteps(self):
+        return self.timesteps
+
+    def _get_average_magnetisation(self, component):
+        return self.m.mean(axis=(1, 2))
+
+    def _get_spatially_resolved_magnetisation(self, component):
+        self.num_reads += 1
+        return self.m
+
+
+def make_timesteps(num_timesteps, dt=5e-12, t0=5e-12):
+    return t0 + dt * np.arange(num_timesteps)
+
+
+def test__runs_with_the_same_timestep_are_trimmed():
+    reader_a = RingdownDataReader(make_timesteps(4008))
+    reader_b = RingdownDataReader(make_timesteps(4000))
+    comparison = SpectralCrossComparison([reader_a, reader_b], names=['a', 'b'])
+
+    assert comparison.get_num_timesteps() == 4000
+    assert comparison.resamplers['a'].is_trimmed and comparison.resamplers['b'].is_trimmed
+
+    # The spectra agree with those computed by `fft_utils` from the trimmed data.
+    for method in [1, 2]:
+        for name in ['a', 'b']:
+            m_full = comparison.data_readers[name].get_spatially_resolved_magnetisation('y')[:4000]
+            spectrum = (fft_utils.get_spectrum_via_method_1(m_full.mean(axis=(1, 2))) if method == 1
+                        else fft_utils.get_spectrum_via_method_2(m_full))
+            assert np.allclose(comparison.get_spectrum(name, 'y', method=method), spectrum, rtol=1e-10, atol=1e-20)
+    assert len(comparison.freqs) == len(comparison.get_spectrum('a', 'x'))
+
+    peaks = comparison.compare('a', 'b', FREQS, component='y', method=2)
+    for peak, freq in zip(peaks, FREQS):
+        assert abs(peak['freq_ref'] - freq) < 0.01
+        assert abs(peak['freq_deviation']) < 1e-10
+        assert abs(peak['relative_amplitude_deviation']) < 1e-6
+
+
+def test__runs_with_different_timesteps_are_interpolated():
+    reader_a = RingdownDataReader(make_timesteps(4000, dt=5e-12))
+    reader_b = RingdownDataReader(make_timesteps(9000, dt=2.5e-12, t0=2.5e-12), freq_shift=0.05)
+    comparison = SpectralCrossComparison([reader_b, reader_a], names=['b', 'a'])
+
+    assert np.allclose(comparison.timesteps, reader_a.get_timesteps())
+    assert comparison.resamplers['a'].is_trimmed
+    assert not comparison.resamplers['b'].is_trimmed
+    assert 'interpolated' in comparison.format_alignment()
+
+    peaks = comparison.compare('a', 'b', FREQS, method=1)
+    for peak in peaks:
+        assert abs(peak['freq_deviation'] - 0.05) < 0.01
+
+
+def test__each_spectrum_is_computed_once_for_pairwise_comparisons():
+    readers = [RingdownDataReader(make_timesteps(2000), freq_shift=shift) for shift in [0.0, 0.02, 0.04]]
+    comparison = SpectralCrossComparison(readers, names=['a', 'b', 'c'])
+
+    results = comparison.compare_all(FREQS, components=['x', 'y'], methods=[1, 2])
+    assert sorted(results) == [('a', 'b'), ('a', 'c'), ('b', 'c')]
+    assert sorted(results[('a', 'b')]) == [('x', 1), ('x', 2), ('y', 1), ('y', 2)]
+    assert abs(results[('a', 'c')][('y', 2)][0]['freq_deviation'] - 0.04) < 0.01
+
+    comparison.compare_all(FREQS)
+    assert [reader.num_reads for reader in readers] == [3, 3, 3]
+    assert len(comparison._peak_finders) == 3 * 4
+
+
+def test__spatially_averaged_comparison():
+    readers = [RingdownDataReader(make_timesteps(2000)), RingdownDataReader(make_timesteps(2000))]
+    comparison = SpectralCrossComparison(readers, names=['a', 'b'], spatially_resolved=False)
+
+    results = comparison.compare_all(FREQS)
+    assert list(results[('a', 'b')]) == [('y', 1)]
+    assert [reader.num_reads for reader in readers] == [0, 0]
+    with pytest.raises(ValueError):
+        comparison.get_spectrum('a', 'y', method=2)
+
+
+def test__plot_overlay():
+    readers = [RingdownDataReader(make_timesteps(2000)), RingdownDataReader(make_timesteps(2000), freq_shift=0.1)]
+    comparison = SpectralCrossComparison(readers, names=['OOMMF', 'Nmag'])
+
+    fig = comparison.plot_overlay(component='y', method=2, approx_freqs=FREQS)
+    ax = fig.axes[0]
+    assert [line.get_label() for line in ax.get_lines() if not line.get_label().startswith('_')] == ['OOMMF', 'Nmag']
+    plt.close(fig)
+
+
+def test__time_bases_must_overlap():
+    with pytest.raises(ValueError):
+        get_common_timesteps([make_timesteps(100), make_timesteps(100, t0=1e-9)])
+    with pytest.raises(ValueError):
+        TimeResampler(make_timesteps(100, dt=1e-11), make_timesteps(200))
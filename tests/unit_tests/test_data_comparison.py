@@ -0,0 +1,110 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing import DataReader
+from postprocessing.data_comparison import \
+    compare_data, compare_data_dirs, compare_spatially_resolved_magnetisation, \
+    compare_spectral_peaks, compare_time_series
+from postprocessing.fft_utils import get_fft_frequencies, get_spectrum_via_method_1
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+
+def make_perturbed_copy(m, timestep, value):
+    m_gen = np.array(m, copy=True)
+    m_gen[timestep:] += value
+    return m_gen
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, None])
+def test__chunked_comparison_agrees_with_direct_computation(chunk_size):
+    m_ref = np.random.RandomState(0).uniform(-1, 1, size=(100, 6, 4))
+    m_gen = m_ref + np.random.RandomState(1).uniform(-1e-6, 1e-6, size=m_ref.shape)
+    timesteps = np.arange(100) * 5e-12
+
+    result = compare_time_series(m_ref, m_gen, tol=1e-5, timesteps=timesteps, chunk_size=chunk_size)
+
+    diff = abs(m_gen - m_ref)
+    assert result.passed
+    assert result.max_diff == diff.max()
+    assert np.isclose(result.rms_diff, np.sqrt((diff**2).mean()), rtol=1e-12)
+    assert result.num_timesteps_compared == 100
+    assert not result.stopped_early
+
+
+def test__first_violation_and_early_exit():
+    m_ref = np.zeros((100, 3, 3))
+    m_gen = make_perturbed_copy(m_ref, 42, 1e-3)
+    timesteps = np.arange(100) * 5e-12
+
+    result = compare_time_series(m_ref, m_gen, tol=1e-4, timesteps=timesteps, chunk_size=10)
+    assert not result.passed
+    assert (result.first_violation, result.first_violation_diff) == (42, 1e-3)
+    assert result.first_violation_time == timesteps[42]
+    assert result.num_timesteps_compared == 100
+    assert 'first exceeded at timestep 42' in result.format()
+
+    result = compare_time_series(m_ref, m_gen, tol=1e-4, chunk_size=10, early_exit=True)
+    assert (result.first_violation, result.num_timesteps_compared) == (42, 50)
+    assert result.stopped_early
+
+    with pytest.raises(ValueError):
+        compare_time_series(m_ref, m_gen[:50], tol=1e-4)
+
+
+def test__comparison_of_memory_mapped_data_in_parallel(tmpdir):
+    data_reader = FakeDataReader(damping=0.08)
+    ref_dir = write_fake_data_dir(os.path.join(str(tmpdir), 'ref'), data_reader)
+    gen_dir = write_fake_data_dir(os.path.join(str(tmpdir), 'gen'), data_reader)
+
+    # Perturb the y-component of the recomputed data from timestep 123 onwards.
+    m = np.load(os.path.join(gen_dir, 'mys.npy'))
+    np.save(os.path.join(gen_dir, 'mys.npy'), make_perturbed_copy(m, 123, 1e-8))
+
+    with DataReader(ref_dir, data_format='OOMMF', mmap_mode='r') as ref_data_reader, \
+            DataReader(gen_dir, data_format='OOMMF', mmap_mode='r') as gen_data_reader:
+        serial = compare_spatially_resolved_magnetisation(ref_data_reader, gen_data_reader, 1e-12,
+                                                          chunk_size=16, jobs=1)
+        parallel = compare_spatially_resolved_magnetisation(ref_data_reader, gen_data_reader, 1e-12,
+                                                            chunk_size=16, jobs=3)
+        early = compare_spatially_resolved_magnetisation(ref_data_reader, gen_data_reader, 1e-12,
+                                                         chunk_size=16, early_exit=True, jobs=1)
+
+    for component in 'xyz':
+        assert parallel[component].max_diff == serial[component].max_diff
+        assert parallel[component].rms_diff == serial[component].rms_diff
+    assert serial['x'].passed and serial['z'].passed
+    assert serial['y'].first_violation == 123
+    assert np.isclose(serial['y'].max_diff, 1e-8)
+    # The comparison stops in the chunk containing the first violation,
+    # and the remaining component is not compared.
+    assert early['y'].first_violation == 123
+    assert early['y'].num_timesteps_compared == 128
+    assert early['z'].num_timesteps_compared == 0 and early['z'].stopped_early
+
+    report = compare_data_dirs(ref_dir, gen_dir, 1e-12, approx_peak_freqs=[5.0], peak_tol=1e-6)
+    assert not report.passed
+    assert report.average['y'].passed
+    assert report.spatially_resolved['y'].first_violation == 123
+    assert report.peaks_passed
+    assert 'FAILED' in report.format()
+
+
+def test__spectral_peak_deviations():
+    data_reader = FakeDataReader(damping=0.08)
+    timesteps = data_reader.get_timesteps()
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    m_ref = data_reader.get_average_magnetisation('y')
+    # Shift the oscillation frequency by 1% and scale the amplitude.
+    m_gen = 1.1 * np.interp(1.01 * timesteps, timesteps, m_ref)
+
+    peaks = compare_spectral_peaks(freqs, get_spectrum_via_method_1(m_ref), get_spectrum_via_method_1(m_gen), [5.0])
+
+    peak, = peaks
+    assert abs(peak['freq_ref'] - 5.0) < 0.05
+    assert abs(peak['freq_deviation'] - 0.01 * peak['freq_ref']) < 0.02
+    assert peak['relative_amplitude_deviation'] > 0
+
+    report = compare_data(data_reader, data_reader, 0, approx_peak_freqs=[5.0], peak_method=2, peak_tol=1e-12)
+    assert report.passed
+    assert report.peaks['y'][0]['freq_deviation'] == 0
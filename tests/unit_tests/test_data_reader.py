@@ -2,10 +2,12 @@ import numpy as np
 import os
 import pytest
 import shutil
+import subprocess
+import sys
 import tempfile
 
 from postprocessing import DataReader
-from .mock_utils import FakeDataReader
+from .mock_utils import FakeDataReader, write_fake_data_dir
 
 HERE = os.path.abspath(os.path.dirname(__file__))
 REF_DATA_DIR = os.path.join(HERE, '../../micromagnetic_simulation_data/reference_data/')
@@ -115,3 +117,164 @@ class TestFakeDataReader(DataReaderTestBase):
         Create an instance of `NmagDataReader` which can be re-used for each individual test.
         """
         cls.data_reader = FakeDataReader()
+
+
+class TestMemoryMappedDataReader(object):
+    @classmethod
+    def setup_class(cls):
+        """
+        Write fake simulation data to a temporary directory which is shared by all tests.
+        """
+        cls.tmpdir = tempfile.mkdtemp()
+        write_fake_data_dir(cls.tmpdir)
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test__spatially_resolved_magnetisation_is_memory_mapped_and_agrees_with_default_mode(self):
+        """
+        DataReader with `mmap_mode='r'` returns memory-mapped arrays with the same values as the default mode.
+        """
+        data_reader_default = DataReader(self.tmpdir, data_format='OOMMF')
+        data_reader_mmap = DataReader(self.tmpdir, data_format='OOMMF', mmap_mode='r')
+
+        for component in ('x', 'y', 'z'):
+            m_default = data_reader_default.get_spatially_resolved_magnetisation(component)
+            m_mmap = data_reader_mmap.get_spatially_resolved_magnetisation(component)
+
+            assert isinstance(m_mmap, np.memmap)
+            assert not isinstance(m_default, np.memmap)
+            assert np.array_equal(m_default, m_mmap)
+
+    def test__repeated_access_returns_cached_array(self):
+        """
+        Repeated access to the same component returns the cached array (no extra I/O).
+        """
+        data_reader = DataReader(self.tmpdir, data_format='OOMMF', mmap_mode='r')
+
+        m_y_1 = data_reader.get_spatially_resolved_magnetisation('y')
+        m_y_2 = data_reader.get_spatially_resolved_magnetisation('y')
+
+        assert m_y_1 is m_y_2
+        assert data_reader.get_cached_components() == ['y']
+
+    def test__cache_is_bounded_and_evicts_least_recently_used_component(self):
+        """
+        The cache holds at most `cache_size` components and evicts the least recently used one.
+        """
+        data_reader = DataReader(self.tmpdir, data_format='Nmag', mmap_mode='r', cache_size=2)
+
+        data_reader.get_spatially_resolved_magnetisation('x')
+        data_reader.get_spatially_resolved_magnetisation('y')
+        data_reader.get_spatially_resolved_magnetisation('x')
+        data_reader.get_spatially_resolved_magnetisation('z')
+
+        assert data_reader.get_cached_components() == ['x', 'z']
+
+        data_reader.evict('x')
+        assert data_reader.get_cached_components() == ['z']
+
+    def test__default_mode_does_not_cache_data(self):
+        """
+        Without `mmap_mode` the data is not cached (unless `cache_size` is given explicitly).
+        """
+        data_reader = DataReader(self.tmpdir, data_format='OOMMF')
+        data_reader.get_spatially_resolved_magnetisation('y')
+        assert data_reader.get_cached_components() == []
+
+        data_reader = DataReader(self.tmpdir, data_format='OOMMF', cache_size=1)
+        data_reader.get_spatially_resolved_magnetisation('y')
+        assert data_reader.get_cached_components() == ['y']
+
+    def test__close_releases_cached_arrays_when_used_as_context_manager(self):
+        """
+        Leaving the `with` block releases all cached arrays; the reader re-reads data on demand afterwards.
+        """
+        with DataReader(self.tmpdir, data_format='OOMMF', mmap_mode='r') as data_reader:
+            for component in ('x', 'y', 'z'):
+                data_reader.get_spatially_resolved_magnetisation(component)
+            assert data_reader.get_cached_components() == ['x', 'y', 'z']
+
+        assert data_reader.get_cached_components() == []
+        assert data_reader.get_spatially_resolved_magnetisation('z').shape == (4000, 24, 24)
+
+
+class TestGridShapeAndDtype(object):
+    @classmethod
+    def setup_class(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    @pytest.mark.parametrize('grid_shape', [(12, 18), (48, 48)])
+    def test__grid_shape_is_read_from_data(self, grid_shape):
+        """
+        DataReader works for sampling grids of any size (not just 24 x 24).
+        """
+        data_dir = write_fake_data_dir(os.path.join(self.tmpdir, 'grid_{}x{}'.format(*grid_shape)),
+                                       FakeDataReader(grid_shape=grid_shape))
+
+        for mmap_mode in (None, 'r'):
+            data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode=mmap_mode)
+            assert data_reader.get_grid_shape() == grid_shape
+            assert data_reader.get_spatially_resolved_magnetisation('y').shape == (4000,) + grid_shape
+
+    def test__flattened_data_is_reshaped_to_square_or_given_grid(self):
+        """
+        Data stored with a flattened spatial dimension is reshaped to a square grid or to `grid_shape`.
+        """
+        fake_data_reader = FakeDataReader(grid_shape=(12, 18))
+        data_dir = write_fake_data_dir(os.path.join(self.tmpdir, 'flat'), fake_data_reader)
+        for component in 'xyz':
+            m = fake_data_reader.get_spatially_resolved_magnetisation(component)
+            np.save(os.path.join(data_dir, 'm{}s.npy'.format(component)), m.reshape(4000, -1))
+
+        data_reader = DataReader(data_dir, data_format='OOMMF', grid_shape=(12, 18))
+        assert data_reader.get_grid_shape() == (12, 18)
+        assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('y'),
+                              fake_data_reader.get_spatially_resolved_magnetisation('y'))
+
+        # 12 * 18 = 216 cells do not form a square grid
+        with pytest.raises(ValueError):
+            DataReader(data_dir, data_format='OOMMF').get_spatially_resolved_magnetisation('y')
+
+        data_reader = DataReader(data_dir, data_format='OOMMF', grid_shape=(6, 36))
+        assert data_reader.get_spatially_resolved_magnetisation('y').shape == (4000, 6, 36)
+
+    def test__data_can_be_converted_to_float32(self):
+        """
+        With `dtype=np.float32` the spatially resolved magnetisation is returned in single precision.
+        """
+        data_dir = write_fake_data_dir(os.path.join(self.tmpdir, 'float32'))
+
+        data_reader_64 = DataReader(data_dir, data_format='OOMMF')
+        data_reader_32 = DataReader(data_dir, data_format='OOMMF', mmap_mode='r', dtype=np.float32)
+
+        m_64 = data_reader_64.get_spatially_resolved_magnetisation('y')
+        m_32 = data_reader_32.get_spatially_resolved_magnetisation('y')
+        m_32_window = data_reader_32.get_spatially_resolved_magnetisation_window('y', time_slice=slice(0, 10))
+
+        assert m_64.dtype == np.float64
+        assert m_32.dtype == np.float32 and m_32_window.dtype == np.float32
+        assert np.allclose(m_32, m_64, atol=0, rtol=2**-24)
+        assert data_reader_32.get_average_magnetisation('y').dtype == np.float64
+
+
+def test__data_reader_and_fft_utils_are_imported_without_matplotlib():
+    """
+    Importing the data reader and the spectral functions does not import
+    matplotlib (the plotting functions are imported on first access) or
+    scipy.signal (which is imported when it is first needed).
+    """
+    code = ("import sys\n"
+            "from postprocessing import DataReader, SpectralAnalysis, fft_utils\n"
+            "assert 'matplotlib' not in sys.modules\n"
+            "assert 'scipy.signal' not in sys.modules\n"
+            "from postprocessing import make_figure_2\n"
+            "assert 'matplotlib' in sys.modules\n")
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.join(HERE, '../../src') + os.pathsep + env.get('PYTHONPATH', '')
+    subprocess.check_call([sys.executable, '-c', code], env=env)
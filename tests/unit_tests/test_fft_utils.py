@@ -0,0 +1,211 @@
+import numpy as np
+import os
+import pytest
+import scipy.signal
+import tracemalloc
+
+from postprocessing.fft_utils import \
+    SpectralEstimator, get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2, \
+    get_fft_coefficients, get_fft_coefficients_at_indices, get_fft_coefficients_at_freqs, \
+    get_mode_amplitudes_and_phases_at_freqs, get_mode_amplitudes_at_freq, get_mode_phases_at_freq, \
+    get_indices_of_frequencies, find_peak_frequency, get_spectrum_and_fft_coefficients_blockwise
+from .mock_utils import FakeDataReader
+
+
+@pytest.mark.parametrize('chunk_size', [1024, 333])
+def test__direct_dft_agrees_with_fft_at_requested_indices(chunk_size):
+    """
+    get_fft_coefficients_at_indices() returns the same coefficients as the full FFT.
+    """
+    m_vals = np.random.RandomState(42).uniform(-1, 1, size=(1000, 6, 5))
+    indices = [0, 3, 17, 250, 500]
+
+    coeffs_expected = get_fft_coefficients(m_vals)[indices]
+    coeffs = get_fft_coefficients_at_indices(m_vals, indices, chunk_size=chunk_size)
+
+    assert coeffs.shape == (5, 6, 5)
+    assert np.allclose(coeffs, coeffs_expected, atol=1e-10, rtol=0)
+
+
+@pytest.mark.parametrize('method', ['auto', 'dft', 'fft'])
+def test__batched_mode_maps_agree_with_single_frequency_functions(method):
+    """
+    get_mode_amplitudes_and_phases_at_freqs() agrees with the single-frequency functions.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    timesteps = data_reader.get_timesteps()
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+    freqs = [2.35, 5.0, 12.0]
+
+    amplitudes, phases = get_mode_amplitudes_and_phases_at_freqs(timesteps, m_y, freqs, method=method)
+
+    assert amplitudes.shape == (3, 24, 24)
+    assert phases.shape == (3, 24, 24)
+    for i, freq in enumerate(freqs):
+        assert np.allclose(amplitudes[i], get_mode_amplitudes_at_freq(timesteps, m_y, freq), atol=1e-10)
+        assert np.allclose(phases[i], get_mode_phases_at_freq(timesteps, m_y, freq), atol=1e-8)
+
+
+def test__get_fft_coefficients_at_freqs_raises_error_for_invalid_method():
+    data_reader = FakeDataReader()
+    with pytest.raises(ValueError):
+        get_fft_coefficients_at_freqs(data_reader.get_timesteps(),
+                                      data_reader.get_spatially_resolved_magnetisation('y'),
+                                      [5.0], method='foobar')
+
+
+def test__default_spectral_estimator_reproduces_raw_periodogram():
+    """
+    SpectralEstimator with default settings reproduces the existing method 1 and method 2 spectra.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    timesteps = data_reader.get_timesteps()
+    m_avg = data_reader.get_average_magnetisation('y')
+    m_full = data_reader.get_spatially_resolved_magnetisation('y')
+    estimator = SpectralEstimator(chunk_size=100)
+
+    assert np.array_equal(estimator.get_frequencies(timesteps, unit='GHz'),
+                          get_fft_frequencies(timesteps, unit='GHz'))
+    assert np.array_equal(get_spectrum_via_method_1(m_avg, estimator=estimator),
+                          get_spectrum_via_method_1(m_avg))
+    assert np.allclose(get_spectrum_via_method_2(m_full, estimator=estimator),
+                       get_spectrum_via_method_2(m_full), atol=0, rtol=1e-12)
+
+
+def test__spectral_estimator_can_keep_last_bin():
+    timesteps = np.linspace(5e-12, 20e-9, 4000)
+    estimator = SpectralEstimator(drop_last_bin=False)
+
+    assert len(estimator.get_frequencies(timesteps)) == 2001
+    assert estimator.get_spectrum_via_method_1(np.random.rand(4000)).shape == (2001,)
+
+
+def test__welch_estimator_agrees_with_scipy_up_to_normalisation():
+    """
+    Welch's method with a Hann window agrees with `scipy.signal.welch` (up to the normalisation).
+    """
+    dt = 5e-12
+    signal = np.random.RandomState(0).normal(size=(4000, 3))
+    estimator = SpectralEstimator(window='hann', nperseg=512, noverlap=256, drop_last_bin=False)
+
+    spectra = estimator.get_power_spectra(signal)
+    freqs_scipy, spectra_scipy = scipy.signal.welch(signal, fs=1 / dt, window='hann', nperseg=512,
+                                                    noverlap=256, detrend=False, axis=0)
+
+    assert np.allclose(estimator.get_frequencies(np.arange(4000) * dt), freqs_scipy)
+    # scipy computes a one-sided density, i.e. it divides by the sampling frequency and by
+    # the sum (rather than the mean) of the squared window, and doubles the inner bins.
+    assert np.allclose(spectra[1:-1], spectra_scipy[1:-1] * (512 / dt) / 2, rtol=1e-10, atol=0)
+
+
+def test__zero_padding_locates_peak_between_fft_bins_more_accurately():
+    """
+    Zero-padding to a finer frequency resolution locates the peak of an off-bin sinusoid more accurately.
+    """
+    dt = 5e-12
+    timesteps = np.arange(1, 4001) * dt
+    freq = 8.2731e9
+    m_avg = np.cos(2 * np.pi * freq * timesteps)
+
+    estimator_raw = SpectralEstimator()
+    nfft = SpectralEstimator.get_nfft_for_resolution(dt, resolution=1e6)
+    estimator_padded = SpectralEstimator(window='hann', nfft=nfft)
+
+    def peak_freq(estimator):
+        freqs = estimator.get_frequencies(timesteps)
+        return freqs[estimator.get_spectrum_via_method_1(m_avg).argmax()]
+
+    assert abs(peak_freq(estimator_padded) - freq) < 2e6
+    assert abs(peak_freq(estimator_padded) - freq) < abs(peak_freq(estimator_raw) - freq)
+
+
+def test__method_2_with_estimator_is_independent_of_chunk_size():
+    m_full = np.random.RandomState(1).normal(size=(1000, 7, 9))
+    spectrum_1 = SpectralEstimator(window='hann', nperseg=200, chunk_size=5).get_spectrum_via_method_2(m_full)
+    spectrum_2 = SpectralEstimator(window='hann', nperseg=200, chunk_size=1000).get_spectrum_via_method_2(m_full)
+    assert np.allclose(spectrum_1, spectrum_2, atol=0, rtol=1e-12)
+
+
+def test__float32_pipeline_agrees_with_float64_within_documented_error_bounds():
+    """
+    Spectra and mode maps computed from float32 data agree with the float64 results within
+    the error bounds given in the README (and are computed in single precision).
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    timesteps = data_reader.get_timesteps()
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    # Add a static component of realistic size, which dominates the rounding error.
+    m_64 = 0.6 + data_reader.get_spatially_resolved_magnetisation('y')
+    m_32 = m_64.astype(np.float32)
+
+    spectrum_64 = get_spectrum_via_method_2(m_64)
+    spectrum_32 = get_spectrum_via_method_2(m_32)
+    assert spectrum_32.dtype == np.float32
+    assert np.max(abs(spectrum_32 - spectrum_64)) < 1e-6 * spectrum_64.max()
+
+    peak_freqs = find_peak_frequency(freqs, spectrum_64, [1.0, 2.35, 5.0, 12.0])
+    assert np.array_equal(find_peak_frequency(freqs, spectrum_32, [1.0, 2.35, 5.0, 12.0]), peak_freqs)
+
+    idx = get_indices_of_frequencies(freqs, peak_freqs)
+    assert np.all(abs(spectrum_32[idx] - spectrum_64[idx]) < 1e-4 * spectrum_64[idx])
+
+    for method in ('dft', 'fft'):
+        coeffs_64 = get_fft_coefficients_at_freqs(timesteps, m_64, peak_freqs, method=method)
+        coeffs_32 = get_fft_coefficients_at_freqs(timesteps, m_32, peak_freqs, method=method)
+        assert coeffs_32.dtype == np.complex64
+        assert np.max(abs(abs(coeffs_32) - abs(coeffs_64))) < 1e-4 * abs(coeffs_64).max()
+
+
+def test__method_2_works_for_any_grid_shape():
+    """
+    The spectrum via method 2 only depends on the values at the grid points, not on the grid shape.
+    """
+    m_vals = FakeDataReader(grid_shape=(12, 18)).get_spatially_resolved_magnetisation('y')
+
+    spectrum = get_spectrum_via_method_2(m_vals)
+
+    assert np.allclose(get_spectrum_via_method_2(m_vals.reshape(4000, -1)), spectrum, atol=0, rtol=1e-12)
+    assert np.allclose(get_spectrum_via_method_2(m_vals.reshape(4000, 6, 36)), spectrum, atol=0, rtol=1e-12)
+    assert np.allclose(SpectralEstimator(chunk_size=50).get_spectrum_via_method_2(m_vals), spectrum,
+                       atol=1e-20, rtol=1e-10)
+
+
+@pytest.mark.parametrize('memory_budget', [1, 100 * 1024, 10 * 1024**2])
+def test__blockwise_computation_agrees_with_in_memory_computation(memory_budget):
+    """
+    The out-of-core spectrum and Fourier coefficients agree with the in-memory results up to round-off,
+    independently of the memory budget (i.e. the number of cells processed at once).
+    """
+    data_reader = FakeDataReader(damping=0.08, grid_shape=(12, 18))
+    m_y = 0.6 + data_reader.get_spatially_resolved_magnetisation('y')
+    indices = [20, 47, 100, 240, 47]
+
+    spectrum, coeffs = get_spectrum_and_fft_coefficients_blockwise(m_y, indices, memory_budget=memory_budget)
+
+    assert np.allclose(spectrum, get_spectrum_via_method_2(m_y), atol=0, rtol=1e-12)
+    assert np.allclose(coeffs, get_fft_coefficients(m_y)[indices], atol=1e-12, rtol=0)
+    assert np.array_equal(get_spectrum_via_method_2(m_y, memory_budget=memory_budget), spectrum)
+
+
+def test__blockwise_computation_of_memory_mapped_data_stays_within_memory_budget(tmpdir):
+    """
+    Processing memory-mapped data out-of-core only allocates memory of the order of the budget
+    (plus the size of the results), not of the size of the data.
+    """
+    filename = os.path.join(str(tmpdir), 'mys.npy')
+    m_y = FakeDataReader(damping=0.08, grid_shape=(48, 48)).get_spatially_resolved_magnetisation('y')
+    np.save(filename, m_y)
+    data_size = m_y.nbytes  # about 74 MB
+    memory_budget = 2 * 1024**2
+    del m_y
+
+    m_mmap = np.load(filename, mmap_mode='r')
+    tracemalloc.start()
+    try:
+        spectrum, coeffs = get_spectrum_and_fft_coefficients_blockwise(m_mmap, [47, 240], memory_budget)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak_memory < 2 * memory_budget < data_size / 10
+    assert np.allclose(spectrum, get_spectrum_via_method_2(np.asarray(m_mmap)), atol=0, rtol=1e-12)
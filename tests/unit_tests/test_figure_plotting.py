@@ -1,9 +1,14 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import os
 import pytest
 
 #from matplotlib.testing.decorators import image_comparison
 
 from mock_utils import FakeDataReader
-from postprocessing import make_figure_2, make_figure_3, make_figure_4, make_figure_5
+from postprocessing import make_figure_2, make_figure_3, make_figure_4, make_figure_5, Sampling, SpectralEstimator
+from postprocessing.figure_plotting import ModeMapRenderer, plot_mode_at_frequency
+from postprocessing.spectral_analysis import SpectralAnalysis
 
 skip_msg = "Skipping test until a sensible image comparison tool is available."
 TOL = 0
@@ -41,3 +46,92 @@ def test__make_figure_4():
 def test__make_figure_5():
     data_reader = FakeDataReader(damping=0.08)
     fig = make_figure_5(data_reader)
+
+
+def test__make_figure_2_and_3_accept_spectral_estimator():
+    """
+    Figures 2 and 3 can be created with a custom spectral estimator.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    estimator = SpectralEstimator(window='hann', nperseg=1000)
+
+    fig2 = make_figure_2(data_reader, estimator=estimator)
+    fig3 = make_figure_3(data_reader, estimator=estimator)
+
+    assert len(fig2.axes[1].lines[0].get_xdata()) == 500
+    assert len(fig3.axes[0].lines[1].get_ydata()) == 500
+
+
+def get_pixels(fig):
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+
+def test__mode_map_renderer_reuses_figure_and_matches_plot_mode_at_frequency(tmpdir):
+    data_reader = FakeDataReader(damping=0.08)
+    spectral_analysis = SpectralAnalysis(data_reader)
+    freqs = [12.0, 1.0, 2.35]
+
+    renderer = ModeMapRenderer()
+    template = os.path.join(str(tmpdir), 'mode_{index}_{freq:.2f}.pdf')
+    filenames = renderer.render_modes(spectral_analysis, freqs, template)
+    assert [os.path.basename(f) for f in filenames] == ['mode_0_12.00.pdf', 'mode_1_1.00.pdf', 'mode_2_2.35.pdf']
+    assert all(os.path.getsize(f) > 0 for f in filenames)
+
+    # The figure is re-used, and each frame looks exactly like the figure
+    # created from scratch by `plot_mode_at_frequency`.
+    fig = renderer.fig
+    for freq in freqs:
+        amplitudes, phases = spectral_analysis.get_mode_maps_at_freqs([freq])
+        assert renderer.update(freq, amplitudes[0], phases[0]) is fig
+        expected = plot_mode_at_frequency(data_reader, freq, spectral_analysis=spectral_analysis)
+        assert np.array_equal(get_pixels(fig), get_pixels(expected))
+        plt.close(expected)
+    renderer.close()
+
+
+def test__mode_map_renderer_fast_png_path(tmpdir):
+    spectral_analysis = SpectralAnalysis(FakeDataReader(damping=0.08, grid_shape=(6, 9)))
+    renderer = ModeMapRenderer(fast_png=True, dpi=50)
+    filenames = renderer.render_modes(spectral_analysis, [1.0, 12.0], os.path.join(str(tmpdir), 'mode_{index}'))
+    renderer.close()
+
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+        assert plt.imread(filename, format='png').shape == (300, 400, 4)
+
+
+def test__plot_mode_of_non_rectangular_region():
+    """
+    Mode maps of a non-rectangular region of interest are plotted on its bounding box.
+    """
+    i, j = np.indices((24, 24))
+    sampling = Sampling(roi=(i - 11.5)**2 + (j - 11.5)**2 <= 36)
+    fig = plot_mode_at_frequency(FakeDataReader(damping=0.08), 12.0, sampling=sampling)
+    images = [ax.get_images()[0] for ax in fig.axes if ax.get_images()]
+    assert [image.get_array().shape for image in images] == [(12, 12)] * 6
+    assert np.isfinite(images[0].get_clim()).all()
+    plt.close(fig)
+
+
+def test__rescale_cmap():
+    import matplotlib as mpl
+    from postprocessing.figure_plotting import rescale_cmap
+
+    xs = np.linspace(0, 1, 101)
+    for cmap_name in ['hsv', mpl.colormaps['hsv']]:
+        cmap = rescale_cmap(cmap_name, low=0.3, high=0.8)
+        colors_ref = mpl.colormaps['hsv'](xs)
+        colors = cmap(xs)
+        assert np.allclose(colors[:, :3], 0.3 + 0.5 * colors_ref[:, :3])
+        assert np.allclose(colors[:, 3], 1.0)
+
+
+def test__phase_cmap_is_constructed_on_first_use():
+    from postprocessing import figure_plotting
+
+    cmap = figure_plotting.get_phase_cmap()
+    assert figure_plotting.get_phase_cmap() is cmap
+    assert figure_plotting.my_hsv is cmap
+    assert figure_plotting.CMAP_PHASE is cmap
@@ -0,0 +1,95 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing import DataReader, Sampling
+from postprocessing.hdf5_store import convert_to_hdf5
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+h5py = pytest.importorskip('h5py')
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmpdir_factory):
+    """
+    Temporary directory containing fake data in OOMMF format, converted to HDF5.
+    """
+    data_dir = str(tmpdir_factory.mktemp('data'))
+    write_fake_data_dir(data_dir, FakeDataReader(damping=0.08))
+    convert_to_hdf5(data_dir, data_format='OOMMF', compression='gzip')
+    return data_dir
+
+
+def test__hdf5_data_reader_returns_same_data_as_original_data_reader(data_dir):
+    """
+    DataReader with data_format='HDF5' returns the same data as the reader for the original files.
+    """
+    data_reader_orig = DataReader(data_dir, data_format='OOMMF')
+    data_reader_hdf5 = DataReader(data_dir, data_format='HDF5')
+
+    assert np.array_equal(data_reader_hdf5.get_timesteps(), data_reader_orig.get_timesteps())
+    assert data_reader_hdf5.get_dt() == data_reader_orig.get_dt()
+
+    for component in ('x', 'y', 'z'):
+        assert np.array_equal(data_reader_hdf5.get_average_magnetisation(component),
+                              data_reader_orig.get_average_magnetisation(component))
+        assert np.array_equal(data_reader_hdf5.get_spatially_resolved_magnetisation(component),
+                              data_reader_orig.get_spatially_resolved_magnetisation(component))
+
+
+def test__hdf5_file_is_chunked_along_time_and_space(data_dir):
+    with h5py.File(os.path.join(data_dir, 'dynamic.h5'), 'r') as f:
+        assert f['m'].shape == (4000, 3, 24, 24)
+        assert f['m'].chunks == (256, 1, 24, 24)
+        assert f['m'].compression == 'gzip'
+
+
+@pytest.mark.parametrize('data_format', ['OOMMF', 'HDF5'])
+def test__get_spatially_resolved_magnetisation_window_returns_requested_part_of_data(data_dir, data_format):
+    """
+    get_spatially_resolved_magnetisation_window() returns the selected time window and spatial region.
+    """
+    data_reader = DataReader(data_dir, data_format=data_format)
+    m_y = DataReader(data_dir, data_format='OOMMF').get_spatially_resolved_magnetisation('y')
+
+    window = data_reader.get_spatially_resolved_magnetisation_window(
+        'y', time_slice=slice(100, 300), spatial_slices=(slice(2, 10), slice(5, 20, 2)))
+
+    assert np.array_equal(window, m_y[100:300, 2:10, 5:20:2])
+
+
+def test__hdf5_data_reader_reads_only_sampled_region(data_dir, monkeypatch):
+    data_reader = DataReader(data_dir, data_format='HDF5')
+    m_y = DataReader(data_dir, data_format='OOMMF').get_spatially_resolved_magnetisation('y')
+
+    def fail(component):
+        raise AssertionError("The full dataset should not be read.")
+    monkeypatch.setattr(data_reader, '_get_spatially_resolved_magnetisation', fail)
+    sampling = Sampling(roi=(slice(4, 20), slice(0, 8)), stride=(4, 2))
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('y', sampling=sampling),
+                          m_y[:, 4:20:4, 0:8:2])
+
+
+def test__hdf5_data_reader_can_be_closed_and_reused(data_dir):
+    with DataReader(data_dir, data_format='HDF5', cache_size=1) as data_reader:
+        m_z = data_reader.get_spatially_resolved_magnetisation('z')
+        assert data_reader.get_cached_components() == ['z']
+
+    assert data_reader._h5file is None
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('z'), m_z)
+    data_reader.close()
+
+
+def test__hdf5_file_can_store_non_square_grid_in_single_precision(tmpdir):
+    data_dir = write_fake_data_dir(str(tmpdir), FakeDataReader(grid_shape=(12, 18)))
+    filename = convert_to_hdf5(data_dir, data_format='OOMMF', dtype=np.float32)
+
+    with h5py.File(filename, 'r') as f:
+        assert f['m'].dtype == np.float32
+
+    data_reader = DataReader(data_dir, data_format='HDF5')
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+    assert data_reader.get_grid_shape() == (12, 18)
+    assert m_y.dtype == np.float32
+    assert np.allclose(m_y, DataReader(data_dir, data_format='OOMMF').get_spatially_resolved_magnetisation('y'),
+                       atol=0, rtol=2**-24)
@@ -0,0 +1,137 @@
+import json
+import multiprocessing
+import numpy as np
+import os
+
+from postprocessing.fft_utils import get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2
+from postprocessing.live_monitoring import \
+    JsonStatusPublisher, LiveSpectrumMonitor, NdtFollower, OdtFollower, RecursiveDFT, get_peaks, get_table_follower
+from postprocessing.ovf import write_ovf
+from .mock_utils import FakeDataReader, write_synthetic_odt
+
+
+def test__recursive_dft_agrees_with_fft():
+    data_reader = FakeDataReader(grid_shape=(4, 3))
+    timesteps = data_reader.get_timesteps()
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    m_avg = data_reader.get_average_magnetisation('y')
+    m_vals = data_reader.get_spatially_resolved_magnetisation('y')
+
+    dft_1 = RecursiveDFT(freqs)
+    dft_2 = RecursiveDFT(freqs)
+    for start, stop in [(0, 1), (1, 17), (17, 2500), (2500, 4000)]:
+        dft_1.update(timesteps[start:stop], m_avg[start:stop])
+        dft_2.update(timesteps[start:stop], m_vals[start:stop])
+
+    assert dft_1.num_samples == 4000
+    assert np.allclose(dft_1.get_power_spectrum(), get_spectrum_via_method_1(m_avg), rtol=1e-8, atol=1e-8)
+    assert np.allclose(dft_2.get_power_spectrum(), get_spectrum_via_method_2(m_vals), rtol=1e-8, atol=1e-8)
+    assert np.isclose(dft_1.get_frequency_resolution(), freqs[1])
+
+
+def test__sliding_dft_only_includes_the_most_recent_samples():
+    data_reader = FakeDataReader()
+    timesteps = data_reader.get_timesteps()
+    m_avg = data_reader.get_average_magnetisation('y')
+    freqs = np.linspace(0, 20, 301)
+
+    dft = RecursiveDFT(freqs, window_size=500)
+    # The coefficients are resynchronised after 500 samples have left the window.
+    for start in range(0, 1750, 70):
+        dft.update(timesteps[start:start + 70], m_avg[start:start + 70])
+
+    t, m = timesteps[1750 - 500:1750], m_avg[1750 - 500:1750]
+    expected = abs(np.exp(-2j * np.pi * np.outer(freqs * 1e9, t)).dot(m))**2
+    assert dft.num_samples == 500
+    assert np.allclose(dft.get_power_spectrum(), expected, rtol=1e-8, atol=1e-8)
+
+
+def test__odt_follower_reads_complete_lines_only(tmpdir):
+    filename = os.path.join(str(tmpdir), 'dynamic.odt')
+    follower = OdtFollower(filename)
+    assert follower.read_new_rows().shape == (0, 4)
+
+    with open(filename, 'w') as f:
+        f.write("# ODT 1.0\n# Columns: {Oxs_TimeDriver::Simulation time} Oxs_TimeDriver::mz "
+                "Oxs_TimeDriver::my Oxs_TimeDriver::mx\n1e-12 0.3 0.2 0.1\n2e-12 0.6")
+    assert np.array_equal(follower.read_new_rows(), [[1e-12, 0.1, 0.2, 0.3]])
+
+    with open(filename, 'a') as f:
+        f.write(" 0.5 0.4\n# Table End\n")
+    assert np.array_equal(follower.read_new_rows(), [[2e-12, 0.4, 0.5, 0.6]])
+    assert follower.finished
+
+
+def test__monitor_follows_a_running_simulation(tmpdir):
+    odt_filename = os.path.join(str(tmpdir), 'dynamic.odt')
+    status_filename = os.path.join(str(tmpdir), 'status.json')
+    data_reader = FakeDataReader(grid_shape=(4, 3))
+
+    # Stand-in for the simulation, which writes the table in batches.
+    writer = multiprocessing.Process(target=write_synthetic_odt, args=(odt_filename, data_reader, 500, 0.05))
+    writer.start()
+    try:
+        monitor = LiveSpectrumMonitor(odt_filename, approx_peak_freqs=[1.0, 12.0],
+                                      publishers=[JsonStatusPublisher(status_filename)])
+        status = monitor.run(interval=0.01, idle_timeout=30)
+    finally:
+        writer.join()
+
+    assert monitor.num_updates > 1
+    assert status['finished']
+    assert status['num_timesteps'] == 4000
+    assert status['time'] == data_reader.get_timesteps()[-1]
+    for peak, approx_freq in zip(status['peaks'], [1.0, 12.0]):
+        assert abs(peak['freq'] - approx_freq) < 0.05
+
+    with open(status_filename) as f:
+        assert json.load(f) == status
+
+
+def test__monitor_follows_omf_snapshots(tmpdir):
+    odt_filename = os.path.join(str(tmpdir), 'dynamic.odt')
+    data_reader = FakeDataReader(grid_shape=(4, 3))
+    write_synthetic_odt(odt_filename, data_reader)
+    m = np.stack([data_reader.get_spatially_resolved_magnetisation(c) for c in 'xyz'], axis=-1)
+    for idx in range(40):
+        # Two layers, so that the central plane is their average.
+        write_ovf(os.path.join(str(tmpdir), 'dynamic-{:07d}.omf'.format(idx)), np.array([m[idx], m[idx]]))
+
+    monitor = LiveSpectrumMonitor(odt_filename, omf_dir=str(tmpdir), freqs=np.linspace(0, 20, 11))
+    status = monitor.update()
+
+    assert status['num_snapshots'] == 40
+    t, m_y = data_reader.get_timesteps()[:40], m[:40, ..., 1]
+    coefficients = np.tensordot(np.exp(-2j * np.pi * np.outer(monitor.freqs * 1e9, t - t[0])), m_y, axes=1)
+    expected = (abs(coefficients)**2).mean(axis=(1, 2))
+    assert np.allclose(monitor.dft_method_2.get_power_spectrum(), expected, rtol=1e-6)
+    assert monitor.update() is None
+
+
+def test__get_peaks_handles_spectra_without_peaks():
+    freqs = np.linspace(0, 10, 101)
+    assert get_peaks(freqs, np.zeros(101)) == []
+    assert get_peaks(freqs, np.ones(101)) == []
+
+    spectrum = 1.0 / (1 + (freqs - 3.0)**2) + 0.5 / (1 + (freqs - 7.0)**2)
+    peaks = get_peaks(freqs, spectrum, num_peaks=1, min_prominence=0.1)
+    assert len(peaks) == 1 and abs(peaks[0]['freq'] - 3.0) < 0.01
+
+
+def test__table_followers_read_numpy_solver_and_nmag_tables(tmpdir):
+    # Table written by the NumPy LLG solver (with continued header lines).
+    filename = os.path.join(str(tmpdir), 'dynamic_txyz.txt')
+    with open(filename, 'w') as f:
+        f.write("# ODT 1.0\n# Table Start\n# Columns: \\\n# {Simulation time} mx my mz\n# Units: \\\n# s {} {} {}\n"
+                "5e-12 0.1 0.2 0.3\n# Table End\n")
+    follower = get_table_follower(filename)
+    assert np.array_equal(follower.read_new_rows(), [[5e-12, 0.1, 0.2, 0.3]])
+    assert follower.finished
+
+    filename = os.path.join(str(tmpdir), '02_dynamic_stage_dat.ndt')
+    with open(filename, 'w') as f:
+        f.write("#time id step m_Py_0 m_Py_1 m_Py_2\n#<s> <> <> <> <> <>\n0 0 0 0.8 0.5 0.0\n5e-12 1 20 0.7 0.6 0.1\n")
+    follower = get_table_follower(filename)
+    assert isinstance(follower, NdtFollower)
+    assert np.array_equal(follower.read_new_rows(), [[0, 0.8, 0.5, 0.0], [5e-12, 0.7, 0.6, 0.1]])
+    assert not follower.finished
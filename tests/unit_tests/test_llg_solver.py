@@ -0,0 +1,117 @@
+import numpy as np
+import os
+import sys
+
+# The solver lives next to the simulation scripts which use it.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '../../src/micromagnetic_simulation_scripts/numpy'))
+
+from llg_solver import LLGSolver, get_demag_kernel, get_demag_kernel_filename, get_demag_tensor  # noqa: E402
+
+
+def make_solver(n=(6, 5, 2), cellsize=(5e-9, 4e-9, 3e-9), **kwargs):
+    params = dict(Ms=8e5, A=1.3e-11, alpha=0.5, gamma=2.210173e5, H_ext=[8e4, 0, 0],
+                  m0=[0.3, 0.4, 1.0], demag_cache_dir=False)
+    params.update(kwargs)
+    return LLGSolver(n, cellsize, **params)
+
+
+def test__demag_tensor_of_single_cell():
+    """
+    The demag factors of a single cube are 1/3, the off-diagonal elements vanish.
+    """
+    N = get_demag_tensor((1, 1, 1), (5e-9, 5e-9, 5e-9))
+    assert np.allclose(N[:3, 0, 0, 0], 1. / 3, atol=1e-12)
+    assert np.allclose(N[3:, 0, 0, 0], 0, atol=1e-12)
+
+
+def test__demag_tensor_trace_sum_rule():
+    """
+    The trace of the demag tensor is 1 for the self-interaction and 0 for all other offsets.
+    """
+    n = (5, 4, 3)
+    N = get_demag_tensor(n, (5e-9, 4e-9, 3e-9))
+    trace = N[0] + N[1] + N[2]
+    expected = np.zeros_like(trace)
+    expected[n[0] - 1, n[1] - 1, n[2] - 1] = 1.0
+    assert np.allclose(trace, expected, atol=1e-10)
+
+
+def test__demag_field_agrees_with_direct_summation():
+    """
+    The FFT-based demag field agrees with the direct convolution of the magnetisation with the demag tensor.
+    """
+    sim = make_solver()
+    rng = np.random.RandomState(0)
+    m = rng.uniform(-1, 1, size=(3,) + sim.shape)
+
+    nx, ny, nz = sim.n
+    N = get_demag_tensor(sim.n, sim.cellsize)
+    Nxx, Nyy, Nzz, Nxy, Nxz, Nyz = N
+    tensor = np.array([[Nxx, Nxy, Nxz], [Nxy, Nyy, Nyz], [Nxz, Nyz, Nzz]])
+    H = np.zeros_like(m)
+    for k in range(nz):
+        for j in range(ny):
+            for i in range(nx):
+                for k2 in range(nz):
+                    for j2 in range(ny):
+                        for i2 in range(nx):
+                            offset = (i - i2 + nx - 1, j - j2 + ny - 1, k - k2 + nz - 1)
+                            H[:, k, j, i] -= tensor[(slice(None), slice(None)) + offset].dot(sim.Ms * m[:, k2, j2, i2])
+
+    assert np.allclose(sim.get_demag_field(m), H, rtol=0, atol=1e-9 * sim.Ms)
+
+
+def test__demag_field_of_uniformly_magnetised_thin_film():
+    """
+    The average demag field of a thin film magnetised out of plane is close to -Ms.
+    """
+    sim = make_solver(n=(40, 40, 1), cellsize=(5e-9, 5e-9, 2e-9), m0=[0, 0, 1])
+    H = sim.get_demag_field(sim.m).reshape(3, -1).mean(axis=1) / sim.Ms
+    assert np.allclose(H[:2], 0, atol=1e-12)
+    assert -1.0 < H[2] < -0.9
+
+
+def test__exchange_field_vanishes_for_uniform_magnetisation():
+    sim = make_solver()
+    assert np.allclose(sim.get_exchange_field(sim.m), 0, atol=1e-6)
+
+
+def test__macrospin_precession_frequency():
+    """
+    An undamped single cell precesses around the applied field with the Larmor frequency gamma * H / (2 pi).
+    """
+    H = 8e4
+    sim = make_solver(n=(1, 1, 1), cellsize=(5e-9, 5e-9, 5e-9), alpha=0.0, H_ext=[0, 0, H],
+                      m0=[np.sin(0.1), 0, np.cos(0.1)], tolerance=1e-9)
+    t = 1e-10
+    sim.run_until(t)
+    phi = sim.gamma * H * t
+    expected = [np.sin(0.1) * np.cos(phi), np.sin(0.1) * np.sin(phi), np.cos(0.1)]
+    assert np.allclose(sim.get_average_magnetisation(), expected, atol=1e-6)
+
+
+def test__damped_dynamics_preserves_norm_and_approaches_field_direction():
+    sim = make_solver(alpha=1.0, H_ext=[8e4, 0, 0])
+    mx_initial = sim.get_average_magnetisation()[0]
+    sim.run_until(2e-10)
+    assert np.allclose(np.sqrt((sim.m**2).sum(axis=0)), 1.0, atol=1e-12)
+    assert sim.t == 2e-10
+    assert sim.get_average_magnetisation()[0] > mx_initial
+
+
+def test__demag_kernel_is_cached_on_disk(tmpdir):
+    cache_dir = str(tmpdir)
+    n, cellsize = (4, 3, 2), (5e-9, 5e-9, 5e-9)
+    kernel = get_demag_kernel(n, cellsize, cache_dir=cache_dir)
+    filename = get_demag_kernel_filename(n, cellsize, cache_dir)
+    assert os.listdir(cache_dir) == [os.path.basename(filename)]
+    assert kernel.shape == (6, 4, 6, 5)
+
+    # The cached kernel is read (rather than recomputed) on the second call.
+    np.save(filename, 2 * kernel)
+    assert np.array_equal(get_demag_kernel(n, cellsize, cache_dir=cache_dir), 2 * kernel)
+
+    # A different cell size uses a different cache file.
+    get_demag_kernel(n, (5e-9, 5e-9, 2e-9), cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
@@ -0,0 +1,144 @@
+import glob
+import numpy as np
+import os
+import pytest
+
+from postprocessing import DataReader, Sampling, nmag_h5
+from .mock_utils import make_box_mesh, write_synthetic_nmag_h5
+
+h5py = pytest.importorskip('h5py')
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+MESH_FILENAME = os.path.join(HERE, '../../src/micromagnetic_simulation_scripts/nmag/meshes/mesh_555.nmesh.h5')
+
+TIMESTEPS = 5e-12 * np.arange(1, 21)
+
+
+def linear_field(t, points):
+    """
+    Magnetisation which is linear in space (so that it is interpolated
+    exactly within each tetrahedron) and varies in time.
+    """
+    x, y, z = points.T
+    omega = 2 * np.pi * 8e9
+    return np.column_stack([1e-3 * x * np.cos(omega * t) + 0.5,
+                            1e-3 * y * np.sin(omega * t),
+                            1e-3 * (x - y) + 0.1 * z * t * 1e9])
+
+
+@pytest.fixture
+def data_dir(tmpdir):
+    data_dir = str(tmpdir)
+    write_synthetic_nmag_h5(data_dir, linear_field, TIMESTEPS)
+    return data_dir
+
+
+def test__probe_points_at_cell_centres():
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 5, grid_shape=(24, 24))
+    assert probe_points.shape == (576, 3)
+    assert np.allclose(np.unique(probe_points[:, 0]), np.arange(2.5, 120, 5))
+    # The x coordinate varies slowest.
+    assert np.allclose(probe_points[:24, 0], 2.5)
+    assert np.allclose(probe_points[:24, 1], np.arange(2.5, 120, 5))
+    assert np.allclose(probe_points[:, 2], 5)
+
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 5, grid_shape=(24, 24), cell_centres=False)
+    assert np.allclose(np.unique(probe_points[:, 0]), np.linspace(0, 120, 24))
+
+
+def test__interpolation_matrix_for_nmag_mesh():
+    """
+    The interpolation matrix for the mesh of the standard problem has four
+    non-negative weights per probe point which sum to one, and reproduces
+    linear functions exactly.
+    """
+    points, simplices = nmag_h5.read_nmag_mesh(MESH_FILENAME)
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 5, grid_shape=(24, 24))
+    matrix = nmag_h5.compute_interpolation_matrix(points, simplices, probe_points)
+
+    assert matrix.shape == (576, len(points))
+    assert np.all(np.diff(matrix.indptr) <= 4)
+    assert np.all(matrix.data >= -nmag_h5.BARYCENTRIC_TOL)
+    assert np.allclose(matrix.sum(axis=1), 1.0)
+    assert np.allclose(matrix.dot(points), probe_points)
+
+
+def test__probe_points_outside_the_mesh_raise_error():
+    points, simplices = make_box_mesh()
+    with pytest.raises(ValueError):
+        nmag_h5.compute_interpolation_matrix(points, simplices, [[60.0, 60.0, 5.0], [60.0, 60.0, 11.0]])
+
+
+def test__nmag_hdf5_data_reader(data_dir):
+    data_reader = DataReader(data_dir, data_format='NmagHDF5', grid_shape=(6, 4))
+
+    assert np.allclose(data_reader.get_timesteps(), TIMESTEPS)
+    assert data_reader.get_grid_shape() == (6, 4)
+
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 5, grid_shape=(6, 4))
+    expected = np.array([linear_field(t, probe_points) for t in TIMESTEPS])
+    for idx, component in enumerate('xyz'):
+        m_full = data_reader.get_spatially_resolved_magnetisation(component)
+        assert m_full.shape == (len(TIMESTEPS), 6, 4)
+        assert np.allclose(m_full, expected[:, :, idx].reshape(-1, 6, 4))
+
+    # The spatial average of a linear field is its value at the centre of the box.
+    expected_avg = np.array([linear_field(t, np.array([[60.0, 60.0, 5.0]]))[0] for t in TIMESTEPS])
+    for idx, component in enumerate('xyz'):
+        assert np.allclose(data_reader.get_average_magnetisation(component), expected_avg[:, idx])
+
+
+def test__nmag_hdf5_data_reader_without_cell_centre_sampling(data_dir):
+    data_reader = DataReader(data_dir, data_format='NmagHDF5', grid_shape=(5, 5), cell_centres=False,
+                             interpolation_cache=False)
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 5, grid_shape=(5, 5), cell_centres=False)
+    expected = np.array([linear_field(t, probe_points) for t in TIMESTEPS])
+    assert np.allclose(data_reader.get_spatially_resolved_magnetisation('y'), expected[:, :, 1].reshape(-1, 5, 5))
+    assert glob.glob(os.path.join(data_dir, '.nmag_interpolation_*')) == []
+
+
+def test__interpolation_matrix_is_cached_on_disk(data_dir, monkeypatch):
+    data_reader = DataReader(data_dir, data_format='NmagHDF5')
+    m_full = data_reader.get_spatially_resolved_magnetisation('x')
+    cache_files = glob.glob(os.path.join(data_dir, '.nmag_interpolation_*.npz'))
+    assert len(cache_files) == 1
+
+    # The cached matrix is used by other data readers (with the same mesh
+    # and probe grid), so the weights are not computed again.
+    def fail(*args):
+        raise AssertionError("Interpolation matrix should be read from the cache.")
+    monkeypatch.setattr(nmag_h5, 'compute_interpolation_matrix', fail)
+    data_reader = DataReader(data_dir, data_format='NmagHDF5')
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('x'), m_full)
+
+    # A different probe grid needs a different matrix.
+    with pytest.raises(AssertionError):
+        DataReader(data_dir, data_format='NmagHDF5', grid_shape=(12, 12)).get_spatially_resolved_magnetisation('x')
+
+
+def test__resample_field_in_a_single_product():
+    points, simplices = make_box_mesh()
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 2.5, grid_shape=(3, 3))
+    matrix = nmag_h5.compute_interpolation_matrix(points, simplices, probe_points)
+    values = np.array([linear_field(t, points) for t in TIMESTEPS])
+
+    resampled = nmag_h5.resample_field(values, matrix)
+    assert resampled.shape == (3, len(TIMESTEPS), 9)
+    for idx, t in enumerate(TIMESTEPS):
+        assert np.allclose(resampled[:, idx, :], linear_field(t, probe_points).T)
+
+
+def test__nmag_hdf5_data_reader_samples_at_other_heights(data_dir):
+    data_reader = DataReader(data_dir, data_format='NmagHDF5', grid_shape=(6, 4))
+    assert data_reader.get_sampling_height() == 5.0
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+
+    sampling = Sampling(roi=(slice(1, 5), slice(None)), height=2.0)
+    m_z = data_reader.get_spatially_resolved_magnetisation('z', sampling=sampling)
+    probe_points = nmag_h5.get_probe_points((0, 120), (0, 120), 2.0, grid_shape=(6, 4))
+    expected = np.array([linear_field(t, probe_points)[:, 2] for t in TIMESTEPS]).reshape(-1, 6, 4)
+    assert np.allclose(m_z, expected[:, 1:5])
+
+    # The data at the default height is not affected.
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('y'), m_y)
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('y', sampling=Sampling(height=5.0)), m_y)
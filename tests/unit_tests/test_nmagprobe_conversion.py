@@ -0,0 +1,93 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing.nmagprobe_conversion import convert_nmagprobe_output, infer_grid_shape
+
+
+def write_nmagprobe_output(filename, num_timesteps, grid_shape, with_positions=True, seed=0):
+    """
+    Write synthetic nmagprobe output to `filename` and return a pair
+    `(timesteps, m)` where `m` has shape (num_timesteps, n1 * n2, 3).
+    """
+    rng = np.random.RandomState(seed)
+    n1, n2 = grid_shape
+    timesteps = 5e-12 * np.arange(1, num_timesteps + 1)
+    m = rng.uniform(-1, 1, size=(num_timesteps, n1 * n2, 3))
+
+    with open(filename, 'w') as f:
+        f.write("# Output of nmagprobe (synthetic test data)\n")
+        for t, m_t in zip(timesteps, m):
+            for idx, (mx, my, mz) in enumerate(m_t):
+                position = " {} {} 5".format(5.0 * (idx // n2), 5.0 * (idx % n2)) if with_positions else ""
+                f.write("{!r}{} [{!r} {!r} {!r}]\n".format(float(t), position, float(mx), float(my), float(mz)))
+            f.write("\n")
+
+    return timesteps, m
+
+
+def convert_nmagprobe_output_naively(filename):
+    """
+    Reference implementation which parses all lines at once (as previously
+    done in the script `nmag_postprocessing.py`).
+    """
+    x, y, z, times = [], [], [], []
+    with open(filename) as f:
+        for line in f.readlines():
+            if len(line) > 5 and not line.startswith('#'):
+                split_line = line.split(']')[0].split('[')[1].split()
+                x.append(float(split_line[0]))
+                y.append(float(split_line[1]))
+                z.append(float(split_line[2]))
+                times.append(float(line.split()[0]))
+    return np.array(times), np.array(x), np.array(y), np.array(z)
+
+
+@pytest.mark.parametrize('with_positions', [True, False])
+@pytest.mark.parametrize('chunk_size', [97, 16 * 1024**2])
+def test__convert_nmagprobe_output_agrees_with_naive_implementation(tmpdir, with_positions, chunk_size):
+    """
+    convert_nmagprobe_output() infers number of timesteps and grid size and agrees with the naive parser.
+    """
+    filename = os.path.join(str(tmpdir), 'dynamic.nmagProbe')
+    timesteps_expected, _ = write_nmagprobe_output(filename, num_timesteps=11, grid_shape=(4, 4),
+                                                   with_positions=with_positions)
+
+    filenames, timesteps = convert_nmagprobe_output(filename, output_dir=str(tmpdir), chunk_size=chunk_size)
+
+    times, x, y, z = convert_nmagprobe_output_naively(filename)
+    assert np.array_equal(timesteps, timesteps_expected)
+    assert np.array_equal(timesteps, times[::16])
+    for filename, m_expected in zip(filenames, [x, y, z]):
+        m = np.load(filename)
+        assert m.shape == (11, 4, 4)
+        assert np.array_equal(m.ravel(), m_expected)
+
+
+def test__convert_nmagprobe_output_infers_non_square_grid_from_positions(tmpdir):
+    filename = os.path.join(str(tmpdir), 'dynamic.nmagProbe')
+    _, m_expected = write_nmagprobe_output(filename, num_timesteps=5, grid_shape=(3, 7))
+
+    filenames, _ = convert_nmagprobe_output(filename, output_dir=str(tmpdir), chunk_size=200)
+
+    m_y = np.load(filenames[1])
+    assert m_y.shape == (5, 3, 7)
+    assert np.array_equal(m_y.reshape(5, -1), m_expected[:, :, 1])
+
+
+def test__convert_nmagprobe_output_raises_error_for_incomplete_timestep(tmpdir):
+    filename = os.path.join(str(tmpdir), 'dynamic.nmagProbe')
+    write_nmagprobe_output(filename, num_timesteps=3, grid_shape=(2, 2))
+    with open(filename, 'a') as f:
+        f.write("1.0 0 0 5 [0.1 0.2 0.3]\n")
+
+    with pytest.raises(ValueError):
+        convert_nmagprobe_output(filename, output_dir=str(tmpdir))
+
+
+def test__infer_grid_shape():
+    assert infer_grid_shape(np.zeros((16, 0))) == (4, 4)
+    positions = np.array([[x, y, 5.0] for x in range(3) for y in range(5)])
+    assert infer_grid_shape(positions) == (3, 5)
+    with pytest.raises(ValueError):
+        infer_grid_shape(np.zeros((15, 0)))
@@ -0,0 +1,79 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing.omf_ingestion import convert_omf_snapshots, sample_central_plane
+from postprocessing.ovf import write_ovf
+
+
+def write_snapshots(directory, num_snapshots, shape=(2, 6, 4), representation='text'):
+    """
+    Write `num_snapshots` random magnetisation snapshots in OVF format to
+    `directory` and return the list of filenames (in chronological order).
+    """
+    rng = np.random.RandomState(42)
+    filenames = []
+    for i in range(num_snapshots):
+        filename = os.path.join(directory, 'dynamic-Oxs_TimeDriver-Spin-{:07d}.omf'.format(i))
+        write_ovf(filename, rng.uniform(-1, 1, size=shape + (3,)), representation=representation)
+        filenames.append(filename)
+    return filenames
+
+
+def convert_omf_snapshots_naively(omf_files):
+    """
+    Reference implementation which reads all snapshots into memory and
+    averages the top and bottom layer (as previously done in the script
+    `oommf_postprocessing.py`).
+    """
+    data = np.array([np.loadtxt(f) for f in omf_files])
+    num_cells_per_layer = data.shape[1] // 2
+    top = data[:, :num_cells_per_layer, :]
+    bottom = data[:, num_cells_per_layer:, :]
+    return 0.5 * (top + bottom)
+
+
+@pytest.mark.parametrize('num_processes', [1, 2])
+def test__convert_omf_snapshots_agrees_with_naive_implementation(tmpdir, num_processes):
+    """
+    convert_omf_snapshots() writes the same data as the naive in-memory implementation.
+    """
+    omf_files = write_snapshots(str(tmpdir), num_snapshots=7, shape=(2, 6, 4))
+
+    filenames = convert_omf_snapshots(omf_files, output_dir=str(tmpdir), num_processes=num_processes)
+
+    assert [os.path.basename(f) for f in filenames] == ['mxs.npy', 'mys.npy', 'mzs.npy']
+
+    expected = convert_omf_snapshots_naively(omf_files)
+    for i, filename in enumerate(filenames):
+        m = np.load(filename)
+        assert m.shape == (7, 6, 4)
+        assert np.array_equal(m.reshape(7, -1), expected[:, :, i])
+
+
+def test__convert_omf_snapshots_can_store_single_precision_data(tmpdir):
+    omf_files = write_snapshots(str(tmpdir), num_snapshots=3)
+    filenames = convert_omf_snapshots(omf_files, output_dir=str(tmpdir), num_processes=1, dtype=np.float32)
+    assert np.load(filenames[0]).dtype == np.float32
+
+
+def test__sample_central_plane_uses_middle_layer_for_odd_number_of_layers():
+    data = np.arange(3 * 2 * 2 * 3, dtype=float).reshape(3, 2, 2, 3)
+    assert np.array_equal(sample_central_plane(data), data[1])
+    assert np.array_equal(sample_central_plane(data[:2]), 0.5 * (data[0] + data[1]))
+
+
+def test__convert_omf_snapshots_detects_binary_snapshots(tmpdir):
+    """
+    convert_omf_snapshots() gives the same result for text and binary snapshots of the same data.
+    """
+    text_dir = tmpdir.mkdir('text')
+    binary_dir = tmpdir.mkdir('binary')
+    omf_files_text = write_snapshots(str(text_dir), num_snapshots=4)
+    omf_files_binary = write_snapshots(str(binary_dir), num_snapshots=4, representation='binary 8')
+
+    filenames_text = convert_omf_snapshots(omf_files_text, output_dir=str(text_dir), num_processes=1)
+    filenames_binary = convert_omf_snapshots(omf_files_binary, output_dir=str(binary_dir), num_processes=2)
+
+    for f_text, f_binary in zip(filenames_text, filenames_binary):
+        assert np.allclose(np.load(f_text), np.load(f_binary), atol=1e-8, rtol=0)
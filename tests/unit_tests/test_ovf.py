@@ -0,0 +1,120 @@
+import numpy as np
+import os
+import pytest
+
+from postprocessing.ovf import read_ovf, write_ovf, get_ovf_representation
+
+
+def make_random_vector_field(shape=(2, 4, 3), seed=0):
+    data = np.random.RandomState(seed).uniform(-1, 1, size=shape + (3,))
+    return data / np.linalg.norm(data, axis=-1)[..., np.newaxis]
+
+
+def test__read_ovf_returns_data_written_by_write_ovf_in_text_format(tmpdir):
+    """
+    read_ovf() returns the header and the data of an OVF file written by write_ovf().
+    """
+    filename = os.path.join(str(tmpdir), 'm.omf')
+    data = make_random_vector_field(shape=(2, 4, 3))
+    write_ovf(filename, data, fmt='%.17g')
+
+    header, data_read = read_ovf(filename)
+
+    assert (header['xnodes'], header['ynodes'], header['znodes']) == (3, 4, 2)
+    assert header['meshtype'] == 'rectangular'
+    assert data_read.shape == (2, 4, 3, 3)
+    assert np.array_equal(data_read, data)
+
+
+def test__read_ovf_data_agrees_with_loadtxt(tmpdir):
+    """
+    Data read by read_ovf() agrees with the result of `np.loadtxt` on the same file.
+    """
+    filename = os.path.join(str(tmpdir), 'm.omf')
+    write_ovf(filename, make_random_vector_field(shape=(2, 5, 5)))
+
+    _, data = read_ovf(filename)
+
+    assert np.array_equal(data.reshape(-1, 3), np.loadtxt(filename))
+
+
+def test__read_ovf_raises_error_if_file_contains_no_data(tmpdir):
+    filename = os.path.join(str(tmpdir), 'invalid.omf')
+    with open(filename, 'w') as f:
+        f.write("# OOMMF OVF 2.0\n# xnodes: 3\n")
+
+    with pytest.raises(ValueError):
+        read_ovf(filename)
+
+
+@pytest.mark.parametrize('representation, dtype', [('binary 4', np.float32), ('binary 8', np.float64)])
+def test__read_ovf_returns_data_written_by_write_ovf_in_binary_format(tmpdir, representation, dtype):
+    """
+    read_ovf() decodes binary OVF 2.0 files (4- and 8-byte) written by write_ovf() without copying the data.
+    """
+    filename = os.path.join(str(tmpdir), 'm.omf')
+    data = make_random_vector_field(shape=(2, 4, 3))
+    write_ovf(filename, data, representation=representation)
+
+    header, data_read = read_ovf(filename)
+
+    assert get_ovf_representation(filename) == representation
+    assert data_read.shape == (2, 4, 3, 3)
+    assert not data_read.flags.owndata
+    assert np.array_equal(data_read, data.astype(dtype))
+
+
+def test__read_ovf_decodes_big_endian_binary_data_in_ovf_1_0_files(tmpdir):
+    """
+    Binary data in OVF 1.0 files is stored in big-endian byte order.
+    """
+    data = make_random_vector_field(shape=(1, 2, 2))
+    filename = os.path.join(str(tmpdir), 'm.omf')
+
+    header = "\n".join([
+        "# OOMMF: rectangular mesh v1.0",
+        "# Segment count: 1",
+        "# Begin: Segment",
+        "# Begin: Header",
+        "# xnodes: 2", "# ynodes: 2", "# znodes: 1",
+        "# End: Header",
+        "# Begin: Data Binary 8",
+        ""])
+    values = np.concatenate([[123456789012345.0], data.ravel()]).astype('>f8')
+    with open(filename, 'wb') as f:
+        f.write(header.encode('ascii') + values.tobytes() + b"\n# End: Data Binary 8\n# End: Segment\n")
+
+    _, data_read = read_ovf(filename)
+
+    assert np.array_equal(data_read, data)
+
+
+@pytest.mark.parametrize('representation', ['binary 4', 'binary 8'])
+def test__read_ovf_raises_error_for_invalid_validation_tag(tmpdir, representation):
+    """
+    read_ovf() raises an error if the validation tag of a binary data block is wrong.
+    """
+    filename = os.path.join(str(tmpdir), 'm.omf')
+    write_ovf(filename, make_random_vector_field(), representation=representation)
+
+    with open(filename, 'rb') as f:
+        content = f.read()
+    offset = content.index(b'\n', content.index(b'# Begin: Data')) + 1
+    with open(filename, 'wb') as f:
+        f.write(content[:offset] + b'\x00' * 4 + content[offset + 4:])
+
+    with pytest.raises(ValueError):
+        read_ovf(filename)
+
+
+def test__read_ovf_raises_error_for_truncated_binary_data(tmpdir):
+    filename = os.path.join(str(tmpdir), 'm.omf')
+    write_ovf(filename, make_random_vector_field(), representation='binary 8')
+
+    with open(filename, 'rb') as f:
+        content = f.read()
+    with open(filename, 'wb') as f:
+        f.write(content[:content.index(b'# Begin: Data') + 100])
+
+    with pytest.raises(ValueError):
+        read_ovf(filename)
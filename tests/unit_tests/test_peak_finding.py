@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from postprocessing.fft_utils import get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2, \
+    find_peak_frequency
+from postprocessing.peak_finding import PeakFinder
+from .mock_utils import FakeDataReader
+
+
+def make_ringdown_spectrum(peak_freqs, num_timesteps=4000, dt=5e-12, damping=0.15e9):
+    """
+    Return (freqs, spectrum) for a sum of exponentially damped sinusoids
+    with the given frequencies (in GHz). The frequencies in GHz are returned.
+    """
+    timesteps = np.arange(num_timesteps) * dt
+    m_avg = sum(np.exp(-damping * timesteps) * np.sin(2 * np.pi * f * 1e9 * timesteps) for f in peak_freqs)
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    return freqs, get_spectrum_via_method_1(m_avg)
+
+
+def test__peaks_of_fake_data_are_found_at_the_input_frequencies():
+    """
+    The peaks detected in the spectrum of the fake data lie exactly at the FFT bins of the input frequencies.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    freqs = get_fft_frequencies(data_reader.get_timesteps(), unit='GHz')
+    spectrum = get_spectrum_via_method_2(data_reader.get_spatially_resolved_magnetisation('y'))
+
+    peak_finder = PeakFinder(freqs, spectrum, interpolation=None)
+    expected_peak_freqs = [1.0, 2.35, 5.0, 12.0]
+
+    assert np.allclose(peak_finder.get_peak_frequencies(), expected_peak_freqs, atol=1e-12, rtol=0)
+    assert np.allclose(peak_finder.find_peak_frequency([0.7, 2.4, 6.0, 30.0]), expected_peak_freqs)
+
+
+@pytest.mark.parametrize('interpolation', ['parabolic', 'lorentzian'])
+def test__peak_positions_are_refined_to_sub_bin_precision(interpolation):
+    """
+    For peaks which lie between two FFT bins, the interpolated peak positions are closer to
+    the true frequencies than the bin frequencies (and within a fifth of the bin spacing).
+    """
+    true_peak_freqs = [3.2731, 8.2617, 11.2389]
+    freqs, spectrum = make_ringdown_spectrum(true_peak_freqs)
+
+    peak_freqs_bin = PeakFinder(freqs, spectrum, interpolation=None).find_peak_frequency(true_peak_freqs)
+    peak_freqs = PeakFinder(freqs, spectrum, interpolation=interpolation).find_peak_frequency(true_peak_freqs)
+
+    assert np.all(abs(peak_freqs - true_peak_freqs) < 0.2 * (freqs[1] - freqs[0]))
+    assert np.all(abs(peak_freqs - true_peak_freqs) < abs(peak_freqs_bin - true_peak_freqs))
+
+
+def test__batched_queries_agree_with_single_queries():
+    """
+    Querying many approximate frequencies at once gives the same result as querying them one by one.
+    """
+    freqs, spectrum = make_ringdown_spectrum([3.2731, 8.2617, 11.2389])
+    peak_finder = PeakFinder(freqs, spectrum)
+    approx_freqs = np.linspace(0, 40, 101)
+
+    peak_freqs = peak_finder.find_peak_frequency(approx_freqs)
+
+    assert peak_freqs.shape == approx_freqs.shape
+    assert np.array_equal(peak_freqs, [peak_finder.find_peak_frequency(f) for f in approx_freqs])
+    assert find_peak_frequency(freqs, spectrum, 8.3) == \
+        PeakFinder(freqs, spectrum, interpolation=None).find_peak_frequency(8.3)
+
+
+def test__low_prominence_bumps_are_ignored():
+    """
+    Small wiggles on the flank of a peak are not reported as peaks.
+    """
+    freqs, spectrum = make_ringdown_spectrum([8.2617])
+    spectrum = spectrum * (1 + 0.01 * np.cos(np.arange(len(spectrum)) * np.pi))
+
+    peak_finder = PeakFinder(freqs, spectrum)
+
+    assert len(peak_finder.get_peak_frequencies()) == 1
+    assert abs(peak_finder.find_peak_frequency(20.0) - 8.2617) < 0.01
+
+
+def test__invalid_arguments_raise_error():
+    freqs, spectrum = make_ringdown_spectrum([8.2617])
+    with pytest.raises(ValueError):
+        PeakFinder(freqs, spectrum, interpolation='cubic')
+    with pytest.raises(ValueError):
+        PeakFinder(freqs, np.ones_like(freqs)).find_peak_frequency(8.0)
+
+
+def test__linewidth_of_lorentzian_peak_agrees_with_damping():
+    """
+    The linewidth (FWHM) of the power spectrum of a damped oscillation exp(-t/tau) is 1 / (pi * tau).
+    """
+    damping = 0.5e9
+    freqs, spectrum = make_ringdown_spectrum([8.2617], num_timesteps=20000, damping=damping)
+
+    peak_freqs, amplitudes, linewidths = PeakFinder(freqs, spectrum).get_peak_properties([8.0])
+
+    assert abs(linewidths[0] - damping / np.pi / 1e9) < 0.1 * damping / np.pi / 1e9
+    assert amplitudes[0] == spectrum.max()
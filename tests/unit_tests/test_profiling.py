@@ -0,0 +1,113 @@
+import json
+import numpy as np
+import os
+
+import postprocessing
+from postprocessing import fft_utils, figure_plotting, profiling
+from postprocessing.data_reader import BaseDataReader
+from postprocessing.spectral_analysis import SpectralAnalysis
+from reproduce_figures import get_profiling_targets, reproduce_figures
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+
+def test__profiling_installs_no_wrappers_when_disabled():
+    originals = (fft_utils.get_fft_coefficients, BaseDataReader.get_timesteps,
+                 figure_plotting.make_figure_2, postprocessing.make_figure_2)
+    assert profiling.get_active_profiler() is None
+
+    with profiling.profile() as profiler:
+        assert profiling.get_active_profiler() is profiler
+        assert fft_utils.get_fft_coefficients is not originals[0]
+        assert BaseDataReader.get_timesteps is not originals[1]
+        # Names imported into other modules are patched, too.
+        assert figure_plotting.make_figure_2 is not originals[2]
+        assert postprocessing.make_figure_2 is figure_plotting.make_figure_2
+
+    assert profiling.get_active_profiler() is None
+    assert (fft_utils.get_fft_coefficients, BaseDataReader.get_timesteps,
+            figure_plotting.make_figure_2, postprocessing.make_figure_2) == originals
+
+
+def test__profiled_functions_return_the_same_results():
+    data_reader = FakeDataReader()
+    expected = SpectralAnalysis(data_reader).get_spectrum_via_method_2('y')
+    freqs = SpectralAnalysis(data_reader).get_frequencies()
+
+    with profiling.profile() as profiler:
+        spectrum = SpectralAnalysis(data_reader).get_spectrum_via_method_2('y')
+        nfft = fft_utils.SpectralEstimator.get_nfft_for_resolution(5e-12, 1e9)
+        peak_freq = fft_utils.find_peak_frequency(freqs, spectrum, 5.0)
+
+    assert np.array_equal(spectrum, expected)
+    assert nfft == 200
+    assert abs(peak_freq - 5.0) < 0.05
+
+    names = set(event['name'] for event in profiler.events)
+    assert 'SpectralAnalysis.get_spectrum_via_method_2' in names
+    assert 'BaseDataReader.get_spatially_resolved_magnetisation' in names
+    assert 'fft_utils.get_fft_coefficients' in names
+    assert 'fft_utils.find_peak_frequency' in names
+    assert 'PeakFinder.__init__' in names
+    assert 'SpectralEstimator.get_nfft_for_resolution' in names
+
+
+def test__nested_stages_record_exclusive_time_and_peak_memory():
+    profiler = profiling.Profiler(trace_memory=True)
+    try:
+        with profiler.stage('outer', 'a'):
+            with profiler.stage('inner', 'b'):
+                a = np.ones(2 * 1024**2)  # 16 MB
+                del a
+            b = np.ones(1024**2)  # 8 MB
+            del b
+    finally:
+        profiler.close()
+
+    inner, outer = profiler.events
+    assert (inner['name'], inner['depth'], outer['name'], outer['depth']) == ('inner', 1, 'outer', 0)
+    assert inner['duration'] <= outer['duration']
+    assert abs(outer['self_duration'] - (outer['duration'] - inner['duration'])) < 1e-12
+    assert 16 * 1024**2 <= inner['peak_memory'] < 17 * 1024**2
+    # The peak of the outer stage includes that of the inner one.
+    assert 16 * 1024**2 <= outer['peak_memory'] < 17 * 1024**2
+
+    summary = profiler.get_summary()
+    assert list(summary) in (['outer', 'inner'], ['inner', 'outer'])
+    assert summary['inner']['calls'] == 1
+    assert set(profiler.get_category_summary()) == {'a', 'b'}
+    assert 'inner' in profiler.format_summary()
+
+
+def test__profiling_results_can_be_written_as_json_and_chrome_trace(tmpdir):
+    with profiling.profile() as profiler:
+        SpectralAnalysis(FakeDataReader()).get_spectrum_via_method_1('y')
+
+    json_file = os.path.join(str(tmpdir), 'profile.json')
+    trace_file = os.path.join(str(tmpdir), 'trace.json')
+    profiler.write_json(json_file)
+    profiler.write_chrome_trace(trace_file)
+
+    with open(json_file) as f:
+        data = json.load(f)
+    assert len(data['events']) == len(profiler.events)
+    assert 'SpectralAnalysis.get_spectrum_via_method_1' in data['summary']
+
+    with open(trace_file) as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == len(profiler.events)
+    for event in trace['traceEvents']:
+        assert event['ph'] == 'X'
+        assert event['ts'] >= 0 and event['dur'] >= 0
+
+
+def test__reproduce_figures_collects_stages_from_worker_processes(tmpdir):
+    data_dir = write_fake_data_dir(os.path.join(str(tmpdir), 'data'), FakeDataReader(damping=0.08))
+
+    with profiling.profile(extra_targets=get_profiling_targets()) as profiler:
+        reproduce_figures(data_dir, os.path.join(str(tmpdir), 'figures'), 'png', jobs=2, profiler=profiler)
+
+    summary = profiler.get_summary()
+    assert summary['savefig']['calls'] == 4
+    for n in range(2, 6):
+        assert summary['figure_plotting.make_figure_{}'.format(n)]['calls'] == 1
+    assert len(set(event['pid'] for event in profiler.events)) >= 2
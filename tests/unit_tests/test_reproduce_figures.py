@@ -0,0 +1,25 @@
+import os
+
+from reproduce_figures import reproduce_figures
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+
+def test__parallel_mode_produces_identical_output_to_serial_mode(tmpdir):
+    """
+    reproduce_figures() with `jobs > 1` produces byte-identical files to the serial mode.
+    """
+    data_dir = write_fake_data_dir(os.path.join(str(tmpdir), 'data'), FakeDataReader(damping=0.08))
+    output_dir_serial = os.path.join(str(tmpdir), 'serial')
+    output_dir_parallel = os.path.join(str(tmpdir), 'parallel')
+
+    reproduce_figures(data_dir, output_dir_serial, 'png,pdf', jobs=1)
+    reproduce_figures(data_dir, output_dir_parallel, 'png,pdf', jobs=2)
+
+    filenames = sorted(os.listdir(output_dir_serial))
+    assert filenames == ['figure_{}.{}'.format(n, fmt) for n in range(2, 6) for fmt in ('pdf', 'png')]
+    assert sorted(os.listdir(output_dir_parallel)) == filenames
+
+    for filename in filenames:
+        with open(os.path.join(output_dir_serial, filename), 'rb') as f_serial, \
+             open(os.path.join(output_dir_parallel, filename), 'rb') as f_parallel:
+            assert f_serial.read() == f_parallel.read()
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from postprocessing import DataReader, Sampling, SpectralAnalysis
+from postprocessing.fft_utils import \
+    get_spectrum_via_method_2, get_mode_amplitudes_at_freq, get_mode_phases_at_freq, \
+    get_mode_amplitudes_and_phases_at_freqs
+from .mock_utils import FakeDataReader, write_fake_data_dir
+
+
+def make_disc_mask(grid_shape=(24, 24), radius=6):
+    i, j = np.indices(grid_shape)
+    return (i - 11.5)**2 + (j - 11.5)**2 <= radius**2
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmpdir_factory):
+    data_dir = str(tmpdir_factory.mktemp('data'))
+    write_fake_data_dir(data_dir, FakeDataReader(damping=0.08, grid_shape=(24, 20)))
+    return data_dir
+
+
+def test__rectangular_sampling_returns_view(data_dir):
+    """
+    A rectangular region of interest with a stride is returned as a view of the memory-mapped data.
+    """
+    data_reader = DataReader(data_dir, data_format='OOMMF', mmap_mode='r')
+    sampling = Sampling(roi=(slice(2, 12), slice(None)), stride=(1, 3))
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+
+    m_y_sampled = data_reader.get_spatially_resolved_magnetisation('y', sampling=sampling)
+    assert np.array_equal(m_y_sampled, m_y[:, 2:12, ::3])
+    assert np.shares_memory(m_y_sampled, m_y)
+    assert sampling.is_rectangular()
+    assert data_reader.get_grid_shape(sampling) == (10, 7) == m_y_sampled.shape[1:]
+    assert sampling.get_num_cells(data_reader.get_grid_shape()) == 70
+
+
+def test__rectangular_mask_is_sampled_without_copy():
+    mask = np.zeros((24, 24), dtype=bool)
+    mask[3:9, 10:20] = True
+    data_reader = FakeDataReader()
+    data_reader.cache_size = 1
+    m_x = data_reader.get_spatially_resolved_magnetisation('x')
+
+    m_x_sampled = data_reader.get_spatially_resolved_magnetisation('x', sampling=Sampling(roi=mask))
+    assert np.shares_memory(m_x_sampled, m_x)
+    assert np.array_equal(m_x_sampled, m_x[:, 3:9, 10:20])
+
+
+def test__non_rectangular_mask():
+    """
+    For a non-rectangular mask only the selected cells are returned (with shape (N, K)), and
+    `to_grid` places values of these cells back on the bounding box of the mask.
+    """
+    mask = make_disc_mask()
+    sampling = Sampling(roi=mask, stride=2)
+    data_reader = FakeDataReader()
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+
+    m_y_sampled = data_reader.get_spatially_resolved_magnetisation('y', sampling=sampling)
+    bounding_box = (slice(6, 18, 2), slice(6, 18, 2))
+    assert not sampling.is_rectangular()
+    assert m_y_sampled.shape == (len(m_y), sampling.get_num_cells((24, 24)))
+    assert np.array_equal(m_y_sampled, m_y[(slice(None),) + bounding_box][:, mask[bounding_box]])
+
+    grid = sampling.to_grid(m_y_sampled[:2])
+    assert grid.shape == (2,) + data_reader.get_grid_shape(sampling) == (2, 6, 6)
+    assert np.array_equal(np.isnan(grid[0]), ~mask[bounding_box])
+    assert np.array_equal(grid[:, mask[bounding_box]], m_y_sampled[:2])
+
+
+def test__spectrum_and_mode_maps_via_sampling():
+    """
+    SpectralAnalysis with a sampling agrees with the functions in `fft_utils` applied to the same region.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    timesteps = data_reader.get_timesteps()
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+
+    for sampling in [Sampling(roi=(slice(0, 6), slice(None)), stride=2), Sampling(roi=make_disc_mask())]:
+        analysis = SpectralAnalysis(data_reader, sampling=sampling)
+        spectrum = get_spectrum_via_method_2(m_y, sampling=sampling)
+        assert np.array_equal(analysis.get_spectrum_via_method_2('y'), spectrum)
+        assert np.allclose(spectrum, get_spectrum_via_method_2(sampling.apply(m_y)))
+
+        peak_freq = analysis.find_peak_frequency(12.0, component='y')
+        amplitudes = get_mode_amplitudes_at_freq(timesteps, m_y, peak_freq, sampling=sampling)
+        phases = get_mode_phases_at_freq(timesteps, m_y, peak_freq, sampling=sampling)
+        assert amplitudes.shape == data_reader.get_grid_shape(sampling)
+        assert np.array_equal(analysis.get_mode_amplitudes_at_freq('y', peak_freq), amplitudes, equal_nan=True)
+        assert np.array_equal(analysis.get_mode_phases_at_freq('y', peak_freq), phases, equal_nan=True)
+
+        mode_amplitudes, mode_phases = analysis.get_mode_maps_at_freqs([peak_freq], components=['y'])
+        assert np.allclose(mode_amplitudes[0, 0], amplitudes, equal_nan=True)
+        amplitudes_dft, _ = get_mode_amplitudes_and_phases_at_freqs(timesteps, m_y, [peak_freq], sampling=sampling)
+        assert np.allclose(amplitudes_dft[0], amplitudes, equal_nan=True)
+
+    # Out-of-core computation of the sampled spectrum and mode maps.
+    sampling = Sampling(roi=make_disc_mask())
+    analysis = SpectralAnalysis(data_reader, sampling=sampling, memory_budget=1024**2)
+    assert np.allclose(analysis.get_spectrum_via_method_2('y'), get_spectrum_via_method_2(m_y, sampling=sampling))
+    assert np.allclose(analysis.get_mode_amplitudes_at_freq('y', 8.25),
+                       get_mode_amplitudes_at_freq(timesteps, m_y, 8.25, sampling=sampling), equal_nan=True)
+
+
+def test__sampling_height(data_dir):
+    """
+    Data which is stored in a single plane can only be sampled at the height of that plane.
+    """
+    data_reader = DataReader(data_dir, data_format='OOMMF')
+    m_z = data_reader.get_spatially_resolved_magnetisation('z')
+    assert data_reader.get_sampling_height() == 5.0
+    assert np.array_equal(data_reader.get_spatially_resolved_magnetisation('z', sampling=Sampling(height=5.0)), m_z)
+    with pytest.raises(ValueError):
+        data_reader.get_spatially_resolved_magnetisation('z', sampling=Sampling(height=2.5))
+
+    # Arrays which have already been read cannot be sampled at a different height.
+    with pytest.raises(ValueError):
+        get_spectrum_via_method_2(m_z, sampling=Sampling(height=5.0))
+
+
+def test__invalid_sampling():
+    with pytest.raises(ValueError):
+        Sampling(stride=0)
+    with pytest.raises(ValueError):
+        Sampling(roi=(slice(0, 10, 2), slice(None)))
+    with pytest.raises(ValueError):
+        Sampling(roi=np.zeros((24, 24), dtype=bool))
+    with pytest.raises(ValueError):
+        FakeDataReader().get_spatially_resolved_magnetisation('x', sampling=Sampling(roi=make_disc_mask((12, 12))))
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from postprocessing import SpectralAnalysis
+from postprocessing import spectral_analysis as spectral_analysis_module
+from postprocessing.fft_utils import \
+    get_fft_frequencies, get_spectrum_via_method_1, get_spectrum_via_method_2, \
+    find_peak_frequency, get_mode_amplitudes_at_freq, get_mode_phases_at_freq
+from .mock_utils import FakeDataReader
+
+
+def test__spectral_analysis_agrees_with_fft_utils():
+    """
+    SpectralAnalysis returns the same frequencies, spectra and mode maps as the functions in `fft_utils`.
+    """
+    data_reader = FakeDataReader(damping=0.08)
+    analysis = SpectralAnalysis(data_reader)
+
+    timesteps = data_reader.get_timesteps()
+    freqs = get_fft_frequencies(timesteps, unit='GHz')
+    m_y = data_reader.get_spatially_resolved_magnetisation('y')
+    m_y_avg = data_reader.get_average_magnetisation('y')
+
+    assert np.allclose(analysis.get_frequencies(unit='GHz'), freqs, atol=0, rtol=1e-15)
+    assert np.array_equal(analysis.get_spectrum_via_method_1('y'), get_spectrum_via_method_1(m_y_avg))
+    assert np.array_equal(analysis.get_spectrum_via_method_2('y'), get_spectrum_via_method_2(m_y))
+
+    peak_freq = find_peak_frequency(freqs, get_spectrum_via_method_2(m_y), approx_freq=12.0)
+    assert analysis.find_peak_frequency(12.0, component='y') == peak_freq
+
+    assert np.array_equal(analysis.get_mode_amplitudes_at_freq('y', peak_freq),
+                          get_mode_amplitudes_at_freq(timesteps, m_y, peak_freq))
+    assert np.array_equal(analysis.get_mode_phases_at_freq('y', peak_freq),
+                          get_mode_phases_at_freq(timesteps, m_y, peak_freq))
+
+
+def test__spectral_analysis_computes_fft_of_each_component_only_once(monkeypatch):
+    """
+    SpectralAnalysis computes the FFT of each component exactly once, no matter how often it is used.
+    """
+    calls = []
+    orig_get_fft_coefficients = spectral_analysis_module.get_fft_coefficients
+
+    def counting_get_fft_coefficients(m_vals):
+        calls.append(m_vals)
+        return orig_get_fft_coefficients(m_vals)
+
+    monkeypatch.setattr(spectral_analysis_module, 'get_fft_coefficients', counting_get_fft_coefficients)
+
+    analysis = SpectralAnalysis(FakeDataReader())
+    for freq in [2.35, 5.0, 12.0]:
+        analysis.find_peak_frequency(freq, component='y')
+        for component in ('x', 'y', 'z'):
+            analysis.get_mode_amplitudes_at_freq(component, freq)
+            analysis.get_mode_phases_at_freq(component, freq)
+
+    assert len(calls) == 3
+
+    analysis.clear_cache()
+    analysis.get_spectrum_via_method_2('y')
+    assert len(calls) == 4
+
+
+@pytest.mark.parametrize('method', ['auto', 'dft', 'fft'])
+def test__get_mode_maps_at_freqs_returns_stacked_maps_for_all_components(method):
+    """
+    SpectralAnalysis.get_mode_maps_at_freqs() returns maps of shape F x 3 x nx x ny which agree with single lookups.
+    """
+    freqs = [2.35, 5.0, 12.0, 15.3]
+    analysis = SpectralAnalysis(FakeDataReader(damping=0.08))
+    amplitudes, phases = analysis.get_mode_maps_at_freqs(freqs, method=method)
+
+    assert amplitudes.shape == (4, 3, 24, 24)
+    assert phases.shape == (4, 3, 24, 24)
+
+    analysis_full = SpectralAnalysis(FakeDataReader(damping=0.08))
+    for i, freq in enumerate(freqs):
+        for j, component in enumerate('xyz'):
+            assert np.allclose(amplitudes[i, j], analysis_full.get_mode_amplitudes_at_freq(component, freq),
+                               atol=1e-10)
+            assert np.allclose(phases[i, j], analysis_full.get_mode_phases_at_freq(component, freq),
+                               atol=1e-8)
+
+
+def test__get_mode_maps_at_freqs_does_not_compute_full_fft_for_few_frequencies():
+    """
+    With only a few target frequencies the full FFT is neither computed nor cached.
+    """
+    analysis = SpectralAnalysis(FakeDataReader())
+    analysis.get_mode_maps_at_freqs([5.0, 12.0])
+    assert analysis._fft_coeffs == {}
+
+    analysis.get_mode_maps_at_freqs([5.0, 12.0], method='fft')
+    assert sorted(analysis._fft_coeffs.keys()) == ['x', 'y', 'z']
+
+
+def test__spectral_analysis_with_memory_budget_agrees_with_in_memory_analysis(monkeypatch):
+    """
+    With a memory budget, SpectralAnalysis returns the same results (up to round-off) without computing full FFTs.
+    """
+    freqs = [2.35, 5.0, 12.0]
+    analysis_full = SpectralAnalysis(FakeDataReader(damping=0.08))
+    spectrum_expected = analysis_full.get_spectrum_via_method_2('y')
+    peak_freq_expected = analysis_full.find_peak_frequency(12.0)
+    amplitudes_expected, phases_expected = analysis_full.get_mode_maps_at_freqs(freqs, method='fft')
+
+    def fail(m_vals):
+        raise AssertionError("Full FFT computed despite memory budget")
+
+    monkeypatch.setattr(spectral_analysis_module, 'get_fft_coefficients', fail)
+    analysis = SpectralAnalysis(FakeDataReader(damping=0.08), memory_budget=256 * 1024)
+
+    assert np.allclose(analysis.get_spectrum_via_method_2('y'), spectrum_expected, atol=0, rtol=1e-12)
+    assert analysis.find_peak_frequency(12.0) == peak_freq_expected
+
+    for j, component in enumerate('xyz'):
+        assert np.allclose(analysis.get_mode_amplitudes_at_freq(component, 5.0), amplitudes_expected[1, j],
+                           atol=1e-12, rtol=0)
+        assert np.allclose(analysis.get_mode_phases_at_freq(component, 5.0), phases_expected[1, j],
+                           atol=1e-8, rtol=0)
+
+    amplitudes, _ = analysis.get_mode_maps_at_freqs(freqs, method='fft')
+    assert np.allclose(amplitudes, amplitudes_expected, atol=1e-12, rtol=0)
+    assert analysis._fft_coeffs == {}
@@ -0,0 +1,99 @@
+import numpy as np
+import os
+import pytest
+import stat
+
+from postprocessing import DataReader
+from postprocessing.table_cache import load_table, get_sidecar_filenames
+from .mock_utils import write_fake_data_dir
+
+
+def write_table(filename, data):
+    np.savetxt(filename, data)
+    return filename
+
+
+@pytest.fixture
+def table_file(tmpdir):
+    data = np.random.RandomState(0).uniform(size=(50, 4))
+    return write_table(os.path.join(str(tmpdir), 'dynamic_txyz.txt'), data)
+
+
+def test__load_table_writes_sidecar_and_memory_maps_it_on_subsequent_reads(table_file):
+    """
+    load_table() writes a binary sidecar on the first read and memory-maps it afterwards.
+    """
+    data_file, metadata_file = get_sidecar_filenames(table_file)
+    assert not os.path.exists(data_file)
+
+    data_1 = load_table(table_file)
+    assert os.path.exists(data_file) and os.path.exists(metadata_file)
+    assert not isinstance(data_1, np.memmap)
+
+    data_2 = load_table(table_file)
+    assert isinstance(data_2, np.memmap)
+    assert np.array_equal(data_1, data_2)
+    assert np.array_equal(data_2, np.loadtxt(table_file))
+
+
+def test__sidecar_is_invalidated_if_content_changes(table_file):
+    """
+    A cached table is not used if the file content has changed (even if the size is the same).
+    """
+    load_table(table_file)
+
+    new_data = np.loadtxt(table_file)[::-1]
+    write_table(table_file, new_data)
+    st = os.stat(table_file)
+    os.utime(table_file, (st.st_atime, st.st_mtime + 10))
+
+    assert np.array_equal(load_table(table_file), new_data)
+
+
+def test__sidecar_is_reused_if_only_the_modification_time_changes(table_file):
+    """
+    A cached table is still used if the file was touched but its content is unchanged.
+    """
+    data = load_table(table_file)
+    st = os.stat(table_file)
+    os.utime(table_file, (st.st_atime, st.st_mtime + 10))
+
+    data_cached = load_table(table_file)
+    assert isinstance(data_cached, np.memmap)
+    assert np.array_equal(data_cached, data)
+
+
+def test__load_table_uses_separate_cache_dir_for_read_only_data(tmpdir, table_file, monkeypatch):
+    """
+    The sidecar can be stored in a separate cache directory (given explicitly or via the environment).
+    """
+    data_dir = os.path.dirname(table_file)
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    os.chmod(data_dir, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        # Reading still works if no sidecar can be written
+        assert np.array_equal(load_table(table_file), np.loadtxt(table_file))
+
+        monkeypatch.setenv('FMR_TABLE_CACHE_DIR', cache_dir)
+        load_table(table_file)
+        assert isinstance(load_table(table_file), np.memmap)
+        assert len(os.listdir(cache_dir)) == 2
+    finally:
+        os.chmod(data_dir, stat.S_IRWXU)
+
+
+def test__data_reader_uses_table_cache(tmpdir):
+    """
+    The OOMMF/Nmag data readers memory-map the cached table after the first instantiation.
+    """
+    data_dir = write_fake_data_dir(str(tmpdir))
+
+    data_reader_1 = DataReader(data_dir, data_format='OOMMF')
+    data_reader_2 = DataReader(data_dir, data_format='Nmag')
+    data_reader_3 = DataReader(data_dir, data_format='OOMMF', table_cache=False)
+
+    assert isinstance(data_reader_2.data_avg, np.memmap)
+    assert not isinstance(data_reader_3.data_avg, np.memmap)
+    for component in ('x', 'y', 'z'):
+        assert np.array_equal(data_reader_1.get_average_magnetisation(component),
+                              data_reader_2.get_average_magnetisation(component))